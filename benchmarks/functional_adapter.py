@@ -0,0 +1,61 @@
+from datetime import datetime
+import task_engine
+
+# Benchmark adapter of the functional engine ( "functional paradigm/task_engine.py" )
+# every operation takes the collection and returns the collection it produces, nothing is mutated
+
+
+def load(filename):
+    return task_engine.open_storage("json", filename).tasks
+
+
+def save(tasks, filename):
+    task_engine.save_tasks_to_file(tasks, filename)
+
+
+# filename ends in .bin, so the binary mode reads it under that name
+def load_binary(filename):
+    return task_engine.open_storage("binary", filename).tasks
+
+
+def save_binary(tasks, filename):
+    task_engine.save_snapshot(tasks, filename)
+
+
+# task_data holds the fields of tasks.json, the highlight flag is set by the highlighting pass
+def add(tasks, task_data):
+    return task_engine.add_task(tasks, {"highlight": False, **task_data})
+
+
+def update(tasks, index, priority, status):
+    return task_engine.update_task(tasks, index, {"priority": priority, "status": status})
+
+
+def delete(tasks, index):
+    return task_engine.delete_task(tasks, index)
+
+
+# Tasks in the order of a field, built like the task list reads them
+def sort(tasks, field):
+    return tuple(task_engine.query_tasks(tasks, order_by=field))
+
+
+# The first page of the order of a field, selected again by each run ( on a copy of the collection
+# without the ordering an earlier run kept )
+def sort_page(tasks, field, page_size):
+    indexes = {key: index for key, index in tasks.indexes.items() if key != ("prefix", field)}
+    return tuple(task_engine.sorted_page(task_engine.IndexedTasks(tasks.columns, tasks.slots, indexes), field, 0, page_size))
+
+
+def next_tasks(tasks, count):
+    return tuple(task_engine.next_tasks(tasks, count))
+
+
+# criteria : priority, status, start_date, end_date ( "YYYY-MM-DD" ) and text, like the filter window gives them
+def filter(tasks, criteria):
+    dates = {field: datetime.strptime(criteria[field], "%Y-%m-%d") for field in ("start_date", "end_date") if criteria.get(field)}
+    return tuple(task_engine.query_tasks(tasks, **{**criteria, **dates}))
+
+
+def highlight(tasks):
+    return task_engine.check_task_highlighting(tasks)
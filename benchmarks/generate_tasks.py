@@ -0,0 +1,61 @@
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+
+# Synthetic task files for the benchmarks
+# the tasks look like the ones the planner is used with : creation times over the last year, due
+# dates a few days to a few months after creation ( so some are past, some due soon, most ahead ),
+# more medium than high priorities, and statuses that agree with the due dates ( most past tasks
+# are completed or overdue, a few are still pending so the overdue pass has work to do ).
+#
+#   python generate_tasks.py 100000 --output tasks.json --seed 1
+
+PRIORITIES = ("Low", "Medium", "High")
+PRIORITY_WEIGHTS = (35, 45, 20)
+
+VERBS = ("Write", "Review", "Fix", "Plan", "Call", "Email", "Update", "Prepare", "Test", "Deploy", "Draft", "Renew")
+SUBJECTS = ("report", "budget", "meeting notes", "invoice", "release", "design", "contract", "backlog", "slides", "server", "newsletter", "client brief")
+WORDS = (
+    "before", "after", "the", "team", "weekly", "review", "check", "numbers", "with", "client", "send", "final",
+    "version", "draft", "update", "notes", "ask", "about", "budget", "plan", "next", "quarter", "release", "fix",
+)
+
+
+# Task dicts in the format of tasks.json ( the same random seed always gives the same tasks )
+def generate_tasks(count, seed=1, now=None):
+    generator = random.Random(seed)
+    now = now or datetime.now().replace(microsecond=0)
+    today = now.date()
+    tasks = []
+    for number in range(count):
+        created = now - timedelta(seconds=generator.randrange(365 * 24 * 3600))
+        # Most tasks are due within a few weeks of their creation, some much later
+        due = created.date() + timedelta(days=int(generator.expovariate(1 / 30)))
+        if due < today:
+            status = generator.choices(("Completed", "Overdue", "Pending"), (55, 35, 10))[0]
+        else:
+            status = generator.choices(("Pending", "Completed"), (80, 20))[0]
+        tasks.append({
+            "title": f"{generator.choice(VERBS)} {generator.choice(SUBJECTS)} {number}",
+            "description": " ".join(generator.choices(WORDS, k=generator.randint(4, 12))).capitalize() + ".",
+            "due_date": due.isoformat(),
+            "priority": generator.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+            "status": status,
+            "creation_time": created.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return tasks
+
+
+def write_tasks(path, count, seed=1):
+    with open(path, "w") as file:
+        json.dump(generate_tasks(count, seed), file, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic tasks file.")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--output", default="tasks.json")
+    parser.add_argument("--seed", type=int, default=1)
+    arguments = parser.parse_args()
+    write_tasks(arguments.output, arguments.count, arguments.seed)
@@ -0,0 +1,73 @@
+import task_engine
+
+# Benchmark adapter of the imperative engine ( "imperative paradigm/task_engine.py" )
+# the engine keeps its tasks in module globals : the operations change them in place and return
+# task_engine.tasks, so the benchmarks treat both engines the same way
+
+
+def load(filename):
+    task_engine.STORAGE_MODE = "json"
+    task_engine.TASKS_FILE = filename
+    task_engine.load_tasks()
+    return task_engine.tasks
+
+
+def save(tasks, filename):
+    task_engine.STORAGE_MODE = "json"
+    task_engine.TASKS_FILE = filename
+    task_engine.write_tasks_file(tasks)
+
+
+# filename ends in .bin, so the binary mode reads and writes it under that name
+def load_binary(filename):
+    task_engine.STORAGE_MODE = "binary"
+    task_engine.TASKS_FILE = filename
+    task_engine.load_tasks()
+    return task_engine.tasks
+
+
+def save_binary(tasks, filename):
+    task_engine.STORAGE_MODE = "binary"
+    task_engine.TASKS_FILE = filename
+    task_engine.write_tasks_file(task_engine.tasks)
+
+
+def add(tasks, task_data):
+    task_engine.add_task(task_data)
+    return task_engine.tasks
+
+
+def update(tasks, index, priority, status):
+    task_engine.update_task(task_engine.tasks[index]["id"], priority, status)
+    return task_engine.tasks
+
+
+def delete(tasks, index):
+    task_engine.delete_task(task_engine.tasks[index]["id"])
+    return task_engine.tasks
+
+
+def sort(tasks, field):
+    return task_engine.sorted_tasks(field)
+
+
+# The first page of the order of a field, selected again by each run ( as after loading )
+def sort_page(tasks, field, page_size):
+    task_engine.sort_prefixes.pop(field, None)
+    return task_engine.sorted_page(field, 0, page_size)
+
+
+def next_tasks(tasks, count):
+    return task_engine.next_tasks(count)
+
+
+# criteria : priority, status, start_date, end_date ( "YYYY-MM-DD" ) and text, like the filter window gives them
+def filter(tasks, criteria):
+    return task_engine.filter_tasks(task_engine.filter_criteria(**criteria))
+
+
+# The pass run after loading : overdue tasks are marked, then every highlight is set
+def highlight(tasks):
+    task_engine.mark_overdue_tasks()
+    task_engine.refresh_highlights()
+    return task_engine.tasks
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from generate_tasks import write_tasks
+
+# Benchmarks of the task engines
+# generates synthetic tasks files of each size, runs the same operations on every engine ( load,
+# save, highlight, the first page of each ordering, each sort field, filters from one criterion to all of them, the most urgent tasks,
+# add / update / delete, then saving and loading a binary snapshot ) and prints the median times. The results can be written as JSON and compared with an
+# earlier run : the exit status is 1 when an operation got slower than the threshold allows.
+# Nothing opens a window, the benchmarks run on servers without a display.
+#
+#   python run_benchmarks.py --sizes 1000 10000 100000 --output results.json
+#   python run_benchmarks.py --compare results.json --threshold 1.2
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+# Engines that can be benchmarked : name -> (directory of the engine modules, adapter module)
+# a new engine gets an adapter with the functions of functional_adapter.py and an entry here
+ENGINES = {
+    "functional": (os.path.join(ROOT_DIR, "functional paradigm"), "functional_adapter"),
+    "imperative": (os.path.join(ROOT_DIR, "imperative paradigm"), "imperative_adapter"),
+}
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Runs the benchmarks of one engine on a tasks file in a process of its own, returns its timing records
+def run_engine(engine, tasks_file, arguments):
+    engine_dir, adapter = ENGINES[engine]
+    command = [
+        sys.executable, os.path.join(BENCHMARKS_DIR, "worker.py"),
+        "--engine-dir", engine_dir, "--adapter", adapter, "--tasks-file", tasks_file,
+        "--repeat", str(arguments.repeat), "--batch", str(arguments.batch), "--seed", str(arguments.seed),
+    ]
+    # The engines write next to the tasks file ( journal, database ), so they run in its directory
+    completed = subprocess.run(command, cwd=os.path.dirname(tasks_file), capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"The {engine} benchmarks failed:\n{completed.stderr}")
+    return json.loads(completed.stdout)
+
+
+def run_all(arguments):
+    results = []
+    for size in arguments.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            tasks_file = os.path.join(directory, "tasks.json")
+            write_tasks(tasks_file, size, arguments.seed)
+            for engine in arguments.engines:
+                print(f"{engine}: {size} tasks ...", file=sys.stderr)
+                for record in run_engine(engine, tasks_file, arguments):
+                    results.append({"engine": engine, "size": size, **record})
+    return results
+
+
+def print_results(results):
+    print(f"{'engine':<12}{'tasks':>10}  {'operation':<24}{'median ms':>12}{'min ms':>12}")
+    for record in results:
+        print(f"{record['engine']:<12}{record['size']:>10}  {record['operation']:<24}{record['median'] * 1000:>12.3f}{record['min'] * 1000:>12.3f}")
+
+
+# Prints the ratio of each median to the one of the earlier run, returns the records that got
+# slower than the threshold allows ( a ratio of 1.2 means 20 % slower )
+def compare_results(results, previous_results, threshold):
+    previous = {(record["engine"], record["size"], record["operation"]): record for record in previous_results}
+    regressions = []
+    print(f"\n{'engine':<12}{'tasks':>10}  {'operation':<24}{'before ms':>12}{'after ms':>12}{'ratio':>8}")
+    for record in results:
+        before = previous.get((record["engine"], record["size"], record["operation"]))
+        if before is None or before["median"] == 0:
+            continue
+        ratio = record["median"] / before["median"]
+        flag = "  slower" if ratio > threshold else ""
+        print(f"{record['engine']:<12}{record['size']:>10}  {record['operation']:<24}{before['median'] * 1000:>12.3f}{record['median'] * 1000:>12.3f}{ratio:>8.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(record)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the task engines.")
+    parser.add_argument("--engines", nargs="+", choices=tuple(ENGINES), default=tuple(ENGINES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="numbers of tasks ( up to 1000000 )")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each operation ( the median is reported )")
+    parser.add_argument("--batch", type=int, default=100, help="tasks added, updated and deleted by one run of the edits")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the generated tasks")
+    parser.add_argument("--output", help="JSON file the results are written to")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as a regression")
+    arguments = parser.parse_args(argv)
+
+    results = run_all(arguments)
+    print_results(results)
+    if arguments.output:
+        report = {
+            "metadata": {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "processor": platform.processor(),
+                "cpus": os.cpu_count(),
+                "repeat": arguments.repeat,
+                "batch": arguments.batch,
+                "seed": arguments.seed,
+            },
+            "results": results,
+        }
+        with open(arguments.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            previous_results = json.load(file)["results"]
+        if compare_results(results, previous_results, arguments.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
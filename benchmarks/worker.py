@@ -0,0 +1,142 @@
+import argparse
+import gc
+import importlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+# Runs every benchmark of one engine on one tasks file and prints the timings as JSON
+# run_benchmarks.py starts it in a process of its own for each engine : the engines have modules
+# of the same names ( task_engine, journal, ... ), so each one needs an interpreter of its own.
+# No window is opened, the engines are used headless.
+
+SORT_FIELDS = ("priority", "due_date", "status", "creation_time")
+
+# Number of tasks the "what next" query reads ( the Next up panel of the windows shows as many )
+NEXT_COUNT = 5
+
+# Rows of the first page of a sorted task list ( the task list of the windows shows as many )
+PAGE_SIZE = 100
+
+
+# Filters of the benchmarks, from one criterion to all of them at once ( dates around today,
+# where most pending tasks are due )
+def filter_cases():
+    today = date.today()
+    next_month = (today + timedelta(days=30)).isoformat()
+    return {
+        "filter_priority": {"priority": "High"},
+        "filter_priority_status": {"priority": "High", "status": "Pending"},
+        "filter_due_range": {"start_date": today.isoformat(), "end_date": next_month},
+        "filter_text": {"text": "budget review"},
+        "filter_combined": {"priority": "High", "status": "Pending", "start_date": today.isoformat(), "end_date": next_month, "text": "budget"},
+    }
+
+
+def new_task(number):
+    return {
+        "title": f"Benchmark task {number}",
+        "description": "Added by the benchmarks",
+        "due_date": (date.today() + timedelta(days=number % 60)).isoformat(),
+        "priority": ("Low", "Medium", "High")[number % 3],
+        "status": "Pending",
+        "creation_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def timing_record(operation, times, batch=1):
+    return {
+        "operation": operation,
+        "batch": batch,
+        "repeat": len(times),
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "max": max(times),
+    }
+
+
+# Seconds one call of run() takes ( divided by batch, the number of operations the call does )
+def time_call(run, batch=1):
+    gc.collect()
+    start = time.perf_counter()
+    result = run()
+    return (time.perf_counter() - start) / batch, result
+
+
+# Times run() repeat times, returns the timing record of the operation and the last result
+def measure(operation, run, repeat):
+    times = []
+    for repetition in range(repeat):
+        seconds, result = time_call(run)
+        times.append(seconds)
+    return timing_record(operation, times), result
+
+
+def run_benchmarks(adapter, tasks_file, repeat, batch, seed):
+    results = []
+    record, tasks = measure("load", lambda: adapter.load(tasks_file), repeat)
+    results.append(record)
+    size = len(tasks)
+    saved_file = os.path.join(os.path.dirname(os.path.abspath(tasks_file)), "saved.json")
+    results.append(measure("save", lambda: adapter.save(tasks, saved_file), repeat)[0])
+
+    record, tasks = measure("highlight", lambda: adapter.highlight(tasks), repeat)
+    results.append(record)
+    # The first page of each ordering, selected without sorting every task, before the full sorts
+    for field in SORT_FIELDS:
+        results.append(measure(f"sort_page_{field}", lambda: adapter.sort_page(tasks, field, PAGE_SIZE), repeat)[0])
+    for field in SORT_FIELDS:
+        results.append(measure(f"sort_{field}", lambda: adapter.sort(tasks, field), repeat)[0])
+    for operation, criteria in filter_cases().items():
+        results.append(measure(operation, lambda: adapter.filter(tasks, criteria), repeat)[0])
+    # The first run builds the urgency queue, the others read it
+    results.append(measure("next_tasks", lambda: adapter.next_tasks(tasks, NEXT_COUNT), repeat)[0])
+
+    # Edits : each run adds a batch of tasks, updates a batch of random tasks, then deletes the
+    # tasks it added, so the collection keeps its size from one run to the next
+    generator = random.Random(seed)
+    state = {"tasks": tasks}
+
+    def add_batch(repetition):
+        for number in range(batch):
+            state["tasks"] = adapter.add(state["tasks"], new_task(repetition * batch + number))
+
+    def update_batch(repetition):
+        for index in generator.sample(range(size), min(batch, size)):
+            state["tasks"] = adapter.update(state["tasks"], index, generator.choice(("Low", "Medium", "High")), "Completed")
+
+    def delete_batch(repetition):
+        for index in range(size + batch - 1, size - 1, -1):
+            state["tasks"] = adapter.delete(state["tasks"], index)
+
+    edit_times = {"add": [], "update": [], "delete": []}
+    for repetition in range(repeat):
+        for operation, run in (("add", add_batch), ("update", update_batch), ("delete", delete_batch)):
+            edit_times[operation].append(time_call(lambda: run(repetition), batch)[0])
+    results.extend(timing_record(operation, times, batch) for operation, times in edit_times.items())
+
+    # The binary snapshot format ( the "binary" storage mode ) is written and read back last
+    snapshot_file = os.path.join(os.path.dirname(os.path.abspath(tasks_file)), "saved.bin")
+    results.append(measure("save_binary", lambda: adapter.save_binary(state["tasks"], snapshot_file), repeat)[0])
+    results.append(measure("load_binary", lambda: adapter.load_binary(snapshot_file), repeat)[0])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of one engine ( started by run_benchmarks.py ).")
+    parser.add_argument("--engine-dir", required=True, help="directory of the engine modules")
+    parser.add_argument("--adapter", required=True, help="module that adapts the engine to the benchmarks")
+    parser.add_argument("--tasks-file", required=True)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    arguments = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(arguments.engine_dir))
+    adapter = importlib.import_module(arguments.adapter)
+    json.dump(run_benchmarks(adapter, arguments.tasks_file, arguments.repeat, arguments.batch, arguments.seed), sys.stdout)
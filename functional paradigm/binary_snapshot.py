@@ -0,0 +1,194 @@
+import json
+import mmap
+import os
+import sys
+from array import array
+from itertools import accumulate, chain
+from task_columns import HIGHLIGHT_NAMES, PRIORITY_NAMES, TaskColumns
+from journal import write_atomically
+
+# Binary snapshot of a task collection ( the "binary" storage mode, tasks.bin )
+# the numeric columns are written as they are kept in memory, fixed-width arrays, and the text
+# columns ( titles, descriptions, ids ) as one heap of UTF-8 strings per column with an array of
+# offsets into it. Loading maps the file with mmap and copies the numeric arrays in one go; no
+# string is decoded until a task is read, so the first screen of a large file is shown without
+# reading the whole file. The snapshot holds the same fields as tasks.json, a file converted one
+# way and back is the same ( see convert_tasks_file in task_engine ).
+#
+# Both planners read and write the same snapshots : the highlights are the codes of
+# task_columns.HIGHLIGHT_NAMES ( normal, yellow, red, none ) and the creation times are seconds with
+# their fraction ( doubles ).
+#
+# file : MAGIC, header length ( 4 bytes, little endian ), JSON header, then the sections, each
+# starting at a multiple of 8 bytes; the header gives the offset and length of every section
+# ( counted from the end of the header ) and the byte order of the arrays
+
+MAGIC = b"TASKSNAP"
+FORMAT_VERSION = 2
+ALIGNMENT = 8
+
+# Numeric columns of TaskColumns and their array typecodes
+NUMBER_COLUMNS = (
+    ("due_days", "i"),
+    ("creation_times", "d"),
+    ("priorities", "b"),
+    ("statuses", "B"),
+    ("highlights", "b"),
+)
+STRING_COLUMNS = ("titles", "descriptions", "ids")
+
+# Typecodes of the numeric columns a snapshot of an older version wrote differently ( version 1 kept
+# the creation times as whole seconds ), they are read and converted
+OLD_TYPECODES = {1: {"creation_times": "q"}}
+
+# Lone surrogates a JSON file may hold survive the trip through UTF-8
+ENCODING_ERRORS = "surrogatepass"
+
+UNREAD = object()  # value of a string that was not decoded yet
+
+# Highlight flag of each highlight code ( true for yellow, a task due soon ), a table for bytes.translate
+HIGHLIGHT_FLAG_TABLE = bytes(code == HIGHLIGHT_NAMES.index("yellow") for code in range(256))
+
+
+# Strings of a column kept in a heap : string i is heap[offsets[i]:offsets[i + 1]], decoded the
+# first time it is read ( the strings added afterwards are kept as they are )
+class HeapStrings:
+    __slots__ = ("heap", "offsets", "values")
+
+    def __init__(self, heap, offsets):
+        self.heap = heap
+        self.offsets = offsets
+        self.values = [UNREAD] * (len(offsets) - 1)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self.values)))
+
+    def __getitem__(self, slot):
+        value = self.values[slot]
+        if value is UNREAD:
+            value = self.values[slot] = str(self.heap[self.offsets[slot]:self.offsets[slot + 1]], "utf-8", ENCODING_ERRORS)
+        return value
+
+    def append(self, value):
+        self.values.append(value)
+
+    def extend(self, values):
+        self.values.extend(values)
+
+    # UTF-8 bytes of a string ( straight from the heap when it was never decoded )
+    def encoded(self, slot):
+        value = self.values[slot]
+        return self.heap[self.offsets[slot]:self.offsets[slot + 1]] if value is UNREAD else value.encode("utf-8", ENCODING_ERRORS)
+
+
+def padding(length):
+    return -length % ALIGNMENT
+
+
+# Heap and offsets of the strings of a column for some slots
+def encode_strings(strings, slots):
+    encode = strings.encoded if isinstance(strings, HeapStrings) else lambda slot: strings[slot].encode("utf-8", ENCODING_ERRORS)
+    parts = tuple(map(encode, slots))
+    return b"".join(parts), array("Q", accumulate(map(len, parts), initial=0))
+
+
+# (name, bytes) of every section for the tasks in some slots of columns, in their order
+def encode_sections(columns, slots):
+    numbers = tuple((name, array(typecode, map(getattr(columns, name).__getitem__, slots)).tobytes()) for name, typecode in NUMBER_COLUMNS)
+    strings = tuple(
+        ((name + ".offsets", offsets.tobytes()), (name + ".heap", heap))
+        for name, (heap, offsets) in ((name, encode_strings(getattr(columns, name), slots)) for name in STRING_COLUMNS)
+    )
+    return numbers + tuple(chain.from_iterable(strings))
+
+
+# Contents of the snapshot of the tasks in some slots of columns
+def encode_snapshot(columns, slots):
+    sections = encode_sections(columns, slots)
+    starts = accumulate((len(data) + padding(len(data)) for _, data in sections), initial=0)
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "count": len(slots),
+        "byteorder": sys.byteorder,
+        "status_names": columns.status_names,
+        "sections": {name: (start, len(data)) for (name, data), start in zip(sections, starts)},
+    }).encode()
+    head = (MAGIC, len(header).to_bytes(4, "little"), header, bytes(padding(len(MAGIC) + 4 + len(header))))
+    return b"".join(chain(head, chain.from_iterable((data, bytes(padding(len(data)))) for _, data in sections)))
+
+
+# Writes the snapshot of the tasks in some slots of columns ( replaced atomically, like tasks.json )
+def write_snapshot(columns, slots, path):
+    write_atomically(path, encode_snapshot(columns, slots))
+
+
+# True when a file starts like a snapshot
+def is_snapshot(path):
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+# Bytes of a snapshot file : mapped, or read on Windows where a mapped file cannot be replaced
+# ( the next save renames the new snapshot over it )
+def map_file(path):
+    with open(path, "rb") as file:
+        if os.name == "nt" or not os.fstat(file.fileno()).st_size:
+            return file.read()
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Opens a snapshot and returns its TaskColumns ( slot i holds task i ), ValueError when the file is not a snapshot
+def read_snapshot(path):
+    data = map_file(path)
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a task snapshot")
+    header_end = len(MAGIC) + 4 + int.from_bytes(data[len(MAGIC):len(MAGIC) + 4], "little")
+    try:
+        header = json.loads(data[len(MAGIC) + 4:header_end])
+    except ValueError:
+        raise ValueError(f"{path} has a damaged header") from None
+    if header.get("version") not in (FORMAT_VERSION, *OLD_TYPECODES):
+        raise ValueError(f"{path} is a snapshot of an unknown version: {header.get('version')}")
+    start = header_end + padding(header_end)
+    count = header["count"]
+    view = memoryview(data)
+
+    def section(name):
+        offset, length = header["sections"][name]
+        if start + offset + length > len(data):
+            raise ValueError(f"{path} is truncated")
+        return view[start + offset:start + offset + length]
+
+    def number_array(name, typecode, size):
+        values = array(typecode)
+        values.frombytes(section(name))
+        if len(values) != size:
+            raise ValueError(f"{path} has a damaged {name} column")
+        if header["byteorder"] != sys.byteorder:
+            values.byteswap()
+        return values
+
+    columns = TaskColumns()
+    old_typecodes = OLD_TYPECODES.get(header["version"], {})
+    for name, typecode in NUMBER_COLUMNS:
+        values = number_array(name, old_typecodes.get(name, typecode), count)
+        setattr(columns, name, values if values.typecode == typecode else array(typecode, values))
+    # The codes index the name tables : a damaged file is refused here rather than failing later
+    code_ranges = ((columns.priorities, len(PRIORITY_NAMES)), (columns.statuses, len(header["status_names"])), (columns.highlights, len(HIGHLIGHT_NAMES)))
+    if count and any(min(codes) < 0 or max(codes) >= size for codes, size in code_ranges):
+        raise ValueError(f"{path} has damaged task codes")
+    columns.highlights = array("b", columns.highlights.tobytes().translate(HIGHLIGHT_FLAG_TABLE))
+    for name in STRING_COLUMNS:
+        setattr(columns, name, HeapStrings(section(name + ".heap"), number_array(name + ".offsets", "Q", count + 1)))
+    columns.numbers = array("q", range(count))
+    columns.numbers_by_id = None
+    columns.next_number = count
+    columns.status_names = header["status_names"]
+    columns.status_codes = {status: code for code, status in enumerate(columns.status_names)}
+    return columns
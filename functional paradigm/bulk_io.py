@@ -0,0 +1,217 @@
+import csv
+import json
+import os
+import re
+from datetime import date, datetime
+from functools import partial
+from itertools import chain, count, islice
+
+import json_stream
+
+# Bulk import and export
+# an import streams the records of a CSV, JSON Lines or JSON file : they are read in batches of
+# BATCH_SIZE and each batch is decoded and validated with the rules of the add dialog ( a title and a
+# description, a known priority, a YYYY-MM-DD due date ). A file of PARALLEL_BYTES or more is
+# validated on a process pool, a few batches at a time, so the whole file is never held in memory.
+# The task engine then adds every task in one pass and the storage saves them with one write ( see
+# task_engine.import_tasks ).
+# An export writes each task as soon as it is read, the JSON format too.
+
+FORMATS = ("csv", "jsonl", "json")
+
+# Fields an export writes and an import reads ( the highlight is derived from the others ); the id is
+# kept, so an exported file imported in another store gives the same tasks, an id the store already
+# holds is replaced by a new one
+EXPORT_FIELDS = ("title", "description", "due_date", "priority", "status", "creation_time", "id")
+IMPORT_FIELDS = EXPORT_FIELDS
+
+PRIORITIES = ("Low", "Medium", "High")
+STATUSES = ("Pending", "Completed", "Overdue")
+
+# Records validated together ( a job of the process pool )
+BATCH_SIZE = 2000
+
+# Files at least this big are validated on a process pool ( when there are several processors, on
+# one the pool would only add the cost of sending the batches )
+PARALLEL_BYTES = 4 * 1024 * 1024
+
+# Batches given to each worker process at a time
+BATCHES_AHEAD = 2
+
+# Layout of a due date and of a creation time ( the values are then checked by fromisoformat )
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+TIME_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\Z")
+
+
+# Format of a file from its name ( .csv, .jsonl / .ndjson or .json ), ValueError for another one
+def format_of(path):
+    extension = os.path.splitext(path)[1].lower()
+    formats = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "json"}
+    if extension not in formats:
+        raise ValueError(f"Unknown file format: {path} ( use --format )")
+    return formats[extension]
+
+
+def parsed_date(text):
+    if not DATE_PATTERN.match(text or ""):
+        raise ValueError(f"invalid due date: {text} ( expected YYYY-MM-DD )")
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"invalid due date: {text} ( expected YYYY-MM-DD )") from None
+
+
+def checked_time(text):
+    if not TIME_PATTERN.match(text):
+        raise ValueError(f"invalid creation time: {text}")
+    try:
+        datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"invalid creation time: {text}") from None
+    return text
+
+
+# The task data of an imported record, raises ValueError when it cannot be added
+# status and creation_time may be left out ( a new task is pending and created now ), a pending
+# task whose due date passed becomes overdue like in the add dialog
+def validate_record(record, today, now):
+    if not isinstance(record, dict):
+        raise ValueError("not an object")
+    not_text = tuple(field for field in IMPORT_FIELDS if record.get(field) is not None and not isinstance(record[field], str))
+    if not_text:
+        raise ValueError(f"{', '.join(not_text)} is not text")
+    if not (record.get("title") or "").strip():
+        raise ValueError("title is required")
+    if not (record.get("description") or "").strip():
+        raise ValueError("description is required")
+    if record.get("priority") not in PRIORITIES:
+        raise ValueError(f"unknown priority: {record.get('priority')}")
+    due_date = parsed_date(record.get("due_date"))
+    status = record.get("status") or "Pending"
+    if status not in STATUSES:
+        raise ValueError(f"unknown status: {status}")
+    task_data = {
+        "title": record["title"],
+        "description": record["description"],
+        "due_date": record["due_date"],
+        "priority": record["priority"],
+        "status": "Overdue" if status == "Pending" and due_date < today else status,
+        "creation_time": checked_time(record.get("creation_time") or now),
+    }
+    return {**task_data, "id": record["id"]} if record.get("id") else task_data
+
+
+# A record as read from the file : a line of JSON Lines is decoded, a CSV row is named by the header
+def decoded(file_format, header, item):
+    if file_format == "jsonl":
+        try:
+            return json.loads(item)
+        except ValueError:
+            raise ValueError("not valid JSON") from None
+    if file_format == "csv":
+        if len(item) != len(header):
+            raise ValueError(f"{len(item)} values for {len(header)} columns")
+        return dict(zip(header, item))
+    return item
+
+
+# (task data, None) for a valid record, (None, error message) for an invalid one
+def checked_record(file_format, header, today, now, numbered_item):
+    number, item = numbered_item
+    try:
+        return validate_record(decoded(file_format, header, item), today, now), None
+    except ValueError as error:
+        return None, f"record {number}: {error}"
+
+
+# Decodes and validates a batch ( run by a worker process for a large file ), returns (task data, error messages)
+# items are the lines of a JSON Lines file, the rows of a CSV file ( with its header ) or the objects of a JSON file
+def validate_batch(job):
+    file_format, first_number, header, items, today, now = job
+    results = tuple(map(partial(checked_record, file_format, header, today, now), enumerate(items, first_number)))
+    return (
+        tuple(task_data for task_data, _ in results if task_data is not None),
+        tuple(error for _, error in results if error is not None),
+    )
+
+
+# The records of a file, undecoded where a worker can decode them : lines of a JSON Lines file
+# ( blank ones are skipped ), rows of a CSV file, objects of a JSON file; returns (header, records)
+def read_records(file, file_format):
+    if file_format == "jsonl":
+        return None, filter(str.strip, file)
+    if file_format == "csv":
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return (), iter(())
+        return tuple(map(str.strip, header)), reader
+    if file_format == "json":
+        return None, json_stream.iter_json_array(file)
+    raise ValueError(f"Unknown file format: {file_format}")
+
+
+# Consecutive tuples of size items ( the last one may be shorter )
+def chunks(items, size):
+    items = iter(items)
+    return iter(lambda: tuple(islice(items, size)), ())
+
+
+# Jobs of validate_batch, BATCH_SIZE records each
+def batch_jobs(file, file_format, today, now):
+    header, records = read_records(file, file_format)
+    return (
+        (file_format, number, header, batch, today, now)
+        for number, batch in zip(count(1, BATCH_SIZE), chunks(records, BATCH_SIZE))
+    )
+
+
+# Runs the jobs on a process pool, results in order; only a few jobs are queued at a time
+def map_on_pool(function, jobs):
+    from concurrent.futures import ProcessPoolExecutor  # multiprocessing is only loaded for a large import
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as executor:
+        yield from chain.from_iterable(executor.map(function, window) for window in chunks(jobs, workers * BATCHES_AHEAD))
+
+
+# Reads a file to import, yields (task data, error messages) per batch of records; parallel tells
+# whether to use the process pool ( by default for a large file )
+# ( OSError when it cannot be read, ValueError for a file that is not valid JSON or CSV )
+def read_task_batches(path, file_format=None, parallel=None):
+    file_format = file_format or format_of(path)
+    if parallel is None:
+        parallel = (os.cpu_count() or 1) > 1 and os.path.getsize(path) >= PARALLEL_BYTES
+    today = datetime.now().date()
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(path, "r", newline="" if file_format == "csv" else None, encoding="utf-8-sig") as file:
+        jobs = batch_jobs(file, file_format, today, now)
+        try:
+            yield from (map_on_pool if parallel else map)(validate_batch, jobs)
+        except csv.Error as error:
+            raise ValueError(f"Invalid CSV: {error}") from None
+
+
+# An exported task in the JSON array, indented like the tasks file
+def json_item(record):
+    return "    " + json.dumps(record, indent=4).replace("\n", "\n    ")
+
+
+# Writes task records to a file as they are read from records ( any iterable, e.g. a map over a query )
+def write_records(records, file_format, file):
+    if file_format == "csv":
+        writer = csv.DictWriter(file, fieldnames=EXPORT_FIELDS, lineterminator="\n", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(records)
+    elif file_format == "jsonl":
+        file.writelines(json.dumps(record) + "\n" for record in records)
+    elif file_format == "json":
+        items = map(json_item, records)
+        first = next(items, None)
+        if first is None:
+            file.write("[]\n")
+            return
+        file.write("[\n" + first)
+        file.writelines(map(",\n".__add__, items))
+        file.write("\n]\n")
+    else:
+        raise ValueError(f"Unknown file format: {file_format}")
@@ -0,0 +1,323 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from functools import partial
+from itertools import chain
+import bulk_io
+import task_engine
+from task_columns import new_task_id
+from scheduler import DEFAULT_WEIGHTS, Weights
+from task_engine import apply_journal_record, check_task_highlighting, import_tasks, next_tasks, open_storage, query_tasks, task_position
+from task_engine import add_recurring_task, complete_occurrence, load_recurring_tasks, query_occurrences, save_recurring_tasks
+
+# Command line interface of the task planner
+# lists, adds, completes, filters, sorts and exports tasks from scripts and cron jobs. Only the
+# headless task_engine is imported, so it starts quickly and runs without a display; the window
+# is only loaded by the "gui" command.
+#
+#   python cli.py list --sort due_date
+#   python cli.py sort due_date --page 2 --page-size 20
+#   python cli.py add "Write report" --description "Quarterly numbers" --due 2025-03-31 --priority High
+#   python cli.py complete 3
+#   python cli.py add "Water the plants" --description "Balcony" --due 2025-03-03 --priority Low --repeat "FREQ=WEEKLY;BYDAY=MO,TH"
+#   python cli.py occurrences --from 2025-03-01 --to 2025-03-31
+#   python cli.py filter --status Pending --to 2025-03-31 --json
+#   python cli.py export --format csv --output tasks.csv
+#   python cli.py export --format jsonl --status Pending --sort due_date --output pending.jsonl
+#   python cli.py import tasks.csv
+#   python cli.py convert tasks.json tasks.bin
+
+SORT_FIELDS = ("priority", "due_date", "status", "creation_time")
+STATUSES = ("Pending", "Completed", "Overdue")
+
+# Columns of the table printed by list / filter / sort
+TABLE_HEADINGS = ("#", "Title", "Description", "Due Date", "Priority", "Status")
+
+# Invalid records an import prints ( the others are counted )
+MAX_ERRORS = 20
+
+
+# Date argument ( "YYYY-MM-DD", like the calendars of the window return )
+def date_argument(text):
+    try:
+        return datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {text} ( expected YYYY-MM-DD )") from None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Task planner without the window.")
+    parser.add_argument("--file", default="tasks.json", help="tasks file ( default: tasks.json )")
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite", "shared", "binary"), default=task_engine.STORAGE_MODE, help="storage mode of the tasks file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list the tasks")
+    list_parser.add_argument("--sort", choices=SORT_FIELDS, help="order the tasks by a field")
+    list_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    sort_parser = commands.add_parser("sort", help="list the tasks ordered by a field")
+    sort_parser.add_argument("sort", choices=SORT_FIELDS)
+    sort_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    # A page of a sorted list is read without sorting every task ( see task_engine.sorted_pages )
+    for page_parser in (list_parser, sort_parser):
+        page_parser.add_argument("--page", type=int, help="only print this page of the list ( from 1 )")
+        page_parser.add_argument("--page-size", type=int, default=task_engine.PAGE_SIZE, help=f"tasks of a page ( default: {task_engine.PAGE_SIZE} )")
+
+    filter_parser = commands.add_parser("filter", help="list the tasks that match every criterion")
+    filter_parser.add_argument("--priority", choices=task_engine.PRIORITIES)
+    filter_parser.add_argument("--status", choices=STATUSES)
+    filter_parser.add_argument("--from", dest="start_date", type=date_argument, help="first due date")
+    filter_parser.add_argument("--to", dest="end_date", type=date_argument, help="last due date")
+    filter_parser.add_argument("--text", help="words of the title or description")
+    filter_parser.add_argument("--sort", choices=SORT_FIELDS, help="order the tasks by a field")
+    filter_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    next_parser = commands.add_parser("next", help="list the most urgent tasks that are not completed")
+    next_parser.add_argument("--count", type=int, default=5, help="number of tasks ( default: 5 )")
+    next_parser.add_argument("--priority-weight", type=float, default=DEFAULT_WEIGHTS.priority, help="weight of a priority step in the urgency score")
+    next_parser.add_argument("--due-weight", type=float, default=DEFAULT_WEIGHTS.due_date, help="weight of a day of due date in the urgency score")
+    next_parser.add_argument("--age-weight", type=float, default=DEFAULT_WEIGHTS.age, help="weight of a day of age in the urgency score")
+    next_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    add_parser = commands.add_parser("add", help="add a task")
+    add_parser.add_argument("title")
+    add_parser.add_argument("--description", required=True)
+    add_parser.add_argument("--due", required=True, type=date_argument, help="due date ( YYYY-MM-DD )")
+    add_parser.add_argument("--priority", required=True, choices=task_engine.PRIORITIES)
+    add_parser.add_argument("--repeat", metavar="RULE", help="add a recurring task, e.g. FREQ=WEEKLY;BYDAY=MO,TH ( the due date is its first occurrence )")
+
+    occurrences_parser = commands.add_parser("occurrences", help="list the occurrences of the recurring tasks in a date range")
+    occurrences_parser.add_argument("--from", dest="start_date", type=date_argument, help="first due date ( default: today )")
+    occurrences_parser.add_argument("--to", dest="end_date", type=date_argument, help=f"last due date ( default: {task_engine.OCCURRENCE_DAYS} days after the first )")
+    occurrences_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    complete_occurrence_parser = commands.add_parser("complete-occurrence", help="mark an occurrence of a recurring task as completed")
+    complete_occurrence_parser.add_argument("id", help="id of the occurrence, as occurrences --json shows it")
+
+    complete_parser = commands.add_parser("complete", help="mark a task as completed")
+    complete_parser.add_argument("number", type=int, help="number of the task, as list shows it")
+
+    export_parser = commands.add_parser("export", help="write the tasks as JSON, JSON Lines or CSV, filtered and sorted like filter")
+    export_parser.add_argument("--format", choices=bulk_io.FORMATS, default="json")
+    export_parser.add_argument("--output", help="file to write ( default: standard output )")
+    export_parser.add_argument("--priority", choices=task_engine.PRIORITIES)
+    export_parser.add_argument("--status", choices=STATUSES)
+    export_parser.add_argument("--from", dest="start_date", type=date_argument, help="first due date")
+    export_parser.add_argument("--to", dest="end_date", type=date_argument, help="last due date")
+    export_parser.add_argument("--text", help="words of the title or description")
+    export_parser.add_argument("--sort", choices=SORT_FIELDS, help="order the tasks by a field")
+
+    import_parser = commands.add_parser("import", help="add the tasks of a CSV, JSON Lines or JSON file")
+    import_parser.add_argument("source")
+    import_parser.add_argument("--format", choices=bulk_io.FORMATS, help="format of the file ( default: from its extension )")
+    import_parser.add_argument("--skip-invalid", action="store_true", help="import the valid records when some are invalid")
+
+    convert_parser = commands.add_parser("convert", help="convert a tasks file to a binary snapshot ( .bin ) or back to JSON")
+    convert_parser.add_argument("source")
+    convert_parser.add_argument("target", help="file to write, a binary snapshot when it ends in .bin")
+
+    commands.add_parser("gui", help="open the window")
+    return parser
+
+
+# (number, task) of each task of a query result, numbered by its place in the collection
+# ( a result shares the columns of the collection, so the place is found from the task number )
+def numbered(tasks, result):
+    if result is tasks:
+        return tuple(zip(range(1, len(tasks) + 1), tasks))
+    numbers = map(result.columns.numbers.__getitem__, result.slots)
+    positions = map(partial(task_position, tasks), numbers)
+    return tuple((position + 1, task) for position, task in zip(positions, result))
+
+
+def format_table(rows):
+    lines = (TABLE_HEADINGS,) + tuple((str(number),) + tuple(task[:5]) for number, task in rows)
+    widths = tuple(max(map(len, column)) for column in zip(*lines))
+    return "\n".join("  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip() for line in lines)
+
+
+def format_json(rows):
+    return json.dumps([{"number": number, **task._asdict()} for number, task in rows], indent=4)
+
+
+# The tasks the filter options of a command select, ordered by its --sort
+def query_criteria(tasks, arguments):
+    return query_tasks(
+        tasks,
+        priority=getattr(arguments, "priority", None),
+        status=getattr(arguments, "status", None),
+        start_date=getattr(arguments, "start_date", None),
+        end_date=getattr(arguments, "end_date", None),
+        order_by=arguments.sort,
+        text=getattr(arguments, "text", None),
+    )
+
+
+def export_record(task):
+    return {field: getattr(task, field) for field in bulk_io.EXPORT_FIELDS}
+
+
+# Writes the tasks that match the options of export, each one as soon as the query result yields it
+def write_export(tasks, arguments, file):
+    result = query_criteria(tasks, arguments)
+    bulk_io.write_records(map(export_record, result), arguments.format, file)
+
+
+# Writes the export to the standard output, returns the exit status
+# a reader that stops early ( e.g. export | head ) closes the pipe : the rest is dropped quietly, the
+# standard output is sent to devnull so the buffered output is not flushed again at exit
+def print_export(tasks, arguments):
+    try:
+        write_export(tasks, arguments, sys.stdout)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+
+# Adds the tasks of a file with one storage write; when a record is invalid nothing is imported,
+# unless --skip-invalid is given. Returns the exit status
+def import_file(arguments, storage, tasks):
+    try:
+        batches = tuple(bulk_io.read_task_batches(arguments.source, arguments.format))
+    except (OSError, ValueError) as error:
+        print(f"Cannot import {arguments.source}: {error}", file=sys.stderr)
+        return 1
+    task_dicts = tuple(chain.from_iterable(batch_tasks for batch_tasks, _ in batches))
+    errors = tuple(chain.from_iterable(batch_errors for _, batch_errors in batches))
+    if errors:
+        print("\n".join(errors[:MAX_ERRORS]), file=sys.stderr)
+    if errors and not arguments.skip_invalid:
+        print(f"{len(errors)} invalid records, no task was imported ( --skip-invalid imports the others )", file=sys.stderr)
+        return 1
+    storage.save(*import_tasks(tasks, task_dicts))
+    skipped = f", skipped {len(errors)} invalid records" if errors else ""
+    print(f"Imported {len(task_dicts)} tasks{skipped}")
+    return 0
+
+
+# The task data of the add command ( a due date in the past makes the task overdue, like the window does )
+def new_task_data(arguments):
+    overdue = arguments.due.date() < datetime.now().date()
+    return {
+        "title": arguments.title,
+        "description": arguments.description,
+        "due_date": arguments.due.strftime("%Y-%m-%d"),
+        "priority": arguments.priority,
+        "status": "Overdue" if overdue else "Pending",
+        "creation_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "highlight": overdue,
+        "id": new_task_id(),
+    }
+
+
+# Runs a command on the loaded tasks : returns (exit status, output text, change to save or None)
+# a change is a journal record, the same ones the window saves
+def run_command(arguments, tasks):
+    if arguments.command in ("list", "sort", "filter"):
+        result = query_criteria(tasks, arguments)
+        if getattr(arguments, "page", None) is not None:
+            start = max(arguments.page - 1, 0) * arguments.page_size
+            result = result[start:start + arguments.page_size]
+        rows = numbered(tasks, result)
+        return 0, format_json(rows) if arguments.json else format_table(rows), None
+    if arguments.command == "next":
+        weights = Weights(arguments.priority_weight, arguments.due_weight, arguments.age_weight)
+        rows = numbered(tasks, next_tasks(tasks, arguments.count, weights))
+        return 0, format_json(rows) if arguments.json else format_table(rows), None
+    if arguments.command == "add":
+        task_data = new_task_data(arguments)
+        return 0, f"Added task {len(tasks) + 1}: {task_data['title']}", {"op": "add", "task": task_data}
+    if arguments.command == "complete":
+        if not 1 <= arguments.number <= len(tasks):
+            return 1, f"No task {arguments.number} ( there are {len(tasks)} tasks )", None
+        changes = {"status": "Completed"}
+        return 0, f"Completed task {arguments.number}: {tasks[arguments.number - 1].title}", {"op": "update", "id": tasks[arguments.number - 1].id, "changes": changes}
+    raise ValueError(f"Unknown command: {arguments.command}")
+
+
+# Runs a command on the recurring tasks : returns (exit status, output text, definitions to save or None)
+# they are kept apart from the tasks file, so these commands do not load the tasks
+def run_recurring_command(arguments, recurring):
+    if arguments.command == "add":
+        try:
+            changed = add_recurring_task(recurring, new_task_data(arguments), arguments.repeat)
+        except ValueError as error:
+            return 1, f"Invalid recurrence rule: {error}", None
+        return 0, f"Added recurring task: {arguments.title}", changed
+    if arguments.command == "occurrences":
+        # Occurrences are not stored, they have no number
+        rows = tuple(("-", task) for task in query_occurrences(recurring, start_date=arguments.start_date, end_date=arguments.end_date))
+        return 0, format_json(rows) if arguments.json else format_table(rows), None
+    if arguments.command == "complete-occurrence":
+        try:
+            changed = complete_occurrence(recurring, arguments.id)
+        except KeyError:
+            return 1, f"No occurrence {arguments.id}", None
+        return 0, f"Completed occurrence {arguments.id}", changed
+    raise ValueError(f"Unknown command: {arguments.command}")
+
+
+# True for the commands that only read or change the recurring tasks
+def is_recurring_command(arguments):
+    return arguments.command in ("occurrences", "complete-occurrence") or (arguments.command == "add" and arguments.repeat is not None)
+
+
+def main(argv=None):
+    arguments = build_parser().parse_args(argv)
+    if arguments.command == "gui":
+        import taskPlanner      # the window and tkinter are only loaded here
+        taskPlanner.main(arguments.storage, arguments.file)
+        return 0
+    if arguments.command == "convert":
+        try:
+            count = task_engine.convert_tasks_file(arguments.source, arguments.target)
+        except (OSError, ValueError) as error:
+            print(f"Cannot convert {arguments.source}: {error}", file=sys.stderr)
+            return 1
+        print(f"Wrote {count} tasks to {arguments.target}")
+        return 0
+    if is_recurring_command(arguments):
+        try:
+            status, output, changed = run_recurring_command(arguments, load_recurring_tasks(arguments.file))
+            if changed is not None:
+                save_recurring_tasks(changed, arguments.file)
+        except (OSError, ValueError) as error:
+            print(f"Cannot use the recurring tasks of {arguments.file}: {error}", file=sys.stderr)
+            return 1
+        print(output, file=sys.stdout if status == 0 else sys.stderr)
+        return status
+
+    try:
+        storage = open_storage(arguments.storage, arguments.file)
+    except (OSError, ValueError) as error:
+        print(f"Cannot load {arguments.file}: {error}", file=sys.stderr)
+        return 1
+    try:
+        tasks = check_task_highlighting(storage.tasks)
+        if arguments.command == "export":
+            if arguments.output is None:
+                return print_export(tasks, arguments)
+            with open(arguments.output, "w", newline="") as file:
+                write_export(tasks, arguments, file)
+            return 0
+        if arguments.command == "import":
+            return import_file(arguments, storage, tasks)
+        status, output, change = run_command(arguments, tasks)
+        if change is not None:
+            saved = storage.save(apply_journal_record(tasks, change), (change,))
+            if storage.sync is not None and saved.conflicts:
+                print("Another planner changed this task, the change was not saved", file=sys.stderr)
+                return 1
+        print(output, file=sys.stdout if status == 0 else sys.stderr)
+        return status
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
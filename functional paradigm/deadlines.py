@@ -0,0 +1,72 @@
+from datetime import datetime
+import sorted_index
+
+# Deadline transitions
+# a pending task only changes state twice : it is highlighted from the day its due date is two days
+# away, and it becomes overdue the day after its due date. The schedule is a persistent sorted index
+# of (day, task number) entries, so its smallest entry is the next transition : the app sleeps until
+# that day starts and then re-checks only the tasks whose transition came, instead of checking
+# every task each time the list is redrawn
+
+HIGHLIGHT_DAYS = 2
+
+# Longest sleep between two checks ( also catches clock changes and a suspended computer )
+LONGEST_WAIT_MS = 60 * 60 * 1000
+
+
+# Day number of today
+def current_day():
+    return datetime.now().date().toordinal()
+
+
+# Day of the next state change of a pending task due on due_day, after today ( None when there is none )
+def next_transition(due_day, today):
+    if today < due_day - HIGHLIGHT_DAYS:
+        return due_day - HIGHLIGHT_DAYS
+    if today <= due_day:
+        return due_day + 1
+    return None
+
+
+# Schedule of the next transition of every pending task stored in slots of columns
+def build_schedule(columns, slots, today):
+    pending = columns.status_codes.get("Pending")
+    entries = (
+        (day, columns.numbers[slot])
+        for slot in slots
+        if columns.statuses[slot] == pending
+        for day in (next_transition(columns.due_days[slot], today),)
+        if day is not None
+    )
+    return sorted_index.from_sorted(sorted(entries))
+
+
+# Returns the schedule with the next transition of the task in a slot added ( if it is pending )
+def schedule_task(schedule, columns, slot, today):
+    if columns.status_names[columns.statuses[slot]] != "Pending":
+        return schedule
+    day = next_transition(columns.due_days[slot], today)
+    return schedule if day is None else sorted_index.insert(schedule, (day, columns.numbers[slot]))
+
+
+# Splits off the transitions that are due by today : returns their task numbers and the rest of the schedule
+# an entry may belong to a task that was changed or deleted since, checking it again does no harm
+def due_transitions(schedule, today):
+    numbers = []
+    while schedule is not None:
+        rest, smallest = sorted_index.remove_min(schedule)
+        day, number = smallest.entry
+        if day > today:
+            break
+        numbers.append(number)
+        schedule = rest
+    return tuple(numbers), schedule
+
+
+# Milliseconds to wait before the next transition is due ( at most LONGEST_WAIT_MS )
+def milliseconds_until_next(schedule):
+    if schedule is None:
+        return LONGEST_WAIT_MS
+    day, _ = next(sorted_index.walk(schedule))
+    wait = (datetime.fromordinal(day) - datetime.now()).total_seconds() * 1000
+    return int(min(max(wait, 0), LONGEST_WAIT_MS))
@@ -0,0 +1,33 @@
+from collections import namedtuple
+
+# Undo / redo history
+# an entry is the change record that undoes an edit ( or redoes it ), e.g. the update that puts back
+# the priority and status it replaced ( see task_engine.inverse_change ), so no task is copied. It is
+# applied to the current tasks like any other edit and saved like one : the tasks may have changed
+# since the edit ( the highlighting rules, the deadline transitions, the changes of other planners in
+# the shared mode ), and those changes are kept. The history keeps the last HISTORY_LIMIT edits, the
+# oldest ones are dropped first
+
+HISTORY_LIMIT = 100
+
+# Entries to undo and to redo, the most recent last
+History = namedtuple("History", ["undo", "redo"])
+
+EMPTY_HISTORY = History((), ())
+
+
+# History after a new edit ( entry is the change that undoes it ), the edits undone are forgotten
+def record(history, entry, limit=HISTORY_LIMIT):
+    return History((history.undo + (entry,))[-limit:], ())
+
+
+# History after its last undo entry was applied; redo_entry goes forward again ( None when the entry
+# could not be applied, it is dropped )
+def undone(history, redo_entry):
+    return History(history.undo[:-1], history.redo + ((redo_entry,) if redo_entry is not None else ()))
+
+
+# History after its last redo entry was applied; undo_entry goes back again ( None when the entry
+# could not be applied, it is dropped )
+def redone(history, undo_entry, limit=HISTORY_LIMIT):
+    return History((history.undo + ((undo_entry,) if undo_entry is not None else ()))[-limit:], history.redo[:-1])
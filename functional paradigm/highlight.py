@@ -0,0 +1,82 @@
+from collections import namedtuple
+
+# Batch highlighting : the highlight state of every task in one pass over the columns
+# the due day and status columns are turned into byte strings of 0 / 1 flags by loops that run in C
+# ( map with a bound integer comparison, bytes.translate ), then each byte string is read as one
+# big integer, so a single & | ^ combines the flags of all the tasks at once
+
+# Highlight state of a task, and the Treeview tag of each state
+NORMAL, DUE_SOON, OVERDUE = 0, 1, 2
+STATE_TAGS = ("normal", "highlight", "overdue")
+
+# What the highlighting rules give for the tasks, position by position ( each field is bytes ) :
+# states : the state of each task
+# changed : 1 for the tasks whose status or highlight flag has to change
+# becomes_overdue : 1 for the pending tasks whose due date has passed
+# highlight : the highlight flag each task should have
+Classification = namedtuple("Classification", ["states", "changed", "becomes_overdue", "highlight"])
+
+
+# Flags of a sequence of integers as one integer ( byte i is 1 where predicate(values[i]) is true )
+def flags(values, predicate):
+    return int.from_bytes(bytes(map(predicate, values)), "little")
+
+
+# Flags of the tasks whose status code is code ( code None matches nothing )
+def status_flags(status_codes, code):
+    table = bytearray(256)
+    if code is not None:
+        table[code] = 1
+    return int.from_bytes(status_codes.translate(table), "little")
+
+
+# Applies the highlighting rules to the tasks stored in slots of columns, in the order of slots
+# a pending task due before today becomes overdue, a pending task due before the end of
+# today + 2 days is highlighted ( today is a day number )
+def classify(columns, slots, today):
+    count = len(slots)
+    due_days = tuple(map(columns.due_days.__getitem__, slots))
+    status_codes = bytes(map(columns.statuses.__getitem__, slots))
+    highlighted = int.from_bytes(bytes(map(columns.highlights.__getitem__, slots)), "little")
+
+    past = flags(due_days, today.__gt__)
+    soon = flags(due_days, (today + 2).__ge__)
+    pending = status_flags(status_codes, columns.status_codes.get("Pending"))
+    overdue = status_flags(status_codes, columns.status_codes.get("Overdue"))
+
+    becomes_overdue = pending & past
+    # past implies soon, so ^ becomes_overdue keeps the pending tasks due in the next days ( a task
+    # that becomes overdue is not highlighted, so the rules change nothing when applied again )
+    highlight = pending & soon ^ becomes_overdue
+    states = highlight * DUE_SOON | (overdue | becomes_overdue) * OVERDUE
+    return Classification(
+        states.to_bytes(count, "little"),
+        (becomes_overdue | highlight ^ highlighted).to_bytes(count, "little"),
+        becomes_overdue.to_bytes(count, "little"),
+        highlight.to_bytes(count, "little"),
+    )
+
+
+# Status codes ( bytes ) with code put in where flag_bytes has a 1, the other codes kept
+def with_status(status_codes, flag_bytes, code):
+    codes = int.from_bytes(status_codes, "little")
+    flags = int.from_bytes(flag_bytes, "little")
+    return (codes & ~(flags * 0xFF) | flags * code).to_bytes(len(status_codes), "little")
+
+
+# States the Treeview shows for tasks the rules were already applied to : overdue for an overdue
+# status, due soon for a highlighted task, normal otherwise
+def display_states(columns, slots):
+    count = len(slots)
+    overdue = status_flags(bytes(map(columns.statuses.__getitem__, slots)), columns.status_codes.get("Overdue"))
+    highlighted = int.from_bytes(bytes(map(columns.highlights.__getitem__, slots)), "little")
+    states = (highlighted & ~overdue) * DUE_SOON | overdue * OVERDUE
+    return states.to_bytes(count, "little")
+
+
+# Positions of the non zero bytes of a byte string
+def positions(flag_bytes):
+    position = flag_bytes.find(1)
+    while position != -1:
+        yield position
+        position = flag_bytes.find(1, position + 1)
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+from collections import namedtuple
+
+# Append-only journal storage
+# every change is appended to the journal as one short JSON line, and a background thread
+# now and then folds the journal into a snapshot. Files are only appended to, or replaced
+# atomically ( temporary file, fsync, os.replace ), so a crash at any moment leaves a store
+# that loads : at worst the last, half-written journal line is dropped.
+#
+# snapshot : {"sequence": n, "tasks": [...]} holds every change up to sequence n
+# journal  : one {"sequence": n, "op": ...} record per line, records <= the snapshot's are skipped
+
+JournalFiles = namedtuple("JournalFiles", ["snapshot", "journal"])
+
+# What open_journal read from disk
+JournalContents = namedtuple("JournalContents", ["tasks", "records"])
+
+# Handle to an open journal : append(records, snapshot_source) and close()
+Journal = namedtuple("Journal", ["append", "close"])
+
+
+# Snapshot and journal file names that belong to a tasks file
+def journal_files(filename="tasks.json"):
+    base = os.path.splitext(filename)[0]
+    return JournalFiles(base + ".snapshot.json", base + ".journal")
+
+
+# Writes data to path so that readers see either the old or the new file, never a mix
+def write_atomically(path, data):
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+    sync_directory(path)
+
+
+# Makes a rename durable ( directories cannot be opened for fsync on Windows )
+def sync_directory(path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+# Reads the snapshot, or starts from the plain tasks file the first time the journal is used
+def read_snapshot(files, filename):
+    try:
+        with open(files.snapshot, "r") as file:
+            snapshot = json.load(file)
+        return snapshot["sequence"], snapshot["tasks"]
+    except FileNotFoundError:
+        pass
+    try:
+        with open(filename, "r") as file:
+            return 0, json.load(file)
+    except FileNotFoundError:
+        return 0, []
+
+
+# Reads the journal records and the length of the valid part of the file
+# reading stops at the first line that is unfinished or not valid JSON ( a torn write )
+def read_records(path):
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return (), 0
+
+    records = []
+    position = 0
+    while True:
+        end = data.find(b"\n", position)
+        if end == -1:
+            return tuple(records), position
+        try:
+            records.append(json.loads(data[position:end]))
+        except ValueError:
+            return tuple(records), position
+        position = end + 1
+
+
+# Opens the journal of a tasks file : returns what is stored and a handle to append changes
+# compaction starts in the background once compact_every records were appended since the last one
+def open_journal(filename="tasks.json", compact_every=500, sync=True):
+    files = journal_files(filename)
+    snapshot_sequence, tasks_data = read_snapshot(files, filename)
+    records, valid_length = read_records(files.journal)
+    records = tuple(record for record in records if record["sequence"] > snapshot_sequence)
+
+    # Drop a torn last line so new records never get glued to it
+    journal_file = open(files.journal, "ab")
+    journal_file.truncate(valid_length)
+
+    lock = threading.Lock()
+    state = {
+        "file": journal_file,
+        "sequence": records[-1]["sequence"] if records else snapshot_sequence,
+        "pending": len(records),
+        "compaction": None,
+    }
+
+    # Writes the snapshot, then keeps only the journal records that are newer than it
+    def compact(sequence, snapshot_source):
+        try:
+            snapshot = {"sequence": sequence, "tasks": list(snapshot_source())}
+            write_atomically(files.snapshot, json.dumps(snapshot).encode())
+            with lock:
+                state["file"].close()
+                newer, _ = read_records(files.journal)
+                newer = b"".join(json.dumps(record).encode() + b"\n" for record in newer if record["sequence"] > sequence)
+                write_atomically(files.journal, newer)
+                state["file"] = open(files.journal, "ab")
+        except OSError:
+            # Nothing was lost : the journal still holds every change, compaction is retried later
+            with lock:
+                if state["file"].closed:
+                    state["file"] = open(files.journal, "ab")
+
+    # Appends a batch of changes with one write and one fsync
+    # snapshot_source returns the task dicts after the last of them, to compact into if one is due
+    def append(records, snapshot_source):
+        with lock:
+            first = state["sequence"] + 1
+            state["sequence"] += len(records)
+            lines = b"".join(
+                json.dumps({"sequence": sequence, **record}).encode() + b"\n"
+                for sequence, record in zip(range(first, state["sequence"] + 1), records)
+            )
+            state["file"].write(lines)
+            state["file"].flush()
+            if sync:
+                os.fsync(state["file"].fileno())
+            state["pending"] += len(records)
+            if state["pending"] < compact_every or (state["compaction"] and state["compaction"].is_alive()):
+                return
+            state["pending"] = 0
+            state["compaction"] = threading.Thread(target=compact, args=(state["sequence"], snapshot_source), daemon=True)
+            state["compaction"].start()
+
+    # Waits for a running compaction and closes the journal
+    def close():
+        if state["compaction"]:
+            state["compaction"].join()
+        with lock:
+            state["file"].close()
+
+    return JournalContents(tuple(tasks_data), records), Journal(append, close)
@@ -0,0 +1,67 @@
+import json
+from json.decoder import WHITESPACE
+
+# Incremental reader for a top level JSON array
+# the file is read in chunks and each element is decoded as soon as it is complete, so only
+# the unread tail of the current chunk is buffered and elements can be used before the end of the file
+
+CHUNK_SIZE = 1 << 16
+
+
+# Yields the elements of the JSON array in file one by one
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    end_of_file = False
+    expected = "start"  # start -> first value or ] -> value -> separator -> value ...
+
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+
+        # Refill when the buffer runs out, keeping the part that was not decoded yet
+        if position == len(buffer):
+            if end_of_file:
+                raise ValueError("Unexpected end of file inside the task array")
+            buffer = file.read(chunk_size)
+            position = 0
+            end_of_file = not buffer
+            continue
+
+        character = buffer[position]
+        if expected == "start":
+            if character != "[":
+                raise ValueError("The tasks file must hold a JSON array")
+            position += 1
+            expected = "first"
+        elif expected in ("first", "value"):
+            if character == "]" and expected == "first":
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                end = None
+            # A value that reaches the end of the buffer may continue in the next chunk
+            if end is None or (end == len(buffer) and not end_of_file):
+                if end_of_file:
+                    raise ValueError("Invalid JSON in the task array")
+                chunk = file.read(chunk_size)
+                end_of_file = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield value
+            position = end
+            expected = "separator"
+        else:
+            if character == "]":
+                return
+            if character != ",":
+                raise ValueError(f"Expected ',' or ']' in the task array, found {character!r}")
+            position += 1
+            expected = "value"
+
+        # Drop the decoded part of the buffer once it gets large
+        if position > chunk_size:
+            buffer = buffer[position:]
+            position = 0
@@ -0,0 +1,153 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from functools import wraps
+from itertools import accumulate
+
+# Instrumentation of the hot paths
+# spans time a function ( a latency histogram and a call count per span name ), counters add up
+# events ( Tk rows inserted, deleted, ... ) and gauges keep the last value of something.
+# It is switched on by the TASK_PLANNER_METRICS environment variable, the name of the metrics file
+# written when the program exits ( Prometheus text format when it ends with .prom, JSON otherwise ):
+#
+#   TASK_PLANNER_METRICS=metrics.json python taskPlanner.py
+#
+# When it is off, timed() returns the function it decorates unchanged, so nothing is measured and
+# nothing is slowed down.
+
+METRICS_FILE = os.environ.get("TASK_PLANNER_METRICS", "")
+ENABLED = bool(METRICS_FILE)
+
+# Upper bounds of the histogram buckets, in seconds ( the last bucket has no bound )
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKET_LABELS = tuple(map(str, BUCKETS)) + ("+Inf",)
+
+# Immutable latency histogram : calls per bucket, number of calls, total and longest time
+Histogram = namedtuple("Histogram", ["counts", "count", "total", "max"])
+
+EMPTY_HISTOGRAM = Histogram((0,) * len(BUCKET_LABELS), 0, 0.0, 0.0)
+
+# The recorded metrics : each update swaps in new immutable values ( under the lock, spans are
+# also recorded by the background writer thread )
+lock = threading.Lock()
+recorded = {"spans": {}, "counters": {}, "gauges": {}}
+
+
+# Histogram with one more call
+def observe(histogram, seconds):
+    bucket = bisect_left(BUCKETS, seconds)
+    return Histogram(
+        histogram.counts[:bucket] + (histogram.counts[bucket] + 1,) + histogram.counts[bucket + 1:],
+        histogram.count + 1,
+        histogram.total + seconds,
+        max(histogram.max, seconds),
+    )
+
+
+# Upper bound of the bucket that holds a quantile ( the largest time seen for the last bucket )
+def quantile(histogram, fraction):
+    seen = 0
+    for bound, count in zip(BUCKETS, histogram.counts):
+        seen += count
+        if seen >= fraction * histogram.count:
+            return min(bound, histogram.max)
+    return histogram.max
+
+
+def record_span(name, seconds):
+    with lock:
+        spans = recorded["spans"]
+        recorded["spans"] = {**spans, name: observe(spans.get(name, EMPTY_HISTOGRAM), seconds)}
+
+
+# Tk rows a refresh of the task list inserted, deleted, moved and changed : the totals and the last refresh
+def record_refresh(inserted, deleted, moved, updated):
+    rows = (("inserted", inserted), ("deleted", deleted), ("moved", moved), ("updated", updated))
+    with lock:
+        counters = recorded["counters"]
+        recorded["counters"] = {
+            **counters,
+            "tree_refreshes": counters.get("tree_refreshes", 0) + 1,
+            **{f"tk_rows_{name}": counters.get(f"tk_rows_{name}", 0) + count for name, count in rows},
+        }
+        recorded["gauges"] = {**recorded["gauges"], **{f"tk_rows_{name}_last_refresh": count for name, count in rows}}
+
+
+# Decorator : records the time of every call under the name of a span
+def timed(name):
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record_span(name, time.perf_counter() - start)
+
+        return timed_function
+
+    return decorate
+
+
+# (name, calls, mean, 95th percentile, max) of every span, in seconds ( for the stats window )
+def span_summaries():
+    return tuple(
+        (name, histogram.count, histogram.total / histogram.count, quantile(histogram, 0.95), histogram.max)
+        for name, histogram in sorted(recorded["spans"].items())
+    )
+
+
+# (name, value) of every counter and gauge
+def event_values():
+    return tuple(sorted(recorded["counters"].items())) + tuple(sorted(recorded["gauges"].items()))
+
+
+def to_json(metrics):
+    return json.dumps({
+        "spans": {
+            name: {"count": histogram.count, "sum": histogram.total, "max": histogram.max, "buckets": dict(zip(BUCKET_LABELS, histogram.counts))}
+            for name, histogram in metrics["spans"].items()
+        },
+        "counters": metrics["counters"],
+        "gauges": metrics["gauges"],
+    }, indent=4)
+
+
+# Metrics in the Prometheus text format ( its histogram buckets are cumulative )
+def to_prometheus(metrics):
+    span_lines = tuple(
+        line
+        for name, histogram in metrics["spans"].items()
+        for line in (
+            *(f'task_planner_span_seconds_bucket{{span="{name}",le="{bound}"}} {total}' for bound, total in zip(BUCKET_LABELS, accumulate(histogram.counts))),
+            f'task_planner_span_seconds_sum{{span="{name}"}} {histogram.total}',
+            f'task_planner_span_seconds_count{{span="{name}"}} {histogram.count}',
+        )
+    )
+    return "\n".join((
+        "# TYPE task_planner_span_seconds histogram",
+        *span_lines,
+        "# TYPE task_planner_events_total counter",
+        *(f'task_planner_events_total{{event="{name}"}} {total}' for name, total in metrics["counters"].items()),
+        "# TYPE task_planner_gauge gauge",
+        *(f'task_planner_gauge{{name="{name}"}} {value}' for name, value in metrics["gauges"].items()),
+    )) + "\n"
+
+
+# Writes the metrics file ( the format follows its extension )
+def write(filename=None):
+    filename = filename or METRICS_FILE
+    metrics = dict(recorded)
+    with open(filename, "w") as file:
+        file.write(to_prometheus(metrics) if filename.endswith(".prom") else to_json(metrics))
+
+
+if ENABLED:
+    atexit.register(write)
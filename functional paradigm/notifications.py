@@ -0,0 +1,250 @@
+import os
+import shutil
+import smtplib
+import subprocess
+import time
+from collections import namedtuple
+from datetime import datetime
+from email.message import EmailMessage
+
+import save_worker
+
+# Notifications
+# the deadline warnings go through a notifier instead of modal message boxes : notify() only queues
+# a notification, so the Tk thread never waits on a window, a file, a desktop notifier or a mail
+# server. A task is notified once per transition ( its key is the task id, the transition and the
+# due date ), the notifications queued within BATCH_DELAY are sent together as one batch and two
+# batches are at least MIN_INTERVAL apart ( what is queued meanwhile joins the next batch ).
+# The in-app toast panel is shown on the Tk thread; the other sinks run on a background worker
+# ( save_worker.start_writer, which merges the batches queued while one is being delivered )
+#
+# TASK_PLANNER_NOTIFY lists the sinks, e.g. "toast,log:notifications.log,desktop,smtp:localhost:1025"
+# ( the toast panel only by default ); smtp sends to a local stand-in server, such as the one
+# started by python -m aiosmtpd -n -l localhost:1025
+
+NOTIFY_SINKS = os.environ.get("TASK_PLANNER_NOTIFY", "toast")
+
+# Milliseconds the notifications of a burst are collected for, and the least time between two batches
+BATCH_DELAY = 500
+MIN_INTERVAL = 5000
+
+# Milliseconds a toast stays up
+TOAST_TIME = 8000
+
+# Titles a batch summary names for each transition, the others are counted
+SUMMARY_TITLES = 5
+
+LOG_FILE = "notifications.log"
+SMTP_SERVER = "localhost:1025"
+MAIL_SENDER = "task-planner@localhost"
+MAIL_RECIPIENT = "user@localhost"
+
+# Seconds a desktop notifier or the mail server may take
+SINK_TIMEOUT = 10
+
+Notification = namedtuple("Notification", ["key", "transition", "title", "due_date", "time"])
+
+# A sink : deliver(batch) sends a batch, on_tk_thread tells whether it must run on the Tk thread
+Sink = namedtuple("Sink", ["name", "deliver", "on_tk_thread"])
+
+# Handle to a running notifier : notify(task_id, transition, title, due_date), close() -> errors not reported yet
+Notifier = namedtuple("Notifier", ["notify", "close"])
+
+
+class NotificationError(Exception):
+    pass
+
+
+def summary_line(transition, titles):
+    named = f"{transition}: {', '.join(titles[:SUMMARY_TITLES])}"
+    return named + (f" and {len(titles) - SUMMARY_TITLES} more" if len(titles) > SUMMARY_TITLES else "")
+
+
+# Summary of a batch : a headline and one line per transition naming its first tasks
+def batch_summary(batch):
+    transitions = tuple(dict.fromkeys(notification.transition for notification in batch))
+    lines = tuple(
+        summary_line(transition, tuple(notification.title for notification in batch if notification.transition == transition))
+        for transition in transitions
+    )
+    headline = "1 task needs attention" if len(batch) == 1 else f"{len(batch)} tasks need attention"
+    return headline, lines
+
+
+# One line per notification ( log file and mail body )
+def notification_line(notification):
+    return f"{notification.time:%Y-%m-%d %H:%M:%S} {notification.transition}: {notification.title} (due {notification.due_date})"
+
+
+# Shows the summary of each batch in a label of the window, hidden again after TOAST_TIME
+def toast_sink(label):
+    timer = {"hide": None}
+
+    def hide():
+        timer["hide"] = None
+        label.pack_forget()
+
+    def deliver(batch):
+        headline, lines = batch_summary(batch)
+        label.configure(text="\n".join((headline,) + lines))
+        label.pack(side="bottom", fill="x", padx=10, pady=5)
+        if timer["hide"] is not None:
+            label.after_cancel(timer["hide"])
+        timer["hide"] = label.after(TOAST_TIME, hide)
+
+    return Sink("toast", deliver, True)
+
+
+# Appends every notification to a text file
+def log_sink(path):
+    def deliver(batch):
+        with open(path, "a") as file:
+            file.writelines(notification_line(notification) + "\n" for notification in batch)
+
+    return Sink("log", deliver, False)
+
+
+def applescript_string(value):
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+# Command that shows a desktop notification ( notify-send on Linux, osascript on macOS )
+def desktop_command(title, text):
+    if shutil.which("notify-send"):
+        return ("notify-send", title, text)
+    if shutil.which("osascript"):
+        return ("osascript", "-e", f"display notification {applescript_string(text)} with title {applescript_string(title)}")
+    raise NotificationError("No desktop notifier found ( notify-send or osascript )")
+
+
+# Shows the summary of each batch as one desktop notification
+def desktop_sink():
+    def deliver(batch):
+        headline, lines = batch_summary(batch)
+        subprocess.run(desktop_command(headline, "\n".join(lines)), check=True, capture_output=True, timeout=SINK_TIMEOUT)
+
+    return Sink("desktop", deliver, False)
+
+
+# Mail of a batch : the summary as subject, a line per notification as body
+def batch_mail(batch):
+    message = EmailMessage()
+    message["Subject"] = batch_summary(batch)[0]
+    message["From"] = MAIL_SENDER
+    message["To"] = MAIL_RECIPIENT
+    message.set_content("\n".join(map(notification_line, batch)) + "\n")
+    return message
+
+
+# Mails each batch to a server given as "host:port"
+def smtp_sink(server):
+    host, _, port = server.partition(":")
+
+    def deliver(batch):
+        with smtplib.SMTP(host or "localhost", int(port or 25), timeout=SINK_TIMEOUT) as connection:
+            connection.send_message(batch_mail(batch))
+
+    return Sink("smtp", deliver, False)
+
+
+# Sink factories by name, called with the text after the ":" of the sink and the toast label
+SINK_FACTORIES = {
+    "toast": lambda argument, toast_label: toast_sink(toast_label),
+    "log": lambda argument, toast_label: log_sink(argument or LOG_FILE),
+    "desktop": lambda argument, toast_label: desktop_sink(),
+    "smtp": lambda argument, toast_label: smtp_sink(argument or SMTP_SERVER),
+}
+
+
+def sink_name(part):
+    name, _, argument = part.strip().partition(":")
+    if name and name not in SINK_FACTORIES:
+        raise ValueError(f"Unknown notification sink: {name}")
+    return name, argument
+
+
+# Sinks of a TASK_PLANNER_NOTIFY list, ValueError for an unknown sink
+def make_sinks(spec, toast_label):
+    return tuple(
+        SINK_FACTORIES[name](argument, toast_label)
+        for name, argument in map(sink_name, spec.split(","))
+        if name
+    )
+
+
+# Two batches the worker did not deliver yet become one
+def join_batches(pending, batch):
+    return pending + batch
+
+
+# Delivers a batch to some sinks, returns the errors of the ones that failed ( a failing sink does
+# not stop the others )
+def deliver_batch(sinks, batch):
+    def failure(sink):
+        try:
+            sink.deliver(batch)
+            return None
+        except Exception as error:
+            return f"{sink.name}: {error}"
+
+    return tuple(filter(None, map(failure, sinks)))
+
+
+def raise_failures(sinks, batch):
+    errors = deliver_batch(sinks, batch)
+    if errors:
+        raise NotificationError("; ".join(errors))
+
+
+def milliseconds():
+    return time.monotonic() * 1000
+
+
+# Starts a notifier sending to some sinks; on_error(error) runs on the Tk thread when a background sink failed
+def start_notifier(root, sinks, on_error=None):
+    panels = tuple(sink for sink in sinks if sink.on_tk_thread)
+    background = tuple(sink for sink in sinks if not sink.on_tk_thread)
+    # sent : keys of the notifications queued so far, queued : the notifications of the next batch,
+    # scheduled : whether the next batch has a timer ( queued is a list, so a burst of notifications
+    # is collected in O(1) each; a batch is sent as a tuple )
+    state = {"sent": set(), "queued": [], "scheduled": False, "last_batch": -MIN_INTERVAL}
+
+    def delivered(result, outstanding):
+        if result.error is not None and on_error is not None:
+            on_error(result.error)
+
+    writer = save_worker.start_writer(root, lambda batch: raise_failures(background, batch), join_batches, delivered) if background else None
+
+    # Sends the queued notifications as one batch ( Tk timer )
+    def flush():
+        batch = tuple(state["queued"])
+        state["queued"], state["scheduled"] = [], False
+        if not batch:
+            return
+        state["last_batch"] = milliseconds()
+        deliver_batch(panels, batch)
+        if writer is not None:
+            writer.submit(batch)
+
+    # Queues a notification unless the task was notified of this transition already, returns whether it was queued
+    def notify(task_id, transition, title, due_date):
+        key = (task_id, transition, due_date)
+        if key in state["sent"]:
+            return False
+        state["sent"].add(key)
+        state["queued"].append(Notification(key, transition, title, due_date, datetime.now()))
+        if not state["scheduled"]:
+            state["scheduled"] = True
+            root.after(int(max(BATCH_DELAY, state["last_batch"] + MIN_INTERVAL - milliseconds())), flush)
+        return True
+
+    # Stops the worker, then delivers what is still queued to the background sinks ( the window may
+    # already be gone ); returns the errors that were not reported yet
+    def close():
+        if writer is None:
+            return ()
+        batch, state["queued"] = tuple(state["queued"]), []
+        errors = tuple(str(result.error) for result in writer.close() if result.error is not None)
+        return errors + (deliver_batch(background, batch) if batch else ())
+
+    return Notifier(notify, close)
@@ -0,0 +1,59 @@
+import heapq
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import compress
+
+# Partial sorting
+# the first screenful of a sorted task list does not need every task in order : the smallest entries
+# of an ordering are selected with a heap ( heapq.nsmallest, O(n log k) for the first k entries ) and
+# only those are sorted. A Prefix holds the entries selected so far; reading a page past them selects
+# again, twice as many, so paging down a list costs one selection per doubling, and insert / remove
+# return the prefix of the next version of the collection. The collection keeps the prefix of a sort
+# key among its indexes until it builds the full sorted index ( see sorted_page_entries in task_engine )
+
+# entries : the len(entries) smallest entries of the ordering, sorted; complete : they are all of them
+Prefix = namedtuple("Prefix", ["entries", "complete"])
+
+
+# The count smallest entries of the tasks in some slots, sorted
+# values are the first fields of their entries ( in slot order ), entries(slots) builds the entries
+# of some slots : the count smallest values are selected first, a column of numbers or names is
+# cheaper to select from than tuples, then only the entries up to the last of them are built
+def smallest_entries(count, slots, values, entries):
+    values = tuple(values)
+    if count < len(values):
+        last = heapq.nsmallest(count, values)[-1]
+        slots = tuple(compress(slots, map(last.__ge__, values)))
+    return tuple(heapq.nsmallest(count, entries(slots)))
+
+
+# Prefix of the count smallest entries, smallest(count) selects them ( see smallest_entries )
+def select(smallest, count):
+    entries = smallest(count)
+    return Prefix(entries, len(entries) < count)
+
+
+# True when the prefix holds the entries up to position stop
+def covers(prefix, stop):
+    return prefix.complete or stop <= len(prefix.entries)
+
+
+# Prefix that holds the entries up to position stop, at least twice as many as the one it replaces
+def grow(prefix, smallest, stop):
+    return select(smallest, max(stop, 2 * len(prefix.entries)))
+
+
+# An entry smaller than the last one selected is one of the smallest entries now, a larger one is not
+def insert(prefix, entry):
+    if not (prefix.complete or (prefix.entries and entry < prefix.entries[-1])):
+        return prefix
+    position = bisect_left(prefix.entries, entry)
+    return prefix._replace(entries=prefix.entries[:position] + (entry,) + prefix.entries[position:])
+
+
+# The prefix without the entry is still the smallest entries of the others
+def remove(prefix, entry):
+    position = bisect_left(prefix.entries, entry)
+    if position == len(prefix.entries) or prefix.entries[position] != entry:
+        return prefix
+    return prefix._replace(entries=prefix.entries[:position] + prefix.entries[position + 1:])
@@ -0,0 +1,294 @@
+from itertools import islice
+from sorted_index import Node, balance, make_node, remove_min, size
+
+# Persistent (immutable) vector : an AVL tree annotated with subtree sizes, read in order
+# it reuses the balanced nodes of sorted_index but finds a position by counting, not by comparing
+# append, replace and delete rebuild only the O(log n) nodes on one path, every other node
+# is shared between the old and the new version
+# a tree built from values starts as one UnbuiltNode over them : its nodes are only made on the
+# paths that are edited, so building the tree of a large vector costs nothing until it is changed
+
+
+# Value at a position ( O(log n), iterative; an unbuilt subtree is read from its tuple )
+def get(node, index):
+    while True:
+        if isinstance(node, UnbuiltNode):
+            return node.values[node.low + index]
+        left_size = size(node.left)
+        if index < left_size:
+            node = node.left
+        elif index == left_size:
+            return node.entry
+        else:
+            index -= left_size + 1
+            node = node.right
+
+
+# Position of the value whose key is key, in a tree whose values are in increasing key_of order
+# ( O(log n) : the tree is searched like a binary search tree ), None if there is no such value
+def find(node, key, key_of):
+    position = 0
+    while node is not None:
+        node_key = key_of(node.entry)
+        if key < node_key:
+            node = node.left
+        elif node_key < key:
+            position += size(node.left) + 1
+            node = node.right
+        else:
+            return position + size(node.left)
+    return None
+
+
+# Position where a value with key goes in a tree whose values are in increasing key_of order ( O(log n) )
+def insertion_point(node, key, key_of):
+    position = 0
+    while node is not None:
+        if key < key_of(node.entry):
+            node = node.left
+        else:
+            position += size(node.left) + 1
+            node = node.right
+    return position
+
+
+# Returns a new tree with the value at a position replaced ( the shape does not change )
+def replace(node, index, value):
+    left_size = size(node.left)
+    if index < left_size:
+        return node._replace(left=replace(node.left, index, value))
+    if index == left_size:
+        return node._replace(entry=value)
+    return node._replace(right=replace(node.right, index - left_size - 1, value))
+
+
+# Returns a new tree with value inserted before a position ( index == size appends )
+def insert(node, index, value):
+    if node is None:
+        return make_node(value, 1, None, None)
+    left_size = size(node.left)
+    if index <= left_size:
+        return balance(node.entry, 1, insert(node.left, index, value), node.right)
+    return balance(node.entry, 1, node.left, insert(node.right, index - left_size - 1, value))
+
+
+# Returns a new tree without the value at a position
+def delete(node, index):
+    left_size = size(node.left)
+    if index < left_size:
+        return balance(node.entry, 1, delete(node.left, index), node.right)
+    if index > left_size:
+        return balance(node.entry, 1, node.left, delete(node.right, index - left_size - 1))
+    if node.left is None:
+        return node.right
+    if node.right is None:
+        return node.left
+    right, successor = remove_min(node.right)
+    return balance(successor.entry, 1, node.left, right)
+
+
+# Values of a tree in order ( step by step, the values of an unbuilt subtree are read from its tuple )
+def walk(node):
+    stack = []
+    while True:
+        while node is not None and not isinstance(node, UnbuiltNode):
+            stack.append(node)
+            node = node.left
+        if node is not None:
+            yield from map(node.values.__getitem__, range(node.low, node.high))
+        if not stack:
+            return
+        node = stack.pop()
+        yield node.entry
+        node = node.right
+
+
+# Values of a tree in order as a list ( one recursive pass, faster than the step by step walk )
+def to_list(node, values=None):
+    if values is None:
+        values = []
+    while node is not None:
+        if isinstance(node, UnbuiltNode):
+            values.extend(node.values[node.low:node.high])
+            break
+        if node.left is not None:
+            to_list(node.left, values)
+        values.append(node.entry)
+        node = node.right
+    return values
+
+
+# Values at the positions start to stop of a tree, in order ( O(log n + k), an unbuilt subtree is
+# read from its tuple ), added to values
+def slice_values(node, start, stop, values):
+    if node is None or start >= stop:
+        return values
+    if isinstance(node, UnbuiltNode):
+        values.extend(node.values[node.low + start:node.low + stop])
+        return values
+    left_size = size(node.left)
+    if start < left_size:
+        slice_values(node.left, start, min(stop, left_size), values)
+    if start <= left_size < stop:
+        values.append(node.entry)
+    if stop > left_size + 1:
+        slice_values(node.right, max(start - left_size - 1, 0), stop - left_size - 1, values)
+    return values
+
+
+# Balanced subtree over values[low:high] ( a tuple ) whose nodes are made only when it is edited
+# it reads like a Node : its fields are computed from the range ( the middle value is the entry,
+# the values on each side are its unbuilt children ), and _replace gives back a Node whose
+# children are still unbuilt, so an edit makes the nodes on its path and no other
+class UnbuiltNode:
+    __slots__ = ("values", "low", "high")
+
+    count = 1
+
+    def __init__(self, values, low, high):
+        self.values = values
+        self.low = low
+        self.high = high
+
+    @property
+    def entry(self):
+        return self.values[(self.low + self.high) // 2]
+
+    @property
+    def left(self):
+        return unbuilt(self.values, self.low, (self.low + self.high) // 2)
+
+    @property
+    def right(self):
+        return unbuilt(self.values, (self.low + self.high) // 2 + 1, self.high)
+
+    # Height of the balanced tree over high - low values ( each side holds half of them )
+    @property
+    def height(self):
+        return (self.high - self.low).bit_length()
+
+    @property
+    def size(self):
+        return self.high - self.low
+
+    def _replace(self, **fields):
+        return Node(self.entry, 1, self.left, self.right, self.height, self.size)._replace(**fields)
+
+
+def unbuilt(values, low, high):
+    return UnbuiltNode(values, low, high) if low < high else None
+
+
+# Balanced tree holding a tuple of values in order ( O(1), its nodes are made as it is edited )
+def build(values):
+    return unbuilt(values, 0, len(values))
+
+
+# Immutable sequence of values backed by the tree above
+# it supports len, indexing, slicing and iteration like a tuple; the "editing" methods
+# return a new vector and leave this one untouched
+class PVector:
+    __slots__ = ("root",)
+
+    def __init__(self, values=()):
+        self.root = build(tuple(values))
+
+    @classmethod
+    def from_root(cls, root):
+        vector = cls.__new__(cls)
+        vector.root = root
+        return vector
+
+    def __len__(self):
+        return size(self.root)
+
+    def __iter__(self):
+        return walk(self.root)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step > 0:
+                return PVector(islice(self, start, stop, step))
+            return PVector(tuple(self)[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("vector index out of range")
+        return get(self.root, index)
+
+    # Position of the value with a key, when the values are in increasing key_of order
+    def find(self, key, key_of):
+        return find(self.root, key, key_of)
+
+    # Position where a value with a key goes, when the values are in increasing key_of order
+    def insertion_point(self, key, key_of):
+        return insertion_point(self.root, key, key_of)
+
+    def tolist(self):
+        return to_list(self.root)
+
+    def __eq__(self, other):
+        if not isinstance(other, PVector):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"PVector({list(self)!r})"
+
+    def append(self, value):
+        return PVector.from_root(insert(self.root, len(self), value))
+
+    # Copy with a value inserted before a position
+    def insert(self, index, value):
+        if not 0 <= index <= len(self):
+            raise IndexError("vector index out of range")
+        return PVector.from_root(insert(self.root, index, value))
+
+    def set(self, index, value):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("vector index out of range")
+        return PVector.from_root(replace(self.root, index, value))
+
+    def delete(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("vector index out of range")
+        return PVector.from_root(delete(self.root, index))
+
+
+# Vector that keeps its values in a tuple, so a large collection that was just loaded is read and
+# indexed at the speed of a tuple; its tree is built the first time it is edited or searched ( an
+# unbuilt node over the tuple ), the vectors its edits return are plain PVectors
+class LazyPVector(PVector):
+    __slots__ = ("values", "tree")
+
+    def __init__(self, values=()):
+        self.values = tuple(values)
+        self.tree = None
+
+    @property
+    def root(self):
+        if self.tree is None:
+            self.tree = build(self.values)
+        return self.tree
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyPVector(self.values[index])
+        try:
+            return self.values[index]
+        except IndexError:
+            raise IndexError("vector index out of range") from None
+
+    def tolist(self):
+        return list(self.values)
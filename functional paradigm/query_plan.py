@@ -0,0 +1,104 @@
+from collections import namedtuple
+from functools import reduce
+from operator import itemgetter
+import sorted_index
+
+# Filter query planner
+# a filter is a set of structured predicates instead of opaque functions : each one selects the
+# entries of one sorted index that lie in a range. Predicates on the same field are merged into one
+# range, the number of tasks in each range is counted from the subtree sizes ( O(log n) ), and the
+# smallest range is walked ( O(log n + k) ) while the other predicates are checked on the entries of
+# the tasks it yields. A combined filter costs about the size of its most selective part instead of
+# a pass over every task.
+# A predicate may also be a set of task numbers given by another index ( e.g. a text search ),
+# it is driven by reading the tasks of those numbers, or checked by looking a number up in the set.
+
+# The tasks whose entry in the sorted index of field lies in [low, high) ( a bound of None is open )
+RangePredicate = namedtuple("RangePredicate", ["field", "low", "high"])
+
+# The tasks whose number is in keys
+KeySetPredicate = namedtuple("KeySetPredicate", ["keys"])
+
+# Index entries are (value, ..., slot) tuples : (value,) is before every entry with that value and
+# (value, INFINITY) after all of them
+INFINITY = float("inf")
+
+
+# Tasks whose field is between first and last ( both included, either may be None )
+def between(field, first, last):
+    return RangePredicate(
+        field,
+        None if first is None else (first,),
+        None if last is None else (last, INFINITY),
+    )
+
+
+def equal_to(field, value):
+    return between(field, value, value)
+
+
+def at_least(field, first):
+    return between(field, first, None)
+
+
+def at_most(field, last):
+    return between(field, None, last)
+
+
+def key_in(keys):
+    return KeySetPredicate(frozenset(keys))
+
+
+# True if an index entry lies in the range of a predicate
+def holds(predicate, entry):
+    return (predicate.low is None or predicate.low <= entry) and (predicate.high is None or entry < predicate.high)
+
+
+# Range of two predicates on the same field that both hold
+def intersect(first, second):
+    lows = tuple(low for low in (first.low, second.low) if low is not None)
+    highs = tuple(high for high in (first.high, second.high) if high is not None)
+    return RangePredicate(first.field, max(lows) if lows else None, min(highs) if highs else None)
+
+
+# One predicate per field ( key sets are intersected too )
+def merge_predicates(predicates):
+    key_sets = tuple(predicate.keys for predicate in predicates if isinstance(predicate, KeySetPredicate))
+    ranges = tuple(predicate for predicate in predicates if not isinstance(predicate, KeySetPredicate))
+    merged = reduce(
+        lambda by_field, predicate: {
+            **by_field,
+            predicate.field: intersect(by_field[predicate.field], predicate) if predicate.field in by_field else predicate,
+        },
+        ranges,
+        {},
+    )
+    keys = (KeySetPredicate(reduce(frozenset.intersection, sorted(key_sets, key=len))),) if key_sets else ()
+    return keys + tuple(merged.values())
+
+
+# Number of tasks a predicate selects, read from its index
+def estimate(indexes, predicate):
+    if isinstance(predicate, KeySetPredicate):
+        return len(predicate.keys)
+    return sorted_index.count_range(indexes[predicate.field], predicate.low, predicate.high)
+
+
+# Slots of the tasks that satisfy every predicate, yielded lazily in the order of the driving index
+# indexes maps a field to its sorted index, entry_of(field, slot) returns the entry of a slot in it,
+# key_of(slot) the number of the task in a slot and slots_of(keys) the slots of some task numbers
+def matching_slots(indexes, entry_of, predicates, key_of=None, slots_of=None):
+    predicates = merge_predicates(predicates)
+    driver = min(predicates, key=lambda predicate: estimate(indexes, predicate))
+    others = tuple(predicate for predicate in predicates if predicate is not driver)
+
+    def satisfies(slot):
+        return all(
+            key_of(slot) in predicate.keys if isinstance(predicate, KeySetPredicate)
+            else holds(predicate, entry_of(predicate.field, slot))
+            for predicate in others
+        )
+
+    if isinstance(driver, KeySetPredicate):
+        return filter(satisfies, slots_of(driver.keys))
+    return filter(satisfies, map(itemgetter(-1), sorted_index.walk_range(indexes[driver.field], driver.low, driver.high)))
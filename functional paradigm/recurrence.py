@@ -0,0 +1,206 @@
+import calendar
+import json
+from collections import namedtuple
+from datetime import MAXYEAR, date, datetime
+from itertools import chain, count, dropwhile, takewhile
+
+# Recurring tasks
+# a recurring task is stored once, as a definition with an RRULE-style rule, instead of one task per
+# occurrence. Its occurrences are produced by generators for a range of due days only : each rule
+# works out its first occurrence in the range with arithmetic and steps from there, so a series
+# without an end is never expanded past the range that is looked at.
+#
+# rule : "FREQ=DAILY|WEEKLY|MONTHLY" plus optional ";INTERVAL=n" ( every n days / weeks / months ),
+# ";BYDAY=MO,WE,FR" ( weekly only, the weekday of the start otherwise ), ";COUNT=n" ( n occurrences )
+# and ";UNTIL=YYYYMMDD" ( the last possible day ); a monthly rule keeps the day of the month of the
+# start and skips the months that do not have it, like RFC 5545 does
+
+Rule = namedtuple("Rule", ["frequency", "interval", "weekdays", "count", "until"])
+
+# Immutable definition of a recurring task ( stored in tasks.recurring.json ) : start is the due date
+# of the first occurrence, completed the due dates of the occurrences that were completed
+RecurringTask = namedtuple("RecurringTask", ["id", "title", "description", "priority", "rule", "start", "creation_time", "completed"])
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+# Day number of the last day a date can hold
+LAST_DAY = date(MAXYEAR, 12, 31).toordinal()
+
+# Separates the id of a definition from the due date in the id of an occurrence
+OCCURRENCE_SEPARATOR = "@"
+
+
+def rule_part(part):
+    name, separator, value = part.partition("=")
+    if not separator or not value.strip():
+        raise ValueError(f"Bad recurrence rule part: {part!r}")
+    return name.strip().upper(), value.strip().upper()
+
+
+def parse_weekdays(text):
+    codes = text.split(",")
+    unknown = tuple(code for code in codes if code not in WEEKDAY_CODES)
+    if unknown:
+        raise ValueError(f"Unknown weekdays: {', '.join(unknown)}")
+    return tuple(sorted(frozenset(map(WEEKDAY_CODES.index, codes))))
+
+
+def positive(name, text):
+    value = int(text)
+    if value < 1:
+        raise ValueError(f"The recurrence {name} must be at least 1")
+    return value
+
+
+# Rule of an RRULE-style text, ValueError when it is not one
+def parse_rule(text):
+    parts = dict(map(rule_part, text.split(";")))
+    unsupported = frozenset(parts) - {"FREQ", "INTERVAL", "BYDAY", "COUNT", "UNTIL"}
+    if unsupported:
+        raise ValueError(f"Unsupported recurrence rule parts: {', '.join(sorted(unsupported))}")
+    frequency = parts.get("FREQ")
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unknown recurrence frequency: {frequency}")
+    if "BYDAY" in parts and frequency != "WEEKLY":
+        raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+    return Rule(
+        frequency,
+        positive("interval", parts.get("INTERVAL", "1")),
+        parse_weekdays(parts["BYDAY"]) if "BYDAY" in parts else (),
+        positive("count", parts["COUNT"]) if "COUNT" in parts else None,
+        datetime.strptime(parts["UNTIL"][:8], "%Y%m%d").toordinal() if "UNTIL" in parts else None,
+    )
+
+
+# Every occurrence day of a daily rule from the k-th one on, as (k, day) : occurrence k is start + k * interval
+def daily_series(rule, start, first):
+    first_index = max(0, -(-(first - start) // rule.interval))
+    return ((index, start + index * rule.interval) for index in count(first_index))
+
+
+# Every occurrence day of a weekly rule from the period holding first on, as (k, day)
+# weeks start on Monday and are counted from the week of the start, every interval-th week has an
+# occurrence on each of the weekdays ( the days of the first week before the start are left out )
+def weekly_series(rule, start, first):
+    weekdays = rule.weekdays or (date.fromordinal(start).weekday(),)
+    week_start = start - date.fromordinal(start).weekday()
+    first_week = tuple(weekday for weekday in weekdays if week_start + weekday >= start)
+    period_length = 7 * rule.interval
+    first_period = max(0, (first - week_start) // period_length)
+    # Occurrences before the first period read ( they count towards COUNT )
+    skipped = 0 if first_period == 0 else len(first_week) + (first_period - 1) * len(weekdays)
+    days = chain.from_iterable(
+        (week_start + period * period_length + weekday for weekday in (first_week if period == 0 else weekdays))
+        for period in count(first_period)
+    )
+    return zip(count(skipped), days)
+
+
+# Day of a month ( months counted from year 0 ), None when the month does not have it
+def day_of_month(month, day):
+    year, month_index = divmod(month, 12)
+    if day > calendar.monthrange(year, month_index + 1)[1]:
+        return None
+    return date(year, month_index + 1, day).toordinal()
+
+
+# Every occurrence day of a monthly rule, as (k, day)
+# without COUNT the months before first are skipped with arithmetic; with it they are stepped
+# through, as the months without the day of the start do not count
+def monthly_series(rule, start, first):
+    start_date = date.fromordinal(start)
+    start_month = start_date.year * 12 + start_date.month - 1
+    skip = 0
+    if rule.count is None:
+        first_date = date.fromordinal(first)
+        skip = max(0, (first_date.year * 12 + first_date.month - 1 - start_month) // rule.interval)
+    months = takewhile(lambda month: month // 12 <= MAXYEAR, count(start_month + skip * rule.interval, rule.interval))
+    days = filter(None, (day_of_month(month, start_date.day) for month in months))
+    return zip(count(), days)
+
+
+RULE_SERIES = {"DAILY": daily_series, "WEEKLY": weekly_series, "MONTHLY": monthly_series}
+
+
+# Occurrence days ( day numbers, increasing ) of a rule starting on the day start, between the days
+# first and last ( both included ); first None starts at the first occurrence
+def occurrence_days(rule, start, first, last):
+    first = start if first is None else max(first, start)
+    last = min(last, LAST_DAY, LAST_DAY if rule.until is None else rule.until)
+    if first > last:
+        return iter(())
+    series = RULE_SERIES[rule.frequency](rule, start, first)
+    counted = series if rule.count is None else takewhile(lambda occurrence: occurrence[0] < rule.count, series)
+    days = (day for _, day in counted)
+    return takewhile(lambda day: day <= last, dropwhile(lambda day: day < first, days))
+
+
+# Status of the occurrence due on a day
+def occurrence_status(definition, due_date, day, today):
+    if due_date in definition.completed:
+        return "Completed"
+    return "Overdue" if day < today else "Pending"
+
+
+# Occurrences of a definition due between the days first and last, as task dicts in due date order
+# the id of an occurrence is the id of its definition and its due date; an occurrence is completed
+# when its due date is in the completed dates, overdue once its day has passed, pending otherwise
+def occurrences(definition, first, last, today):
+    start = datetime.strptime(definition.start, "%Y-%m-%d").toordinal()
+    due_days = occurrence_days(parse_rule(definition.rule), start, first, last)
+    return (
+        {
+            "title": definition.title,
+            "description": definition.description,
+            "due_date": due_date,
+            "priority": definition.priority,
+            "status": occurrence_status(definition, due_date, day, today),
+            "creation_time": definition.creation_time,
+            "highlight": False,
+            "id": definition.id + OCCURRENCE_SEPARATOR + due_date,
+        }
+        for day, due_date in ((day, date.fromordinal(day).isoformat()) for day in due_days)
+    )
+
+
+# True when a series has an occurrence due on a date ( "YYYY-MM-DD" )
+def is_occurrence(definition, due_date):
+    try:
+        day = datetime.strptime(due_date, "%Y-%m-%d").toordinal()
+    except ValueError:
+        return False
+    start = datetime.strptime(definition.start, "%Y-%m-%d").toordinal()
+    return next(occurrence_days(parse_rule(definition.rule), start, day, day), None) is not None
+
+
+# (definition id, due date) of an occurrence id, None for the id of a stored task
+def split_occurrence_id(occurrence_id):
+    definition_id, separator, due_date = occurrence_id.rpartition(OCCURRENCE_SEPARATOR)
+    return (definition_id, due_date) if separator else None
+
+
+def definition_from_dict(data):
+    parse_rule(data["rule"])
+    return RecurringTask(**{**data, "completed": frozenset(data["completed"])})
+
+
+def definition_to_dict(definition):
+    return {**definition._asdict(), "completed": sorted(definition.completed)}
+
+
+# Reads the definitions of a recurring tasks file ( none when there is no file yet )
+def read_definitions(path):
+    try:
+        with open(path, "r") as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return ()
+    if not isinstance(data, list):
+        raise ValueError(f"{path} does not hold a list of recurring tasks")
+    return tuple(map(definition_from_dict, data))
+
+
+# Contents of a recurring tasks file
+def encode_definitions(definitions):
+    return json.dumps(list(map(definition_to_dict, definitions)), indent=4).encode()
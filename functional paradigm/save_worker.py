@@ -0,0 +1,96 @@
+import threading
+from collections import namedtuple
+from queue import Empty, SimpleQueue
+
+# Background writer
+# saves run on a worker thread instead of the Tk event thread : the GUI hands a job over ( what to
+# write ) and goes on at once. While a write is in progress the jobs submitted meanwhile are merged
+# into one pending job, so a burst of edits costs one write however many edits it holds.
+# Tk must only be called from the thread that runs mainloop, so the worker never calls back itself :
+# it queues what each write did, and an after() timer on the Tk thread reports it while jobs are
+# outstanding ( the timer stops once everything submitted was written ).
+
+# Milliseconds between two looks at the finished writes
+POLL_INTERVAL = 50
+
+# What one write reports : how many submitted jobs it held and the error it raised ( None when it succeeded )
+WriteResult = namedtuple("WriteResult", ["jobs", "error"])
+
+# Handle to a running writer : submit(job), close() -> results not reported yet
+Writer = namedtuple("Writer", ["submit", "close"])
+
+
+# Merge of a pending job and a newer one when the newer job replaces it ( e.g. a whole snapshot )
+def keep_latest(pending, job):
+    return job
+
+
+# Starts the worker thread
+# write(job) runs on the worker, merge(pending, job) combines two jobs that were not written yet,
+# on_done(result, outstanding) runs on the Tk thread after each write with the number of jobs still to write
+def start_writer(root, write, merge=keep_latest, on_done=None):
+    condition = threading.Condition()
+    results = SimpleQueue()
+    # pending / waiting : the merged job that is not written yet and how many jobs it holds ( worker side )
+    # outstanding / polling : jobs submitted and not reported yet, and whether the timer runs ( Tk side )
+    state = {"pending": None, "waiting": 0, "closing": False, "outstanding": 0, "polling": False}
+
+    def run():
+        while True:
+            with condition:
+                while not state["waiting"] and not state["closing"]:
+                    condition.wait()
+                if not state["waiting"]:
+                    return
+                job, jobs = state["pending"], state["waiting"]
+                state["pending"], state["waiting"] = None, 0
+            try:
+                write(job)
+                results.put(WriteResult(jobs, None))
+            except Exception as error:     # reported on the Tk thread, the worker keeps running
+                results.put(WriteResult(jobs, error))
+
+    # Results of the writes that finished since the last call
+    def finished():
+        done = []
+        while True:
+            try:
+                done.append(results.get_nowait())
+            except Empty:
+                return tuple(done)
+
+    # Hands the finished writes to on_done ( Tk thread )
+    def report():
+        for result in finished():
+            state["outstanding"] -= result.jobs
+            if on_done is not None:
+                on_done(result, state["outstanding"])
+
+    def poll():
+        report()
+        state["polling"] = state["outstanding"] > 0
+        if state["polling"]:
+            root.after(POLL_INTERVAL, poll)
+
+    def submit(job):
+        with condition:
+            state["pending"] = merge(state["pending"], job) if state["waiting"] else job
+            state["waiting"] += 1
+            condition.notify()
+        state["outstanding"] += 1
+        if not state["polling"]:
+            state["polling"] = True
+            root.after(POLL_INTERVAL, poll)
+
+    # Writes what is still pending and stops the worker
+    # returns the results that were not reported yet ( the GUI may already be gone )
+    def close():
+        with condition:
+            state["closing"] = True
+            condition.notify()
+        worker.join()
+        return finished()
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    return Writer(submit, close)
@@ -0,0 +1,51 @@
+from collections import namedtuple
+from functools import partial
+from itertools import islice
+from operator import itemgetter
+import sorted_index
+
+# "What next" scheduler
+# the tasks that are not completed are ordered by an urgency score, the lowest score first :
+#
+#   score = priority rank * priority weight + due day * due date weight - creation day * age weight
+#
+# with the default weights one priority step counts as much as a week of due date, and every ten days
+# a task waits make it as urgent as if it was due a day earlier. The days of every task grow by the
+# same amount as time goes by, so the order never changes on its own.
+#
+# The queue is a persistent sorted index ( see sorted_index ), like the deadline schedule : its
+# smallest entries are read in O(log n + k) without taking them out, and a change to a task removes
+# the entry of its old slot and inserts the one of its new slot ( O(log n) ), every version of the
+# queue sharing the rest of the tree with the one it came from. The task collection keeps it among
+# its indexes ( see next_tasks in task_engine )
+
+Weights = namedtuple("Weights", ["priority", "due_date", "age"])
+
+DEFAULT_WEIGHTS = Weights(priority=7.0, due_date=1.0, age=0.1)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def urgency(weights, columns, slot):
+    return (
+        columns.priorities[slot] * weights.priority
+        + columns.due_days[slot] * weights.due_date
+        - columns.creation_times[slot] / SECONDS_PER_DAY * weights.age
+    )
+
+
+# Entry of a slot in the queue : (score, creation time, slot), None for a completed task
+def urgency_entry(weights, columns, slot):
+    if columns.status_names[columns.statuses[slot]].lower() == "completed":
+        return None
+    return urgency(weights, columns, slot), columns.creation_times[slot], slot
+
+
+# Builds the queue of the tasks in some slots ( O(n log n) )
+def build_queue(columns, slots, weights):
+    return sorted_index.from_sorted(sorted(filter(None, map(partial(urgency_entry, weights, columns), slots))))
+
+
+# Slots of the count most urgent tasks of a queue, most urgent first
+def next_slots(queue, count=1):
+    return tuple(map(itemgetter(-1), islice(sorted_index.walk(queue), count)))
@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from journal import JournalContents, write_atomically
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+# Task store shared by several planner processes
+# the changes are appended to a journal all of them read, like the journal storage mode does, but
+# each append is a compare-and-swap : the sequence number of the last record is the version of the
+# store, and every process remembers the version it has seen. Under an advisory lock on the lock
+# file, a commit first reads the records the other processes appended since that version; a local
+# change to a task one of them changed too is a conflict and is not written, the other changes are
+# appended after their records. The lock is only held to read those few records and append a few
+# lines : the snapshot that compacts the journal is written outside of it and renamed into place.
+#
+# snapshot  : {"sequence": n, "tasks": [...]} holds every change up to sequence n
+# journal   : one {"sequence": n, "op": ...} record per line
+# lock file : "<snapshot sequence> <floor>", the journal holds every record after the floor
+
+# The journal is compacted once it holds this many records, and keeps the last KEEP_RECORDS of them
+# so the planners that did not read them yet can still catch up without loading the snapshot
+COMPACT_EVERY = 500
+KEEP_RECORDS = 500
+
+SharedFiles = namedtuple("SharedFiles", ["snapshot", "journal", "lock"])
+
+# Result of a commit : the records of the other planners to apply ( None when the store was
+# compacted past this process, which has to read it again ) and the local records that conflict
+# with them and were not written
+Commit = namedtuple("Commit", ["others", "conflicts"])
+
+# Handle to an open shared store :
+# read() reads the whole store ( JournalContents ) and makes this process up to date with it
+# commit(records) appends local changes ( Commit ), refresh() reads the records of the other planners
+# ( None like Commit.others ), compact(snapshot_source) starts a compaction when one is due and
+# close() waits for it
+SharedStore = namedtuple("SharedStore", ["read", "commit", "refresh", "compact", "close"])
+
+
+# Snapshot, journal and lock file names that belong to a tasks file
+def shared_files(filename="tasks.json"):
+    base = os.path.splitext(filename)[0]
+    return SharedFiles(base + ".shared.json", base + ".shared.journal", base + ".lock")
+
+
+# Holds the lock of the store ( other planners wait for it ), yields the open lock file
+@contextmanager
+def file_lock(path):
+    lock_file = os.open(path, os.O_RDWR | os.O_CREAT)
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(lock_file, msvcrt.LK_LOCK, 1)
+        yield lock_file
+    finally:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        else:
+            os.lseek(lock_file, 0, os.SEEK_SET)
+            msvcrt.locking(lock_file, msvcrt.LK_UNLCK, 1)
+        os.close(lock_file)
+
+
+# (snapshot sequence, floor) written in the lock file by the last compaction
+def read_lock_file(lock_file):
+    os.lseek(lock_file, 0, os.SEEK_SET)
+    values = os.read(lock_file, 64).split()
+    return (int(values[0]), int(values[1])) if values else (0, 0)
+
+
+def write_lock_file(lock_file, snapshot_sequence, floor):
+    os.lseek(lock_file, 0, os.SEEK_SET)
+    os.ftruncate(lock_file, 0)
+    os.write(lock_file, f"{snapshot_sequence} {floor}".encode())
+    os.fsync(lock_file)
+
+
+# Reads the journal records after a byte offset and the length of their lines
+# ( a line torn by a planner that crashed while appending ends them, the next commit cuts it off )
+def read_records_from(path, offset):
+    try:
+        with open(path, "rb") as file:
+            file.seek(offset)
+            data = file.read()
+    except FileNotFoundError:
+        return (), 0
+    records = []
+    position = 0
+    while True:
+        end = data.find(b"\n", position)
+        if end == -1:
+            return tuple(records), position
+        try:
+            records.append(json.loads(data[position:end]))
+        except ValueError:
+            return tuple(records), position
+        position = end + 1
+
+
+# Reads the snapshot, or the plain tasks file the first time the store is used
+def read_snapshot(files, filename):
+    try:
+        with open(files.snapshot, "r") as file:
+            snapshot = json.load(file)
+        return snapshot["sequence"], snapshot["tasks"]
+    except FileNotFoundError:
+        pass
+    try:
+        with open(filename, "r") as file:
+            return 0, json.load(file)
+    except FileNotFoundError:
+        return 0, []
+
+
+def record_task_id(record):
+    return record["task"]["id"] if record["op"] == "add" else record["id"]
+
+
+def encode_records(records):
+    return b"".join(json.dumps(record).encode() + b"\n" for record in records)
+
+
+# Opens the shared store of a tasks file
+def open_shared_store(filename="tasks.json"):
+    files = shared_files(filename)
+
+    # What this process has seen : the version ( sequence of the last record it read or wrote ), the
+    # floor of the journal and the bytes of it already read ( valid while the floor does not move )
+    lock = threading.Lock()
+    state = {"version": 0, "floor": 0, "offset": 0, "compaction": None}
+
+    @contextmanager
+    def store_lock():
+        with lock, file_lock(files.lock) as lock_file:
+            yield lock_file
+
+    # The records appended since this process last read the journal ( under the lock ), None when a
+    # compaction dropped records it has not read yet
+    def read_new_records(lock_file):
+        _, floor = read_lock_file(lock_file)
+        if floor != state["floor"]:
+            # The journal was rewritten by a compaction, it is read again from its start
+            if floor > state["version"]:
+                return None
+            state.update(floor=floor, offset=0)
+        records, length = read_records_from(files.journal, state["offset"])
+        state["offset"] += length
+        others = tuple(record for record in records if record["sequence"] > state["version"])
+        if others:
+            state["version"] = others[-1]["sequence"]
+        return others
+
+    # The snapshot is read without the lock : when a compaction moved the journal past it in the
+    # meantime, the newer snapshot is read
+    def read():
+        while True:
+            snapshot_sequence, tasks_data = read_snapshot(files, filename)
+            with store_lock() as lock_file:
+                _, floor = read_lock_file(lock_file)
+                if floor > snapshot_sequence:
+                    continue
+                records, length = read_records_from(files.journal, 0)
+                records = tuple(record for record in records if record["sequence"] > snapshot_sequence)
+                state.update(version=records[-1]["sequence"] if records else snapshot_sequence, floor=floor, offset=length)
+            return JournalContents(tuple(tasks_data), records)
+
+    def commit(records):
+        with store_lock() as lock_file:
+            others = read_new_records(lock_file)
+            if others is None:
+                return Commit(None, tuple(records))
+            changed_ids = frozenset(map(record_task_id, others))
+            conflicts = tuple(record for record in records if record["op"] != "add" and record["id"] in changed_ids)
+            written = tuple(record for record in records if record["op"] == "add" or record["id"] not in changed_ids)
+            if written:
+                first = state["version"] + 1
+                lines = encode_records({"sequence": sequence, **record} for sequence, record in zip(range(first, first + len(written)), written))
+                with open(files.journal, "ab") as file:
+                    # Cut off a line torn by a planner that crashed, so the new records are not glued to it
+                    file.truncate(state["offset"])
+                    file.write(lines)
+                    file.flush()
+                    os.fsync(file.fileno())
+                state["version"] += len(written)
+                state["offset"] += len(lines)
+            return Commit(others, conflicts)
+
+    def refresh():
+        with store_lock() as lock_file:
+            return read_new_records(lock_file)
+
+    # Writes the snapshot of a version outside of the lock, then under the lock renames it into place
+    # ( unless another planner wrote a newer one ) and drops the journal records older than the new floor
+    def run_compaction(version, snapshot_source):
+        temporary_path = f"{files.snapshot}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_path, "wb") as file:
+                file.write(json.dumps({"sequence": version, "tasks": list(snapshot_source())}).encode())
+                file.flush()
+                os.fsync(file.fileno())
+            with store_lock() as lock_file:
+                stored_sequence, _ = read_lock_file(lock_file)
+                if stored_sequence >= version:
+                    os.remove(temporary_path)
+                    return
+                os.replace(temporary_path, files.snapshot)
+                # The new floor is written first : the planners that see it read the journal from its start
+                floor = version - KEEP_RECORDS
+                write_lock_file(lock_file, version, floor)
+                records, _ = read_records_from(files.journal, 0)
+                write_atomically(files.journal, encode_records(record for record in records if record["sequence"] > floor))
+        except OSError:
+            # Nothing was lost : the journal still holds every change, compaction is retried later
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    # Starts a compaction in the background once the journal holds COMPACT_EVERY records more than it keeps
+    # snapshot_source returns the task dicts with every record this process has seen applied
+    def compact(snapshot_source):
+        version = state["version"]
+        if version - state["floor"] < COMPACT_EVERY + KEEP_RECORDS:
+            return
+        if state["compaction"] and state["compaction"].is_alive():
+            return
+        state["compaction"] = threading.Thread(target=run_compaction, args=(version, snapshot_source), daemon=True)
+        state["compaction"].start()
+
+    def close():
+        if state["compaction"]:
+            state["compaction"].join()
+
+    return SharedStore(read, commit, refresh, compact, close)
@@ -0,0 +1,169 @@
+from collections import namedtuple
+
+# Persistent (immutable) AVL tree used as a sorted secondary index
+# insert / remove never modify a node, they return a new root that shares every
+# untouched subtree with the previous version ( only the O(log n) path is rebuilt )
+
+# count is the number of equal entries stored in the node ( the index is a multiset )
+Node = namedtuple("Node", ["entry", "count", "left", "right", "height", "size"])
+
+EMPTY = None
+
+
+def height(node):
+    return node.height if node else 0
+
+
+# Number of entries in the tree ( duplicates included )
+def size(node):
+    return node.size if node else 0
+
+
+def make_node(entry, count, left, right):
+    return Node(entry, count, left, right, max(height(left), height(right)) + 1, size(left) + size(right) + count)
+
+
+def rotate_right(node):
+    left = node.left
+    return make_node(left.entry, left.count, left.left, make_node(node.entry, node.count, left.right, node.right))
+
+
+def rotate_left(node):
+    right = node.right
+    return make_node(right.entry, right.count, make_node(node.entry, node.count, node.left, right.left), right.right)
+
+
+# Builds a node and restores the AVL height invariant with at most two rotations
+def balance(entry, count, left, right):
+    difference = height(left) - height(right)
+    if difference > 1:
+        if height(left.left) < height(left.right):
+            left = rotate_left(left)
+        return rotate_right(make_node(entry, count, left, right))
+    if difference < -1:
+        if height(right.right) < height(right.left):
+            right = rotate_right(right)
+        return rotate_left(make_node(entry, count, left, right))
+    return make_node(entry, count, left, right)
+
+
+# Returns a new tree containing entry ( O(log n) )
+def insert(node, entry):
+    if node is None:
+        return make_node(entry, 1, None, None)
+    if entry < node.entry:
+        return balance(node.entry, node.count, insert(node.left, entry), node.right)
+    if node.entry < entry:
+        return balance(node.entry, node.count, node.left, insert(node.right, entry))
+    return make_node(node.entry, node.count + 1, node.left, node.right)
+
+
+# Returns a new tree without the smallest node, and that node
+def remove_min(node):
+    if node.left is None:
+        return node.right, node
+    left, smallest = remove_min(node.left)
+    return balance(node.entry, node.count, left, node.right), smallest
+
+
+# Returns a new tree with one occurrence of entry removed ( O(log n) )
+# removing an entry that is not in the tree returns the tree unchanged
+def remove(node, entry):
+    if node is None:
+        return None
+    if entry < node.entry:
+        left = remove(node.left, entry)
+        return node if left is node.left else balance(node.entry, node.count, left, node.right)
+    if node.entry < entry:
+        right = remove(node.right, entry)
+        return node if right is node.right else balance(node.entry, node.count, node.left, right)
+    if node.count > 1:
+        return make_node(node.entry, node.count - 1, node.left, node.right)
+    if node.left is None:
+        return node.right
+    if node.right is None:
+        return node.left
+    right, successor = remove_min(node.right)
+    return balance(successor.entry, successor.count, node.left, right)
+
+
+# Builds a balanced tree from already sorted entries in O(n)
+# ( equal entries may end up in separate nodes, which insert / remove / walk all accept )
+def from_sorted(entries):
+    entries = tuple(entries)
+
+    def build(low, high):
+        if low >= high:
+            return None
+        middle = (low + high) // 2
+        left = build(low, middle)
+        right = build(middle + 1, high)
+        return Node(entries[middle], 1, left, right, height(left) + 1, high - low)
+
+    return build(0, len(entries))
+
+
+# Yields the entries in sorted order ( a linear in-order walk with an explicit stack )
+def walk(node, reverse=False):
+    first, second = ("right", "left") if reverse else ("left", "right")
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = getattr(node, first)
+        node = stack.pop()
+        for _ in range(node.count):
+            yield node.entry
+        node = getattr(node, second)
+
+
+# Entry at a position of the sorted order ( O(log n), the subtree sizes are followed down )
+def entry_at(node, position):
+    while node is not None:
+        left = size(node.left)
+        if position < left:
+            node = node.left
+        elif position < left + node.count:
+            return node.entry
+        else:
+            position -= left + node.count
+            node = node.right
+    raise IndexError("index position out of range")
+
+
+# Number of entries smaller than key ( O(log n), the subtree sizes are added up on the way down )
+def rank(node, key):
+    count = 0
+    while node is not None:
+        if node.entry < key:
+            count += size(node.left) + node.count
+            node = node.right
+        else:
+            node = node.left
+    return count
+
+
+# Number of entries with low <= entry < high ( O(log n) ), a bound of None is open
+def count_range(node, low, high):
+    return max(0, (size(node) if high is None else rank(node, high)) - (0 if low is None else rank(node, low)))
+
+
+# Yields the entries with low <= entry < high in sorted order ( O(log n + k) ), a bound of None is open
+# the subtrees left of low are never entered, the walk stops at the first entry past high
+def walk_range(node, low, high):
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            if low is not None and node.entry < low:
+                node = node.right
+            else:
+                stack.append(node)
+                node = node.left
+        if not stack:
+            return
+        node = stack.pop()
+        if high is not None and not node.entry < high:
+            return
+        for _ in range(node.count):
+            yield node.entry
+        node = node.right
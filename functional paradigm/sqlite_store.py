@@ -0,0 +1,163 @@
+import json
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+from task_columns import new_task_id, with_task_id
+
+# SQLite task storage
+# each change is written as a single row ( INSERT / UPDATE / DELETE ) instead of rewriting a file,
+# and filters and sorts run as queries over indexed columns instead of scanning in Python
+# rows are found by the id of their task ( the task_id column, see task_columns )
+
+TASK_FIELDS = ("title", "description", "due_date", "priority", "status", "creation_time")
+PRIORITY_RANKS = {"High": 0, "Medium": 1, "Low": 2}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    task_id TEXT,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    due_date TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    priority_rank INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    creation_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_date, creation_time);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, due_date);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority_rank, creation_time);
+CREATE INDEX IF NOT EXISTS tasks_creation_time ON tasks (creation_time);
+"""
+
+TASK_ID_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS tasks_task_id ON tasks (task_id)"
+
+# Version of the schema ( PRAGMA user_version ) : 1 had no task ids
+SCHEMA_VERSION = 2
+
+INSERT_SQL = f"INSERT INTO tasks (task_id, {', '.join(TASK_FIELDS)}, priority_rank) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+SELECT_SQL = f"SELECT task_id, {', '.join(TASK_FIELDS)} FROM tasks"
+
+# ORDER BY clause of each sortable field ( each one is served by an index above )
+ORDER_BY = {
+    "priority": "priority_rank, creation_time",
+    "due_date": "due_date, creation_time",
+    "status": "status, creation_time",
+    "creation_time": "creation_time",
+}
+
+# Open database
+TaskStore = namedtuple("TaskStore", ["connection"])
+
+
+# Column values of a task dict ( with its id ), in the order of the INSERT statement
+def row_values(task_data):
+    return (task_data["id"],) + tuple(task_data[field] for field in TASK_FIELDS) + (PRIORITY_RANKS[task_data["priority"]],)
+
+
+# Opens ( or creates ) the database and returns the store with the stored task dicts
+# a new database is filled once from the JSON tasks file, if there is one
+def open_store(db_filename="tasks.db", json_filename="tasks.json"):
+    connection = sqlite3.connect(db_filename)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0:
+        with connection:
+            connection.executescript(SCHEMA)
+            migrate_from_json(connection, json_filename)
+    elif version == 1:
+        with connection:
+            add_task_ids(connection)
+    if version < SCHEMA_VERSION:
+        with connection:
+            connection.execute(TASK_ID_INDEX)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    mark_overdue(connection)
+    return TaskStore(connection), tuple(map(task_dict, connection.execute(SELECT_SQL + " ORDER BY id")))
+
+
+# One-shot import of an existing tasks.json, in a single transaction
+def migrate_from_json(connection, json_filename):
+    try:
+        with open(json_filename, "r") as file:
+            tasks_data = json.load(file)
+    except FileNotFoundError:
+        return
+    connection.executemany(INSERT_SQL, map(row_values, map(with_task_id, range(len(tasks_data)), tasks_data)))
+
+
+# The rows of a database made before tasks had ids get new ids
+def add_task_ids(connection):
+    connection.execute("ALTER TABLE tasks ADD COLUMN task_id TEXT")
+    row_ids = tuple(row["id"] for row in connection.execute("SELECT id FROM tasks"))
+    connection.executemany("UPDATE tasks SET task_id = ? WHERE id = ?", ((new_task_id(), row_id) for row_id in row_ids))
+
+
+# Task dict of a row ( without the columns that only exist for the indexes )
+def task_dict(row):
+    return {"id": row["task_id"], **{field: row[field] for field in TASK_FIELDS}}
+
+
+# Applies the overdue rule in the database : pending tasks whose due date passed become overdue
+def mark_overdue(connection):
+    with connection:
+        connection.execute(
+            "UPDATE tasks SET status = 'Overdue' WHERE status = 'Pending' AND due_date < ?",
+            (datetime.now().strftime("%Y-%m-%d"),),
+        )
+
+
+# Writes a batch of changes ( journal style records ) in one transaction
+def apply_changes(store, changes):
+    with store.connection:
+        for change in changes:
+            write_change(store.connection, change)
+
+
+# Writes one change as a single row operation
+def write_change(connection, change):
+    if change["op"] == "add":
+        connection.execute(INSERT_SQL, row_values(change["task"]))
+    elif change["op"] == "update":
+        changes = {field: value for field, value in change["changes"].items() if field in TASK_FIELDS}
+        if "priority" in changes:
+            changes["priority_rank"] = PRIORITY_RANKS[changes["priority"]]
+        if changes:
+            assignments = ", ".join(f"{field} = ?" for field in changes)
+            connection.execute(f"UPDATE tasks SET {assignments} WHERE task_id = ?", (*changes.values(), change["id"]))
+    elif change["op"] == "delete":
+        connection.execute("DELETE FROM tasks WHERE task_id = ?", (change["id"],))
+    else:
+        raise ValueError(f"Unknown change: {change['op']}")
+
+
+# Filters and sorts in the database ( dates are datetime objects, like the filter criteria use )
+def query_tasks(store, priority=None, status=None, start_date=None, end_date=None, order_by=None):
+    conditions = []
+    parameters = []
+    if priority:
+        conditions.append("priority_rank = ?")
+        parameters.append(PRIORITY_RANKS[priority])
+    if status:
+        conditions.append("status = ?")
+        parameters.append(status)
+    if start_date:
+        conditions.append("due_date >= ?")
+        parameters.append(start_date.strftime("%Y-%m-%d"))
+    if end_date:
+        conditions.append("due_date <= ?")
+        parameters.append(end_date.strftime("%Y-%m-%d"))
+
+    mark_overdue(store.connection)
+    sql = SELECT_SQL
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY " + (ORDER_BY[order_by] if order_by else "id")
+    return tuple(task_dict(row) for row in store.connection.execute(sql, parameters))
+
+
+def close_store(store):
+    store.connection.close()
@@ -1,230 +1,141 @@
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
-from tkcalendar import Calendar
-from datetime import datetime, timedelta
-from collections import namedtuple
-import json
-
-# Immutable Task Representation as Tuple
-Task = namedtuple("Task", ["title", "description", "due_date", "priority", "status", "creation_time", "highlight"])
-
-####### functionality Functions :
-
-# Adds a new task to the tasks tuple
-def add_task(tasks, task_data):
-    new_task = Task(**task_data)
-    return tasks + (new_task,)
-
-# Updates a task at a specific index
-def update_task(tasks, index, updates):
-    updated_task = tasks[index]._replace(**updates)
-    return tasks[:index] + (updated_task,) + tasks[index + 1:]
-
-# Deletes a task from the tasks tuple
-def delete_task(tasks, index):
-    return tasks[:index] + tasks[index + 1:]
-
-# Sort tasks using a higher-order approach ( Genericity )
-# using quick-sort algorithm , It splits tasks into tasks <= pivot  and tasks > pivot
-def sort_tasks(tasks, key_function):
-    if not tasks:
-        return tasks
-    pivot, *rest = tasks
-    pivot_value = key_function(pivot)
-
-    # Recursive filter function
-    def filter_tasks(tasks, predicate):
-        if not tasks:
-            return []
-        task = tasks[0]
-        rest = tasks[1:]
-        if predicate(task):
-            return [task] + filter_tasks(rest, predicate)
-        return filter_tasks(rest, predicate)
-
-    less = filter_tasks(rest, lambda task: key_function(task) <= pivot_value)
-    greater = filter_tasks(rest, lambda task: key_function(task) > pivot_value)
-    return sort_tasks(less, key_function) + [pivot] + sort_tasks(greater, key_function)
-
-# Key function for sorting by priority
-def priority_key(task):
-    priority_order = {"Low": 2, "Medium": 1, "High": 0}
-    return priority_order[task.priority]
-
-# Key function for sorting by due date
-def due_date_key(task):
-    return datetime.strptime(task.due_date, "%Y-%m-%d")
-
-#Key function for sorting by creation time
-def creation_time_key(task):
-    return datetime.strptime(task.creation_time, "%Y-%m-%d %H:%M:%S")
-
-# Key function for sorting by status
-def status_key(task):
-    return task.status
-
-#filter tasks using a higher-order approach ( Genericity )
-def filter_tasks(tasks, *criteria_functions):
-
-    # Recursive filtering function
-    def filter_recursive(tasks, filtered_tasks):
-        if not tasks:
-            return filtered_tasks
-        task = tasks[0]
-        rest = tasks[1:]
-
-        # Check if the task matches all criteria
-        def matches(task, criteria_index=0):
-            if criteria_index == len(criteria_functions):
-                return True
-            return criteria_functions[criteria_index](task) and matches(task, criteria_index + 1)
-
-        if matches(task):
-            return filter_recursive(rest, filtered_tasks + (task,))
-        return filter_recursive(rest, filtered_tasks)
-
-    return filter_recursive(tasks, ())
-
-# Criteria for priority
-def priority_criteria(priority):
-    return lambda task: task.priority == priority
-
-# Criteria for status
-def status_criteria(status):
-    return lambda task: task.status == status
-
-# Criteria for start date
-def start_date_criteria(start_date):
-    return lambda task: datetime.strptime(task.due_date, "%Y-%m-%d") >= start_date
-
-# Criteria for end date
-def end_date_criteria(end_date):
-    return lambda task: datetime.strptime(task.due_date, "%Y-%m-%d") <= end_date
-
-
-# Saves tasks to a JSON file
-def save_tasks_to_file(tasks, filename="tasks.json"):
-
-    # Recursive function to accumulate tasks
-    def save_recursive(tasks, accumulated_tasks):
-        if not tasks:
-            with open(filename, "w") as file:
-                json.dump(accumulated_tasks, file, indent=4)
-            return
-        task = tasks[0]
-        rest = tasks[1:]
-        save_recursive(rest, accumulated_tasks + [task._asdict()])
-
-    save_recursive(tasks, [])
-
-# Loads tasks from a JSON file
-def load_tasks_from_file(filename="tasks.json"):
-    try:
-        with open(filename, "r") as file:
-
-            # Recursive function to convert JSON data into Task objects
-            def load_recursive(tasks_data, loaded_tasks):
-                if not tasks_data:
-                    return tuple(loaded_tasks)
-                task_data = tasks_data[0]
-                rest = tasks_data[1:]
-                # Create Task object and recurse
-                task = Task(
-                    title=task_data["title"],
-                    description=task_data["description"],
-                    due_date=task_data["due_date"],
-                    priority=task_data["priority"],
-                    status=task_data["status"],
-                    creation_time=task_data["creation_time"],
-                    highlight=task_data.get("highlight", False)
-                )
-                return load_recursive(rest, loaded_tasks + [task])
-
-            return load_recursive(json.load(file), [])
-    except FileNotFoundError:
-        return ()
-
-
-# Function to update task highlighting based on due dates and status
-def check_task_highlighting(tasks):
-    today = datetime.now().date()
-
-    # Return an updated task based on highlighting rules
-    def highlight_task(task):
-        due_date = datetime.strptime(task.due_date, "%Y-%m-%d").date()
-        status = task.status
-        highlight = False
-        if due_date < today and status == "Pending":
-            status = "Overdue"
-            highlight = True
-        elif today <= due_date <= today + timedelta(days=2) and status == "Pending":
-            highlight = True
-        # Return a new task (updated copy)
-        return Task(
-            title=task.title,
-            description=task.description,
-            due_date=task.due_date,
-            priority=task.priority,
-            status=status,
-            highlight=highlight,
-            creation_time=task.creation_time,
-        )
-
-    # Recursive processing of tasks to update highlights
-    def process_tasks(tasks, processed_tasks=()):
-        if not tasks:
-            return processed_tasks
-        return process_tasks(tasks[1:], processed_tasks + (highlight_task(tasks[0]),))
-    return process_tasks(tasks)
-
+from datetime import datetime
+from functools import partial
+from itertools import repeat
+import deadlines
+import edit_history
+import highlight
+import metrics
+import notifications
+import recurrence
+import save_worker
+import tree_render
+from task_engine import (
+    PAGE_SIZE,
+    STORAGE_MODE,
+    TaskView,
+    add_recurring_task,
+    add_task,
+    apply_journal_record,
+    check_highlighting_at,
+    check_task_highlighting,
+    complete_occurrence,
+    deadline_transitions,
+    delete_recurring_task,
+    delete_task,
+    inverse_change,
+    load_recurring_tasks,
+    merge_saves,
+    next_tasks,
+    open_storage,
+    query_occurrences,
+    query_tasks,
+    save_recurring_tasks,
+    shown_occurrences,
+    slot_list,
+    task_id_position,
+    task_position,
+    update_task,
+)
+from task_columns import new_task_id
+
+# The window of the task planner; the tasks themselves are handled by the headless task_engine
+# ( the calendar widget is only imported when a dialog needs it )
+
+# The task list keeps a Treeview row for every task ( False ), or only rows for the tasks in view
+# and a scrollbar that moves them over the list ( True, for very large task files )
+VIRTUAL_SCROLL = False
+
+# Height of a Treeview row in pixels ( set in the style, so the rows in view can be counted )
+ROW_HEIGHT = 22
+
+# Milliseconds between two looks at the changes other planners saved ( shared storage mode )
+SYNC_INTERVAL = 2000
+
+# Number of tasks the "Next up" panel shows ( the most urgent ones, see scheduler )
+NEXT_UP_COUNT = 5
+
+# Choices of the Repeat box of the Add Task dialog and their recurrence rules ( see recurrence )
+REPEAT_RULES = {"Never": None, "Daily": "FREQ=DAILY", "Weekly": "FREQ=WEEKLY", "Monthly": "FREQ=MONTHLY"}
 
 ####### GUI Functions :
 
-# Update the GUI Treeview with the task Tuple
-def update_task_list(tree, tasks):
-    updated_tasks = check_task_highlighting(tasks)
+# Text of the save status line, after a write finished
+def save_status(result, outstanding):
+    if result.error is not None:
+        return f"Saving failed: {result.error}"
+    return "Saving..." if outstanding else "All changes saved"
 
-    # Recursively clear rows from the Treeview
-    def clear_tree(rows):
-        if not rows:
-            return
-        tree.delete(rows[0])
-        clear_tree(rows[1:])
-
-    clear_tree(tree.get_children())
-
-    # Recursively insert tasks into the Treeview
-    def insert_tasks(tasks):
-        if not tasks:
-            return
-        task = tasks[0]
-        color = (
-            "yellow" if task.highlight and task.status != "Overdue"
-            else "red" if task.status == "Overdue"
-            else "black"
-        )
-        tree.insert(
-            "",
-            "end",
-            values=(task.title, task.description, task.due_date, task.priority, task.status),
-            tags=(
-                "highlight" if task.highlight and task.status != "Overdue"
-                else "overdue" if task.status == "Overdue"
-                else "normal"
-            ),
+# Update the GUI Treeview with the task Tuple
+# tasks from the collection already hold their highlighting ( kept up to date by the deadline
+# schedule in main ), the rules are only applied to plain tasks such as database query results
+# rendered is what the Treeview shows now ( see tree_render ), only the rows that differ are sent
+# to Tk; window = (first, last) limits the rows to the ones in view ( virtual scroll mode ) or to
+# the pages shown so far
+# returns the tasks shown and the new rendering
+@metrics.timed("update_task_list")
+def update_task_list(tree, tasks, rendered=tree_render.NOTHING, window=None):
+    updated_tasks = tasks if isinstance(tasks, TaskView) else check_task_highlighting(tasks)
+    columns = updated_tasks.columns
+    if window is None:
+        slots = slot_list(updated_tasks)
+    else:
+        slots = tuple(map(updated_tasks.slots.__getitem__, range(*window)))
+
+    # A row is keyed by the id of its task; a changed task has a new slot, so the slot tells whether the
+    # row has to be drawn again ( rows of other columns, such as query results, are always drawn again )
+    keys = tuple(map(columns.ids.__getitem__, slots))
+    tokens = dict(zip(keys, zip(repeat(columns), slots)))
+
+    # Values and highlight tag of the rows at some positions, only asked for the rows that changed
+    def rows(positions):
+        row_slots = tuple(map(slots.__getitem__, positions))
+        states = highlight.display_states(columns, row_slots)
+        return tuple(
+            (columns.row(slot)[:5], (highlight.STATE_TAGS[state],))
+            for slot, state in zip(row_slots, states)
         )
-        insert_tasks(tasks[1:])
 
-    insert_tasks(updated_tasks)
+    return updated_tasks, tree_render.render(tree, rendered, tree_render.Rendered(keys, tokens), rows)
+
+# Shows the most urgent tasks of the collection in the "Next up" Listbox ( read from the urgency
+# queue the collection keeps up to date, the tasks are not sorted )
+def update_next_up(listbox, tasks):
+    listbox.delete(0, tk.END)
+    for task in next_tasks(tasks, NEXT_UP_COUNT):
+        listbox.insert(tk.END, f"{task.title}  ( due {task.due_date}, {task.priority} )")
+
+# Shows the occurrences of the recurring tasks due around today that match the search text
+# ( only those days are expanded ), a row is keyed by the id of its occurrence
+def update_occurrences(tree, recurring, text=None):
+    tree.delete(*tree.get_children())
+    occurrences = shown_occurrences(recurring, text)
+    columns = occurrences.columns
+    slots = slot_list(occurrences)
+    for slot, state in zip(slots, highlight.display_states(columns, slots)):
+        tree.insert("", "end", iid=columns.ids[slot], values=columns.row(slot)[:5], tags=(highlight.STATE_TAGS[state],))
+
+# Queues a notification for each task at some positions that is due soon or overdue ( None : every
+# task; a task is only notified once of each transition, see notifications )
+def notify_deadlines(notifier, tasks, positions=None):
+    for task_id, transition, title, due_date in deadline_transitions(tasks, positions):
+        notifier.notify(task_id, transition, title, due_date)
+
+# Colors of the highlight tags ( configured once, when the Treeview is created )
+def configure_tags(tree):
     tree.tag_configure("highlight", background="yellow")
     tree.tag_configure("overdue", background="red", foreground="white")
     tree.tag_configure("normal", background="white", foreground="black")
-    return updated_tasks
 
 
 # Open a GUI dialog to add a new task
-def add_task_gui(root, tree, tasks):
+# on_change receives the new task collection and the change ( a journal record ) to show and persist,
+# on_recurring the new recurring task definitions when a Repeat rule is chosen
+def add_task_gui(root, tree, tasks, on_change, recurring=(), on_recurring=None):
+
+    from tkcalendar import Calendar     # only loaded once a dialog needs it
 
     dialog = tk.Toplevel(root)
     dialog.title("Add Task")
@@ -245,6 +156,12 @@ def add_task_gui(root, tree, tasks):
     priority_combobox = ttk.Combobox(dialog, values=["Low", "Medium", "High"], state="readonly")
     priority_combobox.grid(row=3, column=1, padx=10, pady=5)
 
+    # A repeating task is stored once, its occurrences are worked out for the days shown
+    tk.Label(dialog, text="Repeat:").grid(row=4, column=0, padx=10, pady=5)
+    repeat_combobox = ttk.Combobox(dialog, values=list(REPEAT_RULES), state="readonly")
+    repeat_combobox.grid(row=4, column=1, padx=10, pady=5)
+    repeat_combobox.set("Never")
+
     # handles add task logic
     def save_task():
         # Validation of Inputs
@@ -270,7 +187,6 @@ def add_task_gui(root, tree, tasks):
                 return
             status = "Overdue"
             highlight = True
-            messagebox.showwarning("Overdue Tasks", f"The following tasks are overdue: {title_entry.get()}")
         task_data = {
             "title": title_entry.get(),
             "description": description_entry.get(),
@@ -279,23 +195,31 @@ def add_task_gui(root, tree, tasks):
             "status": status,
             "creation_time": creation_time,
             "highlight": highlight,
+            "id": new_task_id(),
         }
+        rule = REPEAT_RULES[repeat_combobox.get()]
+        if rule is not None and on_recurring is not None:
+            on_recurring(add_recurring_task(recurring, task_data, rule))
+            dialog.destroy()
+            return
         new_tasks = add_task(tasks, task_data)
-        update_task_list(tree, new_tasks)
-        save_tasks_to_file(new_tasks)
+        on_change(new_tasks, {"op": "add", "task": task_data})
         dialog.destroy()
 
-    tk.Button(dialog, text="Save", command=save_task).grid(row=4, column=0, columnspan=2, pady=10)
+    tk.Button(dialog, text="Save", command=save_task).grid(row=5, column=0, columnspan=2, pady=10)
     return tasks
 
 # let the user update task
-def update_task_gui(root, tree, tasks):
+# row_position, when given, returns the position in tasks of the task shown by a Treeview row
+def update_task_gui(root, tree, tasks, on_change, row_position=None):
     selected_item = tree.selection()
     if not selected_item:
         messagebox.showwarning("Select Task", "Please select a task to update.")
         return tasks
 
-    selected_index = tree.index(selected_item[0])
+    selected_index = row_position(selected_item[0]) if row_position else tree.index(selected_item[0])
+    if selected_index is None:
+        return tasks
     task = tasks[selected_index]
 
     dialog = tk.Toplevel(root)
@@ -319,8 +243,7 @@ def update_task_gui(root, tree, tasks):
         updates["priority"] = priority_combobox.get()
 
         new_tasks = update_task(tasks, selected_index, updates)
-        update_task_list(tree, new_tasks)
-        save_tasks_to_file(new_tasks)
+        on_change(new_tasks, {"op": "update", "id": task.id, "changes": updates})
         dialog.destroy()
 
     tk.Button(dialog, text="Save", command=save_update).grid(row=2, column=0, columnspan=2, pady=10)
@@ -328,39 +251,60 @@ def update_task_gui(root, tree, tasks):
     return tasks
 
 # let the user delete task
-def delete_task_gui(tree, tasks):
+def delete_task_gui(tree, tasks, on_change, row_position=None):
     selected_item = tree.selection()
     if not selected_item:
         messagebox.showwarning("Select Task", "Please select a task to delete.")
         return tasks
 
-    selected_index = tree.index(selected_item[0])
+    selected_index = row_position(selected_item[0]) if row_position else tree.index(selected_item[0])
+    if selected_index is None:
+        return tasks
     task = tasks[selected_index]
     if messagebox.askyesno("Delete Task", f"Are you sure you want to delete task '{task.title}'?"):
         new_tasks = delete_task(tasks, selected_index)
-        update_task_list(tree, new_tasks)
-        save_tasks_to_file(new_tasks)
+        on_change(new_tasks, {"op": "delete", "id": task.id})
         return new_tasks
     return tasks
 
-# opens the overdue tasks window
-def show_overdue_tasks(tasks):
-
-    # Recursive function to filter overdue tasks
-    def filter_overdue_tasks(tasks, overdue_tasks):
-        if not tasks:
-            return overdue_tasks
-        task = tasks[0]
-        rest = tasks[1:]
-        if task.status == "Overdue":
-            overdue_tasks.append(task)
-        return filter_overdue_tasks(rest, overdue_tasks)
-
-    overdue_tasks = filter_overdue_tasks(tasks, [])
+# Id of the occurrence of the selected row of the recurring tasks list
+def selected_occurrence_id(occurrence_tree):
+    selected_item = occurrence_tree.selection()
+    if not selected_item:
+        messagebox.showwarning("Select Occurrence", "Please select an occurrence of a recurring task.")
+        return None
+    return selected_item[0]
+
+# Marks the selected occurrence as completed, on_recurring receives the new definitions
+def complete_occurrence_gui(occurrence_tree, recurring, on_recurring):
+    occurrence_id = selected_occurrence_id(occurrence_tree)
+    if occurrence_id is None:
+        return recurring
+    new_recurring = complete_occurrence(recurring, occurrence_id)
+    on_recurring(new_recurring)
+    return new_recurring
+
+# Deletes the recurring task of the selected occurrence ( every occurrence of it )
+def delete_series_gui(occurrence_tree, recurring, on_recurring):
+    occurrence_id = selected_occurrence_id(occurrence_tree)
+    if occurrence_id is None:
+        return recurring
+    definition_id, _ = recurrence.split_occurrence_id(occurrence_id)
+    title = next(definition.title for definition in recurring if definition.id == definition_id)
+    if messagebox.askyesno("Delete Recurring Task", f"Are you sure you want to delete every occurrence of '{title}'?"):
+        new_recurring = delete_recurring_task(recurring, definition_id)
+        on_recurring(new_recurring)
+        return new_recurring
+    return recurring
+
+# opens the overdue tasks window ( from the notification toast )
+def show_overdue_tasks(root, tasks):
+    # One pass over the tasks ( a recursion per task ran out of stack on large task files )
+    overdue_tasks = tuple(task for task in tasks if task.status == "Overdue")
     if not overdue_tasks:
         return
 
-    dialog = tk.Toplevel()
+    dialog = tk.Toplevel(root)
     dialog.title("Overdue Tasks")
 
     tree = ttk.Treeview(dialog, columns=("Title", "Description", "Due Date", "Priority", "Status"), show="headings")
@@ -370,19 +314,13 @@ def show_overdue_tasks(tasks):
     tree.heading("Priority", text="Priority")
     tree.heading("Status", text="Status")
     tree.pack(fill=tk.BOTH, expand=True)
-
-    # Recursive function to insert overdue tasks into the Treeview
-    def insert_task_recursive(tasks, index=0):
-        if index >= len(tasks):
-            return
-        task = tasks[index]
-        tree.insert("", "end", values=(task.title, task.description, task.due_date, task.priority, task.status))
-        insert_task_recursive(tasks, index + 1)
-
-    insert_task_recursive(overdue_tasks)
+    insert_task_rows(tree, overdue_tasks)
 
 # opens the filter tasks window
-def filter_tasks_gui(root, tree, tasks):
+# query is the filter function of the storage in use ( see open_storage )
+def filter_tasks_gui(root, tree, tasks, query=query_tasks):
+    from tkcalendar import Calendar
+
     dialog = tk.Toplevel(root)
     dialog.title("Filter Tasks")
 
@@ -422,18 +360,8 @@ def filter_tasks_gui(root, tree, tasks):
             start_date = datetime.strptime(start_date_cal.get_date(), "%Y-%m-%d")
             end_date = datetime.strptime(end_date_cal.get_date(), "%Y-%m-%d")
 
-        criteria_functions = []
-        if priority:
-            criteria_functions.append(priority_criteria(priority))
-        if status:
-            criteria_functions.append(status_criteria(status))
-        if start_date:
-            criteria_functions.append(start_date_criteria(start_date))
-        if end_date:
-            criteria_functions.append(end_date_criteria(end_date))
-
-        # Apply the filter with the dynamic criteria functions
-        filtered_tasks = filter_tasks(tasks, *criteria_functions)
+        # Apply the filter ( in memory with the criteria functions, or as a database query )
+        filtered_tasks = query(tasks, priority=priority, status=status, start_date=start_date, end_date=end_date)
 
         # Update the UI with filtered tasks
         show_filtered_tasks(filtered_tasks)
@@ -453,22 +381,44 @@ def show_filtered_tasks(filtered_tasks):
     tree.heading("Priority", text="Priority")
     tree.heading("Status", text="Status")
     tree.pack(fill=tk.BOTH, expand=True)
+    insert_task_rows(tree, filtered_tasks)
 
-    # Recursive function to insert tasks into the Treeview
-    def insert_task_recursive(tasks, index=0):
-        if index >= len(tasks):
-            return
-        task = tasks[index]
+# Inserts a row for each task into the Treeview of a results window
+def insert_task_rows(tree, tasks):
+    for task in tasks:
         tree.insert("", "end", values=(task.title, task.description, task.due_date, task.priority, task.status))
-        insert_task_recursive(tasks, index + 1)
 
-    insert_task_recursive(filtered_tasks)
+# Rows of the stats window : the spans ( times in ms ), then the counters and gauges
+def stats_rows(span_summaries, event_values):
+    return tuple(
+        (name, calls, f"{mean * 1000:.2f}", f"{percentile * 1000:.2f}", f"{longest * 1000:.2f}")
+        for name, calls, mean, percentile, longest in span_summaries
+    ) + tuple((name, value, "", "", "") for name, value in event_values)
 
+# Window with the instrumentation numbers ( see metrics ), the Refresh button reads them again
+def show_stats_window(root):
+    dialog = tk.Toplevel(root)
+    dialog.title("Statistics")
+
+    tree = ttk.Treeview(dialog, columns=("Metric", "Calls", "Mean (ms)", "95% (ms)", "Max (ms)"), show="headings")
+    tree.heading("Metric", text="Metric")
+    tree.heading("Calls", text="Calls / Value")
+    tree.heading("Mean (ms)", text="Mean (ms)")
+    tree.heading("95% (ms)", text="95% (ms)")
+    tree.heading("Max (ms)", text="Max (ms)")
+    tree.pack(fill=tk.BOTH, expand=True)
+
+    def fill():
+        tree.delete(*tree.get_children())
+        for row in stats_rows(metrics.span_summaries(), metrics.event_values()):
+            tree.insert("", "end", values=row)
 
+    fill()
+    tk.Button(dialog, text="Refresh", command=fill).pack(pady=5)
 
-def main():
-    tasks = load_tasks_from_file()     # Load the tasks from a JSON file
 
+# Opens the window on the tasks stored in filename with a storage mode
+def main(mode=STORAGE_MODE, filename="tasks.json"):
     root = tk.Tk()
     root.title("Task Manager")
 
@@ -479,7 +429,8 @@ def main():
     style.configure("Treeview",
     background="#F0F0F0",              # Light gray background for rows
     foreground="#001A6E",              # dark blue font color for rows
-    font=("Arial", 10))                # font of the table content
+    font=("Arial", 10),                # font of the table content
+    rowheight=ROW_HEIGHT)
 
     # Change the header look ( first row )
     style.configure("Treeview.Heading",
@@ -497,10 +448,249 @@ def main():
     tree.heading("Due Date", text="Due Date")
     tree.heading("Priority", text="Priority")
     tree.heading("Status", text="Status")
+    configure_tags(tree)
+
+    # Search box above the task list ( the list shows the matching tasks as the text is typed )
+    search_frame = tk.Frame(root)
+    search_frame.pack(fill=tk.X, padx=10, pady=5)
+    tk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+    search_text = tk.StringVar()
+    tk.Entry(search_frame, textvariable=search_text).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+    # In virtual scroll mode the Treeview only holds the rows in view, the scrollbar moves them
+    if VIRTUAL_SCROLL:
+        scrollbar = ttk.Scrollbar(root, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     tree.pack(fill=tk.BOTH, expand=True)
 
-    tasks = update_task_list(tree, tasks)
-    show_overdue_tasks(tasks)
+    # What the Treeview shows : the tasks ( the collection, a sorted view or a query result ),
+    # the rows it holds ( see tree_render ), the first of them ( virtual scroll mode ) or the number
+    # of rows of the pages shown so far ( otherwise )
+    state = {"shown": (), "rendered": tree_render.NOTHING, "offset": 0, "limit": PAGE_SIZE, "search": "", "history": edit_history.EMPTY_HISTORY}
+
+    # Shows tasks in the Treeview, only the rows that changed are touched, returns the tasks shown
+    # a sorted view only puts the rows of the window in order ( see task_engine.sorted_pages )
+    def show(tasks):
+        if VIRTUAL_SCROLL:
+            rows = tree_render.visible_rows(tree, ROW_HEIGHT)
+            state["offset"] = tree_render.clamp_offset(state["offset"], rows, len(tasks))
+            window = (state["offset"], min(state["offset"] + rows, len(tasks)))
+            scrollbar.set(*tree_render.scrollbar_fractions(state["offset"], rows, len(tasks)))
+        else:
+            window = (0, min(state["limit"], len(tasks)))
+        state["shown"], state["rendered"] = update_task_list(tree, tasks, state["rendered"], window)
+        return state["shown"]
+
+    # Shows tasks from their first row ( a new order or search )
+    def show_from_top(tasks):
+        state["offset"] = 0
+        state["limit"] = PAGE_SIZE
+        return show(tasks)
+
+    # The tasks that match the search box ( all of them when it is empty )
+    def searched(tasks):
+        return query_tasks(tasks, text=state["search"]) if state["search"] else tasks
+
+    def on_search(*_):
+        state["search"] = search_text.get()
+        show_from_top(searched(state["tasks"]))
+        update_occurrences(occurrence_tree, state["recurring"], state["search"])
+
+    search_text.trace_add("write", on_search)
+
+    # Position in the collection of the task a Treeview row shows ( rows are keyed by task id )
+    def row_position(item):
+        return task_id_position(state["tasks"], item)
+
+    # Moves the window of rows in view ( virtual scroll mode )
+    def scroll_to(offset):
+        if offset != state["offset"]:
+            state["offset"] = offset
+            show(state["shown"])
+
+    if VIRTUAL_SCROLL:
+        visible = lambda: tree_render.visible_rows(tree, ROW_HEIGHT)
+        scrollbar.configure(command=lambda *command: scroll_to(tree_render.scrolled_offset(state["offset"], visible(), len(state["shown"]), *command)))
+        wheel = lambda event: scroll_to(tree_render.wheel_offset(state["offset"], visible(), len(state["shown"]), event))
+        tree.bind("<MouseWheel>", wheel)
+        tree.bind("<Button-4>", wheel)
+        tree.bind("<Button-5>", wheel)
+        tree.bind("<Configure>", lambda event: show(state["shown"]))
+    else:
+        # The next page of the list is shown once its last row is scrolled into view
+        def scrolled(first, last):
+            limit = tree_render.paged_limit(state["limit"], len(state["shown"]), last, PAGE_SIZE)
+            if limit != state["limit"]:
+                state["limit"] = limit
+                show(state["shown"])
+
+        tree.configure(yscrollcommand=scrolled)
+
+    # Show the first screenful of a large tasks file while the rest of it is being read
+    def preview(first_tasks):
+        show(first_tasks)
+        root.update()
+
+    storage = open_storage(mode, filename, preview)     # Load the tasks with the configured storage mode
+
+    # Saves run on a background writer, so a slow disk never blocks the GUI; the edits made while
+    # a write is in progress are saved together by the next one ( the database and the shared store
+    # are written right away instead : the queries must see every change, and the shared store
+    # answers each write with the changes of the other planners )
+    status_label = tk.Label(root, text="", anchor="w")
+    status_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+
+    # Deadline notifications are queued and sent in batches, never in a modal box : a toast in the
+    # window ( click it for the overdue tasks ) and the sinks TASK_PLANNER_NOTIFY lists ( see notifications )
+    toast_label = tk.Label(root, text="", anchor="w", justify=tk.LEFT, bg="#FFF3B0", cursor="hand2")
+    toast_label.bind("<Button-1>", lambda event: show_overdue_tasks(root, state["tasks"]))
+    notifier = notifications.start_notifier(
+        root,
+        notifications.make_sinks(notifications.NOTIFY_SINKS, toast_label),
+        on_error=lambda error: status_label.configure(text=f"Notifications could not be sent: {error}"),
+    )
+
+    # The most urgent tasks, refreshed whenever the collection changes
+    next_up_frame = tk.Frame(root)
+    next_up_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+    tk.Label(next_up_frame, text="Next up:", anchor="w").pack(fill=tk.X)
+    next_up_list = tk.Listbox(next_up_frame, height=NEXT_UP_COUNT)
+    next_up_list.pack(fill=tk.X)
+
+    # The occurrences of the recurring tasks due in the days around today
+    occurrence_frame = tk.Frame(root)
+    occurrence_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+    tk.Label(occurrence_frame, text="Recurring tasks:", anchor="w").pack(fill=tk.X)
+    occurrence_tree = ttk.Treeview(occurrence_frame, columns=("Title", "Description", "Due Date", "Priority", "Status"), show="headings", height=6)
+    for column in ("Title", "Description", "Due Date", "Priority", "Status"):
+        occurrence_tree.heading(column, text=column)
+    configure_tags(occurrence_tree)
+    occurrence_tree.pack(fill=tk.X)
+
+    def on_saved(result, outstanding):
+        status_label.configure(text=save_status(result, outstanding))
+        if result.error is not None:
+            messagebox.showerror("Save Error", f"The tasks could not be saved: {result.error}")
+
+    writer = None
+    if mode not in ("sqlite", "shared"):
+        writer = save_worker.start_writer(root, lambda job: storage.save(*job), merge_saves, on_saved)
+
+    def save(tasks, change):
+        if storage.sync is not None:
+            show_synced(storage.save(tasks, (change,)))
+            return
+        if writer is None:
+            storage.save(tasks, (change,))
+            return
+        status_label.configure(text="Saving...")
+        writer.submit((tasks, (change,)))
+
+    # The current task collection; each edit swaps in the new immutable version it produced
+    # the highlighting rules run over every task once, then only when a deadline transition comes
+    tasks = check_task_highlighting(storage.tasks)
+    state["tasks"] = tasks
+    show(searched(tasks))
+    # The urgency queue is built by the first fill, once the task list is up
+    root.after_idle(lambda: update_next_up(next_up_list, state["tasks"]))
+    state["schedule"] = deadlines.build_schedule(tasks.columns, slot_list(tasks), deadlines.current_day())
+    # The tasks are looked at for the first notifications once the task list is up
+    root.after_idle(lambda: notify_deadlines(notifier, state["tasks"]))
+
+    # The recurring task definitions, kept in their own file whatever the storage mode
+    state["recurring"] = load_recurring_tasks(filename)
+    update_occurrences(occurrence_tree, state["recurring"], state["search"])
+
+    # Shows and persists new recurring task definitions ( the file is small, it is written right away )
+    def set_recurring(new_recurring):
+        state["recurring"] = new_recurring
+        update_occurrences(occurrence_tree, new_recurring, state["search"])
+        try:
+            save_recurring_tasks(new_recurring, filename)
+        except OSError as error:
+            messagebox.showerror("Save Error", f"The recurring tasks could not be saved: {error}")
+
+    # Shows the tasks merged with the changes of the other planners ( shared mode ); the rules are
+    # applied to every task again, as the tasks may have been read again
+    def show_synced(synced):
+        if synced.conflicts:
+            messagebox.showwarning("Task Changed", "Another planner changed this task, the tasks were loaded again and the change was not saved")
+        if synced.tasks is not state["tasks"]:
+            state["tasks"] = check_task_highlighting(synced.tasks)
+            state["schedule"] = deadlines.build_schedule(state["tasks"].columns, slot_list(state["tasks"]), deadlines.current_day())
+            show(searched(state["tasks"]))
+            update_next_up(next_up_list, state["tasks"])
+            notify_deadlines(notifier, state["tasks"])
+
+    # Shows and persists the version of the tasks a change made ( new_tasks is None for a change to
+    # apply to the current tasks ); the rules are applied to the added or updated task only. Returns
+    # the change that undoes it, for the history ( None when the change could not be applied )
+    def apply_change(new_tasks, change):
+        previous = state["tasks"]
+        if new_tasks is None or storage.sync is not None:
+            # A dialog may have been opened before a sync brought in the changes of other planners,
+            # so the change is applied to the current tasks
+            try:
+                new_tasks = apply_journal_record(previous, change)
+            except ValueError:
+                messagebox.showwarning("Task Changed", "Another planner deleted this task")
+                return None
+            if change["op"] == "add" and task_id_position(previous, change["task"]["id"]) is not None:
+                # The id was taken meanwhile, the task got a new one and went last
+                change = {**change, "task": {**change["task"], "id": new_tasks[-1].id}}
+        position = None if change["op"] == "delete" else task_id_position(new_tasks, change["task"]["id"] if change["op"] == "add" else change["id"])
+        if change["op"] != "delete":
+            new_tasks = check_highlighting_at(new_tasks, (position,))
+            state["schedule"] = deadlines.schedule_task(state["schedule"], new_tasks.columns, new_tasks.slots[position], deadlines.current_day())
+        state["tasks"] = new_tasks
+        show(searched(new_tasks))
+        update_next_up(next_up_list, new_tasks)
+        if change["op"] != "delete":
+            notify_deadlines(notifier, new_tasks, (position,))
+        save(new_tasks, change)
+        return inverse_change(previous, change)
+
+    # An edit made in a dialog, kept in the undo history
+    def set_tasks(new_tasks, change):
+        undo_change = apply_change(new_tasks, change)
+        if undo_change is not None:
+            state["history"] = edit_history.record(state["history"], undo_change)
+
+    # Undo applies the change that undoes the last edit to the current tasks, redo the one that makes
+    # it again; it is saved like an edit ( see edit_history )
+    def undo():
+        if state["history"].undo:
+            state["history"] = edit_history.undone(state["history"], apply_change(None, state["history"].undo[-1]))
+
+    def redo():
+        if state["history"].redo:
+            state["history"] = edit_history.redone(state["history"], apply_change(None, state["history"].redo[-1]))
+
+    # Applies the deadline transitions that are due, then sleeps until the next one ( Tk timer )
+    def on_deadline():
+        today = deadlines.current_day()
+        numbers, state["schedule"] = deadlines.due_transitions(state["schedule"], today)
+        positions = tuple(position for position in map(partial(task_position, state["tasks"]), numbers) if position is not None)
+        new_tasks = check_highlighting_at(state["tasks"], positions)
+        for position in positions:
+            state["schedule"] = deadlines.schedule_task(state["schedule"], new_tasks.columns, new_tasks.slots[position], today)
+        if new_tasks is not state["tasks"]:
+            state["tasks"] = new_tasks
+            show(searched(new_tasks))
+            update_next_up(next_up_list, new_tasks)
+            notify_deadlines(notifier, new_tasks, positions)
+        update_occurrences(occurrence_tree, state["recurring"], state["search"])     # the days shown move with today
+        root.after(deadlines.milliseconds_until_next(state["schedule"]), on_deadline)
+
+    root.after(deadlines.milliseconds_until_next(state["schedule"]), on_deadline)
+
+    # In shared mode the changes other planners saved are shown every few seconds
+    def on_sync():
+        show_synced(storage.sync(state["tasks"]))
+        root.after(SYNC_INTERVAL, on_sync)
+
+    if storage.sync is not None:
+        root.after(SYNC_INTERVAL, on_sync)
 
     # Frame to group the Add, Update, and Delete buttons
     button_frame = tk.Frame(root)
@@ -512,21 +702,45 @@ def main():
         "font": ("Arial", 12)   # Bold font for the header
     }
 
-    tk.Button(button_frame, text="Add Task", command=lambda: add_task_gui(root, tree, tasks), **button_style).pack(side=tk.LEFT, padx=10)
-    tk.Button(button_frame, text="Update Task", command=lambda: update_task_gui(root, tree, tasks), **button_style).pack(side=tk.LEFT, padx=10)
-    tk.Button(button_frame, text="Delete Task", command=lambda: delete_task_gui(tree, tasks), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Add Task", command=lambda: add_task_gui(root, tree, state["tasks"], set_tasks, state["recurring"], set_recurring), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Update Task", command=lambda: update_task_gui(root, tree, state["tasks"], set_tasks, row_position), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Delete Task", command=lambda: delete_task_gui(tree, state["tasks"], set_tasks, row_position), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Undo", command=undo, **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Redo", command=redo, **button_style).pack(side=tk.LEFT, padx=10)
+    root.bind("<Control-z>", lambda event: undo())
+    root.bind("<Control-y>", lambda event: redo())
+    tk.Button(button_frame, text="Complete Occurrence", command=lambda: complete_occurrence_gui(occurrence_tree, state["recurring"], set_recurring), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Delete Series", command=lambda: delete_series_gui(occurrence_tree, state["recurring"], set_recurring), **button_style).pack(side=tk.LEFT, padx=10)
 
     # Frame to group the Sort and Filter buttons in the same row
     sort_filter_frame = tk.Frame(root)
     sort_filter_frame.pack(pady=10)
 
-    tk.Button(sort_filter_frame, text="Sort by Priority", command=lambda: update_task_list(tree, sort_tasks(tasks, priority_key)), **button_style).pack(side=tk.LEFT, padx=10)
-    tk.Button(sort_filter_frame, text="Sort by Due Date", command=lambda: update_task_list(tree, sort_tasks(tasks, due_date_key)), **button_style).pack(side=tk.LEFT, padx=10)
-    tk.Button(sort_filter_frame, text="Sort by Status", command=lambda: update_task_list(tree, sort_tasks(tasks, status_key)), **button_style).pack(side=tk.LEFT, padx=10)
-    tk.Button(sort_filter_frame, text="Sort by Creation Time", command=lambda: update_task_list(tree, sort_tasks(tasks, creation_time_key)), **button_style).pack(side=tk.LEFT, padx=10)
-    tk.Button(sort_filter_frame, text="Filter Tasks", command=lambda: filter_tasks_gui(root, tree, tasks), **button_style).pack(side=tk.LEFT, padx=10)
+    # The sort buttons read the pages shown of an ordering ( selected a page at a time, or read from
+    # the sorted indexes or the database indexes ), the sort and filter results keep to the tasks
+    # that match the search box
+    tk.Button(sort_filter_frame, text="Sort by Priority", command=lambda: show_from_top(storage.query(state["tasks"], order_by="priority", text=state["search"])), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(sort_filter_frame, text="Sort by Due Date", command=lambda: show_from_top(storage.query(state["tasks"], order_by="due_date", text=state["search"])), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(sort_filter_frame, text="Sort by Status", command=lambda: show_from_top(storage.query(state["tasks"], order_by="status", text=state["search"])), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(sort_filter_frame, text="Sort by Creation Time", command=lambda: show_from_top(storage.query(state["tasks"], order_by="creation_time", text=state["search"])), **button_style).pack(side=tk.LEFT, padx=10)
+    # The occurrences of the recurring tasks due in the date range of a filter follow the stored tasks
+    def query_with_occurrences(tasks, **filters):
+        return tuple(storage.query(tasks, text=state["search"], **filters)) + tuple(query_occurrences(state["recurring"], text=state["search"], **filters))
+
+    tk.Button(sort_filter_frame, text="Filter Tasks", command=lambda: filter_tasks_gui(root, tree, state["tasks"], query_with_occurrences), **button_style).pack(side=tk.LEFT, padx=10)
+    if metrics.ENABLED:
+        tk.Button(sort_filter_frame, text="Stats", command=lambda: show_stats_window(root), **button_style).pack(side=tk.LEFT, padx=10)
 
     root.mainloop()
+    # The last saves finish after the window closed : a failure is still shown
+    failed = tuple(result for result in (writer.close() if writer is not None else ()) if result.error is not None)
+    if failed:
+        messagebox.showerror("Save Error", f"The tasks could not be saved: {failed[-1].error}")
+    # The notifications still queued go to the log file, the desktop and the mail server
+    errors = notifier.close()
+    if errors:
+        messagebox.showerror("Notification Error", f"The notifications could not be sent: {errors[-1]}")
+    storage.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,165 @@
+import hashlib
+import secrets
+from array import array
+from datetime import date, datetime, timedelta
+
+# Columnar task storage
+# the fields of the tasks are kept in parallel columns instead of one tuple of strings per task :
+# due dates as day numbers, creation times as seconds, priority and status as small integer codes,
+# and the title / description text apart from the numbers. Dates are parsed once, when a task is
+# added, so sorting, filtering and highlighting only compare numbers.
+#
+# The columns only ever grow : a changed task is added again under a new slot and the values of a
+# slot never change, so every older version of the task collection still reads the values it was
+# made with ( the unused slots are dropped the next time the tasks are loaded )
+#
+# Every task also has a number that the slots of its changed versions keep; numbers are given out
+# in increasing order, so a task collection ( where tasks are only ever appended ) is ordered by them
+#
+# Every task also has an id ( 16 hex digits ) that is stored with it in tasks.json and never changes;
+# numbers_by_id finds the number of an id in O(1) ( ids and numbers never change, so the map only
+# grows, and every version of the task collection can use it ). Columns read from a binary snapshot
+# ( see binary_snapshot ) build it the first time an id is looked up, and keep their text in the
+# snapshot until it is read.
+
+# Priority code = rank of the priority, so ordering by code is ordering by priority
+PRIORITY_NAMES = ("High", "Medium", "Low")
+PRIORITY_CODES = {name: code for code, name in enumerate(PRIORITY_NAMES)}
+
+# Highlight states the imperative planner writes ( and the binary snapshot stores ); the highlight
+# flag of a task here is the due soon state, "yellow"
+HIGHLIGHT_NAMES = ("normal", "yellow", "red", "none")
+HIGHLIGHT_FLAGS = {False: False, True: True, "normal": False, "yellow": True, "red": False, "none": False}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+# Day number of an ISO date ( "2025-01-31" )
+def parse_day(text):
+    return datetime.fromisoformat(text).toordinal()
+
+
+def format_day(day):
+    return date.fromordinal(day).isoformat()
+
+
+# Seconds since 1970 of a creation time ( "2025-01-31 12:00:00", local time like the GUI writes it ),
+# with the fraction of a second a time may hold
+def parse_time(text):
+    return (datetime.fromisoformat(text) - EPOCH).total_seconds()
+
+
+# The creation time text of some seconds ( a time without a fraction of a second is written without one )
+def format_time(seconds):
+    return (EPOCH + timedelta(seconds=seconds)).isoformat(" ")
+
+
+# Id of a new task ( random, so tasks added by different processes do not collide )
+def new_task_id():
+    return secrets.token_hex(8)
+
+
+# Id of a task read from a file written before tasks had ids : derived from its place in the file
+# and its creation, so it is the same every time the file is read ( until the file is rewritten with ids )
+def legacy_task_id(position, task_data):
+    key = f"{position}\0{task_data['creation_time']}\0{task_data['title']}"
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+# The task dict with an id ( see legacy_task_id ), position is its place in the file
+def with_task_id(position, task_data):
+    return task_data if task_data.get("id") else {**task_data, "id": legacy_task_id(position, task_data)}
+
+
+class TaskColumns:
+    __slots__ = ("titles", "descriptions", "due_days", "creation_times", "priorities", "statuses", "highlights", "ids", "numbers", "numbers_by_id", "next_number", "status_names", "status_codes")
+
+    def __init__(self):
+        self.titles = []
+        self.descriptions = []
+        self.due_days = array("i")
+        self.creation_times = array("d")
+        self.priorities = array("b")
+        self.statuses = array("B")
+        self.highlights = array("b")
+        self.ids = []
+        self.numbers = array("q")
+        self.numbers_by_id = {}     # None until id_numbers builds it
+        self.next_number = 0
+        # Status codes are given out the first time a status is seen
+        self.status_names = []
+        self.status_codes = {}
+
+    def __len__(self):
+        return len(self.titles)
+
+    # Number of the task with an id, None when no task has it
+    def number_of(self, task_id):
+        return self.id_numbers().get(task_id)
+
+    # Number of every task id ( built from the ids the first time it is needed )
+    def id_numbers(self):
+        if self.numbers_by_id is None:
+            self.numbers_by_id = dict(zip(self.ids, self.numbers))
+        return self.numbers_by_id
+
+    # Code of a status, a new status gets the next free code
+    def status_code(self, status):
+        code = self.status_codes.get(status)
+        if code is None:
+            if len(self.status_names) == 256:
+                raise ValueError("Too many different task statuses")
+            code = len(self.status_names)
+            self.status_names.append(status)
+            self.status_codes[status] = code
+        return code
+
+    # Adds the fields of a task ( in Task field order ) and returns the slot they were stored in
+    # number is given for a new version of an existing task, a new task gets the next number
+    # a new task without an id, or with the id of another task, gets a new id
+    def add(self, title, description, due_date, priority, status, creation_time, highlight=False, task_id=None, number=None):
+        if priority not in PRIORITY_CODES:
+            raise ValueError(f"Unknown priority: {priority}")
+        due_day = parse_day(due_date)
+        creation_seconds = parse_time(creation_time)
+        status_code = self.status_code(status)
+        if number is None:
+            number = self.next_number
+            self.next_number += 1
+            if not task_id or task_id in self.id_numbers():
+                task_id = new_task_id()
+            self.id_numbers()[task_id] = number
+
+        self.titles.append(title)
+        self.descriptions.append(description)
+        self.due_days.append(due_day)
+        self.creation_times.append(creation_seconds)
+        self.priorities.append(PRIORITY_CODES[priority])
+        self.statuses.append(status_code)
+        self.highlights.append(HIGHLIGHT_FLAGS.get(highlight, False))
+        self.ids.append(task_id)
+        self.numbers.append(number)
+        return len(self.titles) - 1
+
+    # Adds copies of some slots with other status codes and highlight flags ( bytes, one per slot ),
+    # one pass per column and nothing is parsed again; returns the range of the new slots
+    def add_changed_slots(self, slots, status_codes, highlights):
+        first = len(self.titles)
+        for column in (self.titles, self.descriptions, self.due_days, self.creation_times, self.priorities, self.ids, self.numbers):
+            column.extend(map(column.__getitem__, slots))
+        self.statuses.frombytes(status_codes)
+        self.highlights.frombytes(highlights)
+        return range(first, first + len(slots))
+
+    # Field values of a slot as strings, in Task field order
+    def row(self, slot):
+        return (
+            self.titles[slot],
+            self.descriptions[slot],
+            format_day(self.due_days[slot]),
+            PRIORITY_NAMES[self.priorities[slot]],
+            self.status_names[self.statuses[slot]],
+            format_time(self.creation_times[slot]),
+            bool(self.highlights[slot]),
+            self.ids[slot],
+        )
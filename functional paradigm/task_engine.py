@@ -0,0 +1,804 @@
+from datetime import datetime
+from collections import namedtuple
+import heapq
+from functools import lru_cache, partial, reduce
+from itertools import chain, compress, count, islice
+from operator import attrgetter, itemgetter
+import json
+import os
+import binary_snapshot
+import deadlines
+import highlight
+import journal
+import json_stream
+import metrics
+import partial_sort
+import sorted_index
+import query_plan
+import recurrence
+import scheduler
+import shared_store
+import sqlite_store
+import text_index
+from pvector import LazyPVector, PVector
+from task_columns import PRIORITY_CODES, TaskColumns, format_day, new_task_id, with_task_id
+
+# Headless task engine : the task collection, its indexes, queries, highlighting rules and storage
+# it never imports tkinter, so scripts, the command line ( cli.py ) and servers without a display
+# can use it; the window ( taskPlanner.py ) is built on top of it
+
+# Immutable Task Representation as Tuple
+# id is the persistent id of the task ( see task_columns ), a new task without one is given one when it is added
+Task = namedtuple("Task", ["title", "description", "due_date", "priority", "status", "creation_time", "highlight", "id"], defaults=(None,))
+
+# How tasks are persisted : "json" rewrites tasks.json on every change,
+# "journal" appends each change to a journal that is compacted in the background,
+# "sqlite" writes each change as one row of tasks.db and filters / sorts with indexed queries,
+# "shared" lets several planners use the same tasks file : each change is merged into a journal
+# they all read, under a file lock ( see shared_store ),
+# "binary" rewrites tasks.bin, a snapshot that loads without parsing every task ( see binary_snapshot )
+STORAGE_MODE = "json"
+
+# Loaded tasks plus the functions that persist changes, filter / sort, and release the storage
+# sync, only in shared mode, brings in the changes other planners saved
+Storage = namedtuple("Storage", ["tasks", "save", "query", "close", "sync"], defaults=(None,))
+
+# What a save or a sync of the shared mode returns : the tasks with the changes of the other
+# planners applied ( the same collection when there were none ) and the local changes that were
+# not saved because another planner changed the same task first ( the tasks were then read again )
+Synced = namedtuple("Synced", ["tasks", "conflicts"])
+
+# Fields every stored task must have, and the priorities it may have
+REQUIRED_FIELDS = ("title", "description", "due_date", "priority", "status", "creation_time")
+PRIORITIES = ("Low", "Medium", "High")
+
+# Rows shown while the rest of a large tasks file is still being read
+FIRST_SCREEN_ROWS = 50
+
+# Rows of a page of a sorted list ( the task list shows one more page each time it is scrolled to its end )
+PAGE_SIZE = 100
+
+# The full sorted index of a field is built once a page past 1 / FULL_SORT_RATIO of the tasks is read
+# ( selecting that many entries again and again would cost more than sorting them all once )
+FULL_SORT_RATIO = 8
+
+# A flat slot vector takes a batch of changes in one copy of its values when there is at least one
+# change per FLAT_CHANGE_RATIO tasks ( copying a slot costs far less than copying a path of the tree )
+FLAT_CHANGE_RATIO = 1000
+
+# Days after the start of a range of occurrences that is not given an end ( the window shows the
+# occurrences of the recurring tasks from OCCURRENCE_DAYS before today to OCCURRENCE_DAYS after it )
+OCCURRENCE_DAYS = 7
+
+####### functionality Functions :
+
+# Read-only sequence of tasks stored in columns ( see task_columns ) : the slots of the tasks, in order
+# it is indexed, sliced and iterated exactly like a tuple of Task; each Task is only built when it is read
+class TaskView:
+    __slots__ = ("columns", "slots")
+
+    def __init__(self, columns, slots):
+        self.columns = columns
+        self.slots = slots
+
+    def task(self, slot):
+        return Task._make(self.columns.row(slot))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __iter__(self):
+        return map(self.task, self.slots)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TaskView(self.columns, self.slots[index])
+        return self.task(self.slots[index])
+
+# Immutable task collection : a persistent vector of slots plus one persistent sorted index per
+# sortable field, every version shares all untouched structure with the version it came from
+# an index is None until it is first read ( see field_index ), so a collection is shown right after
+# loading and only the indexes a sort, filter or search needs are ever built
+class IndexedTasks(TaskView):
+    __slots__ = ("indexes",)
+
+    def __init__(self, columns, slots, indexes):
+        super().__init__(columns, slots)
+        self.indexes = indexes
+
+# Adds a new task to the tasks collection
+# the task data may leave out the highlight flag ( as the add records of the imperative planner do )
+# a task that was deleted from the collection and is added back ( e.g. an undone delete ) keeps its
+# id and its number, so it goes back to its place in number order
+def add_task(tasks, task_data):
+    tasks = indexed(tasks)
+    columns = tasks.columns
+    number = columns.number_of(task_data.get("id"))
+    if number is None or task_position(tasks, number) is not None:
+        new_slot = columns.add(*task_from_dict(task_data))
+        return IndexedTasks(columns, tasks.slots.append(new_slot), reindex_task(columns, tasks.indexes, None, new_slot))
+    new_slot = columns.add(*task_from_dict(task_data), number=number)
+    position = tasks.slots.insertion_point(number, columns.numbers.__getitem__)
+    return IndexedTasks(columns, tasks.slots.insert(position, new_slot), reindex_task(columns, tasks.indexes, None, new_slot))
+
+# Adds the task data of an import, returns (tasks, the add records to save with one storage write)
+# the slots are appended in one pass and the indexes are built again when first read, instead of
+# updating every index for each task; the highlighting rules are applied to the new tasks only
+@metrics.timed("import_tasks")
+def import_tasks(tasks, task_dicts):
+    tasks = indexed(tasks)
+    columns = tasks.columns
+    new_slots = tuple(columns.add(*Task(**{"highlight": False, **task_data})) for task_data in task_dicts)
+    positions = range(len(tasks), len(tasks) + len(new_slots))
+    imported = check_highlighting_at(columned_tasks(columns, (*slot_list(tasks), *new_slots)), positions)
+    return imported, tuple({"op": "add", "task": imported[position]._asdict()} for position in positions)
+
+# Updates a task at a specific index
+def update_task(tasks, index, updates):
+    tasks = indexed(tasks)
+    new_slot = tasks.columns.add(*tasks[index]._replace(**updates), number=tasks.columns.numbers[tasks.slots[index]])
+    return IndexedTasks(tasks.columns, tasks.slots.set(index, new_slot), reindex_task(tasks.columns, tasks.indexes, tasks.slots[index], new_slot))
+
+# Deletes a task from the tasks collection
+def delete_task(tasks, index):
+    tasks = indexed(tasks)
+    return IndexedTasks(tasks.columns, tasks.slots.delete(index), reindex_task(tasks.columns, tasks.indexes, tasks.slots[index], None))
+
+# Combines several key functions into one composite key ( Genericity )
+# e.g. compose_keys(priority_key, due_date_key, creation_time_key)
+def compose_keys(*key_functions):
+    if len(key_functions) == 1:
+        return key_functions[0]
+    return lambda task: tuple(key_function(task) for key_function in key_functions)
+
+# Sort tasks using a higher-order approach ( Genericity )
+# decorate-sort-undecorate : each key is computed once per task, the (key, task) pairs are
+# ordered by Python's iterative and stable merge sort ( O(n log n) ), then the keys are dropped
+# several key functions may be given, later ones break the ties of the earlier ones
+@metrics.timed("sort_tasks")
+def sort_tasks(tasks, *key_functions, reverse=False):
+    key_function = compose_keys(*key_functions)
+    decorated = tuple(zip(map(key_function, tasks), tasks))
+    return tuple(map(itemgetter(1), sorted(decorated, key=itemgetter(0), reverse=reverse)))
+
+# Key function for sorting by priority
+def priority_key(task):
+    priority_order = {"Low": 2, "Medium": 1, "High": 0}
+    return priority_order[task.priority]
+
+# Key function for sorting by due date ( ISO dates sort like the dates they hold, nothing is parsed )
+def due_date_key(task):
+    return task.due_date
+
+#Key function for sorting by creation time
+def creation_time_key(task):
+    return task.creation_time
+
+# Key function for sorting by status
+def status_key(task):
+    return task.status
+
+# Sortable fields and the key each one orders Task objects by
+# the ISO date strings already sort like the dates they hold, so they are never parsed
+# ties are broken by creation time, so the order looks like a stable sort of the tasks
+SORT_INDEX_KEYS = {
+    "priority": lambda task: (priority_key(task), task.creation_time),
+    "due_date": attrgetter("due_date", "creation_time"),
+    "status": attrgetter("status", "creation_time"),
+    "creation_time": attrgetter("creation_time"),
+}
+
+# Entry of a slot in the sorted index of each field : the same order as SORT_INDEX_KEYS, read from
+# the integer columns, then the slot itself to settle any remaining tie
+INDEX_ENTRIES = {
+    "priority": lambda columns, slot: (columns.priorities[slot], columns.creation_times[slot], slot),
+    "due_date": lambda columns, slot: (columns.due_days[slot], columns.creation_times[slot], slot),
+    "status": lambda columns, slot: (columns.status_names[columns.statuses[slot]], columns.creation_times[slot], slot),
+    "creation_time": lambda columns, slot: (columns.creation_times[slot], slot),
+}
+
+# Column of the first value of the entries of each field ( status entries start with the status name )
+INDEX_COLUMNS = {"priority": "priorities", "due_date": "due_days", "creation_time": "creation_times"}
+
+# Stores the tasks in columns and builds the slot vector ( the indexes are built when first read )
+# tasks may be any iterable of Task, it is consumed once and never held as a whole
+def index_tasks(tasks):
+    columns = TaskColumns()
+    return columned_tasks(columns, tuple(columns.add(*task) for task in tasks))
+
+# Collection of the tasks in some slots of columns, none of its indexes built yet ( nor the tree
+# of its slot vector, see LazyPVector )
+def columned_tasks(columns, slots):
+    return IndexedTasks(columns, LazyPVector(slots), unbuilt_indexes())
+
+def unbuilt_indexes():
+    return dict.fromkeys((*INDEX_ENTRIES, "text"))
+
+# Builds the sorted index of a field ( O(n log n) ), the text index or an urgency queue, for the given slots
+def build_index(columns, slots, field):
+    if field == "text":
+        return build_text_index(columns, slots)
+    if isinstance(field, tuple):
+        return scheduler.build_queue(columns, slots, field[1])
+    return sorted_index.from_sorted(sorted(map(partial(INDEX_ENTRIES[field], columns), slots)))
+
+# Entry function of a sorted index : a field of INDEX_ENTRIES, ("urgency", weights) for the
+# queue of the scheduler ( whose entry is None for a task it leaves out ) or ("prefix", field) for
+# the partial ordering of a field ( see sorted_page_entries )
+def index_entry_of(field):
+    if isinstance(field, tuple):
+        return partial(scheduler.urgency_entry, field[1]) if field[0] == "urgency" else INDEX_ENTRIES[field[1]]
+    return INDEX_ENTRIES[field]
+
+# Index of a field of an indexed collection, built the first time it is read
+# the collection keeps it ( an index depends on nothing but the slots, so filling it in changes no
+# value the collection stands for ), and the versions made from this one update it along with the tasks
+def field_index(tasks, field):
+    index = tasks.indexes.get(field)
+    if index is None:
+        index = tasks.indexes[field] = build_index(tasks.columns, slot_list(tasks), field)
+        tasks.indexes.pop(("prefix", field), None)      # the full index replaces the partial ordering
+    return index
+
+# Builds the full-text index of the titles and descriptions ( see text_index ), keyed by task number
+def build_text_index(columns, slots):
+    return text_index.build(zip(map(columns.numbers.__getitem__, slots), map(columns.titles.__getitem__, slots), map(columns.descriptions.__getitem__, slots)))
+
+# Returns the collection itself if it is already indexed, otherwise indexes it
+def indexed(tasks):
+    return tasks if isinstance(tasks, IndexedTasks) else index_tasks(tasks)
+
+# Position of the task with a number ( see task_columns ), None if it is not in the collection
+# the slots are in increasing number order, so the slot vector is searched like a binary search tree
+def task_position(tasks, number):
+    return tasks.slots.find(number, tasks.columns.numbers.__getitem__)
+
+# Position of the task with an id, None if it is not in the collection
+# ( the number of the id is read from a hash map in O(1), then its position is found in O(log n) )
+def task_id_position(tasks, task_id):
+    number = tasks.columns.number_of(task_id)
+    return None if number is None else task_position(tasks, number)
+
+# Puts plain tasks ( e.g. database query results ) into columns of their own
+def task_view(tasks):
+    columns = TaskColumns()
+    return TaskView(columns, tuple(columns.add(*task) for task in tasks))
+
+# Returns new indexes where old_slot is replaced by new_slot ( either may be None ), O(log n) per index
+# the text index only changes when a task is added or removed, or its title or description changed
+# ( an index that was not built yet stays so )
+def reindex_task(columns, indexes, old_slot, new_slot):
+    def reindex(field, index):
+        if index is None:
+            return None
+        if field == "text":
+            return reindex_text(columns, index, old_slot, new_slot)
+        entry_of = index_entry_of(field)
+        old_entry = None if old_slot is None else entry_of(columns, old_slot)
+        new_entry = None if new_slot is None else entry_of(columns, new_slot)
+        ordering = partial_sort if isinstance(index, partial_sort.Prefix) else sorted_index
+        if old_entry is not None:
+            index = ordering.remove(index, old_entry)
+        if new_entry is not None:
+            index = ordering.insert(index, new_entry)
+        return index
+
+    return {field: reindex(field, index) for field, index in indexes.items()}
+
+def reindex_text(columns, index, old_slot, new_slot):
+    text_of = lambda slot: (columns.numbers[slot], columns.titles[slot], columns.descriptions[slot])
+    if old_slot is not None and new_slot is not None and text_of(old_slot) == text_of(new_slot):
+        return index
+    if old_slot is not None:
+        index = text_index.remove(index, *text_of(old_slot))
+    if new_slot is not None:
+        index = text_index.add(index, *text_of(new_slot))
+    return index
+
+# Slots of a collection in the order of a field, as a sequence that only reads the positions it is
+# sliced or indexed for ( see sorted_page_entries ), so a sorted view is shown without sorting every task
+class SortedSlots:
+    __slots__ = ("tasks", "field")
+
+    def __init__(self, tasks, field):
+        self.tasks = tasks
+        self.field = field
+
+    def __len__(self):
+        return len(self.tasks)
+
+    # Reading every slot reads the full sorted index
+    def __iter__(self):
+        return map(itemgetter(-1), sorted_index.walk(field_index(self.tasks, self.field)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return tuple(self)[index]
+            return tuple(map(itemgetter(-1), sorted_page_entries(self.tasks, self.field, start, stop)))
+        position = index + len(self) if index < 0 else index
+        if not 0 <= position < len(self):
+            raise IndexError("slot position out of range")
+        return sorted_page_entries(self.tasks, self.field, position, position + 1)[0][-1]
+
+# Values of a field of the tasks in some slots, the first fields of their index entries
+def index_values(columns, slots, field):
+    if field == "status":
+        return map(columns.status_names.__getitem__, map(columns.statuses.__getitem__, slots))
+    return map(getattr(columns, INDEX_COLUMNS[field]).__getitem__, slots)
+
+# The count smallest index entries of a field, sorted ( see partial_sort )
+def smallest_entries(tasks, field, count):
+    slots = slot_list(tasks)
+    return partial_sort.smallest_entries(count, slots, index_values(tasks.columns, slots, field), partial(map, partial(INDEX_ENTRIES[field], tasks.columns)))
+
+# Index entries at positions start to stop of the order of a field ( page n is n * size to (n + 1) * size )
+# read from the sorted index when it is built ( O(log n + k) ), otherwise from the partial ordering the
+# collection keeps among its indexes like a sorted index, whose first selection costs O(n log stop)
+# instead of sorting every task
+@metrics.timed("sorted_page")
+def sorted_page_entries(tasks, field, start, stop):
+    tasks = indexed(tasks)
+    if tasks.indexes.get(field) is not None or stop * FULL_SORT_RATIO > len(tasks):
+        index = field_index(tasks, field)
+        if start >= sorted_index.size(index):
+            return ()
+        return tuple(islice(sorted_index.walk_range(index, sorted_index.entry_at(index, start), None), stop - start))
+    key = ("prefix", field)
+    prefix = tasks.indexes.get(key)
+    if prefix is None:
+        prefix = tasks.indexes[key] = partial_sort.select(partial(smallest_entries, tasks, field), stop)
+    elif not partial_sort.covers(prefix, stop):
+        prefix = tasks.indexes[key] = partial_sort.grow(prefix, partial(smallest_entries, tasks, field), stop)
+    return prefix.entries[start:stop]
+
+# Tasks of page number page ( from 0 ) of the order of a field
+def sorted_page(tasks, field, page, page_size=PAGE_SIZE):
+    tasks = indexed(tasks)
+    return TaskView(tasks.columns, tuple(map(itemgetter(-1), sorted_page_entries(tasks, field, page * page_size, (page + 1) * page_size))))
+
+# The tasks in the order of a field, read a page at a time as they are shown
+def sorted_pages(tasks, field):
+    tasks = indexed(tasks)
+    return TaskView(tasks.columns, SortedSlots(tasks, field))
+
+# The count most urgent tasks that are not completed, most urgent first ( see scheduler )
+# the queue of the weights is kept among the indexes of the collection, so the edits update it in
+# O(log n) and reading it costs O(log n + count); the queues of other weights are dropped
+@metrics.timed("next_tasks")
+def next_tasks(tasks, count=1, weights=scheduler.DEFAULT_WEIGHTS):
+    tasks = indexed(tasks)
+    field = ("urgency", weights)
+    for stale_field in [key for key in tasks.indexes if isinstance(key, tuple) and key[0] == "urgency" and key != field]:
+        del tasks.indexes[stale_field]
+    return TaskView(tasks.columns, scheduler.next_slots(field_index(tasks, field), count))
+
+#filter tasks using a higher-order approach ( Genericity )
+# the criteria are structured predicates ( see query_plan ) : the planner reads the smallest range
+# of the sorted indexes and checks the other criteria on it, the Tasks are only built when read
+# the tasks keep their order in the collection ( the task numbers are increasing )
+@metrics.timed("filter_tasks")
+def filter_tasks(tasks, *criteria):
+    tasks = indexed(tasks)
+    if not criteria:
+        return tasks
+    columns = tasks.columns
+    fields = frozenset(predicate.field for predicate in criteria if isinstance(predicate, query_plan.RangePredicate))
+    slots = query_plan.matching_slots(
+        {field: field_index(tasks, field) for field in fields},
+        lambda field, slot: INDEX_ENTRIES[field](columns, slot),
+        criteria,
+        columns.numbers.__getitem__,
+        partial(numbered_slots, tasks),
+    )
+    return TaskView(columns, tuple(sorted(slots, key=columns.numbers.__getitem__)))
+
+# Slots of the tasks whose number is in a set, in collection order
+# a few numbers are looked up one by one ( O(log n) each ), many are picked out in one pass
+def numbered_slots(tasks, numbers):
+    if len(numbers) * 16 > len(tasks):
+        slots = slot_list(tasks)
+        return compress(slots, map(numbers.__contains__, map(tasks.columns.numbers.__getitem__, slots)))
+    positions = sorted(position for position in map(partial(task_position, tasks), numbers) if position is not None)
+    return map(tasks.slots.__getitem__, positions)
+
+# Criteria for priority
+def priority_criteria(priority):
+    return query_plan.equal_to("priority", PRIORITY_CODES[priority])
+
+# Criteria for status
+def status_criteria(status):
+    return query_plan.equal_to("status", status)
+
+# Criteria for start date ( a range of the due date index, compared as day numbers )
+def start_date_criteria(start_date):
+    return query_plan.at_least("due_date", start_date.toordinal())
+
+# Criteria for end date
+def end_date_criteria(end_date):
+    return query_plan.at_most("due_date", end_date.toordinal())
+
+# Criteria for a text search ( the numbers of the matching tasks, read from the text index )
+def text_criteria(tasks, text):
+    return query_plan.key_in(text_index.search(field_index(indexed(tasks), "text"), text))
+
+
+# Saves tasks to a JSON file ( replaced atomically, a reader never sees a half-written file )
+@metrics.timed("save_tasks_to_file")
+def save_tasks_to_file(tasks, filename="tasks.json"):
+    journal.write_atomically(filename, json.dumps(list(map(Task._asdict, tasks)), indent=4).encode())
+
+# Creates a Task object from its JSON data
+def task_from_dict(task_data):
+    return Task(
+        title=task_data["title"],
+        description=task_data["description"],
+        due_date=task_data["due_date"],
+        priority=task_data["priority"],
+        status=task_data["status"],
+        creation_time=task_data["creation_time"],
+        highlight=task_data.get("highlight", False),
+        id=task_data.get("id"),
+    )
+
+# Checks the JSON data of the task at a position of the file, returns it unchanged when valid
+def validate_task_data(task_data, position):
+    if not isinstance(task_data, dict):
+        raise ValueError(f"Task {position} is not a JSON object")
+    missing = tuple(field for field in REQUIRED_FIELDS if not isinstance(task_data.get(field), str))
+    if missing:
+        raise ValueError(f"Task {position} has no valid {', '.join(missing)}")
+    if task_data["priority"] not in PRIORITIES:
+        raise ValueError(f"Task {position} has an unknown priority: {task_data['priority']}")
+    if not isinstance(task_data.get("id", ""), str):
+        raise ValueError(f"Task {position} has an invalid id")
+    try:
+        datetime.fromisoformat(task_data["due_date"])
+    except ValueError:
+        raise ValueError(f"Task {position} has an invalid due date: {task_data['due_date']}") from None
+    return task_data
+
+# Streams the tasks of a JSON file : yields each validated Task as soon as it is read,
+# so neither the whole document nor its dicts are ever held in memory at once
+def stream_tasks_from_file(filename="tasks.json"):
+    try:
+        file = open(filename, "r")
+    except FileNotFoundError:
+        return
+    with file:
+        for position, task_data in enumerate(json_stream.iter_json_array(file)):
+            yield task_from_dict(with_task_id(position, validate_task_data(task_data, position)))
+
+# Loads tasks from a JSON file straight into an indexed, columnar collection
+# preview, when given, receives the first screenful of tasks before the rest of the file is read
+@metrics.timed("load_tasks_from_file")
+def load_tasks_from_file(filename="tasks.json", preview=None):
+    task_stream = stream_tasks_from_file(filename)
+    if preview is None:
+        return index_tasks(task_stream)
+    first_tasks = tuple(islice(task_stream, FIRST_SCREEN_ROWS))
+    preview(first_tasks)
+    return index_tasks(chain(first_tasks, task_stream))
+
+# Saves the tasks to a binary snapshot ( see binary_snapshot )
+@metrics.timed("save_snapshot")
+def save_snapshot(tasks, filename="tasks.bin"):
+    binary_snapshot.write_snapshot(tasks.columns, slot_list(tasks), filename)
+
+# Loads a binary snapshot : the numeric columns are copied, the text stays in the mapped file until it is read
+@metrics.timed("load_snapshot")
+def load_snapshot(filename="tasks.bin"):
+    columns = binary_snapshot.read_snapshot(filename)
+    return columned_tasks(columns, range(len(columns)))
+
+# Converts a tasks file to a binary snapshot or back, returns the number of tasks : a source that
+# is a snapshot is read as one, the target is written as a snapshot when its name ends in .bin
+@metrics.timed("convert_tasks_file")
+def convert_tasks_file(source, target):
+    tasks = load_snapshot(source) if binary_snapshot.is_snapshot(source) else index_tasks(stream_tasks_from_file(source))
+    if target.endswith(".bin"):
+        save_snapshot(tasks, target)
+    else:
+        save_tasks_to_file(tasks, target)
+    return len(tasks)
+
+# Recurring tasks ( see recurrence ) : an immutable tuple of RecurringTask definitions, stored once in
+# tasks.recurring.json whatever the storage mode; their occurrences are only produced for the days looked at
+
+# The recurring tasks file that belongs to a tasks file
+def recurring_file(filename="tasks.json"):
+    return os.path.splitext(filename)[0] + ".recurring.json"
+
+def load_recurring_tasks(filename="tasks.json"):
+    return recurrence.read_definitions(recurring_file(filename))
+
+# The definitions are few, the file is rewritten on every change ( replaced atomically )
+def save_recurring_tasks(recurring, filename="tasks.json"):
+    journal.write_atomically(recurring_file(filename), recurrence.encode_definitions(recurring))
+
+# Returns the definitions with a new recurring task : task_data holds the fields of its first
+# occurrence ( its due date starts the series, the status is left out ), rule is an RRULE-style rule
+# ( ValueError when it is not valid )
+def add_recurring_task(recurring, task_data, rule):
+    recurrence.parse_rule(rule)
+    validate_task_data({**task_data, "status": "Pending"}, "being added")
+    definition = recurrence.RecurringTask(
+        id=new_task_id(),
+        title=task_data["title"],
+        description=task_data["description"],
+        priority=task_data["priority"],
+        rule=rule,
+        start=task_data["due_date"],
+        creation_time=task_data["creation_time"],
+        completed=frozenset(),
+    )
+    return recurring + (definition,)
+
+# Returns the definitions without a recurring task ( and so without any of its occurrences )
+def delete_recurring_task(recurring, definition_id):
+    kept = tuple(definition for definition in recurring if definition.id != definition_id)
+    if len(kept) == len(recurring):
+        raise KeyError(f"No recurring task with id {definition_id}")
+    return kept
+
+# Returns the definitions with one occurrence marked as completed, or pending again ( by the id of the occurrence )
+def complete_occurrence(recurring, occurrence_id, completed=True):
+    definition_id, due_date = recurrence.split_occurrence_id(occurrence_id) or (None, None)
+    if not any(definition.id == definition_id and recurrence.is_occurrence(definition, due_date) for definition in recurring):
+        raise KeyError(f"No occurrence with id {occurrence_id}")
+
+    def change(definition):
+        if definition.id != definition_id:
+            return definition
+        return definition._replace(completed=definition.completed | {due_date} if completed else definition.completed - {due_date})
+
+    return tuple(map(change, recurring))
+
+# Occurrences of the recurring tasks due between two day numbers ( both included, first None starts
+# at the start of each series ), as Tasks in due date order : the series are merged lazily
+def occurrences_between(recurring, first, last):
+    today = deadlines.current_day()
+    series = tuple(recurrence.occurrences(definition, first, last, today) for definition in recurring)
+    return map(task_from_dict, heapq.merge(*series, key=itemgetter("due_date")))
+
+# Occurrences due between two day numbers as an indexed collection of their own, with their
+# highlight set by the same batch pass as the stored tasks
+@metrics.timed("occurrence_tasks")
+def occurrence_tasks(recurring, first, last):
+    return check_task_highlighting(index_tasks(occurrences_between(recurring, first, last)))
+
+# Occurrences the window shows ( the days around today ) that match the search text
+def shown_occurrences(recurring, text=None):
+    today = deadlines.current_day()
+    return query_tasks(occurrence_tasks(recurring, today - OCCURRENCE_DAYS, today + OCCURRENCE_DAYS), text=text)
+
+# Filters the occurrences like query_tasks filters the stored tasks, in due date order
+# only the due dates between start_date and end_date are expanded : a filter without an end date
+# reads OCCURRENCE_DAYS from its start ( or from today ), one without a start date reads each series
+# from its first occurrence; the criteria are then the same start_date_criteria, end_date_criteria...
+@metrics.timed("query_occurrences")
+def query_occurrences(recurring, priority=None, status=None, start_date=None, end_date=None, order_by=None, text=None):
+    first = start_date.toordinal() if start_date else None
+    if end_date:
+        last = end_date.toordinal()
+    else:
+        first = deadlines.current_day() if first is None else first
+        last = first + OCCURRENCE_DAYS
+    occurrences = occurrence_tasks(recurring, first, last)
+    return query_tasks(occurrences, priority, status, start_date, end_date, order_by, text)
+
+# Applies one journal record to the tasks ( replaying a journal is a fold over its records )
+def apply_journal_record(tasks, record):
+    if record["op"] == "add":
+        return add_task(tasks, record["task"])
+    if record["op"] == "update":
+        return update_task(tasks, record_position(tasks, record), record["changes"])
+    if record["op"] == "delete":
+        return delete_task(tasks, record_position(tasks, record))
+    raise ValueError(f"Unknown journal operation: {record['op']}")
+
+# Change record that undoes a change made to tasks ( see edit_history ) : an added task is deleted,
+# a deleted task is added again and an update puts back the values it replaced ( O(log n) )
+def inverse_change(tasks, change):
+    if change["op"] == "add":
+        return {"op": "delete", "id": change["task"]["id"]}
+    task = tasks[record_position(tasks, change)]
+    if change["op"] == "update":
+        return {"op": "update", "id": task.id, "changes": {field: getattr(task, field) for field in change["changes"]}}
+    return {"op": "add", "task": task._asdict()}
+
+# Position of the task a record changes ( the records written before tasks had ids hold the position )
+def record_position(tasks, record):
+    if "id" not in record:
+        return record["index"]
+    position = task_id_position(tasks, record["id"])
+    if position is None:
+        raise ValueError(f"No task with id {record['id']}")
+    return position
+
+# Tasks of a snapshot with the journal records replayed on top of it
+def replay_journal(contents):
+    snapshot = map(task_from_dict, map(with_task_id, count(), contents.tasks))
+    return reduce(apply_journal_record, contents.records, index_tasks(snapshot))
+
+# Save and sync of the shared mode ( see Synced ); a compaction of the shared journal is started
+# from the merged tasks when one is due
+def shared_storage(store):
+    def merged(tasks, others):
+        if others is None:
+            return replay_journal(store.read())
+        new_tasks = reduce(apply_journal_record, others, tasks)
+        store.compact(lambda: map(Task._asdict, new_tasks))
+        return new_tasks
+
+    @metrics.timed("shared_commit")
+    def save(tasks, changes):
+        commit = store.commit(changes)
+        if commit.conflicts:
+            return Synced(replay_journal(store.read()), commit.conflicts)
+        return Synced(merged(tasks, commit.others), ())
+
+    @metrics.timed("shared_sync")
+    def sync(tasks):
+        return Synced(merged(tasks, store.refresh()), ())
+
+    return save, sync
+
+# Filters and sorts the tasks in memory ( the query of the json, journal and shared storage modes )
+@metrics.timed("query_tasks")
+def query_tasks(tasks, priority=None, status=None, start_date=None, end_date=None, order_by=None, text=None):
+    criteria = (
+        ((text_criteria(tasks, text),) if text and not text_index.is_blank(text) else ())
+        + ((priority_criteria(priority),) if priority else ())
+        + ((status_criteria(status),) if status else ())
+        + ((start_date_criteria(start_date),) if start_date else ())
+        + ((end_date_criteria(end_date),) if end_date else ())
+    )
+    if not criteria:
+        return sorted_pages(tasks, order_by) if order_by else tasks
+    filtered_tasks = filter_tasks(tasks, *criteria)
+    if not order_by:
+        return filtered_tasks
+    columns = filtered_tasks.columns
+    return TaskView(columns, tuple(sorted(filtered_tasks.slots, key=partial(INDEX_ENTRIES[order_by], columns))))
+
+# Loads the tasks with the chosen storage mode
+# save(tasks, changes) persists the collection produced by a batch of changes ( journal records ),
+# in shared mode it returns the tasks merged with the changes of the other planners ( Synced )
+# query(tasks, priority, status, start_date, end_date, order_by) filters and sorts
+# preview is passed on to load_tasks_from_file by the json mode
+@metrics.timed("open_storage")
+def open_storage(mode=STORAGE_MODE, filename="tasks.json", preview=None):
+    if mode == "journal":
+        contents, task_journal = journal.open_journal(filename)
+        tasks = replay_journal(contents)
+        # The immutable collection can be turned into dicts later by the compaction thread
+        save = metrics.timed("journal_append")(lambda tasks, changes: task_journal.append(changes, lambda: map(Task._asdict, tasks)))
+        return Storage(tasks, save, query_tasks, task_journal.close)
+    if mode == "sqlite":
+        store, tasks_data = sqlite_store.open_store(os.path.splitext(filename)[0] + ".db", filename)
+        save = metrics.timed("sqlite_write")(lambda tasks, changes: sqlite_store.apply_changes(store, changes))
+        # The database answers filters and sorts from its indexes, the tasks in memory are not scanned
+        # ( a text search is then checked on the rows it returns )
+        query = lambda tasks, text=None, **filters: tuple(
+            task for task in map(task_from_dict, sqlite_store.query_tasks(store, **filters))
+            if not text or text_index.matches(text, task.title, task.description)
+        )
+        return Storage(index_tasks(map(task_from_dict, tasks_data)), save, query, lambda: sqlite_store.close_store(store))
+    if mode == "shared":
+        store = shared_store.open_shared_store(filename)
+        tasks = replay_journal(store.read())
+        save, sync = shared_storage(store)
+        return Storage(tasks, save, query_tasks, store.close, sync)
+    if mode == "json":
+        save = lambda tasks, changes: save_tasks_to_file(tasks, filename)
+        return Storage(load_tasks_from_file(filename, preview), save, query_tasks, lambda: None)
+    if mode == "binary":
+        # The snapshot is made from the tasks file the first time the binary mode is used
+        snapshot_file = os.path.splitext(filename)[0] + ".bin"
+        if not os.path.exists(snapshot_file):
+            convert_tasks_file(filename, snapshot_file)
+        save = lambda tasks, changes: save_snapshot(tasks, snapshot_file)
+        return Storage(load_snapshot(snapshot_file), save, query_tasks, lambda: None)
+    raise ValueError(f"Unknown storage mode: {mode}")
+
+# What the notifications call the highlight states they are sent for ( see notifications )
+DEADLINE_TRANSITIONS = {highlight.DUE_SOON: "Due soon", highlight.OVERDUE: "Overdue"}
+
+# ISO text of a due day, cached : many tasks share their due day
+@lru_cache(maxsize=4096)
+def due_date_text(day):
+    return format_day(day)
+
+# (id, transition, title, due date) of the tasks at some positions that are due soon or overdue, for
+# the notifications ( reads the statuses and highlight flags the rules were applied to from the
+# columns ); positions None looks at every task
+def deadline_transitions(tasks, positions=None):
+    columns = tasks.columns
+    slots = slot_list(tasks) if positions is None else tuple(map(tasks.slots.__getitem__, positions))
+    states = highlight.display_states(columns, slots)
+
+    def transition(index):
+        slot = slots[index]
+        return columns.ids[slot], DEADLINE_TRANSITIONS[states[index]], columns.titles[slot], due_date_text(columns.due_days[slot])
+
+    return tuple(map(transition, highlight.positions(bytes(map(bool, states)))))
+
+# Two saves the background writer did not start yet become one : the newer collection with the
+# changes of both ( a save job is (tasks, changes) )
+def merge_saves(pending, job):
+    return job[0], pending[1] + job[1]
+
+
+# Function to update task highlighting based on due dates and status
+# the rules are applied to all tasks at once by the batch pass of highlight.classify, then only
+# the tasks whose status or highlight flag changes get a new slot ( added to the columns together )
+@metrics.timed("check_task_highlighting")
+def check_task_highlighting(tasks):
+    if not isinstance(tasks, TaskView):
+        tasks = task_view(tasks)
+    slots = slot_list(tasks)
+    return apply_slot_changes(tasks, highlight_changes(tasks.columns, slots, range(len(slots))))
+
+# Applies the highlighting rules to the tasks at some positions only ( O(log n) per task )
+# used when a deadline transition comes or a task was edited, the other tasks are not looked at
+@metrics.timed("check_highlighting_at")
+def check_highlighting_at(tasks, positions):
+    positions = tuple(positions)
+    slots = tuple(map(tasks.slots.__getitem__, positions))
+    return apply_slot_changes(tasks, highlight_changes(tasks.columns, slots, positions))
+
+# (position, new slot) of each task the highlighting rules change
+# slots are the slots of the tasks to check, positions their positions in the collection; the flags
+# of the classification are narrowed to the changed tasks and give their new status codes and
+# highlight flags as bytes, which the columns take in one pass
+def highlight_changes(columns, slots, positions):
+    classification = highlight.classify(columns, slots, deadlines.current_day())
+    changed = classification.changed
+    if 1 not in changed:
+        return ()
+    changed_slots = tuple(compress(slots, changed))
+    statuses = highlight.with_status(
+        bytes(map(columns.statuses.__getitem__, changed_slots)),
+        bytes(compress(classification.becomes_overdue, changed)),
+        columns.status_code("Overdue"),
+    )
+    new_slots = columns.add_changed_slots(changed_slots, statuses, bytes(compress(classification.highlight, changed)))
+    return tuple(zip(compress(positions, changed), new_slots))
+
+# Returns the collection with the (position, new slot) changes applied
+def apply_slot_changes(tasks, changes):
+    if not changes:
+        return tasks
+    columns = tasks.columns
+    if not isinstance(tasks, IndexedTasks):
+        return TaskView(columns, replace_slots(tasks.slots, changes))
+
+    # A few changes are applied one by one ( O(log n) each ), many changes rebuild the collection and
+    # leave its sorted indexes to be built again when read ( the highlighting only changes statuses
+    # and highlight flags, so the text index is kept ). A slot vector still held flat ( a collection
+    # just loaded ) takes a batch of changes in one copy of its values instead of one path per change
+    if len(changes) * 16 > len(tasks):
+        new_slots = replace_slots(slot_list(tasks), changes)
+        return IndexedTasks(columns, LazyPVector(new_slots), {**unbuilt_indexes(), "text": tasks.indexes["text"]})
+    if isinstance(tasks.slots, LazyPVector) and len(changes) * FLAT_CHANGE_RATIO > len(tasks):
+        slots = LazyPVector(replace_slots(tasks.slots.values, changes))
+    else:
+        slots = reduce(lambda vector, change: vector.set(*change), changes, tasks.slots)
+    return IndexedTasks(
+        columns,
+        slots,
+        reduce(lambda indexes, change: reindex_task(columns, indexes, tasks.slots[change[0]], change[1]), changes, tasks.indexes),
+    )
+
+# Slots of a task sequence in order, as a flat sequence the batch passes can index quickly
+def slot_list(tasks):
+    return tasks.slots.tolist() if isinstance(tasks.slots, PVector) else tasks.slots
+
+# Copy of a sequence of slots with the (position, slot) changes applied
+def replace_slots(slots, changes):
+    new_slots = list(slots)
+    for position, slot in changes:
+        new_slots[position] = slot
+    return tuple(new_slots)
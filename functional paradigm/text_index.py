@@ -0,0 +1,172 @@
+import re
+from bisect import bisect_left
+from collections import namedtuple
+from functools import partial, reduce
+from itertools import chain
+
+import sorted_index
+from pvector import UnbuiltNode, build as balanced_tree, slice_values, to_list
+
+# Full-text search over task titles and descriptions
+# an inverted index maps every word ( token ) to the numbers of the tasks that contain it, so a
+# search only reads the postings of the words it asks for instead of looking at every task.
+# The index is immutable : the postings are a balanced tree of (token, numbers) entries in token
+# order ( the nodes of sorted_index, searched by token ) and the numbers of each token are a
+# sorted_index tree too, so a change rebuilds only the O(log n) nodes on the paths of the words it
+# touches and shares every other node with the previous index. The tokens that start with a prefix
+# are one range of the tree ( search as you type : the last word of a query is a prefix until it
+# is completed ).
+
+WORD = re.compile(r"\w+")
+
+# postings : tree of (token, numbers) entries in token order, numbers : tree of the task numbers that contain the token
+TextIndex = namedtuple("TextIndex", ["postings"])
+
+EMPTY = TextIndex(None)
+
+# A number is searched in a tree in about the time SEARCH_RATIO numbers of a tree are read
+SEARCH_RATIO = 32
+
+# Larger than any character, so prefix + LAST_CHARACTER is after every token that starts with prefix
+LAST_CHARACTER = "\U0010ffff"
+
+
+# Distinct lower case words of a task
+def tokens(title, description):
+    return frozenset(WORD.findall(title.lower()) + WORD.findall(description.lower()))
+
+
+# Builds the index of (number, title, description) entries in one pass
+# the trees are made over sorted tuples, their nodes only once they are edited ( see pvector.build )
+def build(entries):
+    postings = {}
+    for number, title, description in entries:
+        for token in tokens(title, description):
+            postings.setdefault(token, []).append(number)
+    return TextIndex(balanced_tree(tuple((token, balanced_tree(tuple(sorted(numbers)))) for token, numbers in sorted(postings.items()))))
+
+
+# Numbers of the tasks that contain a token, None when no task does ( O(log n) )
+def numbers_of(postings, token):
+    while postings is not None:
+        entry_token, numbers = postings.entry
+        if token < entry_token:
+            postings = postings.left
+        elif entry_token < token:
+            postings = postings.right
+        else:
+            return numbers
+    return None
+
+
+# Returns the postings with the numbers of a token replaced, numbers None takes the token out ( O(log n) )
+# a subtree that keeps its size keeps its shape, so the nodes above it are copied without balancing
+def with_numbers(postings, token, numbers):
+    if postings is None:
+        return None if numbers is None else sorted_index.make_node((token, numbers), 1, None, None)
+    entry_token = postings.entry[0]
+    if token < entry_token:
+        left = with_numbers(postings.left, token, numbers)
+        if sorted_index.size(left) == sorted_index.size(postings.left):
+            return postings._replace(left=left)
+        return sorted_index.balance(postings.entry, 1, left, postings.right)
+    if entry_token < token:
+        right = with_numbers(postings.right, token, numbers)
+        if sorted_index.size(right) == sorted_index.size(postings.right):
+            return postings._replace(right=right)
+        return sorted_index.balance(postings.entry, 1, postings.left, right)
+    if numbers is not None:
+        return postings._replace(entry=(token, numbers))
+    if postings.left is None:
+        return postings.right
+    if postings.right is None:
+        return postings.left
+    right, successor = sorted_index.remove_min(postings.right)
+    return sorted_index.balance(successor.entry, 1, postings.left, right)
+
+
+# True if a tree of numbers holds a number ( O(log n), an unbuilt subtree is searched in its tuple )
+def contains(numbers, number):
+    while numbers is not None:
+        if isinstance(numbers, UnbuiltNode):
+            position = bisect_left(numbers.values, number, numbers.low, numbers.high)
+            return position < numbers.high and numbers.values[position] == number
+        if number < numbers.entry:
+            numbers = numbers.left
+        elif numbers.entry < number:
+            numbers = numbers.right
+        else:
+            return True
+    return False
+
+
+# Returns the index with a task added ( O(log n) per word of the task )
+def add(index, number, title, description):
+    def added(postings, token):
+        return with_numbers(postings, token, sorted_index.insert(numbers_of(postings, token), number))
+
+    return TextIndex(reduce(added, tokens(title, description), index.postings))
+
+
+# Returns the index with a task removed ( words no task contains any more leave the index )
+def remove(index, number, title, description):
+    def removed(postings, token):
+        numbers = numbers_of(postings, token)
+        return postings if numbers is None else with_numbers(postings, token, sorted_index.remove(numbers, number))
+
+    return TextIndex(reduce(removed, tokens(title, description), index.postings))
+
+
+# The words of a query : the complete words, and the last word when it is still being typed
+def query_terms(query):
+    words = WORD.findall(query.lower())
+    if words and WORD.match(query[-1:]):
+        return tuple(words[:-1]), words[-1]
+    return tuple(words), None
+
+
+# True for a query without any word ( it matches every task )
+def is_blank(query):
+    return WORD.search(query) is None
+
+
+# Numbers trees of the tokens that start with a prefix ( one range of the postings, O(log n + k) )
+# the bounds are 1-tuples, so an entry is only compared with them by its token
+def prefixed(index, prefix):
+    start = sorted_index.rank(index.postings, (prefix,))
+    stop = sorted_index.rank(index.postings, (prefix + LAST_CHARACTER,))
+    return tuple(numbers for _, numbers in slice_values(index.postings, start, stop, []))
+
+
+# The numbers of found that a tree of numbers holds too : the tree is read into the intersection
+# unless it is more than SEARCH_RATIO times larger than found, then each number of found is searched in it
+def narrowed(found, numbers):
+    if sorted_index.size(numbers) <= len(found) * SEARCH_RATIO:
+        return found.intersection(to_list(numbers))
+    return frozenset(filter(partial(contains, numbers), found))
+
+
+# Numbers of the tasks that contain every complete word of the query and a word starting with its
+# last word; None for a query without words ( it matches every task )
+# the postings are intersected smallest first, so the cost follows the rarest word
+def search(index, query):
+    words, prefix = query_terms(query)
+    if not words and prefix is None:
+        return None
+    # a word no task contains has no numbers ( size 0 ), so it comes first
+    postings = sorted((numbers_of(index.postings, word) for word in words), key=sorted_index.size)
+    if postings and postings[0] is None:
+        return frozenset()
+    found = reduce(narrowed, postings[1:], frozenset(to_list(postings[0]))) if postings else None
+    if prefix is None:
+        return found
+    if found is None:
+        return frozenset(chain.from_iterable(map(to_list, prefixed(index, prefix))))
+    return frozenset().union(*(narrowed(found, numbers) for numbers in prefixed(index, prefix)))
+
+
+# True if a task matches a query ( the same rule as search, for tasks that are not in an index )
+def matches(query, title, description):
+    words, prefix = query_terms(query)
+    task_tokens = tokens(title, description)
+    return task_tokens.issuperset(words) and (prefix is None or any(token.startswith(prefix) for token in task_tokens))
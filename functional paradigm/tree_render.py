@@ -0,0 +1,158 @@
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import compress
+from operator import lt, ne, not_
+import metrics
+
+# Diff-based Treeview rendering
+# the rows a Treeview shows are described by a key per row ( its iid ) and a token per key that
+# changes whenever the content of the row changes. A new list of rows is compared with the one
+# shown before and only the rows that were removed, added, moved or changed are sent to Tk, so a
+# refresh costs Tk calls in proportion to the change instead of the length of the list.
+# The rows that kept their relative order ( the longest such run ) stay where they are, only the
+# others are detached and put back at their new position
+
+# Rows shown by a Treeview : the keys in display order, and the token of each key
+Rendered = namedtuple("Rendered", ["keys", "tokens"])
+
+NOTHING = Rendered((), {})
+
+# What changed between two renderings :
+# removed : keys of the rows to delete
+# moved : keys of the rows to detach and put back
+# placed : (position, key) of the moved and added rows, by increasing position
+# updated : (position, key) of the kept rows whose token changed
+RowChanges = namedtuple("RowChanges", ["removed", "moved", "placed", "updated"])
+
+
+# Indexes of a longest strictly increasing run of values ( not necessarily contiguous, O(n log n) )
+def longest_increasing(values):
+    tail_values = []     # smallest last value of an increasing run of each length
+    tail_indexes = []
+    previous = [None] * len(values)
+    for index, value in enumerate(values):
+        length = bisect_left(tail_values, value)
+        previous[index] = tail_indexes[length - 1] if length else None
+        if length == len(tail_values):
+            tail_values.append(value)
+            tail_indexes.append(index)
+        else:
+            tail_values[length] = value
+            tail_indexes[length] = index
+
+    run = set()
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        run.add(index)
+        index = previous[index]
+    return run
+
+
+# Length of the common beginning of two sequences
+def common_prefix(first, second):
+    return next((index for index, (a, b) in enumerate(zip(first, second)) if a != b), min(len(first), len(second)))
+
+
+# Positions ( in new ) of the moved and added rows
+# the common beginning and end stay as they are, and when the kept rows in between are still in
+# their old order ( rows were only added or removed ) nothing moves; the longest increasing run is
+# only looked for when rows really changed places
+def placed_positions(old_positions, old_keys, new_keys):
+    if old_keys == new_keys:
+        return ()
+    start = common_prefix(old_keys, new_keys)
+    end = len(new_keys) - common_prefix(old_keys[start:][::-1], new_keys[start:][::-1])
+    middle = new_keys[start:end]
+    kept = tuple(compress(range(start, end), map(old_positions.__contains__, middle)))
+    old_order = tuple(map(old_positions.__getitem__, map(new_keys.__getitem__, kept)))
+    if all(map(lt, old_order, old_order[1:])):
+        return tuple(compress(range(start, end), map(not_, map(old_positions.__contains__, middle))))
+    staying = frozenset(map(kept.__getitem__, longest_increasing(old_order)))
+    return tuple(position for position in range(start, end) if position not in staying)
+
+
+# Compares the rows shown before with the rows to show
+# the loops that touch every row ( token comparisons, set difference ) run in C
+def diff_rows(old, new):
+    old_positions = dict(zip(old.keys, range(len(old.keys))))
+    placed = tuple((position, new.keys[position]) for position in placed_positions(old_positions, old.keys, new.keys))
+    changed = compress(range(len(new.keys)), map(ne, map(old.tokens.get, new.keys), map(new.tokens.__getitem__, new.keys)))
+    return RowChanges(
+        removed=tuple(old.tokens.keys() - new.tokens.keys()),
+        moved=tuple(key for _, key in placed if key in old_positions),
+        placed=placed,
+        updated=tuple((position, new.keys[position]) for position in changed if new.keys[position] in old_positions),
+    )
+
+
+# Shows the new rendering in a Treeview that shows the old one, and returns the new one
+# rows(positions) returns the (values, tags) of the rows at some positions of the new rendering,
+# it is only asked for the rows that are added or changed
+def render(tree, old, new, rows):
+    changes = diff_rows(old, new)
+    if changes.removed:
+        tree.delete(*changes.removed)
+    if changes.moved:
+        tree.detach(*changes.moved)
+
+    # Every row before a placed position is in place when it is reached, so its position is its index
+    moved = frozenset(changes.moved)
+    added = tuple((position, key) for position, key in changes.placed if key not in moved)
+    contents = dict(zip(added, rows(tuple(position for position, _ in added))))
+    for position, key in changes.placed:
+        if key in moved:
+            tree.move(key, "", position)
+        else:
+            values, tags = contents[position, key]
+            tree.insert("", position, iid=key, values=values, tags=tags)
+
+    for (_, key), (values, tags) in zip(changes.updated, rows(tuple(position for position, _ in changes.updated))):
+        tree.item(key, values=values, tags=tags)
+    if metrics.ENABLED:
+        metrics.record_refresh(len(added), len(changes.removed), len(changes.moved), len(changes.updated))
+    return new
+
+
+####### Paging :
+# without virtual scrolling the rows are added a page at a time : the first page is shown, and one
+# more each time the Treeview is scrolled to its last row
+
+# Number of rows to show once the Treeview reports the fraction last of the list in view ( its
+# yscrollcommand ) : one more page when the last row is in view and the list has more rows
+def paged_limit(limit, count, last, page_size):
+    return limit + page_size if float(last) >= 1.0 and limit < count else limit
+
+
+####### Virtual scrolling :
+# only the rows in view exist in the Treeview, a separate scrollbar moves a window over the list
+
+# Number of rows that fit in a Treeview ( at least one )
+def visible_rows(tree, row_height):
+    return max(1, tree.winfo_height() // row_height - 1)     # minus the heading
+
+
+# First row of a window of rows rows, kept inside a list of count rows
+def clamp_offset(offset, rows, count):
+    return max(0, min(offset, count - rows))
+
+
+# First row after a scrollbar command : ("moveto", fraction) or ("scroll", number, "units" | "pages")
+def scrolled_offset(offset, rows, count, *command):
+    if command[0] == "moveto":
+        return clamp_offset(round(float(command[1]) * count), rows, count)
+    step = int(command[1]) * (rows if command[2] == "pages" else 1)
+    return clamp_offset(offset + step, rows, count)
+
+
+# First row after a mouse wheel event ( delta on Windows / macOS, buttons 4 and 5 on X11 )
+def wheel_offset(offset, rows, count, event):
+    if event.num == 4 or event.delta > 0:
+        return clamp_offset(offset - 3, rows, count)
+    return clamp_offset(offset + 3, rows, count)
+
+
+# (first, last) fractions of the list a window shows, as the scrollbar expects them
+def scrollbar_fractions(offset, rows, count):
+    if not count:
+        return 0.0, 1.0
+    return offset / count, min(offset + rows, count) / count
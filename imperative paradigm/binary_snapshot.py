@@ -0,0 +1,204 @@
+import json
+import mmap
+import os
+import sys
+from array import array
+from itertools import accumulate
+from task_columns import HIGHLIGHT_NAMES, PRIORITY_NAMES, TaskColumns, reserve_versions, spaced_ranks
+import journal
+
+# Binary snapshot of the task columns ( the "binary" storage mode, tasks.bin )
+# the numeric columns are written as they are kept in memory, fixed-width arrays, and the text
+# columns ( titles, descriptions, ids ) as one heap of UTF-8 strings per column with an array of
+# offsets into it. Loading maps the file with mmap and copies the numeric arrays in one go; no
+# string is decoded until a task is shown or looked at, so the first screen of a large file is up
+# without reading the whole file. The snapshot holds the same fields as tasks.json, a file
+# converted one way and back is the same ( see convert_tasks_file in task_engine ).
+#
+# Both planners read and write the same snapshots : the highlights are the codes of
+# task_columns.HIGHLIGHT_NAMES ( normal, yellow, red, none ) and the creation times are seconds with
+# their fraction ( doubles ).
+#
+# file : MAGIC, header length ( 4 bytes, little endian ), JSON header, then the sections, each
+# starting at a multiple of 8 bytes; the header gives the offset and length of every section
+# ( counted from the end of the header ) and the byte order of the arrays
+
+MAGIC = b"TASKSNAP"
+FORMAT_VERSION = 2
+ALIGNMENT = 8
+
+# Numeric columns of TaskColumns and their array typecodes
+NUMBER_COLUMNS = (
+    ("due_days", "i"),
+    ("creation_times", "d"),
+    ("priorities", "b"),
+    ("statuses", "B"),
+    ("highlights", "b"),
+)
+STRING_COLUMNS = ("titles", "descriptions", "ids")
+
+# Typecodes of the numeric columns a snapshot of an older version wrote differently ( version 1 kept
+# the creation times as whole seconds ), they are read and converted
+OLD_TYPECODES = {1: {"creation_times": "q"}}
+
+# Lone surrogates a JSON file may hold survive the trip through UTF-8
+ENCODING_ERRORS = "surrogatepass"
+
+UNREAD = object()  # value of a string that was not decoded yet
+
+
+# Strings of a column kept in a heap : string i is heap[offsets[i]:offsets[i + 1]], decoded the first
+# time it is read; strings stored afterwards ( and None for deleted tasks ) are kept as they are
+class HeapStrings:
+    def __init__(self, heap, offsets):
+        self.heap = heap
+        self.offsets = offsets
+        self.values = [UNREAD] * (len(offsets) - 1)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self.values)))
+
+    def __getitem__(self, slot):
+        value = self.values[slot]
+        if value is UNREAD:
+            value = self.values[slot] = str(self.heap[self.offsets[slot]:self.offsets[slot + 1]], "utf-8", ENCODING_ERRORS)
+        return value
+
+    def __setitem__(self, slot, value):
+        self.values[slot] = value
+
+    def append(self, value):
+        self.values.append(value)
+
+    # UTF-8 bytes of a string ( straight from the heap when it was never decoded )
+    def encoded(self, slot):
+        value = self.values[slot]
+        if value is UNREAD:
+            return self.heap[self.offsets[slot]:self.offsets[slot + 1]]
+        return value.encode("utf-8", ENCODING_ERRORS)
+
+    # Copy that shares the heap ( it is never written to )
+    def copy(self):
+        strings = HeapStrings.__new__(HeapStrings)
+        strings.heap = self.heap
+        strings.offsets = self.offsets
+        strings.values = self.values[:]
+        return strings
+
+
+def padding(length):
+    return -length % ALIGNMENT
+
+
+# Heap and offsets of the strings of a column, in the order of the tasks
+def encode_strings(strings, order):
+    if isinstance(strings, HeapStrings):
+        encode = strings.encoded
+    else:
+        encode = lambda slot: strings[slot].encode("utf-8", ENCODING_ERRORS)
+    parts = list(map(encode, order))
+    return b"".join(parts), array("Q", accumulate(map(len, parts), initial=0))
+
+
+# Contents of the snapshot of a TaskColumns ( the tasks in their order, deleted slots are left out )
+def encode_snapshot(columns):
+    order = columns.order
+    sections = []
+    for name, typecode in NUMBER_COLUMNS:
+        sections.append((name, array(typecode, map(getattr(columns, name).__getitem__, order)).tobytes()))
+    for name in STRING_COLUMNS:
+        heap, offsets = encode_strings(getattr(columns, name), order)
+        sections.append((name + ".offsets", offsets.tobytes()))
+        sections.append((name + ".heap", heap))
+
+    layout = {}
+    offset = 0
+    for name, data in sections:
+        layout[name] = (offset, len(data))
+        offset += len(data) + padding(len(data))
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "count": len(order),
+        "byteorder": sys.byteorder,
+        "status_names": columns.status_names,
+        "sections": layout,
+    }).encode()
+    pieces = [MAGIC, len(header).to_bytes(4, "little"), header, bytes(padding(len(MAGIC) + 4 + len(header)))]
+    for name, data in sections:
+        pieces.append(data)
+        pieces.append(bytes(padding(len(data))))
+    return b"".join(pieces)
+
+
+# Writes the snapshot of a TaskColumns ( replaced atomically, like tasks.json )
+def write_snapshot(columns, path):
+    journal.write_atomically(path, encode_snapshot(columns))
+
+
+# True when a file starts like a snapshot
+def is_snapshot(path):
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+# Opens a snapshot and returns its TaskColumns, ValueError when the file is not a snapshot
+def read_snapshot(path):
+    with open(path, "rb") as file:
+        if os.name == "nt":
+            # A mapped file cannot be replaced on Windows, where the next save renames over it
+            data = file.read()
+        else:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a task snapshot")
+    header_end = len(MAGIC) + 4 + int.from_bytes(data[len(MAGIC):len(MAGIC) + 4], "little")
+    try:
+        header = json.loads(data[len(MAGIC) + 4:header_end])
+    except ValueError:
+        raise ValueError(f"{path} has a damaged header") from None
+    if header.get("version") not in (FORMAT_VERSION, *OLD_TYPECODES):
+        raise ValueError(f"{path} is a snapshot of an unknown version: {header.get('version')}")
+    start = header_end + padding(header_end)
+    count = header["count"]
+    view = memoryview(data)
+
+    def section(name):
+        offset, length = header["sections"][name]
+        if start + offset + length > len(data):
+            raise ValueError(f"{path} is truncated")
+        return view[start + offset:start + offset + length]
+
+    def number_array(name, typecode, size):
+        values = array(typecode)
+        values.frombytes(section(name))
+        if len(values) != size:
+            raise ValueError(f"{path} has a damaged {name} column")
+        if header["byteorder"] != sys.byteorder:
+            values.byteswap()
+        return values
+
+    columns = TaskColumns()
+    old_typecodes = OLD_TYPECODES.get(header["version"], {})
+    for name, typecode in NUMBER_COLUMNS:
+        values = number_array(name, old_typecodes.get(name, typecode), count)
+        setattr(columns, name, values if values.typecode == typecode else array(typecode, values))
+    # The codes index the name tables : a damaged file is refused here rather than failing later
+    code_ranges = ((columns.priorities, len(PRIORITY_NAMES)), (columns.statuses, len(header["status_names"])), (columns.highlights, len(HIGHLIGHT_NAMES)))
+    if count and any(min(codes) < 0 or max(codes) >= size for codes, size in code_ranges):
+        raise ValueError(f"{path} has damaged task codes")
+    for name in STRING_COLUMNS:
+        offsets = number_array(name + ".offsets", "Q", count + 1)
+        setattr(columns, name, HeapStrings(section(name + ".heap"), offsets))
+    columns.versions = array("q", reserve_versions(count))
+    columns.order = array("q", range(count))
+    columns.ranks = spaced_ranks(count)
+    columns.status_names = header["status_names"]
+    columns.status_codes = {status: code for code, status in enumerate(columns.status_names)}
+    columns.slot_by_id = None
+    return columns
@@ -0,0 +1,213 @@
+import csv
+import json
+import os
+import re
+from collections import deque
+from datetime import date, datetime
+
+import json_stream
+
+# Bulk import and export
+# an import streams the records of a CSV, JSON Lines or JSON file : they are read in batches of
+# BATCH_SIZE and each batch is decoded and validated with the rules of the add dialog ( a title and a
+# description, a known priority, a YYYY-MM-DD due date ). A file of PARALLEL_BYTES or more is
+# validated on a process pool, a few batches ahead of the one being added, so the whole file is
+# never held in memory. The task engine then stores every task with one write ( see
+# task_engine.import_tasks ).
+# An export writes each task as soon as it is read, the JSON format too.
+
+FORMATS = ("csv", "jsonl", "json")
+
+# Fields an export writes and an import reads ( the highlight is derived from the others ); the id is
+# kept, so an exported file imported in another store gives the same tasks, an id the store already
+# holds is replaced by a new one
+EXPORT_FIELDS = ("title", "description", "due_date", "priority", "status", "creation_time", "id")
+IMPORT_FIELDS = EXPORT_FIELDS
+
+PRIORITIES = ("Low", "Medium", "High")
+STATUSES = ("Pending", "Completed", "Overdue")
+
+# Records validated together ( a job of the process pool )
+BATCH_SIZE = 2000
+
+# Files at least this big are validated on a process pool ( when there are several processors, on
+# one the pool would only add the cost of sending the batches )
+PARALLEL_BYTES = 4 * 1024 * 1024
+
+# Batches a worker process may be given before the first one is added
+BATCHES_AHEAD = 2
+
+# Layout of a due date and of a creation time ( the values are then checked by fromisoformat )
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+TIME_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\Z")
+
+
+# Format of a file from its name ( .csv, .jsonl / .ndjson or .json ), ValueError for another one
+def format_of(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".json":
+        return "json"
+    raise ValueError(f"Unknown file format: {path} ( use --format )")
+
+
+# The task dict of an imported record, raises ValueError when it cannot be added
+# status and creation_time may be left out ( a new task is pending and created now ), a pending
+# task whose due date passed becomes overdue like in the add dialog
+def validate_record(record, today, now):
+    if not isinstance(record, dict):
+        raise ValueError("not an object")
+    for field in IMPORT_FIELDS:
+        if record.get(field) is not None and not isinstance(record[field], str):
+            raise ValueError(f"{field} is not text")
+    if not (record.get("title") or "").strip():
+        raise ValueError("title is required")
+    if not (record.get("description") or "").strip():
+        raise ValueError("description is required")
+    if record.get("priority") not in PRIORITIES:
+        raise ValueError(f"unknown priority: {record.get('priority')}")
+    try:
+        if not DATE_PATTERN.match(record.get("due_date") or ""):
+            raise ValueError
+        due_date = date.fromisoformat(record["due_date"])
+    except ValueError:
+        raise ValueError(f"invalid due date: {record.get('due_date')} ( expected YYYY-MM-DD )") from None
+    status = record.get("status") or "Pending"
+    if status not in STATUSES:
+        raise ValueError(f"unknown status: {status}")
+    creation_time = record.get("creation_time") or now
+    try:
+        if not TIME_PATTERN.match(creation_time):
+            raise ValueError
+        datetime.fromisoformat(creation_time)
+    except ValueError:
+        raise ValueError(f"invalid creation time: {creation_time}") from None
+    if status == "Pending" and due_date < today:
+        status = "Overdue"
+    task = {
+        "title": record["title"],
+        "description": record["description"],
+        "due_date": record["due_date"],
+        "priority": record["priority"],
+        "status": status,
+        "creation_time": creation_time,
+    }
+    if record.get("id"):
+        task["id"] = record["id"]
+    return task
+
+
+# Decodes and validates a batch ( run by a worker process for a large file )
+# items are the lines of a JSON Lines file, the rows of a CSV file ( with its header ) or the
+# objects of a JSON file; returns (task dicts, error messages)
+def validate_batch(job):
+    file_format, first_number, header, items, today, now = job
+    tasks = []
+    errors = []
+    for number, item in enumerate(items, first_number):
+        try:
+            if file_format == "jsonl":
+                try:
+                    item = json.loads(item)
+                except ValueError:
+                    raise ValueError("not valid JSON") from None
+            elif file_format == "csv":
+                if len(item) != len(header):
+                    raise ValueError(f"{len(item)} values for {len(header)} columns")
+                item = dict(zip(header, item))
+            tasks.append(validate_record(item, today, now))
+        except ValueError as error:
+            errors.append(f"record {number}: {error}")
+    return tasks, errors
+
+
+# The records of a file, undecoded where a worker can decode them : lines of a JSON Lines file
+# ( blank ones are skipped ), rows of a CSV file, objects of a JSON file; returns (header, records)
+def read_records(file, file_format):
+    if file_format == "jsonl":
+        return None, (line for line in file if line.strip())
+    if file_format == "csv":
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return [], iter(())
+        return [name.strip() for name in header], reader
+    if file_format == "json":
+        return None, json_stream.iter_json_array(file)
+    raise ValueError(f"Unknown file format: {file_format}")
+
+
+# Jobs of validate_batch, BATCH_SIZE records each
+def batch_jobs(file, file_format, today, now):
+    header, records = read_records(file, file_format)
+    number = 1
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == BATCH_SIZE:
+            yield file_format, number, header, batch, today, now
+            number += len(batch)
+            batch = []
+    if batch:
+        yield file_format, number, header, batch, today, now
+
+
+# Runs the jobs on a process pool, results in order; only a few jobs are queued at a time
+def map_on_pool(function, jobs):
+    from concurrent.futures import ProcessPoolExecutor  # multiprocessing is only loaded for a large import
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for job in jobs:
+            pending.append(executor.submit(function, job))
+            if len(pending) >= workers * BATCHES_AHEAD:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# Reads a file to import, yields (task dicts, error messages) per batch of records; parallel tells
+# whether to use the process pool ( by default for a large file )
+# ( OSError when it cannot be read, ValueError for a file that is not valid JSON or CSV )
+def read_task_batches(path, file_format=None, parallel=None):
+    file_format = file_format or format_of(path)
+    if parallel is None:
+        parallel = (os.cpu_count() or 1) > 1 and os.path.getsize(path) >= PARALLEL_BYTES
+    today = datetime.now().date()
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(path, "r", newline="" if file_format == "csv" else None, encoding="utf-8-sig") as file:
+        jobs = batch_jobs(file, file_format, today, now)
+        try:
+            results = map_on_pool(validate_batch, jobs) if parallel else map(validate_batch, jobs)
+            for result in results:
+                yield result
+        except csv.Error as error:
+            raise ValueError(f"Invalid CSV: {error}") from None
+
+
+# Writes task dicts to a file as they are read from records ( an iterable, e.g. a generator ),
+# returns their number; the JSON is laid out like the tasks file
+def write_records(records, file_format, file):
+    count = 0
+    if file_format == "csv":
+        writer = csv.DictWriter(file, fieldnames=EXPORT_FIELDS, lineterminator="\n", extrasaction="ignore")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    elif file_format == "jsonl":
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+            count += 1
+    elif file_format == "json":
+        for record in records:
+            file.write("[\n" if count == 0 else ",\n")
+            file.write("    " + json.dumps(record, indent=4).replace("\n", "\n    "))
+            count += 1
+        file.write("\n]\n" if count else "[]\n")
+    else:
+        raise ValueError(f"Unknown file format: {file_format}")
+    return count
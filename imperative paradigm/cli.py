@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+import bulk_io
+import shared_store
+import task_engine
+
+# Command line interface of the task planner
+# lists, adds, completes, filters, sorts and exports tasks from scripts and cron jobs. Only the
+# headless task_engine is imported, so it starts quickly and runs without a display; the window
+# is only loaded by the "gui" command.
+#
+#   python cli.py list --sort due_date
+#   python cli.py sort due_date --page 2 --page-size 20
+#   python cli.py add "Write report" --description "Quarterly numbers" --due 2025-03-31 --priority High
+#   python cli.py complete 3
+#   python cli.py add "Water the plants" --description "Balcony" --due 2025-03-03 --priority Low --repeat "FREQ=WEEKLY;BYDAY=MO,TH"
+#   python cli.py occurrences --from 2025-03-01 --to 2025-03-31
+#   python cli.py filter --status Pending --to 2025-03-31 --json
+#   python cli.py export --format csv --output tasks.csv
+#   python cli.py export --format jsonl --status Pending --sort due_date --output pending.jsonl
+#   python cli.py import tasks.csv
+#   python cli.py convert tasks.json tasks.bin
+
+STATUSES = ("Pending", "Completed", "Overdue")
+
+# Columns of the table printed by list / filter / sort
+TABLE_HEADINGS = ("#", "Title", "Description", "Due Date", "Priority", "Status")
+TABLE_FIELDS = ("title", "description", "due_date", "priority", "status")
+
+# Invalid records an import prints ( the others are counted )
+MAX_ERRORS = 20
+
+
+# Date argument ( "YYYY-MM-DD", like the calendars of the window return )
+def date_argument(text):
+    try:
+        datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {text} ( expected YYYY-MM-DD )") from None
+    return text
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Task planner without the window.")
+    parser.add_argument("--file", default=task_engine.TASKS_FILE, help="tasks file ( default: tasks.json )")
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite", "shared", "binary"), default=task_engine.STORAGE_MODE, help="storage mode of the tasks file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list the tasks")
+    list_parser.add_argument("--sort", choices=task_engine.SORT_KEYS, help="order the tasks by a field")
+    list_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    sort_parser = commands.add_parser("sort", help="list the tasks ordered by a field")
+    sort_parser.add_argument("sort", choices=task_engine.SORT_KEYS)
+    sort_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    # A page of a sorted list is read without sorting every task ( see task_engine.sorted_page )
+    for page_parser in (list_parser, sort_parser):
+        page_parser.add_argument("--page", type=int, help="only print this page of the list ( from 1 )")
+        page_parser.add_argument("--page-size", type=int, default=task_engine.PAGE_SIZE, help=f"tasks of a page ( default: {task_engine.PAGE_SIZE} )")
+
+    filter_parser = commands.add_parser("filter", help="list the tasks that match every criterion")
+    filter_parser.add_argument("--priority", choices=task_engine.PRIORITIES)
+    filter_parser.add_argument("--status", choices=STATUSES)
+    filter_parser.add_argument("--from", dest="start_date", type=date_argument, help="first due date")
+    filter_parser.add_argument("--to", dest="end_date", type=date_argument, help="last due date")
+    filter_parser.add_argument("--text", help="words of the title or description")
+    filter_parser.add_argument("--sort", choices=task_engine.SORT_KEYS, help="order the tasks by a field")
+    filter_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    next_parser = commands.add_parser("next", help="list the most urgent tasks that are not completed")
+    next_parser.add_argument("--count", type=int, default=5, help="number of tasks ( default: 5 )")
+    next_parser.add_argument("--priority-weight", type=float, help="weight of a priority step in the urgency score")
+    next_parser.add_argument("--due-weight", type=float, help="weight of a day of due date in the urgency score")
+    next_parser.add_argument("--age-weight", type=float, help="weight of a day of age in the urgency score")
+    next_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    add_parser = commands.add_parser("add", help="add a task")
+    add_parser.add_argument("title")
+    add_parser.add_argument("--description", required=True)
+    add_parser.add_argument("--due", required=True, type=date_argument, help="due date ( YYYY-MM-DD )")
+    add_parser.add_argument("--priority", required=True, choices=task_engine.PRIORITIES)
+    add_parser.add_argument("--repeat", metavar="RULE", help="add a recurring task, e.g. FREQ=WEEKLY;BYDAY=MO,TH ( the due date is its first occurrence )")
+
+    occurrences_parser = commands.add_parser("occurrences", help="list the occurrences of the recurring tasks in a date range")
+    occurrences_parser.add_argument("--from", dest="start_date", type=date_argument, help="first due date ( default: today )")
+    occurrences_parser.add_argument("--to", dest="end_date", type=date_argument, help=f"last due date ( default: {task_engine.OCCURRENCE_DAYS} days after the first )")
+    occurrences_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    complete_occurrence_parser = commands.add_parser("complete-occurrence", help="mark an occurrence of a recurring task as completed")
+    complete_occurrence_parser.add_argument("id", help="id of the occurrence, as occurrences --json shows it")
+
+    complete_parser = commands.add_parser("complete", help="mark a task as completed")
+    complete_parser.add_argument("number", type=int, help="number of the task, as list shows it")
+
+    export_parser = commands.add_parser("export", help="write the tasks as JSON, JSON Lines or CSV, filtered and sorted like filter")
+    export_parser.add_argument("--format", choices=bulk_io.FORMATS, default="json")
+    export_parser.add_argument("--output", help="file to write ( default: standard output )")
+    export_parser.add_argument("--priority", choices=task_engine.PRIORITIES)
+    export_parser.add_argument("--status", choices=STATUSES)
+    export_parser.add_argument("--from", dest="start_date", type=date_argument, help="first due date")
+    export_parser.add_argument("--to", dest="end_date", type=date_argument, help="last due date")
+    export_parser.add_argument("--text", help="words of the title or description")
+    export_parser.add_argument("--sort", choices=task_engine.SORT_KEYS, help="order the tasks by a field")
+
+    import_parser = commands.add_parser("import", help="add the tasks of a CSV, JSON Lines or JSON file")
+    import_parser.add_argument("source")
+    import_parser.add_argument("--format", choices=bulk_io.FORMATS, help="format of the file ( default: from its extension )")
+    import_parser.add_argument("--skip-invalid", action="store_true", help="import the valid records when some are invalid")
+
+    convert_parser = commands.add_parser("convert", help="convert a tasks file to a binary snapshot ( .bin ) or back to JSON")
+    convert_parser.add_argument("source")
+    convert_parser.add_argument("target", help="file to write, a binary snapshot when it ends in .bin")
+
+    commands.add_parser("gui", help="open the window")
+    return parser
+
+
+# Slots of the tasks the list, sort, filter and next commands show, in the order they are shown
+def selected_slots(arguments):
+    tasks = task_engine.tasks
+    if arguments.command == "next":
+        weights = {"priority": arguments.priority_weight, "due_date": arguments.due_weight, "age": arguments.age_weight}
+        task_engine.set_urgency_weights(**{name: weight for name, weight in weights.items() if weight is not None})
+        return [task.slot for task in task_engine.next_tasks(arguments.count)]
+    if arguments.command != "filter":
+        slots = tasks.order if arguments.sort is None else task_engine.sorted_slots(arguments.sort)
+        if arguments.page is None:
+            return list(slots)
+        start = max(arguments.page - 1, 0) * arguments.page_size
+        return list(slots[start:start + arguments.page_size])
+
+    # The same query plan as the filter window : each criterion is a range of a sorted index
+    criteria = task_engine.filter_criteria(arguments.priority, arguments.status, arguments.start_date, arguments.end_date, arguments.text)
+    slots = [task.slot for task in task_engine.filter_tasks(criteria)]
+    if arguments.sort is not None:
+        slots.sort(key=lambda slot: task_engine.index_entry(tasks.row(slot), arguments.sort))
+    return slots
+
+
+def print_table(rows):
+    lines = [TABLE_HEADINGS]
+    for number, task in rows:
+        lines.append((str(number),) + tuple(task[field] for field in TABLE_FIELDS))
+    widths = [max(len(line[column]) for line in lines) for column in range(len(TABLE_HEADINGS))]
+    for line in lines:
+        print("  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip())
+
+
+def print_json(rows):
+    print(json.dumps([{"number": number, **dict(task)} for number, task in rows], indent=4))
+
+
+# Writes the tasks that match the options of export, each one as soon as it is read
+def export_tasks(arguments, file):
+    criteria = task_engine.filter_criteria(arguments.priority, arguments.status, arguments.start_date, arguments.end_date, arguments.text)
+    rows = task_engine.iter_tasks(criteria, arguments.sort)
+    bulk_io.write_records(({field: task[field] for field in bulk_io.EXPORT_FIELDS} for task in rows), arguments.format, file)
+
+
+# Writes the export to the standard output, returns the exit status
+# a reader that stops early ( e.g. export | head ) closes the pipe : the rest is dropped quietly, the
+# standard output is sent to devnull so the buffered output is not flushed again at exit
+def print_export(arguments):
+    try:
+        export_tasks(arguments, sys.stdout)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+
+# Adds the tasks of a file with one storage write; when a record is invalid nothing is imported,
+# unless --skip-invalid is given
+def import_file(arguments):
+    task_dicts = []
+    errors = []
+    error_count = 0
+    try:
+        for batch_tasks, batch_errors in bulk_io.read_task_batches(arguments.source, arguments.format):
+            error_count += len(batch_errors)
+            errors.extend(batch_errors[:MAX_ERRORS - len(errors)])
+            if not error_count or arguments.skip_invalid:
+                task_dicts.extend(batch_tasks)
+    except (OSError, ValueError) as error:
+        print(f"Cannot import {arguments.source}: {error}", file=sys.stderr)
+        return 1
+    for error in errors:
+        print(error, file=sys.stderr)
+    if error_count and not arguments.skip_invalid:
+        print(f"{error_count} invalid records, no task was imported ( --skip-invalid imports the others )", file=sys.stderr)
+        return 1
+    task_engine.import_tasks(task_dicts)
+    task_engine.save_tasks()
+    skipped = f", skipped {error_count} invalid records" if error_count else ""
+    print(f"Imported {len(task_dicts)} tasks{skipped}")
+    return 0
+
+
+# Runs a command on the loaded tasks, returns the exit status
+def run_command(arguments):
+    tasks = task_engine.tasks
+    if arguments.command in ("list", "sort", "filter", "next"):
+        # Tasks are numbered by their place in the task list, the number complete takes
+        positions = {slot: position for position, slot in enumerate(tasks.order)}
+        rows = [(positions[slot] + 1, tasks.row(slot)) for slot in selected_slots(arguments)]
+        if arguments.json:
+            print_json(rows)
+        else:
+            print_table(rows)
+        return 0
+
+    if arguments.command == "add":
+        # A due date in the past makes the task overdue ( like the window does )
+        task = {
+            "title": arguments.title,
+            "description": arguments.description,
+            "due_date": arguments.due,
+            "priority": arguments.priority,
+            "status": "Pending",
+            "creation_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        if arguments.repeat:
+            try:
+                task_engine.add_recurring_task(task, arguments.repeat)
+            except ValueError as error:
+                print(f"Invalid recurrence rule: {error}", file=sys.stderr)
+                return 1
+            print(f"Added recurring task: {arguments.title}")
+            return 0
+        task_engine.add_task(task)
+        task_engine.save_tasks()
+        print(f"Added task {len(tasks)}: {arguments.title}")
+        return 0
+
+    if arguments.command == "occurrences":
+        # Occurrences are not stored, they have no number
+        rows = [("-", task) for task in task_engine.filter_occurrences(start_date=arguments.start_date, end_date=arguments.end_date)]
+        if arguments.json:
+            print_json(rows)
+        else:
+            print_table(rows)
+        return 0
+
+    if arguments.command == "complete-occurrence":
+        try:
+            task_engine.set_occurrence_completed(arguments.id)
+        except KeyError:
+            print(f"No occurrence {arguments.id}", file=sys.stderr)
+            return 1
+        print(f"Completed occurrence {arguments.id}")
+        return 0
+
+    if arguments.command == "complete":
+        if not 1 <= arguments.number <= len(tasks):
+            print(f"No task {arguments.number} ( there are {len(tasks)} tasks )", file=sys.stderr)
+            return 1
+        index = arguments.number - 1
+        task_engine.update_task(tasks[index]["id"], tasks[index]["priority"], "Completed")
+        task_engine.save_tasks()
+        print(f"Completed task {arguments.number}: {tasks[index]['title']}")
+        return 0
+
+    if arguments.command == "export":
+        if arguments.output is None:
+            return print_export(arguments)
+        with open(arguments.output, "w", newline="") as file:
+            export_tasks(arguments, file)
+        return 0
+
+    if arguments.command == "import":
+        return import_file(arguments)
+    raise ValueError(f"Unknown command: {arguments.command}")
+
+
+def main(argv=None):
+    arguments = build_parser().parse_args(argv)
+    task_engine.STORAGE_MODE = arguments.storage
+    task_engine.TASKS_FILE = arguments.file
+    if arguments.command == "gui":
+        import taskplanner  # the window and tkinter are only loaded here
+        taskplanner.main()
+        return 0
+    if arguments.command == "convert":
+        try:
+            count = task_engine.convert_tasks_file(arguments.source, arguments.target)
+        except (OSError, ValueError) as error:
+            print(f"Cannot convert {arguments.source}: {error}", file=sys.stderr)
+            return 1
+        print(f"Wrote {count} tasks to {arguments.target}")
+        return 0
+
+    try:
+        task_engine.load_tasks()
+    except (OSError, ValueError) as error:
+        print(f"Cannot load {arguments.file}: {error}", file=sys.stderr)
+        return 1
+    try:
+        task_engine.mark_overdue_tasks()
+        return run_command(arguments)
+    except shared_store.ConflictError as error:
+        print(error, file=sys.stderr)
+        return 1
+    finally:
+        task_engine.close_storage()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
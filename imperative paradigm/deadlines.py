@@ -0,0 +1,66 @@
+import heapq
+from datetime import datetime
+
+# Deadline transitions
+# the highlight of a task that is not completed only changes on three days : it turns yellow when
+# its due date is two days away, red on its due date, and a pending task becomes overdue the day
+# after. A heap holds the next transition day of every task, so the app sleeps until the next one
+# starts and then re-checks only the tasks whose transition came, instead of checking every task
+# each time the list is redrawn
+
+HIGHLIGHT_DAYS = 2
+
+# Longest sleep between two checks ( also catches clock changes and a suspended computer )
+LONGEST_WAIT_MS = 60 * 60 * 1000
+
+transitions = []  # heap of (day, slot)
+
+
+# Day number of today
+def current_day():
+    return datetime.now().date().toordinal()
+
+
+# Day of the next state change of a task due on due_day, after today ( None when there is none )
+def next_transition(due_day, today):
+    for day in (due_day - HIGHLIGHT_DAYS, due_day, due_day + 1):
+        if day > today:
+            return day
+    return None
+
+
+# Schedules the next transition of the task in a slot ( completed tasks have none )
+# an entry may outlive its task ( changed, completed or deleted ), checking it again does no harm
+def schedule_task(columns, slot, today):
+    if columns.status_names[columns.statuses[slot]].lower() == "completed":
+        return
+    day = next_transition(columns.due_days[slot], today)
+    if day is not None:
+        heapq.heappush(transitions, (day, slot))
+
+
+# Schedules every task again ( after loading )
+def schedule_all(columns, today):
+    transitions.clear()
+    for slot in columns.order:
+        if columns.status_names[columns.statuses[slot]].lower() != "completed":
+            day = next_transition(columns.due_days[slot], today)
+            if day is not None:
+                transitions.append((day, slot))
+    heapq.heapify(transitions)
+
+
+# Removes the transitions that are due by today and returns the slots of their tasks
+def pop_due(today):
+    slots = []
+    while transitions and transitions[0][0] <= today:
+        slots.append(heapq.heappop(transitions)[1])
+    return slots
+
+
+# Milliseconds to wait before the next transition is due ( at most LONGEST_WAIT_MS )
+def milliseconds_until_next():
+    if not transitions:
+        return LONGEST_WAIT_MS
+    wait = (datetime.fromordinal(transitions[0][0]) - datetime.now()).total_seconds() * 1000
+    return int(min(max(wait, 0), LONGEST_WAIT_MS))
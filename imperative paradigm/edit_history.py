@@ -0,0 +1,53 @@
+from collections import deque
+
+# Undo / redo history
+# the task list is changed in place, so the history keeps compact inverse operations instead of
+# copies of the tasks : an entry holds the operation that undoes an edit and the one that makes it
+# again, ("add", task dict, position), ("update", id, priority, status) or ("delete", id). Undo and
+# redo apply one operation through the task engine like any other edit ( O(log n) index updates ).
+# The history keeps the last HISTORY_LIMIT edits, the oldest ones are dropped first
+
+HISTORY_LIMIT = 100
+
+
+class EditHistory:
+    def __init__(self, limit=HISTORY_LIMIT):
+        self.undo_entries = deque(maxlen=limit)     # (undo operation, redo operation), the most recent last
+        self.redo_entries = []
+        self.replaying = False      # True while an undo or redo is applied ( it is not a new edit )
+
+    def record(self, undo_operation, redo_operation):
+        if self.replaying:
+            return
+        self.undo_entries.append((undo_operation, redo_operation))
+        self.redo_entries.clear()
+
+    def clear(self):
+        self.undo_entries.clear()
+        self.redo_entries.clear()
+
+    # Applies the operation of the most recent entry of one side with apply(operation) and moves the
+    # entry to the other side; an entry that cannot be applied ( e.g. another planner deleted its
+    # task ) is dropped and the error raised again
+    def step(self, entries, other_entries, operation_index, apply):
+        entry = entries.pop()
+        self.replaying = True
+        try:
+            apply(entry[operation_index])
+        finally:
+            self.replaying = False
+        other_entries.append(entry)
+
+    # Undoes the last edit, False when there is none
+    def undo(self, apply):
+        if not self.undo_entries:
+            return False
+        self.step(self.undo_entries, self.redo_entries, 0, apply)
+        return True
+
+    # Makes the last undone edit again, False when there is none
+    def redo(self, apply):
+        if not self.redo_entries:
+            return False
+        self.step(self.redo_entries, self.undo_entries, 1, apply)
+        return True
@@ -0,0 +1,54 @@
+# Batch highlighting : the highlight state of every task in one pass over the columns
+# the due day and status columns are turned into byte strings of 0 / 1 flags by loops that run in C
+# ( map with a bound integer comparison, bytes.translate ), then each byte string is read as one
+# big integer, so a single & | ^ combines the flags of all the tasks at once
+
+# Highlight state of a task ( the same codes as task_columns.HIGHLIGHT_NAMES ), and its Treeview tag
+NORMAL, DUE_SOON, OVERDUE, COMPLETED = 0, 1, 2, 3
+STATE_TAGS = ("normal", "highlight", "overdue", "normal")
+
+
+# Flags of a sequence of integers as one integer ( byte i is 1 where predicate(values[i]) is true )
+def flags(values, predicate):
+    return int.from_bytes(bytes(map(predicate, values)), "little")
+
+
+# Flags of the tasks whose status matches, from their status codes ( bytes )
+# test is called once per status name, not once per task
+def status_flags(columns, status_codes, test):
+    table = bytearray(256)
+    for code, name in enumerate(columns.status_names):
+        if test(name):
+            table[code] = 1
+    return int.from_bytes(status_codes.translate(table), "little")
+
+
+# Highlight states of the tasks stored in slots of columns, in the order of slots ( today is a day number )
+# completed tasks are not highlighted, a due date whose day has started is overdue,
+# a due date in the next two days is due soon
+def classify(columns, slots, today):
+    due_days = tuple(map(columns.due_days.__getitem__, slots))
+    status_codes = bytes(map(columns.statuses.__getitem__, slots))
+    completed = status_flags(columns, status_codes, lambda name: name.lower() == "completed")
+    not_completed = status_flags(columns, status_codes, lambda name: name.lower() != "completed")
+
+    overdue = not_completed & flags(due_days, today.__ge__)
+    # overdue tasks are also due within two days, ^ leaves the ones that are only due soon
+    due_soon = (not_completed & flags(due_days, (today + 2).__ge__)) ^ overdue
+    states = due_soon * DUE_SOON | overdue * OVERDUE | completed * COMPLETED
+    return states.to_bytes(len(slots), "little")
+
+
+# Flags ( as bytes ) of the pending tasks whose due date is before today
+def pending_past_due(columns, slots, today):
+    past = flags(map(columns.due_days.__getitem__, slots), today.__gt__)
+    pending = status_flags(columns, bytes(map(columns.statuses.__getitem__, slots)), lambda name: name == "Pending")
+    return (pending & past).to_bytes(len(slots), "little")
+
+
+# Positions of the non zero bytes of a byte string
+def positions(flag_bytes):
+    position = flag_bytes.find(1)
+    while position != -1:
+        yield position
+        position = flag_bytes.find(1, position + 1)
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+
+# Append-only journal storage
+# every change is appended to the journal as one short JSON line, and a background thread
+# now and then folds the journal into a snapshot. Files are only appended to, or replaced
+# atomically ( temporary file, fsync, os.replace ), so a crash at any moment leaves a store
+# that loads : at worst the last, half-written journal line is dropped.
+#
+# snapshot : {"sequence": n, "tasks": [...]} holds every change up to sequence n
+# journal  : one {"sequence": n, "op": ...} record per line, records <= the snapshot's are skipped
+
+snapshot_path = None
+journal_path = None
+journal_file = None
+sequence = 0
+pending_records = 0
+compact_every = 500
+sync_writes = True
+journal_lock = threading.Lock()
+compaction_thread = None
+
+
+# Writes data to path so that readers see either the old or the new file, never a mix
+def write_atomically(path, data):
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+    # Make the rename durable ( directories cannot be opened for fsync on Windows )
+    if hasattr(os, "O_DIRECTORY"):
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+# Reads the journal records and the length of the valid part of the file
+# reading stops at the first line that is unfinished or not valid JSON ( a torn write )
+def read_records(path):
+    records = []
+    valid_length = 0
+    try:
+        with open(path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_length += len(line)
+    except FileNotFoundError:
+        pass
+    return records, valid_length
+
+
+# Reads the snapshot and the journal of a tasks file
+# returns the snapshot tasks and the journal records to replay on top of them
+def read_journal(filename="tasks.json"):
+    global snapshot_path, journal_path, sequence
+    base = os.path.splitext(filename)[0]
+    snapshot_path = base + ".snapshot.json"
+    journal_path = base + ".journal"
+
+    snapshot_sequence = 0
+    try:
+        with open(snapshot_path, "r") as file:
+            snapshot = json.load(file)
+        snapshot_sequence = snapshot["sequence"]
+        task_dicts = snapshot["tasks"]
+    except FileNotFoundError:
+        # First time the journal is used : start from the plain tasks file
+        try:
+            with open(filename, "r") as file:
+                task_dicts = json.load(file)
+        except FileNotFoundError:
+            task_dicts = []
+
+    records, _ = read_records(journal_path)
+    records = [record for record in records if record["sequence"] > snapshot_sequence]
+    sequence = records[-1]["sequence"] if records else snapshot_sequence
+    return task_dicts, records
+
+
+# Opens the journal for appending ( call after read_journal and after the records were replayed )
+def open_journal(every=500, sync=True):
+    global journal_file, pending_records, compact_every, sync_writes
+    records, valid_length = read_records(journal_path)
+    compact_every = every
+    sync_writes = sync
+    pending_records = len(records)
+
+    # Drop a torn last line so new records never get glued to it
+    journal_file = open(journal_path, "ab")
+    journal_file.truncate(valid_length)
+
+
+def is_open():
+    return journal_file is not None
+
+
+# Appends one change to the journal
+# snapshot_source returns a copy of the task dicts, it is only called when a compaction is due
+def append_record(record, snapshot_source):
+    append_records([record], snapshot_source)
+
+
+# Appends several changes with one write ( and one fsync )
+def append_records(records, snapshot_source):
+    global sequence, pending_records, compaction_thread
+    with journal_lock:
+        lines = []
+        for record in records:
+            sequence += 1
+            lines.append(json.dumps(dict(record, sequence=sequence), default=str).encode() + b"\n")
+        journal_file.write(b"".join(lines))
+        journal_file.flush()
+        if sync_writes:
+            os.fsync(journal_file.fileno())
+
+        pending_records += len(records)
+        if pending_records < compact_every:
+            return
+        if compaction_thread is not None and compaction_thread.is_alive():
+            return
+        pending_records = 0
+        # The copy is taken here, on the caller's thread, so the background thread never
+        # reads task dicts while the GUI is changing them
+        compaction_thread = threading.Thread(target=compact, args=(sequence, snapshot_source()), daemon=True)
+        compaction_thread.start()
+
+
+# Writes the snapshot, then keeps only the journal records that are newer than it
+def compact(snapshot_sequence, task_dicts):
+    global journal_file
+    try:
+        snapshot = {"sequence": snapshot_sequence, "tasks": task_dicts}
+        write_atomically(snapshot_path, json.dumps(snapshot, default=str).encode())
+        with journal_lock:
+            journal_file.close()
+            records, _ = read_records(journal_path)
+            newer = []
+            for record in records:
+                if record["sequence"] > snapshot_sequence:
+                    newer.append(json.dumps(record, default=str).encode() + b"\n")
+            write_atomically(journal_path, b"".join(newer))
+            journal_file = open(journal_path, "ab")
+    except OSError:
+        # Nothing was lost : the journal still holds every change, compaction is retried later
+        with journal_lock:
+            if journal_file.closed:
+                journal_file = open(journal_path, "ab")
+
+
+# Waits for a running compaction and closes the journal
+def close_journal():
+    global journal_file
+    if compaction_thread is not None:
+        compaction_thread.join()
+    with journal_lock:
+        if journal_file is not None:
+            journal_file.close()
+            journal_file = None
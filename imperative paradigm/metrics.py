@@ -0,0 +1,151 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# Instrumentation of the hot paths
+# spans time a function ( a latency histogram and a call count per span name ), counters add up
+# events ( Tk rows inserted, deleted, ... ) and gauges keep the last value of something.
+# It is switched on by the TASK_PLANNER_METRICS environment variable, the name of the metrics file
+# written when the program exits ( Prometheus text format when it ends with .prom, JSON otherwise ):
+#
+#   TASK_PLANNER_METRICS=metrics.json python taskplanner.py
+#
+# When it is off, timed() returns the function it decorates unchanged, so nothing is measured and
+# nothing is slowed down.
+
+METRICS_FILE = os.environ.get("TASK_PLANNER_METRICS", "")
+ENABLED = bool(METRICS_FILE)
+
+# Upper bounds of the histogram buckets, in seconds ( the last bucket has no bound )
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKET_LABELS = [str(bound) for bound in BUCKETS] + ["+Inf"]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    # Upper bound of the bucket that holds the quantile ( the largest time seen for the last bucket )
+    def quantile(self, fraction):
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= fraction * self.count:
+                return min(bound, self.max)
+        return self.max
+
+
+spans = {}  # span name -> Histogram
+counters = {}  # counter name -> total
+gauges = {}  # gauge name -> last value
+lock = threading.Lock()  # spans are also recorded by the background writer thread
+
+
+def observe(name, seconds):
+    with lock:
+        if name not in spans:
+            spans[name] = Histogram()
+        spans[name].observe(seconds)
+
+
+# Tk rows a refresh of the task list inserted, deleted, moved and changed : the totals and the last refresh
+def record_refresh(inserted, deleted, moved, updated):
+    with lock:
+        counters["tree_refreshes"] = counters.get("tree_refreshes", 0) + 1
+        for name, rows in (("inserted", inserted), ("deleted", deleted), ("moved", moved), ("updated", updated)):
+            counters[f"tk_rows_{name}"] = counters.get(f"tk_rows_{name}", 0) + rows
+            gauges[f"tk_rows_{name}_last_refresh"] = rows
+
+
+# Decorator : records the time of every call under the name of a span
+def timed(name):
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+
+        return timed_function
+
+    return decorate
+
+
+# (name, calls, mean, 95th percentile, max) of every span, in seconds ( for the stats window )
+def span_summaries():
+    with lock:
+        return [
+            (name, histogram.count, histogram.total / histogram.count, histogram.quantile(0.95), histogram.max)
+            for name, histogram in sorted(spans.items())
+        ]
+
+
+# (name, value) of every counter and gauge
+def event_values():
+    with lock:
+        return sorted(counters.items()) + sorted(gauges.items())
+
+
+def to_json():
+    with lock:
+        return json.dumps({
+            "spans": {
+                name: {
+                    "count": histogram.count,
+                    "sum": histogram.total,
+                    "max": histogram.max,
+                    "buckets": dict(zip(BUCKET_LABELS, histogram.counts)),
+                }
+                for name, histogram in spans.items()
+            },
+            "counters": dict(counters),
+            "gauges": dict(gauges),
+        }, indent=4)
+
+
+def to_prometheus():
+    lines = ["# TYPE task_planner_span_seconds histogram"]
+    with lock:
+        for name, histogram in spans.items():
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKET_LABELS, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'task_planner_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'task_planner_span_seconds_sum{{span="{name}"}} {histogram.total}')
+            lines.append(f'task_planner_span_seconds_count{{span="{name}"}} {histogram.count}')
+        lines.append("# TYPE task_planner_events_total counter")
+        for name, total in counters.items():
+            lines.append(f'task_planner_events_total{{event="{name}"}} {total}')
+        lines.append("# TYPE task_planner_gauge gauge")
+        for name, value in gauges.items():
+            lines.append(f'task_planner_gauge{{name="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+# Writes the metrics file ( the format follows its extension )
+def write(filename=None):
+    filename = filename or METRICS_FILE
+    with open(filename, "w") as file:
+        file.write(to_prometheus() if filename.endswith(".prom") else to_json())
+
+
+if ENABLED:
+    atexit.register(write)
@@ -0,0 +1,247 @@
+import os
+import shutil
+import smtplib
+import subprocess
+import time
+from collections import namedtuple
+from datetime import datetime
+from email.message import EmailMessage
+
+import save_worker
+
+# Notifications
+# the deadline warnings go through a Notifier instead of modal message boxes : notify() only queues
+# a notification, so the Tk thread never waits on a window, a file, a desktop notifier or a mail
+# server. A task is notified once per transition ( its key is the task id, the transition and the
+# due date ), the notifications queued within BATCH_DELAY are sent together as one batch and two
+# batches are at least MIN_INTERVAL apart ( what is queued meanwhile joins the next batch ).
+# The in-app toast panel is shown on the Tk thread; the other sinks run on a background worker
+# ( save_worker.BackgroundWriter, which merges the batches queued while one is being delivered )
+#
+# TASK_PLANNER_NOTIFY lists the sinks, e.g. "toast,log:notifications.log,desktop,smtp:localhost:1025"
+# ( the toast panel only by default ); smtp sends to a local stand-in server, such as the one
+# started by python -m aiosmtpd -n -l localhost:1025
+
+NOTIFY_SINKS = os.environ.get("TASK_PLANNER_NOTIFY", "toast")
+
+# Milliseconds the notifications of a burst are collected for, and the least time between two batches
+BATCH_DELAY = 500
+MIN_INTERVAL = 5000
+
+# Milliseconds a toast stays up
+TOAST_TIME = 8000
+
+# Titles a batch summary names for each transition, the others are counted
+SUMMARY_TITLES = 5
+
+LOG_FILE = "notifications.log"
+SMTP_SERVER = "localhost:1025"
+MAIL_SENDER = "task-planner@localhost"
+MAIL_RECIPIENT = "user@localhost"
+
+# Seconds a desktop notifier or the mail server may take
+SINK_TIMEOUT = 10
+
+Notification = namedtuple("Notification", ["key", "transition", "title", "due_date", "time"])
+
+
+class NotificationError(Exception):
+    pass
+
+
+# Summary of a batch : a headline and one line per transition naming its first tasks
+def batch_summary(batch):
+    titles = {}
+    for notification in batch:
+        titles.setdefault(notification.transition, []).append(notification.title)
+    lines = []
+    for transition, names in titles.items():
+        line = f"{transition}: {', '.join(names[:SUMMARY_TITLES])}"
+        if len(names) > SUMMARY_TITLES:
+            line += f" and {len(names) - SUMMARY_TITLES} more"
+        lines.append(line)
+    headline = "1 task needs attention" if len(batch) == 1 else f"{len(batch)} tasks need attention"
+    return headline, lines
+
+
+# One line per notification ( log file and mail body )
+def notification_line(notification):
+    return f"{notification.time:%Y-%m-%d %H:%M:%S} {notification.transition}: {notification.title} (due {notification.due_date})"
+
+
+# Shows the summary of each batch in a label of the window, hidden again after TOAST_TIME
+class ToastPanel:
+    name = "toast"
+    on_tk_thread = True
+
+    def __init__(self, label):
+        self.label = label
+        self.hide_timer = None
+
+    def deliver(self, batch):
+        headline, lines = batch_summary(batch)
+        self.label.configure(text="\n".join([headline] + lines))
+        self.label.pack(side="bottom", fill="x", padx=10, pady=5)
+        if self.hide_timer is not None:
+            self.label.after_cancel(self.hide_timer)
+        self.hide_timer = self.label.after(TOAST_TIME, self.hide)
+
+    def hide(self):
+        self.hide_timer = None
+        self.label.pack_forget()
+
+
+# Appends every notification to a text file
+class LogFileSink:
+    name = "log"
+    on_tk_thread = False
+
+    def __init__(self, path):
+        self.path = path
+
+    def deliver(self, batch):
+        with open(self.path, "a") as file:
+            file.writelines(notification_line(notification) + "\n" for notification in batch)
+
+
+# Command that shows a desktop notification ( notify-send on Linux, osascript on macOS )
+def desktop_command(title, text):
+    if shutil.which("notify-send"):
+        return ["notify-send", title, text]
+    if shutil.which("osascript"):
+        quote = lambda value: '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+        return ["osascript", "-e", f"display notification {quote(text)} with title {quote(title)}"]
+    raise NotificationError("No desktop notifier found ( notify-send or osascript )")
+
+
+# Shows the summary of each batch as one desktop notification
+class DesktopSink:
+    name = "desktop"
+    on_tk_thread = False
+
+    def deliver(self, batch):
+        headline, lines = batch_summary(batch)
+        subprocess.run(desktop_command(headline, "\n".join(lines)), check=True, capture_output=True, timeout=SINK_TIMEOUT)
+
+
+# Mails each batch ( the summary as subject, a line per notification as body )
+class SmtpSink:
+    name = "smtp"
+    on_tk_thread = False
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def deliver(self, batch):
+        message = EmailMessage()
+        message["Subject"] = batch_summary(batch)[0]
+        message["From"] = MAIL_SENDER
+        message["To"] = MAIL_RECIPIENT
+        message.set_content("\n".join(map(notification_line, batch)) + "\n")
+        with smtplib.SMTP(self.host, self.port, timeout=SINK_TIMEOUT) as server:
+            server.send_message(message)
+
+
+def smtp_sink(argument):
+    host, _, port = (argument or SMTP_SERVER).partition(":")
+    return SmtpSink(host or "localhost", int(port or 25))
+
+
+# Sink factories by name, called with the text after the ":" of the sink and the toast label
+SINK_FACTORIES = {
+    "toast": lambda argument, toast_label: ToastPanel(toast_label),
+    "log": lambda argument, toast_label: LogFileSink(argument or LOG_FILE),
+    "desktop": lambda argument, toast_label: DesktopSink(),
+    "smtp": lambda argument, toast_label: smtp_sink(argument),
+}
+
+
+# Sinks of a TASK_PLANNER_NOTIFY list, ValueError for an unknown sink
+def make_sinks(spec, toast_label):
+    sinks = []
+    for part in spec.split(","):
+        name, _, argument = part.strip().partition(":")
+        if not name:
+            continue
+        if name not in SINK_FACTORIES:
+            raise ValueError(f"Unknown notification sink: {name}")
+        sinks.append(SINK_FACTORIES[name](argument, toast_label))
+    return sinks
+
+
+# Two batches the worker did not deliver yet become one
+def join_batches(pending, batch):
+    return pending + batch
+
+
+def milliseconds():
+    return time.monotonic() * 1000
+
+
+class Notifier:
+    # on_error(error) runs on the Tk thread when a background sink failed
+    def __init__(self, root, sinks, on_error=None):
+        self.root = root
+        self.panels = [sink for sink in sinks if sink.on_tk_thread]
+        self.sinks = [sink for sink in sinks if not sink.on_tk_thread]
+        self.on_error = on_error
+        self.sent = set()           # keys of the notifications queued so far
+        self.queued = []            # the notifications of the next batch
+        self.scheduled = False      # whether the next batch has a timer
+        self.last_batch = -MIN_INTERVAL
+        self.writer = None
+        if self.sinks:
+            self.writer = save_worker.BackgroundWriter(root, self.deliver, merge=join_batches, on_done=self.delivered)
+
+    # Queues a notification unless the task was notified of this transition already, returns whether it was queued
+    def notify(self, task_id, transition, title, due_date):
+        key = (task_id, transition, due_date)
+        if key in self.sent:
+            return False
+        self.sent.add(key)
+        self.queued.append(Notification(key, transition, title, due_date, datetime.now()))
+        if not self.scheduled:
+            self.scheduled = True
+            wait = max(BATCH_DELAY, self.last_batch + MIN_INTERVAL - milliseconds())
+            self.root.after(int(wait), self.flush)
+        return True
+
+    # Sends the queued notifications as one batch ( Tk timer )
+    def flush(self):
+        self.scheduled = False
+        batch, self.queued = self.queued, []
+        if not batch:
+            return
+        self.last_batch = milliseconds()
+        for panel in self.panels:
+            panel.deliver(batch)
+        if self.writer is not None:
+            self.writer.submit(batch)
+
+    # Delivers a batch to the background sinks ( worker thread ), a failing sink does not stop the others
+    def deliver(self, batch):
+        errors = []
+        for sink in self.sinks:
+            try:
+                sink.deliver(batch)
+            except Exception as error:
+                errors.append(f"{sink.name}: {error}")
+        if errors:
+            raise NotificationError("; ".join(errors))
+
+    def delivered(self, result, outstanding):
+        if result.error is not None and self.on_error is not None:
+            self.on_error(result.error)
+
+    # Delivers what is still queued to the background sinks and stops the worker
+    # returns the errors that were not reported yet ( the window may already be gone )
+    def close(self):
+        batch, self.queued = self.queued, []
+        if self.writer is None:
+            return []
+        if batch:
+            self.writer.queue_job(batch)
+        results = self.writer.close()
+        self.writer = None
+        return [result.error for result in results if result.error is not None]
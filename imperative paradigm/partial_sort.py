@@ -0,0 +1,82 @@
+import heapq
+from bisect import bisect_left, insort
+from itertools import compress
+
+# Partial sorting
+# the first screenful of a sorted task list does not need every task in order : the smallest entries
+# of an ordering are selected with a heap ( heapq.nsmallest, O(n log k) for the first k entries ) and
+# only those are sorted. A SortedPrefix keeps the entries selected so far and selects again, twice
+# as many, when a page past them is read, so paging down a list costs one selection per doubling;
+# add / remove keep it exact while the tasks change. The task engine builds the full sorted index
+# ( see sorted_index ) instead once a page deep into the list is read.
+
+
+# The count smallest entries of the tasks in some slots, sorted
+# values are the first fields of their entries ( in slot order ), entries(slots) builds the entries
+# of some slots : the count smallest values are selected first, a column of numbers or names is
+# cheaper to select from than tuples, then only the entries up to the last of them are built
+def smallest_entries(count, slots, values, entries):
+    values = list(values)
+    if count < len(values):
+        last = heapq.nsmallest(count, values)[-1]
+        slots = list(compress(slots, map(last.__ge__, values)))
+    return heapq.nsmallest(count, entries(slots))
+
+
+class SortedPrefix:
+    # smallest(count) returns the count smallest entries of the ordering, sorted ( see smallest_entries )
+    def __init__(self, smallest):
+        self.smallest = smallest
+        self.prefix = []        # the len(self.prefix) smallest entries, sorted
+        self.complete = False   # True once the prefix holds every entry
+        self.selected = False
+
+    def __len__(self):
+        return len(self.prefix)
+
+    def select(self, length):
+        self.prefix = self.smallest(length)
+        self.complete = len(self.prefix) < length
+        self.selected = True
+
+    # Entries at positions start to stop of the ordering
+    def page(self, start, stop):
+        if not self.selected or (stop > len(self.prefix) and not self.complete):
+            self.select(max(stop, 2 * len(self.prefix)))
+        return self.prefix[start:stop]
+
+    # An entry smaller than the last one selected is one of the smallest entries now, a larger one is not
+    def add(self, entry):
+        if self.complete or (self.prefix and entry < self.prefix[-1]):
+            insort(self.prefix, entry)
+
+    # The prefix without the entry is still the smallest entries of the others
+    def remove(self, entry):
+        position = bisect_left(self.prefix, entry)
+        if position < len(self.prefix) and self.prefix[position] == entry:
+            del self.prefix[position]
+
+
+# Slots of the tasks in an ordering as a sequence of count slots, read a page at a time
+# read_page(start, stop) returns the entries at positions start to stop ( their slot is last ),
+# so the task list slices out the rows it shows without the ordering being sorted as a whole
+class PagedSlots:
+    def __init__(self, read_page, count):
+        self.read_page = read_page
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    # Reading the whole list is one page of every slot
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, positions):
+        if not isinstance(positions, slice):
+            position = positions + self.count if positions < 0 else positions
+            if not 0 <= position < self.count:
+                raise IndexError("slot position out of range")
+            return self.read_page(position, position + 1)[0][-1]
+        start, stop, _ = positions.indices(self.count)
+        return [entry[-1] for entry in self.read_page(start, stop)] if start < stop else []
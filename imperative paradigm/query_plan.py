@@ -0,0 +1,99 @@
+from collections import namedtuple
+
+# Filter query planner
+# a filter is a list of structured predicates instead of one list comprehension per criterion :
+# each predicate selects the entries of one sorted index that lie in a range. Predicates on the
+# same field are merged into one range, the number of tasks in each range is counted from the
+# index, and only the smallest range is read while the other predicates are checked on the index
+# entries of the tasks it holds. A combined filter costs about the size of its most selective part
+# instead of one pass over every task per criterion.
+# A predicate may also be a set of slots given by another index ( e.g. a text search ), it is
+# driven by reading those slots, or checked by looking a slot up in the set.
+
+# The tasks whose entry in the sorted index of field lies in [low, high) ( a bound of None is open )
+RangePredicate = namedtuple("RangePredicate", ["field", "low", "high"])
+
+# The tasks stored in one of the slots
+KeySetPredicate = namedtuple("KeySetPredicate", ["keys"])
+
+# Index entries are (value, ..., slot) tuples : (value,) is before every entry with that value and
+# (value, INFINITY) after all of them
+INFINITY = float("inf")
+
+
+# Tasks whose field is between first and last ( both included, either may be None )
+def between(field, first, last):
+    return RangePredicate(
+        field,
+        None if first is None else (first,),
+        None if last is None else (last, INFINITY),
+    )
+
+
+def equal_to(field, value):
+    return between(field, value, value)
+
+
+def at_least(field, first):
+    return between(field, first, None)
+
+
+def at_most(field, last):
+    return between(field, None, last)
+
+
+def key_in(keys):
+    return KeySetPredicate(set(keys))
+
+
+# True if an index entry lies in the range of a predicate
+def holds(predicate, entry):
+    return (predicate.low is None or predicate.low <= entry) and (predicate.high is None or entry < predicate.high)
+
+
+# One predicate per field, the ranges of the predicates on the same field are intersected
+# ( and so are the slot sets )
+def merge_predicates(predicates):
+    merged = {}
+    for predicate in predicates:
+        if isinstance(predicate, KeySetPredicate):
+            other = merged.get(KeySetPredicate)
+            merged[KeySetPredicate] = predicate if other is None else KeySetPredicate(other.keys & predicate.keys)
+            continue
+        other = merged.get(predicate.field)
+        if other is None:
+            merged[predicate.field] = predicate
+            continue
+        lows = [low for low in (other.low, predicate.low) if low is not None]
+        highs = [high for high in (other.high, predicate.high) if high is not None]
+        merged[predicate.field] = RangePredicate(predicate.field, max(lows) if lows else None, min(highs) if highs else None)
+    return list(merged.values())
+
+
+# Number of tasks a predicate selects
+def estimate(indexes, predicate):
+    if isinstance(predicate, KeySetPredicate):
+        return len(predicate.keys)
+    return indexes[predicate.field].count_range(predicate.low, predicate.high)
+
+
+# True if the task in a slot satisfies a predicate
+def satisfies(predicate, entry_of, slot):
+    if isinstance(predicate, KeySetPredicate):
+        return slot in predicate.keys
+    return holds(predicate, entry_of(predicate.field, slot))
+
+
+# Slots of the tasks that satisfy every predicate, yielded lazily in the order of the driving index
+# indexes maps a field to its SortedIndex, entry_of(field, slot) returns the entry of a slot in it
+def matching_slots(indexes, entry_of, predicates):
+    predicates = merge_predicates(predicates)
+    driver = min(predicates, key=lambda predicate: estimate(indexes, predicate))
+    others = [predicate for predicate in predicates if predicate is not driver]
+    if isinstance(driver, KeySetPredicate):
+        slots = driver.keys
+    else:
+        slots = (entry[-1] for entry in indexes[driver.field].irange(driver.low, driver.high))
+    for slot in slots:
+        if all(satisfies(predicate, entry_of, slot) for predicate in others):
+            yield slot
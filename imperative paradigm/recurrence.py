@@ -0,0 +1,195 @@
+import calendar
+import json
+from collections import namedtuple
+from datetime import MAXYEAR, date, datetime
+
+# Recurring tasks
+# a recurring task is stored once, as a definition with an RRULE-style rule, instead of one task per
+# occurrence. Its occurrences are produced by generators for a range of due days only : each rule
+# works out its first occurrence in the range with arithmetic and steps from there, so a series
+# without an end is never expanded past the range that is looked at.
+#
+# rule : "FREQ=DAILY|WEEKLY|MONTHLY" plus optional ";INTERVAL=n" ( every n days / weeks / months ),
+# ";BYDAY=MO,WE,FR" ( weekly only, the weekday of the start otherwise ), ";COUNT=n" ( n occurrences )
+# and ";UNTIL=YYYYMMDD" ( the last possible day ); a monthly rule keeps the day of the month of the
+# start and skips the months that do not have it, like RFC 5545 does
+#
+# definition ( stored in tasks.recurring.json ) : {"id", "title", "description", "priority", "rule",
+# "start" ( due date of the first occurrence ), "creation_time", "completed" ( due dates of the
+# occurrences that were completed )}
+
+Rule = namedtuple("Rule", ["frequency", "interval", "weekdays", "count", "until"])
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+# Day number of the last day a date can hold
+LAST_DAY = date(MAXYEAR, 12, 31).toordinal()
+
+# Separates the id of a definition from the due date in the id of an occurrence
+OCCURRENCE_SEPARATOR = "@"
+
+
+# Rule of an RRULE-style text, ValueError when it is not one
+def parse_rule(text):
+    parts = {}
+    for part in text.split(";"):
+        name, separator, value = part.partition("=")
+        if not separator or not value.strip():
+            raise ValueError(f"Bad recurrence rule part: {part!r}")
+        parts[name.strip().upper()] = value.strip().upper()
+
+    frequency = parts.pop("FREQ", None)
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unknown recurrence frequency: {frequency}")
+    interval = int(parts.pop("INTERVAL", "1"))
+    if interval < 1:
+        raise ValueError("The recurrence interval must be at least 1")
+    weekdays = ()
+    if "BYDAY" in parts:
+        if frequency != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        codes = parts.pop("BYDAY").split(",")
+        unknown = [code for code in codes if code not in WEEKDAY_CODES]
+        if unknown:
+            raise ValueError(f"Unknown weekdays: {', '.join(unknown)}")
+        weekdays = tuple(sorted(set(map(WEEKDAY_CODES.index, codes))))
+    count = None
+    if "COUNT" in parts:
+        count = int(parts.pop("COUNT"))
+        if count < 1:
+            raise ValueError("The recurrence count must be at least 1")
+    until = None
+    if "UNTIL" in parts:
+        until = datetime.strptime(parts.pop("UNTIL")[:8], "%Y%m%d").toordinal()
+    if parts:
+        raise ValueError(f"Unsupported recurrence rule parts: {', '.join(parts)}")
+    return Rule(frequency, interval, weekdays, count, until)
+
+
+# Occurrence days of a daily rule in [first, last] : occurrence k is start + k * interval
+def daily_days(rule, start, first, last):
+    index = max(0, -(-(first - start) // rule.interval))
+    day = start + index * rule.interval
+    while day <= last and (rule.count is None or index < rule.count):
+        yield day
+        index += 1
+        day += rule.interval
+
+
+# Occurrence days of a weekly rule in [first, last]
+# weeks start on Monday and are counted from the week of the start, every interval-th week has an
+# occurrence on each of the weekdays ( the days of the first week before the start are left out )
+def weekly_days(rule, start, first, last):
+    weekdays = rule.weekdays or (date.fromordinal(start).weekday(),)
+    week_start = start - date.fromordinal(start).weekday()
+    first_week = tuple(weekday for weekday in weekdays if week_start + weekday >= start)
+    period_length = 7 * rule.interval
+    period = max(0, (first - week_start) // period_length)
+    # Occurrences before the period the range starts in ( they count towards COUNT )
+    index = 0 if period == 0 else len(first_week) + (period - 1) * len(weekdays)
+    while week_start + period * period_length <= last:
+        for weekday in first_week if period == 0 else weekdays:
+            if rule.count is not None and index >= rule.count:
+                return
+            day = week_start + period * period_length + weekday
+            if day > last:
+                return
+            if day >= first:
+                yield day
+            index += 1
+        period += 1
+
+
+# Occurrence days of a monthly rule in [first, last]
+# without COUNT the months before the range are skipped with arithmetic; with it they are stepped
+# through, as the months without the day of the start do not count
+def monthly_days(rule, start, first, last):
+    start_date = date.fromordinal(start)
+    month = start_date.year * 12 + start_date.month - 1
+    if rule.count is None:
+        first_date = date.fromordinal(first)
+        month += max(0, (first_date.year * 12 + first_date.month - 1 - month) // rule.interval) * rule.interval
+    index = 0
+    while rule.count is None or index < rule.count:
+        year, month_index = divmod(month, 12)
+        if year > MAXYEAR or date(year, month_index + 1, 1).toordinal() > last:
+            return
+        if start_date.day <= calendar.monthrange(year, month_index + 1)[1]:
+            day = date(year, month_index + 1, start_date.day).toordinal()
+            if day > last:
+                return
+            if day >= first:
+                yield day
+            index += 1
+        month += rule.interval
+
+
+RULE_DAYS = {"DAILY": daily_days, "WEEKLY": weekly_days, "MONTHLY": monthly_days}
+
+
+# Occurrence days ( day numbers, increasing ) of a rule starting on the day start, between the days
+# first and last ( both included ); first None starts at the first occurrence
+def occurrence_days(rule, start, first, last):
+    first = start if first is None else max(first, start)
+    if rule.until is not None:
+        last = min(last, rule.until)
+    if first > last:
+        return iter(())
+    return RULE_DAYS[rule.frequency](rule, start, first, min(last, LAST_DAY))
+
+
+# Occurrences of a definition due between the days first and last, as task dicts in due date order
+# the id of an occurrence is the id of its definition and its due date; an occurrence is completed
+# when its due date is in the completed list, overdue once its day has passed, pending otherwise
+def occurrences(definition, first, last, today):
+    rule = parse_rule(definition["rule"])
+    start = datetime.strptime(definition["start"], "%Y-%m-%d").toordinal()
+    completed = set(definition["completed"])
+    for day in occurrence_days(rule, start, first, last):
+        due_date = date.fromordinal(day).isoformat()
+        if due_date in completed:
+            status = "Completed"
+        elif day < today:
+            status = "Overdue"
+        else:
+            status = "Pending"
+        yield {
+            "title": definition["title"],
+            "description": definition["description"],
+            "due_date": due_date,
+            "priority": definition["priority"],
+            "status": status,
+            "creation_time": definition["creation_time"],
+            "id": definition["id"] + OCCURRENCE_SEPARATOR + due_date,
+        }
+
+
+# True when a series has an occurrence due on a date ( "YYYY-MM-DD" )
+def is_occurrence(definition, due_date):
+    try:
+        day = datetime.strptime(due_date, "%Y-%m-%d").toordinal()
+    except ValueError:
+        return False
+    start = datetime.strptime(definition["start"], "%Y-%m-%d").toordinal()
+    return any(occurrence_days(parse_rule(definition["rule"]), start, day, day))
+
+
+# (definition id, due date) of an occurrence id, None for the id of a stored task
+def split_occurrence_id(occurrence_id):
+    definition_id, separator, due_date = occurrence_id.rpartition(OCCURRENCE_SEPARATOR)
+    return (definition_id, due_date) if separator else None
+
+
+# Reads the definitions of a recurring tasks file ( none when there is no file yet )
+def read_definitions(path):
+    try:
+        with open(path, "r") as file:
+            definitions = json.load(file)
+    except FileNotFoundError:
+        return []
+    if not isinstance(definitions, list):
+        raise ValueError(f"{path} does not hold a list of recurring tasks")
+    for definition in definitions:
+        parse_rule(definition["rule"])
+    return definitions
@@ -0,0 +1,117 @@
+import threading
+from collections import namedtuple
+from queue import Empty, SimpleQueue
+
+# Background writer
+# saves run on a worker thread instead of the Tk event thread : the GUI hands a job over ( what to
+# write ) and goes on at once. While a write is in progress the jobs submitted meanwhile are merged
+# into one pending job, so a burst of edits costs one write however many edits it holds.
+# Tk must only be called from the thread that runs mainloop, so the worker never calls back itself :
+# it queues what each write did, and an after() timer on the Tk thread reports it while jobs are
+# outstanding ( the timer stops once everything submitted was written ).
+
+# Milliseconds between two looks at the finished writes
+POLL_INTERVAL = 50
+
+# What one write reports : how many submitted jobs it held and the error it raised ( None when it succeeded )
+WriteResult = namedtuple("WriteResult", ["jobs", "error"])
+
+
+# Merge of a pending job and a newer one when the newer job replaces it ( e.g. a whole snapshot )
+def keep_latest(pending, job):
+    return job
+
+
+class BackgroundWriter:
+    # write(job) runs on the worker, merge(pending, job) combines two jobs that were not written yet,
+    # on_done(result, outstanding) runs on the Tk thread after each write with the number of jobs still to write
+    def __init__(self, root, write, merge=keep_latest, on_done=None):
+        self.root = root
+        self.write = write
+        self.merge = merge
+        self.on_done = on_done
+        self.results = SimpleQueue()
+        # Worker side : the merged job that is not written yet and how many jobs it holds
+        self.condition = threading.Condition()
+        self.pending = None
+        self.waiting = 0
+        self.closing = False
+        # Tk side : jobs submitted and not reported yet, whether the timer runs, and the job source
+        # of submit_when_idle
+        self.outstanding = 0
+        self.polling = False
+        self.requested = None
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.waiting and not self.closing:
+                    self.condition.wait()
+                if not self.waiting:
+                    return
+                job, jobs = self.pending, self.waiting
+                self.pending, self.waiting = None, 0
+            try:
+                self.write(job)
+                self.results.put(WriteResult(jobs, None))
+            except Exception as error:     # reported on the Tk thread, the worker keeps running
+                self.results.put(WriteResult(jobs, error))
+
+    # Hands a job to the worker ( merged into the pending one, if there is one )
+    def queue_job(self, job):
+        with self.condition:
+            self.pending = self.merge(self.pending, job) if self.waiting else job
+            self.waiting += 1
+            self.condition.notify()
+        self.outstanding += 1
+
+    def submit(self, job):
+        self.queue_job(job)
+        if not self.polling:
+            self.polling = True
+            self.root.after(POLL_INTERVAL, self.poll)
+
+    # Submits the job source() returns once the Tk thread is idle : the saves requested while one
+    # event is handled become one job, and source is only called once for them
+    def submit_when_idle(self, source):
+        if self.requested is None:
+            self.root.after_idle(self.submit_requested)
+        self.requested = source
+
+    def submit_requested(self):
+        source, self.requested = self.requested, None
+        if source is not None:
+            self.submit(source())
+
+    # Results of the writes that finished since the last call
+    def finished(self):
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except Empty:
+                return done
+
+    # Hands the finished writes to on_done ( Tk thread )
+    def poll(self):
+        for result in self.finished():
+            self.outstanding -= result.jobs
+            if self.on_done is not None:
+                self.on_done(result, self.outstanding)
+        self.polling = self.outstanding > 0
+        if self.polling:
+            self.root.after(POLL_INTERVAL, self.poll)
+
+    # Writes what is still pending ( a requested save too ) and stops the worker
+    # returns the results that were not reported yet ( the GUI may already be gone )
+    def close(self):
+        source, self.requested = self.requested, None
+        if source is not None:
+            self.queue_job(source())
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        self.worker.join()
+        return self.finished()
@@ -0,0 +1,97 @@
+import heapq
+
+# "What next" scheduler
+# the tasks that are not completed are kept in a heap ordered by an urgency score, so the most
+# urgent task is read in O(log n) and the k most urgent ones in O(k log n), without sorting the task
+# list. The score is a weighted sum of the priority rank, the due day and the creation day, the
+# lowest score is the most urgent :
+#
+#   score = priority rank * priority weight + due day * due date weight - creation day * age weight
+#
+# with the default weights one priority step counts as much as a week of due date, and every ten days
+# a task waits make it as urgent as if it was due a day earlier. The days of every task grow by the
+# same amount as time goes by, so the order of the heap never changes on its own.
+#
+# A changed task is pushed again instead of being looked for in the heap : each entry holds the
+# version of its slot ( see task_columns ), the entries of a task that changed, was completed or was
+# deleted since are dropped when they come to the top
+
+WEIGHTS = {"priority": 7.0, "due_date": 1.0, "age": 0.1}
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+queue = []  # heap of (score, creation seconds, slot, version)
+unscheduled = None  # columns given to schedule_all that were not put in the heap yet
+
+# The heap is built again once it holds this many times more entries than there are tasks
+REBUILD_RATIO = 2
+
+
+def urgency(columns, slot):
+    return (
+        columns.priorities[slot] * WEIGHTS["priority"]
+        + columns.due_days[slot] * WEIGHTS["due_date"]
+        - columns.creation_times[slot] / SECONDS_PER_DAY * WEIGHTS["age"]
+    )
+
+
+def is_open(columns, slot):
+    return columns.status_names[columns.statuses[slot]].lower() != "completed"
+
+
+def heap_entry(columns, slot):
+    return (urgency(columns, slot), columns.creation_times[slot], slot, columns.versions[slot])
+
+
+# True while the task an entry was pushed for is unchanged
+def is_current(columns, entry):
+    slot = entry[2]
+    return slot < len(columns.versions) and columns.holds_task(slot) and columns.versions[slot] == entry[3]
+
+
+# Schedules every task again ( after loading ), the heap is built the first time it is read
+def schedule_all(columns):
+    global unscheduled
+    queue.clear()
+    unscheduled = columns
+
+
+def build_queue(columns):
+    global unscheduled
+    unscheduled = None
+    queue[:] = [heap_entry(columns, slot) for slot in columns.order if is_open(columns, slot)]
+    heapq.heapify(queue)
+
+
+# Pushes the task in a slot after it was added or changed ( a completed task is not pushed )
+def schedule_task(columns, slot):
+    if unscheduled is not None:
+        return
+    if is_open(columns, slot):
+        heapq.heappush(queue, heap_entry(columns, slot))
+    if len(queue) > REBUILD_RATIO * len(columns) + 64:
+        build_queue(columns)
+
+
+# Changes the weights of the score and schedules every task again
+def set_weights(columns, **weights):
+    unknown = set(weights) - set(WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown urgency weights: {', '.join(sorted(unknown))}")
+    WEIGHTS.update(weights)
+    schedule_all(columns)
+
+
+# Slots of the count most urgent tasks, most urgent first
+# they are popped, stale entries on the way are dropped, and the current ones are pushed back
+def next_slots(columns, count=1):
+    if unscheduled is not None:
+        build_queue(unscheduled)
+    found = []
+    while queue and len(found) < count:
+        entry = heapq.heappop(queue)
+        if is_current(columns, entry):
+            found.append(entry)
+    for entry in found:
+        heapq.heappush(queue, entry)
+    return [entry[2] for entry in found]
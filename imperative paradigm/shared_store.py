@@ -0,0 +1,256 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+import journal
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Task store shared by several planner processes
+# the changes are appended to a journal all of them read, like the journal storage mode does, but
+# each append is a compare-and-swap : the sequence number of the last record is the version of the
+# store, and every process remembers the version it has seen. Under an advisory lock on the lock
+# file, a commit first reads the records the other processes appended since that version; a local
+# change to a task one of them changed too is a conflict and is not written, the other changes are
+# appended after their records. The lock is only held to read those few records and append a few
+# lines : the snapshot that compacts the journal is written outside of it and renamed into place.
+#
+# snapshot  : {"sequence": n, "tasks": [...]} holds every change up to sequence n
+# journal   : one {"sequence": n, "op": ...} record per line
+# lock file : "<snapshot sequence> <floor>", the journal holds every record after the floor
+
+# The journal is compacted once it holds this many records, and keeps the last KEEP_RECORDS of them
+# so the planners that did not read them yet can still catch up without loading the snapshot
+COMPACT_EVERY = 500
+KEEP_RECORDS = 500
+
+snapshot_path = None
+journal_path = None
+lock_path = None
+version = 0  # sequence of the last record this process read or wrote
+floor = 0  # floor of the journal when this process last read it
+journal_offset = 0  # bytes of the journal already read ( valid while the floor does not move )
+thread_lock = threading.Lock()  # the compaction thread takes the lock too
+compaction_thread = None
+opened = False
+
+
+# A local change was not written : another planner changed the same task first
+class ConflictError(Exception):
+    pass
+
+
+# Holds the lock of the store ( other planners wait for it ), yields the open lock file
+@contextmanager
+def store_lock():
+    with thread_lock:
+        lock_file = os.open(lock_path, os.O_RDWR | os.O_CREAT)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(lock_file, msvcrt.LK_LOCK, 1)
+            yield lock_file
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                os.lseek(lock_file, 0, os.SEEK_SET)
+                msvcrt.locking(lock_file, msvcrt.LK_UNLCK, 1)
+            os.close(lock_file)
+
+
+# (snapshot sequence, floor) written in the lock file by the last compaction
+def read_lock_file(lock_file):
+    os.lseek(lock_file, 0, os.SEEK_SET)
+    values = os.read(lock_file, 64).split()
+    return (int(values[0]), int(values[1])) if values else (0, 0)
+
+
+def write_lock_file(lock_file, snapshot_sequence, journal_floor):
+    os.lseek(lock_file, 0, os.SEEK_SET)
+    os.ftruncate(lock_file, 0)
+    os.write(lock_file, f"{snapshot_sequence} {journal_floor}".encode())
+    os.fsync(lock_file)
+
+
+# Reads the journal records from a byte offset, returns them and the length of their lines
+# reading stops at the first line that is unfinished or not valid JSON ( a planner that crashed
+# while appending; the next commit cuts the line off )
+def read_records_from(offset):
+    records = []
+    length = 0
+    try:
+        with open(journal_path, "rb") as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                length += len(line)
+    except FileNotFoundError:
+        pass
+    return records, length
+
+
+# Reads the records appended since this process last read the journal ( call it under the lock )
+# returns None when a compaction dropped records this process has not read yet
+def read_new_records(lock_file):
+    global floor, journal_offset
+    _, journal_floor = read_lock_file(lock_file)
+    if journal_floor != floor:
+        # The journal was rewritten by a compaction, it is read again from its start
+        if journal_floor > version:
+            return None
+        floor = journal_floor
+        journal_offset = 0
+    records, length = read_records_from(journal_offset)
+    journal_offset += length
+    return [record for record in records if record["sequence"] > version]
+
+
+# Reads the snapshot, or the plain tasks file the first time the store is used
+def read_snapshot(filename):
+    try:
+        with open(snapshot_path, "r") as file:
+            snapshot = json.load(file)
+        return snapshot["sequence"], snapshot["tasks"]
+    except FileNotFoundError:
+        pass
+    try:
+        with open(filename, "r") as file:
+            return 0, json.load(file)
+    except FileNotFoundError:
+        return 0, []
+
+
+# Opens the shared store of a tasks file ( or reads it again )
+# returns the snapshot tasks and the journal records to replay on top of them
+def open_store(filename="tasks.json"):
+    global snapshot_path, journal_path, lock_path, version, floor, journal_offset, opened
+    base = os.path.splitext(filename)[0]
+    snapshot_path = base + ".shared.json"
+    journal_path = base + ".shared.journal"
+    lock_path = base + ".lock"
+
+    # The snapshot is read without the lock : when a compaction moved the journal past it in the
+    # meantime, the newer snapshot is read
+    while True:
+        snapshot_sequence, task_dicts = read_snapshot(filename)
+        with store_lock() as lock_file:
+            _, floor = read_lock_file(lock_file)
+            if floor <= snapshot_sequence:
+                records, journal_offset = read_records_from(0)
+                break
+
+    records = [record for record in records if record["sequence"] > snapshot_sequence]
+    version = records[-1]["sequence"] if records else snapshot_sequence
+    opened = True
+    return task_dicts, records
+
+
+def is_open():
+    return opened
+
+
+# Appends local changes unless another planner changed the same tasks since this process last read
+# the store. Returns the records of the other planners ( to apply to the tasks ) and the local
+# records that conflict and were not written; when the store was compacted past this process,
+# the records are None and nothing was written
+def commit(records):
+    global version, journal_offset
+    with store_lock() as lock_file:
+        others = read_new_records(lock_file)
+        if others is None:
+            return None, list(records)
+        changed_ids = {record_task_id(record) for record in others}
+        conflicts = [record for record in records if record["op"] != "add" and record["id"] in changed_ids]
+        written = [record for record in records if record["op"] == "add" or record["id"] not in changed_ids]
+        if others:
+            version = others[-1]["sequence"]
+        if written:
+            first = version + 1
+            version += len(written)
+            lines = b"".join(
+                json.dumps(dict(record, sequence=sequence), default=str).encode() + b"\n"
+                for sequence, record in zip(range(first, version + 1), written)
+            )
+            with open(journal_path, "ab") as file:
+                # Cut off a line torn by a planner that crashed, so the new records are not glued to it
+                file.truncate(journal_offset)
+                file.write(lines)
+                file.flush()
+                os.fsync(file.fileno())
+            journal_offset += len(lines)
+        return others, conflicts
+
+
+# Reads the records other planners appended since this process last read the store
+# ( None when the store was compacted past this process, which has to open it again )
+def refresh():
+    global version
+    with store_lock() as lock_file:
+        others = read_new_records(lock_file)
+        if others:
+            version = others[-1]["sequence"]
+        return others
+
+
+def record_task_id(record):
+    return record["task"]["id"] if record["op"] == "add" else record["id"]
+
+
+# Starts a compaction in the background once the journal holds COMPACT_EVERY records more than it keeps
+# snapshot_source returns the task dicts at the version of this process ( every record applied )
+def compact_when_due(snapshot_source):
+    global compaction_thread
+    if version - floor < COMPACT_EVERY + KEEP_RECORDS:
+        return
+    if compaction_thread is not None and compaction_thread.is_alive():
+        return
+    # The copy is taken here, on the caller's thread, so the background thread never reads task
+    # dicts while they are changed
+    compaction_thread = threading.Thread(target=compact, args=(version, snapshot_source()), daemon=True)
+    compaction_thread.start()
+
+
+# Writes the snapshot of a version outside of the lock, then under the lock renames it into place
+# ( unless another planner wrote a newer one ) and drops the journal records older than the new floor
+def compact(snapshot_sequence, task_dicts):
+    temporary_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(json.dumps({"sequence": snapshot_sequence, "tasks": task_dicts}, default=str).encode())
+            file.flush()
+            os.fsync(file.fileno())
+        with store_lock() as lock_file:
+            stored_sequence, _ = read_lock_file(lock_file)
+            if stored_sequence >= snapshot_sequence:
+                os.remove(temporary_path)
+                return
+            os.replace(temporary_path, snapshot_path)
+            # The new floor is written first : the planners that see it read the journal from its start
+            new_floor = snapshot_sequence - KEEP_RECORDS
+            write_lock_file(lock_file, snapshot_sequence, new_floor)
+            records, _ = read_records_from(0)
+            kept = b"".join(json.dumps(record, default=str).encode() + b"\n" for record in records if record["sequence"] > new_floor)
+            journal.write_atomically(journal_path, kept)
+    except OSError:
+        # Nothing was lost : the journal still holds every change, compaction is retried later
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+# Waits for a running compaction and closes the store
+def close_store():
+    global opened
+    if compaction_thread is not None:
+        compaction_thread.join()
+    opened = False
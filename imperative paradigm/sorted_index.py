@@ -0,0 +1,104 @@
+from bisect import bisect_left, insort
+
+# Sorted index that keeps its entries in a list of small sorted buckets
+# add / remove only shift one bucket, so they cost O(log n) to locate the
+# bucket plus a short bounded move, instead of shifting the whole list
+
+BUCKET_SIZE = 512
+
+
+class SortedIndex:
+    def __init__(self, entries=()):
+        entries = sorted(entries)
+        self.buckets = [entries[i:i + BUCKET_SIZE] for i in range(0, len(entries), BUCKET_SIZE)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.length = len(entries)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for bucket in self.buckets:
+            yield from bucket
+
+    def __reversed__(self):
+        for bucket in reversed(self.buckets):
+            yield from reversed(bucket)
+
+    def add(self, entry):
+        self.length += 1
+        if not self.buckets:
+            self.buckets.append([entry])
+            self.maxes.append(entry)
+            return
+
+        # Find the first bucket whose largest entry is not smaller than the new one
+        position = bisect_left(self.maxes, entry)
+        if position == len(self.buckets):
+            position -= 1
+            self.buckets[position].append(entry)
+            self.maxes[position] = entry
+        else:
+            insort(self.buckets[position], entry)
+
+        # Split buckets that grew too large so moves stay short
+        bucket = self.buckets[position]
+        if len(bucket) > 2 * BUCKET_SIZE:
+            self.buckets.insert(position + 1, bucket[BUCKET_SIZE:])
+            del bucket[BUCKET_SIZE:]
+            self.maxes.insert(position, bucket[-1])
+
+    def remove(self, entry):
+        position = bisect_left(self.maxes, entry)
+        if position == len(self.buckets):
+            raise ValueError(f"{entry!r} is not in the index")
+        bucket = self.buckets[position]
+        index = bisect_left(bucket, entry)
+        if index == len(bucket) or bucket[index] != entry:
+            raise ValueError(f"{entry!r} is not in the index")
+
+        del bucket[index]
+        self.length -= 1
+        if not bucket:
+            del self.buckets[position]
+            del self.maxes[position]
+        else:
+            self.maxes[position] = bucket[-1]
+
+    # Entries at positions start to stop ( the buckets before start are skipped by their length )
+    def page(self, start, stop):
+        entries = []
+        for bucket in self.buckets:
+            if start < len(bucket):
+                entries.extend(bucket[max(start, 0):stop])
+            if stop <= len(bucket):
+                break
+            start -= len(bucket)
+            stop -= len(bucket)
+        return entries
+
+    # Number of entries smaller than key
+    def rank(self, key):
+        position = bisect_left(self.maxes, key)
+        if position == len(self.buckets):
+            return self.length
+        return sum(map(len, self.buckets[:position])) + bisect_left(self.buckets[position], key)
+
+    # Number of entries with low <= entry < high ( a bound of None is open )
+    def count_range(self, low, high):
+        count = (self.length if high is None else self.rank(high)) - (0 if low is None else self.rank(low))
+        return max(count, 0)
+
+    # Yields the entries with low <= entry < high in order ( a bound of None is open )
+    # only the buckets that overlap the range are read
+    def irange(self, low, high):
+        position = 0 if low is None else bisect_left(self.maxes, low)
+        start = 0 if low is None or position == len(self.buckets) else bisect_left(self.buckets[position], low)
+        while position < len(self.buckets):
+            bucket = self.buckets[position]
+            end = len(bucket) if high is None else bisect_left(bucket, high)
+            yield from bucket[start:end]
+            if end < len(bucket):
+                return
+            position += 1
+            start = 0
@@ -0,0 +1,169 @@
+import json
+import sqlite3
+from datetime import datetime
+from task_columns import new_task_id, with_task_id
+
+# SQLite task storage
+# each change is written as a single row ( INSERT / UPDATE / DELETE ) instead of rewriting a file,
+# and filters and sorts run as queries over indexed columns instead of scanning in Python
+# rows are found by the id of their task ( the task_id column, see task_columns )
+
+TASK_FIELDS = ("title", "description", "due_date", "priority", "status", "creation_time")
+PRIORITY_RANKS = {"High": 0, "Medium": 1, "Low": 2}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    task_id TEXT,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    due_date TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    priority_rank INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    creation_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_date, creation_time);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, due_date);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority_rank, creation_time);
+CREATE INDEX IF NOT EXISTS tasks_creation_time ON tasks (creation_time);
+"""
+
+TASK_ID_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS tasks_task_id ON tasks (task_id)"
+
+# Version of the schema ( PRAGMA user_version ) : 1 had no task ids
+SCHEMA_VERSION = 2
+
+# ORDER BY clause of each sort key ( each one is served by an index above )
+ORDER_BY = {
+    "priority": "priority_rank, creation_time",
+    "due_date": "due_date, creation_time",
+    "status": "status, creation_time",
+    "creation_time": "creation_time",
+}
+
+INSERT_SQL = f"INSERT INTO tasks (task_id, {', '.join(TASK_FIELDS)}, priority_rank) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+SELECT_SQL = f"SELECT task_id, {', '.join(TASK_FIELDS)} FROM tasks"
+
+connection = None
+
+
+def row_values(task):
+    return [task["id"]] + [task[field] for field in TASK_FIELDS] + [PRIORITY_RANKS[task["priority"]]]
+
+
+def task_dict(row):
+    task = {"id": row["task_id"]}
+    for field in TASK_FIELDS:
+        task[field] = row[field]
+    return task
+
+
+def is_open():
+    return connection is not None
+
+
+# Opens ( or creates ) the database and returns the stored tasks as dicts
+# a new database is filled once from the JSON tasks file, if there is one
+def open_store(db_filename="tasks.db", json_filename="tasks.json"):
+    global connection
+    connection = sqlite3.connect(db_filename)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0:
+        with connection:
+            connection.executescript(SCHEMA)
+            # One-shot migration of the existing tasks.json, in a single transaction
+            try:
+                with open(json_filename, "r") as file:
+                    task_dicts = json.load(file)
+                connection.executemany(INSERT_SQL, [row_values(with_task_id(position, task)) for position, task in enumerate(task_dicts)])
+            except FileNotFoundError:
+                pass
+    elif version == 1:
+        # The rows of a database made before tasks had ids get new ids
+        with connection:
+            connection.execute("ALTER TABLE tasks ADD COLUMN task_id TEXT")
+            row_ids = [row["id"] for row in connection.execute("SELECT id FROM tasks")]
+            connection.executemany("UPDATE tasks SET task_id = ? WHERE id = ?", [(new_task_id(), row_id) for row_id in row_ids])
+    if version < SCHEMA_VERSION:
+        with connection:
+            connection.execute(TASK_ID_INDEX)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    mark_overdue()
+    return [task_dict(row) for row in connection.execute(SELECT_SQL + " ORDER BY id")]
+
+
+# Applies the overdue rule in the database : pending tasks whose due date passed become overdue
+def mark_overdue():
+    with connection:
+        connection.execute(
+            "UPDATE tasks SET status = 'Overdue' WHERE status = 'Pending' AND due_date < ?",
+            (datetime.now().strftime("%Y-%m-%d"),),
+        )
+
+
+# task is a task dict with its id
+def insert_task(task):
+    insert_tasks([task])
+
+
+# Inserts several task dicts in one transaction
+def insert_tasks(tasks):
+    with connection:
+        connection.executemany(INSERT_SQL, map(row_values, tasks))
+
+
+def update_task(task_id, changes):
+    columns = {}
+    for field, value in changes.items():
+        if field in TASK_FIELDS:
+            columns[field] = value
+    if "priority" in columns:
+        columns["priority_rank"] = PRIORITY_RANKS[columns["priority"]]
+    if not columns:
+        return
+    assignments = ", ".join(f"{field} = ?" for field in columns)
+    with connection:
+        connection.execute(f"UPDATE tasks SET {assignments} WHERE task_id = ?", [*columns.values(), task_id])
+
+
+def delete_task(task_id):
+    with connection:
+        connection.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+
+
+# Filters and sorts in the database ( dates are "YYYY-MM-DD" strings, like the calendars return )
+def query_tasks(priority=None, status=None, start_date=None, end_date=None, order_by=None):
+    conditions = []
+    parameters = []
+    if priority:
+        conditions.append("priority_rank = ?")
+        parameters.append(PRIORITY_RANKS[priority])
+    if status:
+        conditions.append("status = ?")
+        parameters.append(status)
+    if start_date:
+        conditions.append("due_date >= ?")
+        parameters.append(start_date)
+    if end_date:
+        conditions.append("due_date <= ?")
+        parameters.append(end_date)
+
+    mark_overdue()
+    sql = SELECT_SQL
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY " + (ORDER_BY[order_by] if order_by else "id")
+    return [task_dict(row) for row in connection.execute(sql, parameters)]
+
+
+def close_store():
+    global connection
+    if connection is not None:
+        connection.close()
+        connection = None
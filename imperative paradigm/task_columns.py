@@ -0,0 +1,337 @@
+import hashlib
+import secrets
+from array import array
+from collections.abc import MutableMapping
+from datetime import date, datetime, timedelta
+from itertools import count
+
+# Columnar task storage
+# the fields of the tasks are kept in parallel columns instead of one dict of strings per task :
+# due dates as day numbers, creation times as seconds, priority, status and highlight as small
+# integer codes, and the title / description text apart from the numbers. Dates are parsed once,
+# when a task is stored, so sorting, filtering and highlighting only compare numbers.
+#
+# Each task lives in a slot that never moves while the task exists; the order of the tasks is
+# a separate array of slots, and the slot of a deleted task is reused by the next new one.
+# tasks[index] returns a TaskRow, a dict-like view of one slot, so task["status"] still works.
+# Every slot has a rank that grows along the order ( spaced by RANK_GAP, a task put back between
+# two others gets a rank in between ), so the position of a task is found by a binary search of
+# the order instead of a scan. Deleting or putting back a task shifts the order array ( one memmove ).
+#
+# Every slot also has a version number that is renewed whenever the task in it is stored or
+# changed ( the Treeview only redraws the rows whose version changed ). Version numbers are shared
+# by all the column stores, so no two contents of any slot ever have the same one.
+#
+# Every task has an id ( 16 hex digits ) that is stored with it in tasks.json and never changes;
+# slot_by_id finds the slot of an id in O(1), so a task is found by its id whatever order it is shown in.
+# Columns read from a binary snapshot ( see binary_snapshot ) build it the first time a task is
+# looked up, and keep their text in the snapshot until it is read.
+
+FIELDS = ("title", "description", "due_date", "priority", "status", "creation_time", "highlight", "id")
+
+# Priority code = rank of the priority, so ordering by code is ordering by priority
+PRIORITY_NAMES = ("High", "Medium", "Low")
+PRIORITY_CODES = {name: code for code, name in enumerate(PRIORITY_NAMES)}
+
+# Highlight states written by update_task_list ( the functional planner writes a flag, true for a task due soon )
+HIGHLIGHT_NAMES = ("normal", "yellow", "red", "none")
+HIGHLIGHT_CODES = {**{name: code for code, name in enumerate(HIGHLIGHT_NAMES)}, False: 0, True: 1}
+
+# Space between the ranks of two tasks added one after the other
+RANK_GAP = 1 << 32
+
+EPOCH = datetime(1970, 1, 1)
+
+version_numbers = count(1)
+
+
+# Version numbers for a number of new slots at once ( a range )
+def reserve_versions(size):
+    global version_numbers
+    first = next(version_numbers)
+    version_numbers = count(first + size)
+    return range(first, first + size)
+
+
+# Ranks of count tasks stored in slot order ( e.g. read from a binary snapshot )
+def spaced_ranks(count):
+    return array("q", range(0, count * RANK_GAP, RANK_GAP))
+
+
+# Id of a new task ( random, so tasks added by different processes do not collide )
+def new_task_id():
+    return secrets.token_hex(8)
+
+
+# Id of a task read from a file written before tasks had ids : derived from its place in the file
+# and its creation, so it is the same every time the file is read ( until the file is rewritten with ids )
+def legacy_task_id(position, task):
+    key = f"{position}\0{task['creation_time']}\0{task['title']}"
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+# The task dict with an id ( see legacy_task_id ), position is its place in the file
+def with_task_id(position, task):
+    if task.get("id"):
+        return task
+    return {**task, "id": legacy_task_id(position, task)}
+
+
+# Day number of an ISO date ( "2025-01-31" )
+def parse_day(text):
+    return datetime.fromisoformat(text).toordinal()
+
+
+def format_day(day):
+    return date.fromordinal(day).isoformat()
+
+
+# Seconds since 1970 of a creation time ( "2025-01-31 12:00:00", local time like the GUI writes it ),
+# with the fraction of a second a time may hold
+def parse_time(text):
+    return (datetime.fromisoformat(text) - EPOCH).total_seconds()
+
+
+# The creation time text of some seconds ( a time without a fraction of a second is written without one )
+def format_time(seconds):
+    return (EPOCH + timedelta(seconds=seconds)).isoformat(" ")
+
+
+class TaskColumns:
+    def __init__(self, tasks=()):
+        self.titles = []
+        self.descriptions = []
+        self.due_days = array("i")
+        self.creation_times = array("d")
+        self.priorities = array("b")
+        self.statuses = array("B")
+        self.highlights = array("b")
+        self.versions = array("q")
+        self.ranks = array("q")   # grows along the order, see position_of
+        self.ids = []
+        self.slot_by_id = {}   # None until id_slots builds it
+        self.order = array("q")   # slot of the task at each position
+        self.free_slots = []
+        # Status codes are given out the first time a status is seen
+        self.status_names = []
+        self.status_codes = {}
+        for task in tasks:
+            self.append(task)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        for slot in self.order:
+            yield TaskRow(self, slot)
+
+    def __getitem__(self, index):
+        return TaskRow(self, self.order[index])
+
+    def __delitem__(self, index):
+        slot = self.order.pop(index)
+        # Let go of the text and the id of the deleted task, the slot is reused by the next new task
+        self.titles[slot] = None
+        self.descriptions[slot] = None
+        del self.id_slots()[self.ids[slot]]
+        self.ids[slot] = None
+        self.free_slots.append(slot)
+
+    def row(self, slot):
+        return TaskRow(self, slot)
+
+    # Slot of the task with an id, None when there is no such task ( O(1) )
+    def slot_of(self, task_id):
+        return self.id_slots().get(task_id)
+
+    # Slot of every task id ( built from the ids the first time it is needed )
+    def id_slots(self):
+        if self.slot_by_id is None:
+            self.slot_by_id = {task_id: slot for slot, task_id in enumerate(self.ids) if task_id is not None}
+        return self.slot_by_id
+
+    # Position of the task in a slot : a binary search of the order by rank ( O(log n) )
+    def position_of(self, slot):
+        rank = self.ranks[slot]
+        low, high = 0, len(self.order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.ranks[self.order[middle]] < rank:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    # Rank for the task at a position, between the ranks of the tasks around it; when there is no
+    # room left between them every task is ranked again
+    def rank_between(self, position):
+        if len(self.order) == 1:
+            return 0
+        if position == len(self.order) - 1:
+            return self.ranks[self.order[position - 1]] + RANK_GAP
+        after = self.ranks[self.order[position + 1]]
+        if position == 0:
+            return after - RANK_GAP
+        before = self.ranks[self.order[position - 1]]
+        if after - before > 1:
+            return (before + after) // 2
+        self.renumber()
+        return self.ranks[self.order[position]]
+
+    def renumber(self):
+        for position, slot in enumerate(self.order):
+            self.ranks[slot] = position * RANK_GAP
+
+    # Copy of every column ( a snapshot another thread can read while this one goes on changing the tasks )
+    def copy(self):
+        columns = TaskColumns()
+        columns.titles = self.titles.copy()
+        columns.descriptions = self.descriptions.copy()
+        columns.due_days = self.due_days[:]
+        columns.creation_times = self.creation_times[:]
+        columns.priorities = self.priorities[:]
+        columns.statuses = self.statuses[:]
+        columns.highlights = self.highlights[:]
+        columns.versions = self.versions[:]
+        columns.ranks = self.ranks[:]
+        columns.ids = self.ids.copy()
+        columns.slot_by_id = None if self.slot_by_id is None else dict(self.slot_by_id)
+        columns.order = self.order[:]
+        columns.free_slots = self.free_slots[:]
+        columns.status_names = self.status_names[:]
+        columns.status_codes = dict(self.status_codes)
+        return columns
+
+    # False for a slot whose task was deleted ( and that was not reused yet )
+    def holds_task(self, slot):
+        return self.titles[slot] is not None
+
+    # Code of a status, a new status gets the next free code
+    def status_code(self, status):
+        code = self.status_codes.get(status)
+        if code is None:
+            if len(self.status_names) == 256:
+                raise ValueError("Too many different task statuses")
+            code = len(self.status_names)
+            self.status_names.append(status)
+            self.status_codes[status] = code
+        return code
+
+    # Stores a task dict at a position of the order ( the end by default, an undone delete puts the
+    # task back where it was ) and returns its row
+    # a task without an id, or with the id of another task, gets a new id
+    def append(self, task, position=None):
+        if task["priority"] not in PRIORITY_CODES:
+            raise ValueError(f"Unknown priority: {task['priority']}")
+        task_id = task.get("id")
+        if not task_id or task_id in self.id_slots():
+            task_id = new_task_id()
+        values = (
+            task["title"],
+            task["description"],
+            parse_day(task["due_date"]),
+            parse_time(task["creation_time"]),
+            PRIORITY_CODES[task["priority"]],
+            self.status_code(task["status"]),
+            HIGHLIGHT_CODES.get(task.get("highlight"), 0),
+            next(version_numbers),
+            self.ranks[self.order[-1]] + RANK_GAP if self.order else 0,
+            task_id,
+        )
+        columns = (self.titles, self.descriptions, self.due_days, self.creation_times, self.priorities, self.statuses, self.highlights, self.versions, self.ranks, self.ids)
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            for column, value in zip(columns, values):
+                column[slot] = value
+        else:
+            slot = len(self.titles)
+            for column, value in zip(columns, values):
+                column.append(value)
+        self.id_slots()[task_id] = slot
+        if position is None or position >= len(self.order):
+            self.order.append(slot)
+        else:
+            self.order.insert(position, slot)
+            self.ranks[slot] = self.rank_between(position)
+        return TaskRow(self, slot)
+
+    # Value of a field of a slot, as the string the task dict used to hold
+    def get_value(self, slot, field):
+        if field == "id":
+            return self.ids[slot]
+        if field == "title":
+            return self.titles[slot]
+        if field == "description":
+            return self.descriptions[slot]
+        if field == "due_date":
+            return format_day(self.due_days[slot])
+        if field == "priority":
+            return PRIORITY_NAMES[self.priorities[slot]]
+        if field == "status":
+            return self.status_names[self.statuses[slot]]
+        if field == "creation_time":
+            return format_time(self.creation_times[slot])
+        if field == "highlight":
+            return HIGHLIGHT_NAMES[self.highlights[slot]]
+        raise KeyError(field)
+
+    def set_value(self, slot, field, value):
+        if field == "title":
+            self.titles[slot] = value
+        elif field == "description":
+            self.descriptions[slot] = value
+        elif field == "due_date":
+            self.due_days[slot] = parse_day(value)
+        elif field == "priority":
+            if value not in PRIORITY_CODES:
+                raise ValueError(f"Unknown priority: {value}")
+            self.priorities[slot] = PRIORITY_CODES[value]
+        elif field == "status":
+            self.statuses[slot] = self.status_code(value)
+        elif field == "creation_time":
+            self.creation_times[slot] = parse_time(value)
+        elif field == "highlight":
+            self.highlights[slot] = HIGHLIGHT_CODES.get(value, 0)
+        else:
+            raise KeyError(field)
+        self.versions[slot] = next(version_numbers)
+
+
+# Dict-like view of the task stored in one slot ( reads and writes go to the columns )
+# the parsed values are also available directly : due_day, creation_seconds and priority_code
+class TaskRow(MutableMapping):
+    __slots__ = ("columns", "slot")
+
+    def __init__(self, columns, slot):
+        self.columns = columns
+        self.slot = slot
+
+    def __getitem__(self, field):
+        return self.columns.get_value(self.slot, field)
+
+    def __setitem__(self, field, value):
+        self.columns.set_value(self.slot, field, value)
+
+    def __delitem__(self, field):
+        raise TypeError("Task fields cannot be removed")
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    @property
+    def due_day(self):
+        return self.columns.due_days[self.slot]
+
+    @property
+    def creation_seconds(self):
+        return self.columns.creation_times[self.slot]
+
+    @property
+    def priority_code(self):
+        return self.columns.priorities[self.slot]
+
+    def __repr__(self):
+        return f"TaskRow({dict(self)!r})"
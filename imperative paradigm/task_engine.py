@@ -0,0 +1,655 @@
+import heapq
+import json
+import os
+from datetime import datetime
+from functools import lru_cache, partial
+from operator import itemgetter
+from sorted_index import SortedIndex
+from task_columns import PRIORITY_CODES, TaskColumns, format_day, new_task_id, with_task_id
+import binary_snapshot
+import deadlines
+import edit_history
+import highlight
+import journal
+import json_stream
+import metrics
+import partial_sort
+import query_plan
+import recurrence
+import scheduler
+import shared_store
+import sqlite_store
+import text_index
+
+# Headless task engine : the task list, its indexes, the highlighting rules and the storage
+# it never imports tkinter, so scripts, the command line ( cli.py ) and servers without a display
+# can use it; the window ( taskplanner.py ) is built on top of it
+
+# Global variables
+tasks = TaskColumns()  # columnar task storage, tasks[index] is a dict-like view of one task
+
+# How tasks are persisted : "json" rewrites the tasks file on every save,
+# "journal" appends each change to a journal that is compacted in the background,
+# "sqlite" writes each change as one row of a database and filters / sorts with indexed queries,
+# "shared" lets several planners use the same tasks file : each change is merged into a journal
+# they all read, under a file lock ( see shared_store ),
+# "binary" rewrites a binary snapshot that loads without parsing every task ( see binary_snapshot )
+STORAGE_MODE = "json"
+
+# The tasks file ( the journal, the database and the snapshot are named after it : tasks.journal, tasks.db, tasks.bin )
+TASKS_FILE = "tasks.json"
+
+# Sorted secondary indexes ( one per sortable field ), kept up to date by add / update / delete
+# an index is built the first time it is used, so the task list is shown without waiting for them
+SORT_KEYS = ("priority", "due_date", "status", "creation_time")
+
+# Column a sort key orders by ( status is ordered by name, see column_entries )
+SORT_COLUMNS = {"priority": "priorities", "due_date": "due_days", "creation_time": "creation_times"}
+
+
+class SortIndexes(dict):
+    def __missing__(self, sort_key):
+        if sort_key not in SORT_KEYS:
+            raise KeyError(sort_key)
+        sort_prefixes.pop(sort_key, None)     # the full index replaces the partial ordering
+        index = self[sort_key] = SortedIndex(column_entries(sort_key))
+        return index
+
+
+sort_indexes = SortIndexes()
+
+# Partial orderings ( see partial_sort ) of the sort keys whose full index is not built : a sorted
+# list is shown a page at a time, and only the tasks up to the page read are put in order
+sort_prefixes = {}
+
+# Rows of a page of a sorted list ( the task list shows one more page each time it is scrolled to its end )
+PAGE_SIZE = 100
+
+# The full index of a sort key is built once a page past 1 / FULL_SORT_RATIO of the tasks is read
+# ( selecting that many entries again and again would cost more than sorting them all once )
+FULL_SORT_RATIO = 8
+
+# Full-text index of the titles and descriptions ( also built the first time it is searched )
+search_index = text_index.TextIndex()
+
+# Recurring task definitions by id ( see recurrence ), stored once in tasks.recurring.json whatever
+# the storage mode; their occurrences are only produced for the days that are looked at
+recurring_tasks = {}
+
+# Days after the start of a range of occurrences that is not given an end ( the window shows the
+# occurrences from OCCURRENCE_DAYS before today to OCCURRENCE_DAYS after it )
+OCCURRENCE_DAYS = 7
+
+# Fields every stored task must have, and the priorities it may have
+REQUIRED_FIELDS = ("title", "description", "due_date", "priority", "status", "creation_time")
+PRIORITIES = ("Low", "Medium", "High")
+
+# Rows shown while the rest of a large tasks file is still being read
+FIRST_SCREEN_ROWS = 50
+
+save_writer = None  # background writer of the tasks file ( save_worker.BackgroundWriter ), set by the window
+
+recording = True  # False while the changes other planners saved are applied ( they are stored already )
+
+# Undo / redo of the edits made with add_task, update_task and delete_task ( see edit_history )
+history = edit_history.EditHistory()
+
+# Checks a task read from a file, raises ValueError when it cannot be used
+def validate_task(task, position):
+    if not isinstance(task, dict):
+        raise ValueError(f"Task {position} is not a JSON object")
+    for field in REQUIRED_FIELDS:
+        if not isinstance(task.get(field), str):
+            raise ValueError(f"Task {position} has no valid {field}")
+    if task["priority"] not in PRIORITIES:
+        raise ValueError(f"Task {position} has an unknown priority: {task['priority']}")
+    if not isinstance(task.get("id", ""), str):
+        raise ValueError(f"Task {position} has an invalid id")
+    try:
+        datetime.fromisoformat(task["due_date"])
+    except ValueError:
+        raise ValueError(f"Task {position} has an invalid due date: {task['due_date']}") from None
+
+# Reads the tasks of a JSON file one at a time, without loading the whole document first
+# ( a task written before tasks had ids gets the id derived from its place in the file )
+def stream_tasks(filename):
+    try:
+        file = open(filename, "r")
+    except FileNotFoundError:
+        return
+    with file:
+        position = 0
+        for task in json_stream.iter_json_array(file):
+            validate_task(task, position)
+            yield with_task_id(position, task)
+            position += 1
+
+# Functions to manage tasks
+# preview, when given, is called once the first screenful of tasks has been read
+@metrics.timed("load_tasks")
+def load_tasks(preview=None):
+    global tasks
+    load_recurring_tasks()
+    history.clear()
+    if STORAGE_MODE == "journal":
+        # Start from the snapshot and replay the changes recorded after it
+        task_dicts, records = journal.read_journal(TASKS_FILE)
+        tasks = TaskColumns(map(with_task_id, range(len(task_dicts)), task_dicts))
+        rebuild_indexes()
+        for record in records:
+            apply_record(record)
+        history.clear()     # the changes replayed are not edits of this session
+        journal.open_journal()
+        return
+    if STORAGE_MODE == "sqlite":
+        tasks = TaskColumns(sqlite_store.open_store(os.path.splitext(TASKS_FILE)[0] + ".db", TASKS_FILE))
+        rebuild_indexes()
+        return
+    if STORAGE_MODE == "shared":
+        task_dicts, records = shared_store.open_store(TASKS_FILE)
+        tasks = TaskColumns(map(with_task_id, range(len(task_dicts)), task_dicts))
+        rebuild_indexes()
+        apply_shared_records(records)
+        return
+    if STORAGE_MODE == "binary":
+        # The snapshot is made from the tasks file the first time the binary mode is used
+        if not os.path.exists(snapshot_file()):
+            convert_tasks_file(TASKS_FILE, snapshot_file())
+        tasks = binary_snapshot.read_snapshot(snapshot_file())
+        rebuild_indexes()
+        return
+    tasks = TaskColumns()
+    for task in stream_tasks(TASKS_FILE):
+        tasks.append(task)
+        if preview is not None and len(tasks) == FIRST_SCREEN_ROWS:
+            preview(tasks)
+    rebuild_indexes()
+
+# Applies one journal record to the tasks
+# ( the records written before tasks had ids name the task by its position )
+def apply_record(record):
+    if record["op"] == "add":
+        add_task(record["task"])
+    elif record["op"] == "update":
+        # the functional planner saves only the fields it changed
+        task_id = record_task_id(record)
+        task = tasks.row(task_slot(task_id))
+        changes = record["changes"]
+        update_task(task_id, changes.get("priority", task["priority"]), changes.get("status", task["status"]))
+    elif record["op"] == "delete":
+        delete_task(record_task_id(record))
+    else:
+        raise ValueError(f"Unknown journal operation: {record['op']}")
+
+def record_task_id(record):
+    return record["id"] if "id" in record else tasks[record["index"]]["id"]
+
+# Applies records the other planners saved to the shared store, without recording them again
+def apply_shared_records(records):
+    global recording
+    recording = False
+    try:
+        for record in records:
+            apply_record(record)
+    finally:
+        recording = True
+
+# Persists a change right away when the journal, the SQLite or the shared storage is in use
+@metrics.timed("record_change")
+def record_change(record):
+    if not recording:
+        return
+    if shared_store.is_open():
+        commit_shared_changes([record])
+    elif journal.is_open():
+        journal.append_record(record, lambda: [dict(task) for task in tasks])
+    elif sqlite_store.is_open():
+        if record["op"] == "add":
+            sqlite_store.insert_task(record["task"])
+        elif record["op"] == "update":
+            sqlite_store.update_task(record["id"], record["changes"])
+        elif record["op"] == "delete":
+            sqlite_store.delete_task(record["id"])
+
+# Writes changes to the shared store; the changes other planners saved since the last look are
+# applied too. When one of them changed the same task, the changes are not written : the tasks are
+# loaded again and ConflictError is raised
+def commit_shared_changes(records):
+    others, conflicts = shared_store.commit(records)
+    if conflicts:
+        reload_shared_store()
+        raise shared_store.ConflictError("Another planner changed this task, the tasks were loaded again and the change was not saved")
+    apply_shared_records(others)
+    shared_store.compact_when_due(lambda: [dict(task) for task in tasks])
+
+# Applies the changes other planners saved to the shared store, returns True when tasks changed
+# ( the window calls it now and then )
+@metrics.timed("sync_shared_store")
+def sync_shared_store():
+    if not shared_store.is_open():
+        return False
+    others = shared_store.refresh()
+    if others is None:
+        reload_shared_store()
+        return True
+    apply_shared_records(others)
+    return bool(others)
+
+# Loads the shared store again ( after a conflict, or once a compaction dropped records this planner had not read )
+def reload_shared_store():
+    load_tasks()
+    mark_overdue_tasks()
+    refresh_highlights()
+
+# Value a task is ordered by for a sort key ( read from the parsed columns, nothing is parsed )
+def sort_key_value(task, sort_key):
+    if sort_key == "priority":
+        return task.priority_code
+    if sort_key == "due_date":
+        return task.due_day
+    if sort_key == "creation_time":
+        return task.creation_seconds
+    return task[sort_key]
+
+# Index entry of a task : ties are broken by creation time, then by the slot of the task
+# ( the entry is worked out from the fields again to remove it, so fields only change through set_task_fields )
+def index_entry(task, sort_key):
+    return (sort_key_value(task, sort_key), task.creation_seconds, task.slot)
+
+# Values of a sort key of the tasks in some slots, read straight from the columns
+def column_values(sort_key, order):
+    if sort_key == "status":
+        return map(tasks.status_names.__getitem__, map(tasks.statuses.__getitem__, order))
+    return map(getattr(tasks, SORT_COLUMNS[sort_key]).__getitem__, order)
+
+# Index entries of the tasks in some slots ( every task by default ) for a sort key
+def column_entries(sort_key, order=None):
+    order = tasks.order if order is None else order
+    return list(zip(column_values(sort_key, order), map(tasks.creation_times.__getitem__, order), order))
+
+# The count smallest index entries of a sort key, sorted ( see partial_sort )
+def smallest_entries(sort_key, count):
+    return partial_sort.smallest_entries(count, tasks.order, column_values(sort_key, tasks.order), partial(column_entries, sort_key))
+
+# Adds a task to the sorted indexes built so far
+def index_task(task):
+    for sort_key, index in sort_indexes.items():
+        index.add(index_entry(task, sort_key))
+    for sort_key, prefix in sort_prefixes.items():
+        prefix.add(index_entry(task, sort_key))
+
+# Removes a task from the sorted indexes built so far
+def unindex_task(task):
+    for sort_key, index in sort_indexes.items():
+        index.remove(index_entry(task, sort_key))
+    for sort_key, prefix in sort_prefixes.items():
+        prefix.remove(index_entry(task, sort_key))
+
+# Drops the indexes of the previous task list ( after loading ), they are built again when used
+def rebuild_indexes():
+    sort_indexes.clear()
+    sort_prefixes.clear()
+    search_index.build(tasks)
+    scheduler.schedule_all(tasks)
+
+# Changes fields of a task and moves it inside the sorted indexes ( O(log n) )
+def set_task_fields(task, **changes):
+    unindex_task(task)
+    task.update(changes)
+    index_task(task)
+    scheduler.schedule_task(tasks, task.slot)
+
+# Tasks in the order of a sorted index ( a linear read, nothing is re-sorted )
+@metrics.timed("sorted_tasks")
+def sorted_tasks(sort_key):
+    return [tasks.row(entry[2]) for entry in sort_indexes[sort_key]]
+
+# Index entries at positions start to stop of the order of a sort key ( page n is n * size to (n + 1) * size )
+# read from the full index when it is built ( O(n / bucket size + k) ), otherwise from the partial
+# ordering, whose first selection costs O(n log stop) instead of sorting every task
+@metrics.timed("sorted_page")
+def sorted_page_entries(sort_key, start, stop):
+    if sort_key in sort_indexes or stop * FULL_SORT_RATIO > len(tasks):
+        return sort_indexes[sort_key].page(start, stop)
+    if sort_key not in sort_prefixes:
+        sort_prefixes[sort_key] = partial_sort.SortedPrefix(partial(smallest_entries, sort_key))
+    return sort_prefixes[sort_key].page(start, stop)
+
+# Tasks of page number page ( from 0 ) of the order of a sort key
+def sorted_page(sort_key, page, page_size=PAGE_SIZE):
+    return [tasks.row(entry[2]) for entry in sorted_page_entries(sort_key, page * page_size, (page + 1) * page_size)]
+
+# Slots of every task in the order of a sort key, as a sequence that reads the pages it is sliced for
+def sorted_slots(sort_key):
+    return partial_sort.PagedSlots(partial(sorted_page_entries, sort_key), len(tasks))
+
+# The count most urgent tasks that are not completed, most urgent first ( see scheduler, O(count log n) )
+@metrics.timed("next_tasks")
+def next_tasks(count=1):
+    return [tasks.row(slot) for slot in scheduler.next_slots(tasks, count)]
+
+# Changes the weights of the urgency score ( priority, due_date, age ), ValueError for an unknown one
+def set_urgency_weights(**weights):
+    scheduler.set_weights(tasks, **weights)
+
+# Tasks that satisfy every criterion ( query_plan predicates ), in creation order
+@metrics.timed("filter_tasks")
+def filter_tasks(criteria):
+    if not criteria:
+        return list(tasks)
+    slots = query_plan.matching_slots(sort_indexes, lambda field, slot: index_entry(tasks.row(slot), field), criteria)
+    return [tasks.row(slot) for slot in sorted(slots, key=lambda slot: (tasks.creation_times[slot], slot))]
+
+# Tasks that satisfy every criterion, yielded one at a time in the order of a sort key ( or of the
+# task list ) : an export writes each one as it is read, the sorted index is read linearly and no
+# list of the tasks is built
+def iter_tasks(criteria=(), sort_key=None):
+    slots = tasks.order if sort_key is None else (entry[2] for entry in sort_indexes[sort_key])
+    entry_of = lambda field, slot: index_entry(tasks.row(slot), field)
+    for slot in slots:
+        if all(query_plan.satisfies(predicate, entry_of, slot) for predicate in criteria):
+            yield tasks.row(slot)
+
+# Query plan criteria of a filter ( see query_plan ), a value of None leaves its field unfiltered
+# the dates are "YYYY-MM-DD" strings ( parsed once, the index compares day numbers ), text the words of a search
+def filter_criteria(priority=None, status=None, start_date=None, end_date=None, text=None):
+    criteria = []
+    if text:
+        found = search_index.search(text)
+        if found is not None:
+            criteria.append(query_plan.key_in(found))
+    if priority:
+        criteria.append(query_plan.equal_to("priority", PRIORITY_CODES[priority]))
+    if status:
+        criteria.append(query_plan.equal_to("status", status))
+    if start_date:
+        criteria.append(query_plan.at_least("due_date", datetime.fromisoformat(start_date).toordinal()))
+    if end_date:
+        criteria.append(query_plan.at_most("due_date", datetime.fromisoformat(end_date).toordinal()))
+    return criteria
+
+# Slot of the task with an id ( O(1), see task_columns ), KeyError when there is no such task
+def task_slot(task_id):
+    slot = tasks.slot_of(task_id)
+    if slot is None:
+        raise KeyError(f"No task with id {task_id}")
+    return slot
+
+def update_task(task_id, priority, status):
+    global tasks
+    slot = task_slot(task_id)
+    task = tasks.row(slot)
+    undo_operation = ("update", task_id, task["priority"], task["status"])
+    set_task_fields(task, priority=priority, status=status)
+    record_change({"op": "update", "id": task_id, "changes": {"priority": priority, "status": status}})
+    remember(undo_operation, ("update", task_id, priority, status))
+    check_task_states([slot])
+
+# Adds a task dict, returns its id ( a new id unless the task has one that is not in use )
+# the task goes last, or to a position ( an undone delete )
+def add_task(task, position=None):
+    global tasks
+    row = append_task(task, position)
+    record_change({"op": "add", "task": {**task, "id": row["id"]}})
+    remember(("delete", row["id"]), ("add", {**task, "id": row["id"]}, tasks.position_of(row.slot)))
+    check_task_states([row.slot])
+    return row["id"]
+
+def delete_task(task_id):
+    global tasks
+    slot = task_slot(task_id)
+    position = tasks.position_of(slot)
+    undo_operation = ("add", dict(tasks.row(slot)), position)
+    unindex_task(tasks.row(slot))
+    search_index.remove(slot)
+    del tasks[position]
+    record_change({"op": "delete", "id": task_id})
+    remember(undo_operation, ("delete", task_id))
+
+# Adds a task dict to the columns ( at the end of the order or at a position ), the indexes and the
+# urgency schedule, returns its row
+def append_task(task, position=None):
+    row = tasks.append(task, position)
+    index_task(row)
+    search_index.add(row.slot, task["title"], task["description"])
+    scheduler.schedule_task(tasks, row.slot)
+    return row
+
+# Adds the task dicts of an import, returns their ids
+# they are stored with one write ( one journal append, one database transaction or one commit to the
+# shared store; the json and binary modes write the tasks file once with save_tasks ), their states
+# are checked in one pass, and an import is not an edit of the undo history
+@metrics.timed("import_tasks")
+def import_tasks(task_dicts):
+    rows = [append_task(task) for task in task_dicts]
+    check_task_states([row.slot for row in rows])
+    task_ids = [row["id"] for row in rows]
+    added = [{**task, "id": task_id} for task, task_id in zip(task_dicts, task_ids)]
+    if shared_store.is_open():
+        commit_shared_changes([{"op": "add", "task": task} for task in added])
+    elif journal.is_open():
+        journal.append_records([{"op": "add", "task": task} for task in added], lambda: [dict(task) for task in tasks])
+    elif sqlite_store.is_open():
+        sqlite_store.insert_tasks(added)
+    return task_ids
+
+# Keeps an edit in the undo history ( the changes of other planners and the replayed ones are not edits )
+def remember(undo_operation, redo_operation):
+    if recording:
+        history.record(undo_operation, redo_operation)
+
+# Applies an operation of the undo history ( see edit_history ) : a task added again goes back to its
+# position ( its rank is put between its neighbours, nothing is scanned )
+def apply_operation(operation):
+    if operation[0] == "add":
+        add_task(operation[1], operation[2])
+    elif operation[0] == "update":
+        update_task(*operation[1:])
+    else:
+        delete_task(operation[1])
+
+# Undoes the last edit, False when there is none ( KeyError when another planner deleted its task )
+def undo():
+    return history.undo(apply_operation)
+
+# Makes the last undone edit again, False when there is none
+def redo():
+    return history.redo(apply_operation)
+
+# Re-checks the tasks in some slots only : a pending task past its due date becomes overdue, the
+# highlight is refreshed and the next deadline transition is scheduled ( the other tasks are not looked at )
+# returns True when a task changed
+@metrics.timed("check_task_states")
+def check_task_states(slots):
+    today = deadlines.current_day()
+    slots = [slot for slot in dict.fromkeys(slots) if tasks.holds_task(slot)]
+    changed = False
+    for position in highlight.positions(highlight.pending_past_due(tasks, slots, today)):
+        set_task_fields(tasks.row(slots[position]), status="Overdue")
+        changed = True
+    states = highlight.classify(tasks, slots, today)
+    for slot, state in zip(slots, states):
+        if tasks.highlights[slot] != state:
+            tasks.highlights[slot] = state
+            changed = True
+        deadlines.schedule_task(tasks, slot, today)
+    return changed
+
+# What the notifications call the highlight states they are sent for ( see notifications )
+DEADLINE_TRANSITIONS = {highlight.DUE_SOON: "Due soon", highlight.OVERDUE: "Overdue"}
+
+# ISO text of a due day, cached : many tasks share their due day
+@lru_cache(maxsize=4096)
+def due_date_text(day):
+    return format_day(day)
+
+# (id, transition, title, due date) of the tasks in some slots that are due soon or overdue, for the
+# notifications ( reads the highlights set by check_task_states / refresh_highlights from the columns )
+def deadline_transitions(slots):
+    return [
+        (tasks.ids[slot], DEADLINE_TRANSITIONS[tasks.highlights[slot]], tasks.titles[slot], due_date_text(tasks.due_days[slot]))
+        for slot in slots
+        if tasks.highlights[slot] in DEADLINE_TRANSITIONS and tasks.holds_task(slot)
+    ]
+
+# Sets the highlight of every task and schedules the deadline transitions ( after loading )
+@metrics.timed("refresh_highlights")
+def refresh_highlights():
+    today = deadlines.current_day()
+    states = highlight.classify(tasks, tasks.order, today)
+    for slot, state in zip(tasks.order, states):
+        tasks.highlights[slot] = state
+    deadlines.schedule_all(tasks, today)
+
+@metrics.timed("save_tasks")
+def save_tasks():
+    if STORAGE_MODE not in ("json", "binary"):
+        return  # every change is already in the journal, the database or the shared store
+    if save_writer is None:
+        write_tasks_file(tasks)
+        return
+    # The columns are copied on the Tk thread once the current event is handled ( the saves of one
+    # action become one ), the background writer of the window encodes the copy and writes it
+    save_writer.submit_when_idle(tasks.copy)
+
+# Writes the tasks file, or the snapshot in binary mode ( replaced atomically, a reader never sees a half-written file )
+@metrics.timed("write_tasks_file")
+def write_tasks_file(columns):
+    if STORAGE_MODE == "binary":
+        binary_snapshot.write_snapshot(columns, snapshot_file())
+    else:
+        write_json_file(columns, TASKS_FILE)
+
+def write_json_file(columns, path):
+    journal.write_atomically(path, json.dumps([dict(task) for task in columns], default=str, indent=4).encode())
+
+# The binary snapshot of the tasks file
+def snapshot_file():
+    return os.path.splitext(TASKS_FILE)[0] + ".bin"
+
+# Converts a tasks file to a binary snapshot or back : a source that is a snapshot is read as one,
+# the target is written as a snapshot when its name ends in .bin and as JSON otherwise
+@metrics.timed("convert_tasks_file")
+def convert_tasks_file(source, target):
+    if binary_snapshot.is_snapshot(source):
+        columns = binary_snapshot.read_snapshot(source)
+    else:
+        columns = TaskColumns(stream_tasks(source))
+    if target.endswith(".bin"):
+        binary_snapshot.write_snapshot(columns, target)
+    else:
+        write_json_file(columns, target)
+    return len(columns)
+
+# The recurring tasks file that belongs to the tasks file
+def recurring_file():
+    return os.path.splitext(TASKS_FILE)[0] + ".recurring.json"
+
+def load_recurring_tasks():
+    global recurring_tasks
+    recurring_tasks = {definition["id"]: definition for definition in recurrence.read_definitions(recurring_file())}
+
+# The definitions are few, the file is rewritten on every change ( replaced atomically )
+def save_recurring_tasks():
+    journal.write_atomically(recurring_file(), json.dumps(list(recurring_tasks.values()), indent=4).encode())
+
+# Adds a recurring task : task holds the fields of its first occurrence ( its due date starts the
+# series, the status is left out ), rule is an RRULE-style rule; returns its id, ValueError for a bad rule
+def add_recurring_task(task, rule):
+    recurrence.parse_rule(rule)
+    validate_task({**task, "status": "Pending"}, "being added")
+    definition = {
+        "id": new_task_id(),
+        "title": task["title"],
+        "description": task["description"],
+        "priority": task["priority"],
+        "rule": rule,
+        "start": task["due_date"],
+        "creation_time": task["creation_time"],
+        "completed": [],
+    }
+    recurring_tasks[definition["id"]] = definition
+    save_recurring_tasks()
+    return definition["id"]
+
+# Deletes a recurring task and all its occurrences
+def delete_recurring_task(definition_id):
+    if recurring_tasks.pop(definition_id, None) is None:
+        raise KeyError(f"No recurring task with id {definition_id}")
+    save_recurring_tasks()
+
+# Marks one occurrence as completed, or pending again ( by the id of the occurrence )
+def set_occurrence_completed(occurrence_id, completed=True):
+    definition_id, due_date = recurrence.split_occurrence_id(occurrence_id) or (None, None)
+    definition = recurring_tasks.get(definition_id)
+    if definition is None or not recurrence.is_occurrence(definition, due_date):
+        raise KeyError(f"No occurrence with id {occurrence_id}")
+    done = set(definition["completed"])
+    if completed:
+        done.add(due_date)
+    else:
+        done.discard(due_date)
+    definition["completed"] = sorted(done)
+    save_recurring_tasks()
+
+# Occurrences of every recurring task due between two day numbers ( both included, first None starts
+# at the start of each series ), as task dicts in due date order : the series are merged lazily
+def occurrences_between(first, last):
+    today = deadlines.current_day()
+    series = [recurrence.occurrences(definition, first, last, today) for definition in recurring_tasks.values()]
+    return heapq.merge(*series, key=itemgetter("due_date"))
+
+# Occurrences due between two day numbers that match a search text, as columns of their own with
+# their highlight set by the same batch pass as the stored tasks
+@metrics.timed("occurrence_columns")
+def occurrence_columns(first, last, text=None):
+    columns = TaskColumns(
+        task for task in occurrences_between(first, last)
+        if not text or text_index.matches(text, task["title"], task["description"])
+    )
+    states = highlight.classify(columns, columns.order, deadlines.current_day())
+    for slot, state in zip(columns.order, states):
+        columns.highlights[slot] = state
+    return columns
+
+# Occurrences the window shows ( the days around today )
+def shown_occurrences(text=None):
+    today = deadlines.current_day()
+    return occurrence_columns(today - OCCURRENCE_DAYS, today + OCCURRENCE_DAYS, text)
+
+# Occurrences that match the criteria of a filter ( the arguments of filter_criteria ), in due date order
+# only the due dates between start_date and end_date are expanded : a filter without an end date
+# reads OCCURRENCE_DAYS from its start ( or from today ), one without a start date reads each series
+# from its first occurrence
+@metrics.timed("filter_occurrences")
+def filter_occurrences(priority=None, status=None, start_date=None, end_date=None, text=None):
+    first = datetime.fromisoformat(start_date).toordinal() if start_date else None
+    if end_date:
+        last = datetime.fromisoformat(end_date).toordinal()
+    else:
+        first = deadlines.current_day() if first is None else first
+        last = first + OCCURRENCE_DAYS
+    columns = occurrence_columns(first, last, text)
+    criteria = filter_criteria(priority, status)
+    entry_of = lambda field, slot: index_entry(columns.row(slot), field)
+    return [
+        columns.row(slot) for slot in columns.order
+        if all(query_plan.satisfies(predicate, entry_of, slot) for predicate in criteria)
+    ]
+
+# Marks the pending tasks whose due date passed as overdue, returns them
+# ( one batch pass over the day number and status columns )
+@metrics.timed("mark_overdue_tasks")
+def mark_overdue_tasks():
+    today = datetime.now().date().toordinal()
+    past_due = highlight.pending_past_due(tasks, tasks.order, today)
+    overdue_tasks = [tasks[position] for position in highlight.positions(past_due)]
+    for task in overdue_tasks:
+        set_task_fields(task, status="Overdue")
+    return overdue_tasks
+
+# Releases the journal, the database or the shared store
+def close_storage():
+    journal.close_journal()
+    sqlite_store.close_store()
+    shared_store.close_store()
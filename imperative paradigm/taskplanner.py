@@ -1,41 +1,107 @@
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
-from tkcalendar import Calendar
-import json
-from datetime import datetime, timedelta
-
-# Global variables
-tasks = []
-
-# Functions to manage tasks
-def load_tasks():
-    global tasks
-    try:
-        with open("tasks.json", "r") as file:
-            task_dicts = json.load(file)
-            tasks = task_dicts
-    except FileNotFoundError:
-        tasks = []
-
-def save_tasks():
-    global tasks
-    with open("tasks.json", "w") as file:
-        json.dump(tasks, file, indent=4)
-
-def update_task(index, priority, status):
-    global tasks
-    tasks[index]["priority"] = priority
-
-def add_task(task):
-    global tasks
-    tasks.append(task)
-
-def save_tasks():
-    with open("tasks.json", "w") as file:
-        json.dump(tasks, file, default=str, indent=4)
+from datetime import datetime
+from itertools import compress
+from task_columns import TaskColumns
+import deadlines
+import highlight
+import metrics
+import notifications
+import recurrence
+import save_worker
+import sqlite_store
+import shared_store
+import task_engine
+import text_index
+import tree_render
+from task_engine import (
+    add_recurring_task,
+    add_task,
+    check_task_states,
+    close_storage,
+    delete_recurring_task,
+    delete_task,
+    filter_criteria,
+    filter_occurrences,
+    filter_tasks,
+    load_tasks,
+    mark_overdue_tasks,
+    next_tasks,
+    refresh_highlights,
+    save_tasks,
+    search_index,
+    set_occurrence_completed,
+    shown_occurrences,
+    sort_indexes,
+    sorted_slots,
+    sync_shared_store,
+    update_task,
+    write_tasks_file,
+)
+
+# The window of the task planner; the tasks themselves are handled by the headless task_engine
+# ( task_engine.tasks is the task list, the calendar widget is only imported when a dialog needs it )
+
+current_sort_key = None  # index the task list is shown in ( None shows the tasks as stored )
+search_text = ""  # text of the search box
+
+# The task list keeps a Treeview row for every task ( False ), or only rows for the tasks in view
+# and a scrollbar that moves them over the list ( True, for very large task files )
+VIRTUAL_SCROLL = False
+
+# Height of a Treeview row in pixels ( set in the style, so the rows in view can be counted )
+ROW_HEIGHT = 22
+
+# Milliseconds between two looks at the changes other planners saved ( shared storage mode )
+SYNC_INTERVAL = 2000
+
+tree_rows = None  # rows of the main Treeview ( tree_render.TreeRows ), created by main
+notifier = None  # deadline notifications ( notifications.Notifier ), created by main
+
+# Number of tasks the "Next up" panel shows ( the most urgent ones, see scheduler )
+NEXT_UP_COUNT = 5
+
+next_up_list = None  # Listbox of the "Next up" panel, created by main
+
+# Choices of the Repeat box of the Add Task dialog and their recurrence rules ( see recurrence )
+REPEAT_RULES = {"Never": None, "Daily": "FREQ=DAILY", "Weekly": "FREQ=WEEKLY", "Monthly": "FREQ=MONTHLY"}
+
+occurrence_tree = None  # Treeview of the occurrences of the recurring tasks around today, created by main
+
+# Columns and slots of the tasks, in the order the task list currently shows them
+# only the tasks that match the search box are shown; a sorted list is a sequence that only puts
+# the pages the task list reads in order ( see task_engine.sorted_slots )
+def visible_slots():
+    if current_sort_key is not None and sqlite_store.is_open():
+        query_result = TaskColumns(
+            task for task in sqlite_store.query_tasks(order_by=current_sort_key)
+            if not search_text or text_index.matches(search_text, task["title"], task["description"])
+        )
+        return query_result, query_result.order
+    found = search_index.search(search_text)
+    if current_sort_key is None:
+        slots = task_engine.tasks.order
+    elif found is None:
+        return task_engine.tasks, sorted_slots(current_sort_key)
+    elif current_sort_key in sort_indexes:
+        slots = [entry[2] for entry in sort_indexes[current_sort_key]]
+    else:
+        # The matches of a search are put in order on their own
+        return task_engine.tasks, [entry[2] for entry in sorted(task_engine.column_entries(current_sort_key, found))]
+    if found is not None:
+        slots = list(compress(slots, map(found.__contains__, slots)))
+    return task_engine.tasks, slots
+
+# Text of the save status line, after a write finished
+def save_status(result, outstanding):
+    if result.error is not None:
+        return f"Saving failed: {result.error}"
+    return "Saving..." if outstanding else "All changes saved"
 
 def add_task_gui(root, tree):
+    from tkcalendar import Calendar  # only loaded once a dialog needs it
+
     dialog = tk.Toplevel(root)
     dialog.title("Add Task")
 
@@ -55,6 +121,12 @@ def add_task_gui(root, tree):
     priority_combobox = ttk.Combobox(dialog, values=["Low", "Medium", "High"], state="readonly")
     priority_combobox.grid(row=3, column=1, padx=10, pady=5)
 
+    # A repeating task is stored once, its occurrences are worked out for the days shown
+    tk.Label(dialog, text="Repeat:").grid(row=4, column=0, padx=10, pady=5)
+    repeat_combobox = ttk.Combobox(dialog, values=list(REPEAT_RULES), state="readonly")
+    repeat_combobox.grid(row=4, column=1, padx=10, pady=5)
+    repeat_combobox.set("Never")
+
     def save_task():
         if not title_entry.get().strip():
             messagebox.showerror("Input Error", "Title is required.")
@@ -84,74 +156,123 @@ def add_task_gui(root, tree):
             "creation_time": creation_time,  # Add creation time to task data
         }
 
-        add_task(task_data)
+        rule = REPEAT_RULES[repeat_combobox.get()]
+        try:
+            if rule is None:
+                notify_deadlines([task_engine.task_slot(add_task(task_data))])
+            else:
+                add_recurring_task(task_data, rule)
+        except shared_store.ConflictError as error:
+            messagebox.showwarning("Tasks Changed", str(error))
+        except OSError as error:
+            messagebox.showerror("Save Error", f"The recurring task could not be saved: {error}")
         save_tasks()  
         update_task_list(tree) 
         dialog.destroy()
 
-    tk.Button(dialog, text="Save", command=save_task).grid(row=4, column=0, columnspan=2, pady=10)
-
-def delete_task(index):
-    global tasks
-    del tasks[index]
-
-def check_due_dates():
-    global tasks
-    today = datetime.now().date()
-    overdue_tasks = []
-    for task in tasks:
-        due_date = datetime.strptime(task["due_date"], "%Y-%m-%d").date()
-        if due_date < today and task["status"] == "Pending":
-            task["status"] = "Overdue"
-            overdue_tasks.append(task)
-        elif due_date <= today + timedelta(days=2) and task["status"] != "Completed":
-            # Highlight tasks nearing deadlines (within 2 days)
-            task["highlight"] = True
-        else:
-            task["highlight"] = False
+    tk.Button(dialog, text="Save", command=save_task).grid(row=5, column=0, columnspan=2, pady=10)
 
-    if overdue_tasks:
-        overdue_task_titles = ", ".join([task["title"] for task in overdue_tasks])
-        messagebox.showwarning("Overdue Tasks", f"The following tasks are overdue: {overdue_task_titles}")
+# Queues a notification for each task in some slots that is due soon or overdue ( a task is only
+# notified once of each transition, so the slots may hold tasks that were notified already )
+def notify_deadlines(slots):
+    if notifier is None:
+        return
+    for task_id, transition, title, due_date in task_engine.deadline_transitions(slots):
+        notifier.notify(task_id, transition, title, due_date)
 
+# Shows the tasks again; nothing is saved here, the actions that change tasks save them
+@metrics.timed("update_task_list")
 def update_task_list(tree):
-    global tasks
-    check_due_dates()  # Assuming this function updates task states based on due dates
-      
-    for row in tree.get_children():
-        tree.delete(row)
-
-    for task in tasks:
-        # Parse the due_date into a datetime object for comparison
-        due_date = datetime.strptime(task["due_date"], "%Y-%m-%d")
-        today = datetime.now()
-
-        # Check if task is "completed" - do not highlight
-        if task["status"].lower() == "completed":
-            task["highlight"] = "none"  # Reset any previous highlighting
-        else:
-            # Check if task is overdue (due date has passed)
-            if due_date < today:  # Overdue tasks
-                task["highlight"] = 'red'
-            elif due_date - today <= timedelta(days=2):  # Tasks due soon
-                task["highlight"] = 'yellow'
-            else:
-                task["highlight"] = "normal"  # Default state
+    render_task_list(tree)
+    render_next_up()
+    render_occurrences()
+
+# Shows the occurrences of the recurring tasks due around today ( only those days are expanded )
+def render_occurrences():
+    if occurrence_tree is None:
+        return
+    occurrence_tree.delete(*occurrence_tree.get_children())
+    columns = shown_occurrences(search_text)
+    for task in columns:
+        values = (task["title"], task["description"], task["due_date"], task["priority"], task["status"])
+        occurrence_tree.insert("", "end", iid=task["id"], values=values, tags=(highlight.STATE_TAGS[columns.highlights[task.slot]],))
+
+# Id of the occurrence of the selected row of the recurring tasks list
+def get_selected_occurrence_id():
+    selected_item = occurrence_tree.selection()
+    if not selected_item:
+        messagebox.showwarning("Select Occurrence", "Please select an occurrence of a recurring task.")
+        return None
+    return selected_item[0]
+
+def complete_occurrence_gui(tree):
+    occurrence_id = get_selected_occurrence_id()
+    if occurrence_id is not None:
+        try:
+            set_occurrence_completed(occurrence_id)
+        except OSError as error:
+            messagebox.showerror("Save Error", f"The recurring task could not be saved: {error}")
+        update_task_list(tree)
 
-        # Insert the task into the treeview
-        tree.insert("", "end", 
-                    values=(task["title"], task["description"], task["due_date"], task["priority"], task["status"]),
-                    tags=('highlight' if task["highlight"] == 'yellow' 
-                          else 'overdue' if task["highlight"] == 'red' 
-                          else 'normal'))
+def delete_series_gui(tree):
+    occurrence_id = get_selected_occurrence_id()
+    if occurrence_id is None:
+        return
+    definition_id, _ = recurrence.split_occurrence_id(occurrence_id)
+    title = task_engine.recurring_tasks[definition_id]["title"]
+    if messagebox.askyesno("Delete Recurring Task", f"Are you sure you want to delete every occurrence of '{title}'?"):
+        try:
+            delete_recurring_task(definition_id)
+        except OSError as error:
+            messagebox.showerror("Save Error", f"The recurring task could not be saved: {error}")
+        update_task_list(tree)
 
-    # Configure the tags for highlighting
+# Shows the most urgent tasks in the "Next up" panel ( read from the scheduler heap, the task list is not sorted )
+def render_next_up():
+    if next_up_list is None:
+        return
+    next_up_list.delete(0, tk.END)
+    for task in next_tasks(NEXT_UP_COUNT):
+        next_up_list.insert(tk.END, f"{task['title']}  ( due {task['due_date']}, {task['priority']} )")
+
+# Shows the tasks in the Treeview : only the rows that changed since the last time are sent to Tk
+@metrics.timed("render_task_list")
+def render_task_list(tree):
+    global tree_rows
+    if tree_rows is None:
+        tree_rows = tree_render.TreeRows(tree)
+
+    # Rows are keyed by task id ( the iid of the row ); a row is drawn again when the version or the
+    # highlight of its slot changed
+    columns, slots = visible_slots()
+    window = tree_rows.window(len(slots))
+    slots = slots[window.start:window.stop]
+
+    # The tasks hold their highlight ( the states are the highlight codes of the columns ), kept up to date
+    # by check_task_states; only the rows of a database query are classified here, in one pass
+    if columns is task_engine.tasks:
+        states = bytes(map(columns.highlights.__getitem__, slots))
+    else:
+        states = highlight.classify(columns, slots, deadlines.current_day())
+    keys = list(map(columns.ids.__getitem__, slots))
+    tokens = dict(zip(keys, zip(map(columns.versions.__getitem__, slots), states)))
+
+    def rows(positions):
+        contents = []
+        for position in positions:
+            task = columns.row(slots[position])
+            values = (task["title"], task["description"], task["due_date"], task["priority"], task["status"])
+            contents.append((values, highlight.STATE_TAGS[states[position]]))
+        return contents
+
+    tree_rows.show(keys, tokens, rows)
+
+# Configure the tags for highlighting ( once, when the Treeview is created )
+def configure_tags(tree):
     tree.tag_configure('highlight', background='yellow')  # Highlight tasks due soon
     tree.tag_configure('overdue', background='red', foreground='white')  # Highlight overdue tasks
     tree.tag_configure('normal', background='white', foreground='black')  # Default style for normal tasks
 
-    save_tasks()
-
 def task_dialog(root, tree, action, task=None):
     dialog = tk.Toplevel(root)
     dialog.title(f"{action} Task")
@@ -176,11 +297,14 @@ def task_dialog(root, tree, action, task=None):
             messagebox.showerror("Input Error", "Both Status and Priority must be selected.")
             return
 
-        selected_task_index = get_selected_task_index(tree)
-        if selected_task_index is not None:
+        selected_task_id = get_selected_task_id(tree)
+        if selected_task_id is not None:
             # Update task status and priority
-            tasks[selected_task_index]["status"] = status_combobox.get()
-            tasks[selected_task_index]["priority"] = priority_combobox.get()
+            try:
+                update_task(selected_task_id, priority_combobox.get(), status_combobox.get())
+                notify_deadlines([task_engine.task_slot(selected_task_id)])
+            except shared_store.ConflictError as error:
+                messagebox.showwarning("Task Changed", str(error))
 
         # Save the tasks and update the Treeview
         save_tasks()
@@ -191,64 +315,50 @@ def task_dialog(root, tree, action, task=None):
     tk.Button(dialog, text="Save", command=save_task).grid(row=2, column=0, columnspan=2, pady=10)
 
 def update_task_gui(root, tree):
-    selected_task_index = get_selected_task_index(tree)
-    if selected_task_index is not None:
-        task_dialog(root, tree, "Update", tasks[selected_task_index])
+    selected_task_id = get_selected_task_id(tree)
+    if selected_task_id is not None:
+        task_dialog(root, tree, "Update", task_engine.tasks.row(task_engine.tasks.slot_of(selected_task_id)))
 
 def delete_task_gui(tree):
-    selected_task_index = get_selected_task_index(tree)
-    if selected_task_index is not None:
-        task = tasks[selected_task_index]
+    selected_task_id = get_selected_task_id(tree)
+    if selected_task_id is not None:
+        task = task_engine.tasks.row(task_engine.tasks.slot_of(selected_task_id))
         if messagebox.askyesno("Delete Task", f"Are you sure you want to delete task '{task['title']}'?"):
-            delete_task(selected_task_index)
+            try:
+                delete_task(selected_task_id)
+            except shared_store.ConflictError as error:
+                messagebox.showwarning("Task Changed", str(error))
             save_tasks()
             update_task_list(tree)
 
-def get_selected_task_index(tree):
+# Undoes or redoes the last edit ( step is task_engine.undo or task_engine.redo ), then saves and shows the tasks
+def history_gui(tree, step):
+    try:
+        if not step():
+            return
+    except shared_store.ConflictError as error:
+        messagebox.showwarning("Tasks Changed", str(error))
+    except KeyError:
+        messagebox.showwarning("Task Changed", "Another planner deleted this task, the edit was dropped from the history")
+    save_tasks()
+    update_task_list(tree)
+
+# Id of the task of the selected row ( rows are keyed by task id, whatever order the list is in )
+def get_selected_task_id(tree):
     selected_item = tree.selection()
     if not selected_item:
         messagebox.showwarning("Select Task", "Please select a task to update or delete.")
         return None
-    selected_item = selected_item[0]
-    title = tree.item(selected_item, "values")[0]  
-    for index, task in enumerate(tasks):
-        if task["title"] == title:
-            return index
-    return None
+    return selected_item[0] if task_engine.tasks.slot_of(selected_item[0]) is not None else None
 
+@metrics.timed("sort_tasks")
 def sort_tasks(tree, sort_key):
-    global tasks
-
-    # Bubble Sort Algorithm
-    n = len(tasks)
-    
-    # Perform the Bubble Sort
-    for i in range(n):
-        for j in range(0, n-i-1):
-            swap = False
-            # Compare two adjacent tasks based on the sort_key
-            if sort_key == "priority":
-                priority_order = {"Low": 2, "Medium": 1, "High": 0}
-                if priority_order[tasks[j][sort_key]] > priority_order[tasks[j + 1][sort_key]]:
-                    tasks[j], tasks[j + 1] = tasks[j + 1], tasks[j]
-                    swap = True
-            elif sort_key == "due_date":
-                if datetime.strptime(tasks[j][sort_key], "%Y-%m-%d") > datetime.strptime(tasks[j + 1][sort_key], "%Y-%m-%d"):
-                    tasks[j], tasks[j + 1] = tasks[j + 1], tasks[j]
-                    swap = True
-            elif sort_key == "status":
-                if tasks[j][sort_key] > tasks[j + 1][sort_key]:
-                    tasks[j], tasks[j + 1] = tasks[j + 1], tasks[j]
-                    swap = True
-            elif sort_key == "creation_time":
-                if datetime.strptime(tasks[j][sort_key], "%Y-%m-%d %H:%M:%S") > datetime.strptime(tasks[j + 1][sort_key], "%Y-%m-%d %H:%M:%S"):
-                    tasks[j], tasks[j + 1] = tasks[j + 1], tasks[j]
-                    swap = True
-
-            # If there was a swap, the list might still not be sorted
-            if swap:
-                continue
-    
+    global current_sort_key
+
+    # The ordering is read a page at a time ( or from its sorted index ), so sorting only switches the one shown
+    current_sort_key = sort_key
+    tree_rows.rewind()
+
     # Update the task list after sorting
     update_task_list(tree)
 
@@ -268,6 +378,8 @@ def display_filtered_results(filtered_tasks):
         tree.insert("", "end", values=(task["title"], task["description"], task["due_date"], task["priority"], task["status"]))
 
 def filter_tasks_window(root, tree):
+    from tkcalendar import Calendar
+
     filter_window = tk.Toplevel(root)
     filter_window.title("Filter Tasks")
 
@@ -299,37 +411,57 @@ def filter_tasks_window(root, tree):
     ignore_dates_checkbox.grid(row=4, column=0, columnspan=2, pady=10)
 
     def apply_filter():
-        filtered_tasks = tasks
-        priority_filter = priority_combobox.get()
-        if priority_filter != "All":
-            filtered_tasks = [task for task in filtered_tasks if task["priority"] == priority_filter]
-
-        status_filter = status_combobox.get()
-        if status_filter != "All":
-            filtered_tasks = [task for task in filtered_tasks if task["status"] == status_filter]
+        if sqlite_store.is_open():
+            # Let the database answer the filter from its indexes
+            start_date = end_date = None
+            if not ignore_dates_var.get():
+                start_date = start_date_cal.get_date()
+                end_date = end_date_cal.get_date()
+            query_result = sqlite_store.query_tasks(
+                priority=None if priority_combobox.get() == "All" else priority_combobox.get(),
+                status=None if status_combobox.get() == "All" else status_combobox.get(),
+                start_date=start_date,
+                end_date=end_date,
+            )
+            # The results keep to the tasks that match the search box
+            display_filtered_results([
+                task for task in query_result
+                if not search_text or text_index.matches(search_text, task["title"], task["description"])
+            ] + filter_occurrences(
+                priority=None if priority_combobox.get() == "All" else priority_combobox.get(),
+                status=None if status_combobox.get() == "All" else status_combobox.get(),
+                start_date=start_date,
+                end_date=end_date,
+                text=search_text,
+            ))
+            return
 
+        # Each filter becomes a range of a sorted index, the query planner reads the smallest one
+        # ( the search box adds the set of slots of the tasks that match it )
+        start_date = end_date = None
         if not ignore_dates_var.get():  # Only apply date filters if the checkbox is not checked
             start_date = start_date_cal.get_date()
             end_date = end_date_cal.get_date()
-
-            if start_date:
-                filtered_tasks = [task for task in filtered_tasks if task["due_date"] >= start_date]
-
-            if end_date:
-                filtered_tasks = [task for task in filtered_tasks if task["due_date"] <= end_date]
-
-        display_filtered_results(filtered_tasks)
+        filters = {
+            "priority": None if priority_combobox.get() == "All" else priority_combobox.get(),
+            "status": None if status_combobox.get() == "All" else status_combobox.get(),
+            "start_date": start_date,
+            "end_date": end_date,
+            "text": search_text,
+        }
+        # The occurrences of the recurring tasks due in the date range follow the stored tasks
+        display_filtered_results(filter_tasks(filter_criteria(**filters)) + filter_occurrences(**filters))
 
     apply_button = tk.Button(filter_window, text="Apply Filter", command=apply_filter)
     apply_button.grid(row=5, column=0, columnspan=2, pady=10)
 
-def show_overdue_tasks(tree):
-    global tasks
-
-    # Filter overdue tasks that are not completed
+# Window with the overdue tasks ( opened from the notification toast )
+def show_overdue_tasks(root):
+    # Filter overdue tasks that are not completed ( due at midnight of a day that has started )
+    today = datetime.now().date().toordinal()
     overdue_tasks = [
-        task for task in tasks 
-        if datetime.strptime(task["due_date"], "%Y-%m-%d") < datetime.now() and task["status"].lower() != "completed"
+        task for task in task_engine.tasks 
+        if task.due_day <= today and task["status"].lower() != "completed"
     ]
 
     if not overdue_tasks:
@@ -337,7 +469,7 @@ def show_overdue_tasks(tree):
         return
 
     # Create a new window to display overdue tasks
-    overdue_window = tk.Toplevel()
+    overdue_window = tk.Toplevel(root)
     overdue_window.title("Overdue Tasks")
 
     # Create a Treeview to display the overdue tasks
@@ -353,11 +485,31 @@ def show_overdue_tasks(tree):
     for task in overdue_tasks:
         overdue_tree.insert("", "end", values=(task["title"], task["description"], task["due_date"], task["priority"], task["status"]))
 
-    overdue_window.mainloop()
+# Window with the instrumentation numbers ( see metrics ), the Refresh button reads them again
+def show_stats_window(root):
+    stats_window = tk.Toplevel(root)
+    stats_window.title("Statistics")
+
+    stats_tree = ttk.Treeview(stats_window, columns=("Metric", "Calls", "Mean (ms)", "95% (ms)", "Max (ms)"), show="headings")
+    stats_tree.heading("Metric", text="Metric")
+    stats_tree.heading("Calls", text="Calls / Value")
+    stats_tree.heading("Mean (ms)", text="Mean (ms)")
+    stats_tree.heading("95% (ms)", text="95% (ms)")
+    stats_tree.heading("Max (ms)", text="Max (ms)")
+    stats_tree.pack(fill=tk.BOTH, expand=True)
+
+    def fill():
+        stats_tree.delete(*stats_tree.get_children())
+        for name, calls, mean, percentile, longest in metrics.span_summaries():
+            stats_tree.insert("", "end", values=(name, calls, f"{mean * 1000:.2f}", f"{percentile * 1000:.2f}", f"{longest * 1000:.2f}"))
+        for name, value in metrics.event_values():
+            stats_tree.insert("", "end", values=(name, value, "", "", ""))
+
+    fill()
+    tk.Button(stats_window, text="Refresh", command=fill).pack(pady=5)
 
 def main():
-    global tasks
-    load_tasks()
+    global tree_rows, next_up_list, occurrence_tree, notifier
 
     root = tk.Tk()
     root.title("Task Manager")
@@ -376,7 +528,8 @@ def main():
     style.configure("Treeview",
     background="#F0F0F0",
     foreground="#001A6E",  
-    font=("Arial", 10))      
+    font=("Arial", 10),
+    rowheight=ROW_HEIGHT)
 
     # Set a color for the selected row
     style.map("Treeview",
@@ -389,9 +542,128 @@ def main():
     tree.heading("Due Date", text="Due Date")
     tree.heading("Priority", text="Priority")
     tree.heading("Status", text="Status")
+    configure_tags(tree)
+
+    # Search box above the task list ( the list shows the matching tasks as the text is typed )
+    search_frame = tk.Frame(root)
+    search_frame.pack(fill=tk.X, padx=10, pady=5)
+    tk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+    search_var = tk.StringVar()
+    tk.Entry(search_frame, textvariable=search_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+    def on_search(*_):
+        global search_text
+        search_text = search_var.get()
+        tree_rows.rewind()
+        render_task_list(tree)
+        render_occurrences()
+
+    search_var.trace_add("write", on_search)
+
+    # In virtual scroll mode the Treeview only holds the rows in view, the scrollbar moves them
+    if VIRTUAL_SCROLL:
+        scrollbar = ttk.Scrollbar(root, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree_rows = tree_render.TreeRows(tree, scrollbar, ROW_HEIGHT)
+
+        def scroll(*command):
+            if tree_rows.scroll(*command):
+                render_task_list(tree)
+
+        def scroll_wheel(event):
+            if tree_rows.scroll_wheel(event):
+                render_task_list(tree)
+
+        scrollbar.configure(command=scroll)
+        tree.bind("<MouseWheel>", scroll_wheel)
+        tree.bind("<Button-4>", scroll_wheel)
+        tree.bind("<Button-5>", scroll_wheel)
+        tree.bind("<Configure>", lambda event: render_task_list(tree))
+    else:
+        tree_rows = tree_render.TreeRows(tree, page_size=task_engine.PAGE_SIZE)
+
+        # The next page of the list is shown once its last row is scrolled into view
+        def scrolled(first, last):
+            if tree_rows.show_more(first, last):
+                render_task_list(tree)
+
+        tree.configure(yscrollcommand=scrolled)
     tree.pack(fill=tk.BOTH, expand=True)
 
+    # Show the first screenful of a large tasks file while the rest of it is being read
+    def preview(first_tasks):
+        render_task_list(tree)
+        root.update()
+
+    load_tasks(preview)
+
+    # tasks.json is written by a background writer, so a slow disk never blocks the GUI; the saves
+    # asked for while a write is in progress are done together by the next one
+    status_label = tk.Label(root, text="", anchor="w")
+    status_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+
+    # Deadline notifications are queued and sent in batches, never in a modal box : a toast in the
+    # window ( click it for the overdue tasks ) and the sinks TASK_PLANNER_NOTIFY lists ( see notifications )
+    toast_label = tk.Label(root, text="", anchor="w", justify=tk.LEFT, bg="#FFF3B0", cursor="hand2")
+    toast_label.bind("<Button-1>", lambda event: show_overdue_tasks(root))
+    notifier = notifications.Notifier(
+        root,
+        notifications.make_sinks(notifications.NOTIFY_SINKS, toast_label),
+        on_error=lambda error: status_label.configure(text=f"Notifications could not be sent: {error}"),
+    )
+
+    # The most urgent tasks, refreshed with the task list
+    next_up_frame = tk.Frame(root)
+    next_up_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+    tk.Label(next_up_frame, text="Next up:", anchor="w").pack(fill=tk.X)
+    next_up_list = tk.Listbox(next_up_frame, height=NEXT_UP_COUNT)
+    next_up_list.pack(fill=tk.X)
+
+    # The occurrences of the recurring tasks due in the days around today
+    occurrence_frame = tk.Frame(root)
+    occurrence_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+    tk.Label(occurrence_frame, text="Recurring tasks:", anchor="w").pack(fill=tk.X)
+    occurrence_tree = ttk.Treeview(occurrence_frame, columns=("Title", "Description", "Due Date", "Priority", "Status"), show="headings", height=6)
+    for column in ("Title", "Description", "Due Date", "Priority", "Status"):
+        occurrence_tree.heading(column, text=column)
+    configure_tags(occurrence_tree)
+    occurrence_tree.pack(fill=tk.X)
+
+    def on_saved(result, outstanding):
+        status_label.configure(text=save_status(result, outstanding))
+        if result.error is not None:
+            messagebox.showerror("Save Error", f"The tasks could not be saved: {result.error}")
+
+    task_engine.save_writer = save_worker.BackgroundWriter(root, write_tasks_file, on_done=on_saved)
+    # The due dates are checked for every task once, then only when a deadline transition comes
+    if mark_overdue_tasks():
+        save_tasks()
+    refresh_highlights()
     update_task_list(tree)
+    # The tasks are looked at for the first notifications once the task list is up
+    root.after_idle(lambda: notify_deadlines(task_engine.tasks.order))
+
+    # Applies the deadline transitions that are due, then sleeps until the next one ( Tk timer )
+    def on_deadline():
+        slots = deadlines.pop_due(deadlines.current_day())
+        if check_task_states(slots):
+            save_tasks()
+            update_task_list(tree)
+            notify_deadlines(slots)
+        else:
+            render_occurrences()  # the days shown move with today
+        root.after(deadlines.milliseconds_until_next(), on_deadline)
+
+    root.after(deadlines.milliseconds_until_next(), on_deadline)
+
+    # In shared mode the changes other planners saved are shown every few seconds
+    def on_sync():
+        if sync_shared_store():
+            update_task_list(tree)
+        root.after(SYNC_INTERVAL, on_sync)
+
+    if task_engine.STORAGE_MODE == "shared":
+        root.after(SYNC_INTERVAL, on_sync)
 
     # Frame to group the buttons
     button_frame = tk.Frame(root)
@@ -406,7 +678,13 @@ def main():
     tk.Button(button_frame, text="Add Task", command=lambda: add_task_gui(root, tree), **button_style).pack(side=tk.LEFT, padx=10)
     tk.Button(button_frame, text="Update Task", command=lambda: update_task_gui(root, tree), **button_style).pack(side=tk.LEFT, padx=10)
     tk.Button(button_frame, text="Delete Task", command=lambda: delete_task_gui(tree), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Undo", command=lambda: history_gui(tree, task_engine.undo), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Redo", command=lambda: history_gui(tree, task_engine.redo), **button_style).pack(side=tk.LEFT, padx=10)
+    root.bind("<Control-z>", lambda event: history_gui(tree, task_engine.undo))
+    root.bind("<Control-y>", lambda event: history_gui(tree, task_engine.redo))
     tk.Button(button_frame, text="sort by creation time", command=lambda: sort_tasks(tree, "creation_time"), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Complete Occurrence", command=lambda: complete_occurrence_gui(tree), **button_style).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Delete Series", command=lambda: delete_series_gui(tree), **button_style).pack(side=tk.LEFT, padx=10)
 
     # Frame to group the Sort and Filter buttons in the same row
     sort_filter_frame = tk.Frame(root)
@@ -416,9 +694,22 @@ def main():
     tk.Button(sort_filter_frame, text="Sort by Due Date", command=lambda: sort_tasks(tree, "due_date"), **button_style).pack(side=tk.LEFT, padx=10)
     tk.Button(sort_filter_frame, text="Sort by Status", command=lambda: sort_tasks(tree, "status"), **button_style).pack(side=tk.LEFT, padx=10)
     tk.Button(sort_filter_frame, text="Filter Tasks", command=lambda: filter_tasks_window(root, tree), **button_style).pack(side=tk.LEFT, padx=10)
+    if metrics.ENABLED:
+        tk.Button(sort_filter_frame, text="Stats", command=lambda: show_stats_window(root), **button_style).pack(side=tk.LEFT, padx=10)
 
-    show_overdue_tasks(None) 
     root.mainloop()
 
+    # The last saves finish after the window closed : a failure is still shown
+    failed = [result for result in task_engine.save_writer.close() if result.error is not None]
+    task_engine.save_writer = None
+    if failed:
+        messagebox.showerror("Save Error", f"The tasks could not be saved: {failed[-1].error}")
+    # The notifications still queued go to the log file, the desktop and the mail server
+    errors = notifier.close()
+    notifier = None
+    if errors:
+        messagebox.showerror("Notification Error", f"The notifications could not be sent: {errors[-1]}")
+    close_storage()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,123 @@
+import re
+from bisect import bisect_left, insort
+
+# Full-text search over task titles and descriptions
+# an inverted index maps every word ( token ) to the set of slots of the tasks that contain it, so
+# a search only reads the postings of the words it asks for instead of looking at every task.
+# add / remove keep it up to date as tasks are added and deleted. The vocabulary is kept sorted,
+# so the tokens that start with a prefix are one range of it ( search as you type : the last word
+# of a query is a prefix until it is completed ).
+
+WORD = re.compile(r"\w+")
+
+# Larger than any character, so prefix + LAST_CHARACTER is after every token that starts with prefix
+LAST_CHARACTER = "\U0010ffff"
+
+
+# Distinct lower case words of a task
+def tokens(title, description):
+    return set(WORD.findall(title.lower()) + WORD.findall(description.lower()))
+
+
+# The words of a query : the complete words, and the last word when it is still being typed
+def query_terms(query):
+    words = WORD.findall(query.lower())
+    if words and WORD.match(query[-1:]):
+        return words[:-1], words[-1]
+    return words, None
+
+
+# True for a query without any word ( it matches every task )
+def is_blank(query):
+    return WORD.search(query) is None
+
+
+# True if a task matches a query ( the same rule as TextIndex.search, for tasks that are not in an index )
+def matches(query, title, description):
+    words, prefix = query_terms(query)
+    task_tokens = tokens(title, description)
+    if not task_tokens.issuperset(words):
+        return False
+    return prefix is None or any(token.startswith(prefix) for token in task_tokens)
+
+
+class TextIndex:
+    def __init__(self):
+        self.postings = {}      # token -> set of slots
+        self.vocabulary = []    # the tokens in sorted order
+        self.slot_tokens = {}   # slot -> tokens of the task in it ( to remove it again )
+        self.unindexed = None   # columns given to build that were not indexed yet
+
+    def clear(self):
+        self.postings.clear()
+        self.vocabulary.clear()
+        self.slot_tokens.clear()
+        self.unindexed = None
+
+    # Indexes every task of a TaskColumns, the first time a query has words ( the columns are read
+    # as they are then, so the tasks added or removed in the meantime need not be indexed )
+    def build(self, columns):
+        self.clear()
+        self.unindexed = columns
+
+    # Indexes the columns given to build, all at once ( the vocabulary is sorted once )
+    def index_columns(self):
+        columns = self.unindexed
+        self.unindexed = None
+        for slot in columns.order:
+            task_tokens = tokens(columns.titles[slot], columns.descriptions[slot])
+            self.slot_tokens[slot] = task_tokens
+            for token in task_tokens:
+                self.postings.setdefault(token, set()).add(slot)
+        self.vocabulary = sorted(self.postings)
+
+    def add(self, slot, title, description):
+        if self.unindexed is not None:
+            return
+        task_tokens = tokens(title, description)
+        self.slot_tokens[slot] = task_tokens
+        for token in task_tokens:
+            slots = self.postings.get(token)
+            if slots is None:
+                self.postings[token] = {slot}
+                insort(self.vocabulary, token)
+            else:
+                slots.add(slot)
+
+    # Removes the task in a slot ( words no task contains any more leave the vocabulary )
+    def remove(self, slot):
+        if self.unindexed is not None:
+            return
+        for token in self.slot_tokens.pop(slot, ()):
+            slots = self.postings[token]
+            slots.discard(slot)
+            if not slots:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    # Tokens of the vocabulary that start with a prefix ( one range of the sorted vocabulary )
+    def prefixed(self, prefix):
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + LAST_CHARACTER)
+        return self.vocabulary[start:end]
+
+    # Slots of the tasks that contain every complete word of the query and a word starting with
+    # its last word; None for a query without words ( it matches every task )
+    # the postings are intersected smallest first, so the cost follows the rarest word
+    def search(self, query):
+        words, prefix = query_terms(query)
+        if not words and prefix is None:
+            return None
+        if self.unindexed is not None:
+            self.index_columns()
+        if any(word not in self.postings for word in words):
+            return set()
+        found = None
+        for slots in sorted((self.postings[word] for word in words), key=len):
+            found = set(slots) if found is None else found & slots
+        if prefix is None:
+            return found
+        result = set()
+        for token in self.prefixed(prefix):
+            result |= self.postings[token] if found is None else found & self.postings[token]
+        return result
@@ -0,0 +1,167 @@
+from bisect import bisect_left
+from itertools import compress
+from operator import lt, ne, not_
+import metrics
+
+# Diff-based Treeview rendering
+# the rows of the Treeview are described by a key per row ( its iid ) and a token per key that
+# changes whenever the content of the row changes. TreeRows remembers the rows it showed last time,
+# compares them with the rows to show and only sends Tk the rows that were removed, added, moved
+# or changed, so a refresh costs Tk calls in proportion to the change, not to the number of tasks.
+# The rows that kept their relative order ( the longest such run ) stay where they are, the others
+# are detached and put back at their new position.
+#
+# In virtual scroll mode only the rows in view exist in the Treeview : a separate scrollbar moves
+# a window over the list and the window is rendered the same way ( scrolling one row = 2 Tk calls ).
+# Otherwise the rows are added a page at a time : the first page_size rows are shown, and one more
+# page each time the Treeview is scrolled to its last row ( see show_more )
+
+
+# Indexes of a longest strictly increasing run of values ( not necessarily contiguous, O(n log n) )
+def longest_increasing(values):
+    tail_values = []     # smallest last value of an increasing run of each length
+    tail_indexes = []
+    previous = [None] * len(values)
+    for index, value in enumerate(values):
+        length = bisect_left(tail_values, value)
+        previous[index] = tail_indexes[length - 1] if length else None
+        if length == len(tail_values):
+            tail_values.append(value)
+            tail_indexes.append(index)
+        else:
+            tail_values[length] = value
+            tail_indexes[length] = index
+
+    run = set()
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        run.add(index)
+        index = previous[index]
+    return run
+
+
+# Length of the common beginning of two sequences
+def common_prefix(first, second):
+    for index, (a, b) in enumerate(zip(first, second)):
+        if a != b:
+            return index
+    return min(len(first), len(second))
+
+
+class TreeRows:
+    def __init__(self, tree, scrollbar=None, row_height=22, page_size=100):
+        self.tree = tree
+        self.keys = []      # keys of the rows shown, in order
+        self.tokens = {}    # key -> token of the row shown
+        # Virtual scroll mode ( when there is a scrollbar ) : first row in view and length of the list
+        self.scrollbar = scrollbar
+        self.row_height = row_height
+        self.offset = 0
+        self.count = 0
+        # Otherwise : number of rows of the list shown, a whole number of pages
+        self.page_size = page_size
+        self.limit = page_size
+
+    # Positions ( in keys ) of the rows to move or add
+    # the common beginning and end stay as they are, and when the kept rows in between are still in
+    # their old order ( rows were only added or removed ) nothing moves
+    def placed_positions(self, old_positions, keys):
+        if self.keys == keys:
+            return []
+        start = common_prefix(self.keys, keys)
+        end = len(keys) - common_prefix(self.keys[start:][::-1], keys[start:][::-1])
+        middle = keys[start:end]
+        kept = list(compress(range(start, end), map(old_positions.__contains__, middle)))
+        old_order = [old_positions[keys[position]] for position in kept]
+        if all(map(lt, old_order, old_order[1:])):
+            return list(compress(range(start, end), map(not_, map(old_positions.__contains__, middle))))
+        staying = set(kept[index] for index in longest_increasing(old_order))
+        return [position for position in range(start, end) if position not in staying]
+
+    # Shows rows in the Treeview : keys in order, tokens maps each key to its token
+    # rows(positions) returns the (values, tags) of the rows at some positions of keys,
+    # it is only asked for the rows that are added or changed
+    def show(self, keys, tokens, rows):
+        keys = list(keys)
+        old_positions = dict(zip(self.keys, range(len(self.keys))))
+        placed = self.placed_positions(old_positions, keys)
+        changed = compress(range(len(keys)), map(ne, map(self.tokens.get, keys), map(tokens.__getitem__, keys)))
+        updated = [position for position in changed if keys[position] in old_positions]
+
+        removed = self.tokens.keys() - tokens.keys()
+        if removed:
+            self.tree.delete(*removed)
+        moved = [keys[position] for position in placed if keys[position] in old_positions]
+        if moved:
+            self.tree.detach(*moved)
+
+        # Every row before a placed position is in place when it is reached, so its position is its index
+        added = [position for position in placed if keys[position] not in old_positions]
+        contents = dict(zip(added, rows(added)))
+        for position in placed:
+            if position in contents:
+                values, tags = contents[position]
+                self.tree.insert("", position, iid=keys[position], values=values, tags=tags)
+            else:
+                self.tree.move(keys[position], "", position)
+
+        for position, (values, tags) in zip(updated, rows(updated)):
+            self.tree.item(keys[position], values=values, tags=tags)
+
+        self.keys = keys
+        self.tokens = tokens
+        if metrics.ENABLED:
+            metrics.record_refresh(len(added), len(removed), len(moved), len(updated))
+
+    # Positions of the list to show as rows : the pages shown so far, or the window in view ( virtual scroll mode )
+    def window(self, count):
+        self.count = count
+        if self.scrollbar is None:
+            return range(min(count, self.limit))
+        rows = self.visible_rows()
+        self.offset = max(0, min(self.offset, count - rows))
+        self.scrollbar.set(*self.scrollbar_fractions(rows))
+        return range(self.offset, min(self.offset + rows, count))
+
+    # Number of rows that fit in the Treeview ( at least one )
+    def visible_rows(self):
+        return max(1, self.tree.winfo_height() // self.row_height - 1)     # minus the heading
+
+    def scrollbar_fractions(self, rows):
+        if not self.count:
+            return 0.0, 1.0
+        return self.offset / self.count, min(self.offset + rows, self.count) / self.count
+
+    # Moves the window for a scrollbar command : ("moveto", fraction) or ("scroll", number, "units" | "pages")
+    # returns True when the rows in view changed
+    def scroll(self, *command):
+        if command[0] == "moveto":
+            return self.scroll_to(round(float(command[1]) * self.count))
+        step = int(command[1]) * (self.visible_rows() if command[2] == "pages" else 1)
+        return self.scroll_to(self.offset + step)
+
+    # Moves the window for a mouse wheel event ( delta on Windows / macOS, buttons 4 and 5 on X11 )
+    def scroll_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            return self.scroll_to(self.offset - 3)
+        return self.scroll_to(self.offset + 3)
+
+    # Shows the list from its first row again ( a new order or search )
+    def rewind(self):
+        self.offset = 0
+        self.limit = self.page_size
+
+    # Adds a page of rows for a yscrollcommand of the Treeview ( the fractions of the rows in view )
+    # returns True when the last row is in view and the list has more rows to show
+    def show_more(self, first, last):
+        if self.scrollbar is not None or float(last) < 1.0 or self.limit >= self.count:
+            return False
+        self.limit += self.page_size
+        return True
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, self.count - self.visible_rows()))
+        if offset == self.offset:
+            return False
+        self.offset = offset
+        return True
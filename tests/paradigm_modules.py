@@ -0,0 +1,24 @@
+import importlib
+import os
+import sys
+
+# The two planners have modules of the same names ( journal, recurrence, sorted_index ... ) : a module
+# is imported with the folder of its paradigm first on the path, then the modules of that folder are
+# taken out of sys.modules again, so a module of the other paradigm imports its own
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# A module of one paradigm ( "functional" or "imperative" ), a fresh copy on every call
+def paradigm_module(paradigm, name):
+    directory = os.path.join(ROOT, paradigm + " paradigm")
+    local_names = {os.path.splitext(entry)[0] for entry in os.listdir(directory) if entry.endswith(".py")}
+    saved = {module_name: sys.modules.pop(module_name) for module_name in local_names if module_name in sys.modules}
+    sys.path.insert(0, directory)
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path.remove(directory)
+        for module_name in local_names:
+            sys.modules.pop(module_name, None)
+        sys.modules.update(saved)
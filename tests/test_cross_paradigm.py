@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Both planners share their storage files : a file written by one paradigm must be read the same by the other
+# ( each command runs the cli of a paradigm in its own process, the modules of the two have the same names )
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = {
+    "imperative": os.path.join(ROOT, "imperative paradigm", "cli.py"),
+    "functional": os.path.join(ROOT, "functional paradigm", "cli.py"),
+}
+
+
+def run_cli(paradigm, directory, *arguments):
+    result = subprocess.run(
+        [sys.executable, CLI[paradigm], *arguments],
+        cwd=directory, capture_output=True, text=True, encoding="utf-8",
+    )
+    if result.returncode != 0:
+        raise AssertionError(f"{paradigm} cli {' '.join(arguments)} failed:\n{result.stderr}")
+    return result.stdout
+
+
+def listed_titles(paradigm, directory, storage):
+    output = run_cli(paradigm, directory, "--file", "tasks.json", "--storage", storage, "list", "--json")
+    return [task["title"] for task in json.loads(output)]
+
+
+class SharedJournalReplayTest(unittest.TestCase):
+    def test_each_paradigm_replays_the_records_of_the_other(self):
+        for storage in ("journal", "shared"):
+            with self.subTest(storage=storage), tempfile.TemporaryDirectory() as directory:
+                with open(os.path.join(directory, "tasks.json"), "w") as file:
+                    file.write("[]")
+                for paradigm, title in (("imperative", "Imperative task"), ("functional", "Functional task")):
+                    run_cli(paradigm, directory, "--file", "tasks.json", "--storage", storage,
+                            "add", title, "--description", "Written by the " + paradigm + " planner",
+                            "--due", "2099-01-01", "--priority", "Medium")
+                for paradigm in CLI:
+                    self.assertEqual(listed_titles(paradigm, directory, storage), ["Imperative task", "Functional task"])
+
+
+def task(title, creation_time, highlight):
+    return {"title": title, "description": "Snapshot task", "due_date": "2099-01-01", "priority": "Low",
+            "status": "Pending", "creation_time": creation_time, "highlight": highlight, "id": title.lower()}
+
+
+class BinarySnapshotTest(unittest.TestCase):
+    # A tasks file converted to a snapshot by one paradigm and back by the other
+    def converted(self, tasks, writer, reader):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "tasks.json"), "w") as file:
+                json.dump(tasks, file)
+            run_cli(writer, directory, "convert", "tasks.json", "tasks.bin")
+            run_cli(reader, directory, "convert", "tasks.bin", "read.json")
+            with open(os.path.join(directory, "read.json")) as file:
+                return json.load(file)
+
+    def test_a_snapshot_reads_back_the_same_in_each_paradigm(self):
+        functional_tasks = [task("A", "2024-02-16 14:30:41.123456", True), task("B", "2024-02-16 14:30:41", False)]
+        imperative_tasks = [task(name, "2023-01-01 00:00:00.000001", name.lower()) for name in ("Red", "Yellow", "None", "Normal")]
+        self.assertEqual(self.converted(functional_tasks, "functional", "functional"), functional_tasks)
+        self.assertEqual(self.converted(imperative_tasks, "imperative", "imperative"), imperative_tasks)
+
+    def test_the_highlight_and_the_creation_time_cross_over(self):
+        functional_tasks = [task("A", "2024-02-16 14:30:41.123456", True), task("B", "2024-02-16 14:30:41", False)]
+        imperative_tasks = [task(name, "2023-01-01 00:00:00.000001", name.lower()) for name in ("Red", "Yellow", "None", "Normal")]
+        self.assertEqual(
+            [(read["creation_time"], read["highlight"]) for read in self.converted(functional_tasks, "functional", "imperative")],
+            [("2024-02-16 14:30:41.123456", "yellow"), ("2024-02-16 14:30:41", "normal")],
+        )
+        self.assertEqual(
+            [(read["creation_time"], read["highlight"]) for read in self.converted(imperative_tasks, "imperative", "functional")],
+            [("2023-01-01 00:00:00.000001", highlight) for highlight in (False, True, False, False)],
+        )
+
+
+class ExportImportTest(unittest.TestCase):
+    def test_an_export_of_one_paradigm_imports_in_the_other_with_its_ids(self):
+        for exporter, importer, file_format in (("imperative", "functional", "csv"), ("functional", "imperative", "jsonl")):
+            with self.subTest(exporter=exporter, format=file_format), tempfile.TemporaryDirectory() as directory:
+                for name in ("source.json", "target.json"):
+                    with open(os.path.join(directory, name), "w") as file:
+                        file.write("[]")
+                for title in ("First task", "Second task"):
+                    run_cli(exporter, directory, "--file", "source.json", "add", title,
+                            "--description", "Exported", "--due", "2099-01-01", "--priority", "High")
+                export_file = "tasks." + file_format
+                run_cli(exporter, directory, "--file", "source.json", "export", "--format", file_format, "--output", export_file)
+                run_cli(importer, directory, "--file", "target.json", "import", export_file)
+                with open(os.path.join(directory, "source.json")) as source, open(os.path.join(directory, "target.json")) as target:
+                    self.assertEqual(
+                        [(task["id"], task["title"]) for task in json.load(source)],
+                        [(task["id"], task["title"]) for task in json.load(target)],
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
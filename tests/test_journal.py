@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import unittest
+
+from paradigm_modules import paradigm_module
+
+# The append-only journal of both planners checked against the records written to it : a journal
+# cut at any byte ( a crash in the middle of a write ) must open with exactly the records whose line
+# was complete, drop the torn rest and go on appending after them; compaction must keep every change
+
+PARADIGMS = ("functional", "imperative")
+
+
+# open_store(filename, compact_every) of a paradigm : returns (tasks, records, append, close)
+def store_opener(paradigm):
+    journal = paradigm_module(paradigm, "journal")
+    if paradigm == "functional":
+        def open_store(filename, compact_every):
+            contents, handle = journal.open_journal(filename, compact_every, sync=False)
+            return contents.tasks, contents.records, handle.append, handle.close
+    else:
+        def open_store(filename, compact_every):
+            tasks, records = journal.read_journal(filename)
+            journal.open_journal(compact_every, sync=False)
+            return tuple(tasks), tuple(records), journal.append_records, journal.close_journal
+    return open_store
+
+
+def record(number):
+    return {"op": "add", "title": f"Task {number}", "description": "x" * (number % 4)}
+
+
+# The records without their sequence numbers, after checking that these count up from first
+def unnumbered(test, records, first=1):
+    test.assertEqual([stored["sequence"] for stored in records], list(range(first, first + len(records))))
+    return [{field: value for field, value in stored.items() if field != "sequence"} for stored in records]
+
+
+class JournalTest(unittest.TestCase):
+    def test_a_journal_cut_anywhere_opens_with_its_complete_records(self):
+        written = [record(number) for number in range(6)]
+        for paradigm in PARADIGMS:
+            open_store = store_opener(paradigm)
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, "tasks.json")
+                _, _, append, close = open_store(filename, 1000)
+                append(written[:2], tuple)
+                append(written[2:], tuple)
+                close()
+                journal_path = os.path.join(directory, "tasks.journal")
+                with open(journal_path, "rb") as file:
+                    data = file.read()
+                line_ends = [position + 1 for position, byte in enumerate(data) if byte == ord("\n")]
+                self.assertEqual(len(line_ends), len(written))
+
+                for cut in range(len(data) + 1):
+                    complete = sum(1 for end in line_ends if end <= cut)
+                    with self.subTest(paradigm=paradigm, cut=cut):
+                        with open(journal_path, "wb") as file:
+                            file.write(data[:cut])
+                        tasks, records, append, close = open_store(filename, 1000)
+                        self.assertEqual(tasks, ())
+                        self.assertEqual(unnumbered(self, records), written[:complete])
+                        append([record(99)], tuple)
+                        close()
+                        _, records, _, close = open_store(filename, 1000)
+                        close()
+                        self.assertEqual(unnumbered(self, records), written[:complete] + [record(99)])
+
+    def test_reading_stops_at_a_line_that_is_not_json(self):
+        for paradigm in PARADIGMS:
+            open_store = store_opener(paradigm)
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, "tasks.json")
+                _, _, append, close = open_store(filename, 1000)
+                append([record(0), record(1)], tuple)
+                close()
+                with open(os.path.join(directory, "tasks.journal"), "ab") as file:
+                    file.write(b"not json\n" + json.dumps({"sequence": 3, **record(2)}).encode() + b"\n")
+                with self.subTest(paradigm=paradigm):
+                    _, records, append, close = open_store(filename, 1000)
+                    self.assertEqual(unnumbered(self, records), [record(0), record(1)])
+                    append([record(3)], tuple)
+                    close()
+                    _, records, _, close = open_store(filename, 1000)
+                    close()
+                    self.assertEqual(unnumbered(self, records), [record(0), record(1), record(3)])
+
+    def test_compaction_keeps_every_change(self):
+        for paradigm in PARADIGMS:
+            open_store = store_opener(paradigm)
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, "tasks.json")
+                with open(filename, "w") as file:
+                    file.write("[]")
+                titles = []
+                _, _, append, close = open_store(filename, 3)
+                for batch in range(8):
+                    added = [record(batch * 10 + number) for number in range(batch % 3 + 1)]
+                    titles += [added_record["title"] for added_record in added]
+                    append(added, lambda titles=tuple(titles): list(titles))
+                close()
+                with self.subTest(paradigm=paradigm):
+                    tasks, records, _, close = open_store(filename, 3)
+                    close()
+                    self.assertTrue(os.path.exists(os.path.join(directory, "tasks.snapshot.json")))
+                    self.assertEqual(list(tasks) + [stored["title"] for stored in records], titles)
+                    self.assertEqual(unnumbered(self, records, len(tasks) + 1), [record(int(title.split()[1])) for title in titles[len(tasks):]])
+
+
+if __name__ == "__main__":
+    unittest.main()
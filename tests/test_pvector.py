@@ -0,0 +1,108 @@
+import random
+import unittest
+from bisect import bisect_right
+
+from paradigm_modules import paradigm_module
+
+# The persistent vector of the functional planner checked against a plain list : random edits must
+# give the same values in the same order, every version must keep its values, and the tree must stay
+# balanced with the right sizes, also where its subtrees are still unbuilt ( see pvector.UnbuiltNode )
+
+pvector = paradigm_module("functional", "pvector")
+
+SIZES = (0, 1, 2, 3, 7, 16, 100)
+
+
+# Height of a tree, after checking the AVL balance, the height and the size of every node
+def checked_height(test, node):
+    if node is None:
+        return 0
+    left = checked_height(test, node.left)
+    right = checked_height(test, node.right)
+    test.assertLessEqual(abs(left - right), 1)
+    test.assertEqual(node.height, max(left, right) + 1)
+    test.assertEqual(node.size, pvector.size(node.left) + pvector.size(node.right) + 1)
+    return node.height
+
+
+def edited(generator, vector, values):
+    operation = generator.choice(("set", "insert", "append", "delete") if values else ("insert", "append"))
+    value = generator.random()
+    if operation == "set":
+        index = generator.randrange(-len(values), len(values))
+        values[index] = value
+        return vector.set(index, value)
+    if operation == "insert":
+        index = generator.randrange(len(values) + 1)
+        values.insert(index, value)
+        return vector.insert(index, value)
+    if operation == "append":
+        values.append(value)
+        return vector.append(value)
+    index = generator.randrange(-len(values), len(values))
+    del values[index]
+    return vector.delete(index)
+
+
+class PVectorTest(unittest.TestCase):
+    def assert_holds(self, vector, values):
+        self.assertEqual(len(vector), len(values))
+        self.assertEqual(list(vector), values)
+        self.assertEqual(vector.tolist(), values)
+        self.assertEqual([vector[index] for index in range(-len(values), len(values))], values + values)
+        checked_height(self, vector.root)
+
+    def test_random_edits_match_a_list(self):
+        generator = random.Random(1)
+        for size in SIZES:
+            for vector_type in (pvector.PVector, pvector.LazyPVector):
+                with self.subTest(size=size, vector=vector_type.__name__):
+                    values = [generator.random() for _ in range(size)]
+                    vector = vector_type(values)
+                    versions = [(vector, list(values))]
+                    for step in range(300):
+                        vector = edited(generator, vector, values)
+                        self.assert_holds(vector, values)
+                        if step % 50 == 0:
+                            versions.append((vector, list(values)))
+                    for version, version_values in versions:
+                        self.assertEqual(list(version), version_values)
+
+    def test_slices_match_a_list(self):
+        generator = random.Random(2)
+        values = list(range(60))
+        vector = pvector.LazyPVector(values)
+        for _ in range(40):
+            vector = edited(generator, vector, values)
+            start = generator.randrange(len(values) + 1)
+            stop = generator.randrange(start, len(values) + 1)
+            self.assertEqual(pvector.slice_values(vector.root, start, stop, []), values[start:stop])
+            self.assertEqual(list(vector[start:stop]), values[start:stop])
+            self.assertEqual(list(vector[::-3]), values[::-3])
+
+    def test_sorted_values_are_found_like_bisect(self):
+        values = sorted(random.Random(3).choices(range(50), k=80))
+        for vector in (pvector.LazyPVector(values), pvector.PVector(values).set(0, values[0])):
+            for key in range(-1, 52):
+                position = vector.find(key, lambda value: value)
+                if key in values:
+                    self.assertEqual(vector[position], key)
+                else:
+                    self.assertIsNone(position)
+                self.assertEqual(vector.insertion_point(key, lambda value: value), bisect_right(values, key))
+
+    def test_positions_out_of_range_raise_index_error(self):
+        for vector in (pvector.PVector(range(3)), pvector.LazyPVector(range(3))):
+            for index in (3, -4):
+                with self.assertRaises(IndexError):
+                    vector[index]
+                with self.assertRaises(IndexError):
+                    vector.set(index, 0)
+                with self.assertRaises(IndexError):
+                    vector.delete(index)
+            with self.assertRaises(IndexError):
+                vector.insert(4, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
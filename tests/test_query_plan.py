@@ -0,0 +1,83 @@
+import random
+import unittest
+
+from paradigm_modules import paradigm_module
+
+# The filter query planner of both planners checked against a brute-force filter : random
+# combinations of range predicates ( several on one field are merged ) and key sets must select the
+# same tasks as testing every task, each once, in the order of one of the indexes when no key set drives
+
+FIELDS = {"priority": 3, "due_day": 30}   # field : number of different values
+TASKS = 200
+# Task number of a slot in the functional planner ( key sets hold task numbers there, slots in the imperative one )
+FIRST_NUMBER = 1000
+
+
+def random_values(generator):
+    return {field: [generator.randrange(values) for _ in range(TASKS)] for field, values in FIELDS.items()}
+
+
+# A random predicate and the test of a slot it stands for
+def random_predicate(generator, query_plan, values, as_key):
+    kind = generator.choice(("between", "equal_to", "at_least", "at_most", "key_in"))
+    if kind == "key_in":
+        slots = frozenset(generator.sample(range(TASKS), generator.randrange(TASKS // 2)))
+        return query_plan.key_in(map(as_key, slots)), slots.__contains__
+    field = generator.choice(tuple(FIELDS))
+    first, last = sorted(generator.randrange(-1, FIELDS[field] + 1) for _ in range(2))
+    column = values[field]
+    if kind == "between":
+        first, last = generator.choice((first, None)), generator.choice((last, None))
+        return query_plan.between(field, first, last), lambda slot: (first is None or first <= column[slot]) and (last is None or column[slot] <= last)
+    if kind == "equal_to":
+        return query_plan.equal_to(field, first), lambda slot: column[slot] == first
+    if kind == "at_least":
+        return query_plan.at_least(field, first), lambda slot: column[slot] >= first
+    return query_plan.at_most(field, last), lambda slot: column[slot] <= last
+
+
+class QueryPlanTest(unittest.TestCase):
+    def check_plans(self, paradigm, matching_slots, build_index, as_key):
+        query_plan = paradigm_module(paradigm, "query_plan")
+        generator = random.Random(paradigm)
+        for _ in range(300):
+            values = random_values(generator)
+            indexes = {field: build_index(sorted((column[slot], slot) for slot in range(TASKS))) for field, column in values.items()}
+            entry_of = lambda field, slot: (values[field][slot], slot)
+            chosen = [random_predicate(generator, query_plan, values, as_key) for _ in range(generator.randint(1, 4))]
+            predicates = [predicate for predicate, _ in chosen]
+            expected = [slot for slot in range(TASKS) if all(test(slot) for _, test in chosen)]
+
+            found = list(matching_slots(query_plan, indexes, entry_of, predicates))
+            self.assertEqual(sorted(found), expected, predicates)
+            if not any(isinstance(predicate, query_plan.KeySetPredicate) for predicate in predicates):
+                orders = [sorted(expected, key=lambda slot: entry_of(predicate.field, slot)) for predicate in predicates]
+                self.assertIn(found, orders)
+            for predicate, test in chosen:
+                self.assertEqual(query_plan.estimate(indexes, predicate), sum(map(test, range(TASKS))))
+
+    def test_functional_plans_match_a_brute_force_filter(self):
+        sorted_index = paradigm_module("functional", "sorted_index")
+        self.check_plans(
+            "functional",
+            lambda query_plan, indexes, entry_of, predicates: query_plan.matching_slots(
+                indexes, entry_of, predicates,
+                key_of=lambda slot: slot + FIRST_NUMBER,
+                slots_of=lambda numbers: (number - FIRST_NUMBER for number in numbers),
+            ),
+            sorted_index.from_sorted,
+            lambda slot: slot + FIRST_NUMBER,
+        )
+
+    def test_imperative_plans_match_a_brute_force_filter(self):
+        sorted_index = paradigm_module("imperative", "sorted_index")
+        self.check_plans(
+            "imperative",
+            lambda query_plan, indexes, entry_of, predicates: query_plan.matching_slots(indexes, entry_of, predicates),
+            sorted_index.SortedIndex,
+            lambda slot: slot,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
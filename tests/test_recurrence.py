@@ -0,0 +1,112 @@
+import random
+import unittest
+from datetime import date
+
+from paradigm_modules import paradigm_module
+
+# The recurrence rules of both planners checked against a brute-force expansion that tests every day
+# from the start : random daily, weekly ( with and without BYDAY ) and monthly rules with INTERVAL,
+# COUNT and UNTIL, starting on month ends and leap days, must give the same occurrences in any range
+
+PARADIGMS = ("functional", "imperative")
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+STARTS = ("2024-01-31", "2024-02-29", "2023-03-30", "2024-08-31", "2025-06-15", "2024-12-29", "2023-01-01")
+# Days after the start the brute force expands
+HORIZON = 2000
+
+
+# Occurrence days of a rule before start + HORIZON, every day tested like RFC 5545 describes it
+def expanded_days(rule, start):
+    start_date = date.fromordinal(start)
+    week_start = start - start_date.weekday()
+
+    def occurs(day):
+        day_date = date.fromordinal(day)
+        if rule.frequency == "DAILY":
+            return (day - start) % rule.interval == 0
+        if rule.frequency == "WEEKLY":
+            weekdays = rule.weekdays or (start_date.weekday(),)
+            return (day - week_start) // 7 % rule.interval == 0 and day_date.weekday() in weekdays
+        months = (day_date.year - start_date.year) * 12 + day_date.month - start_date.month
+        return months % rule.interval == 0 and day_date.day == start_date.day
+
+    days = [day for day in range(start, start + HORIZON) if occurs(day)]
+    if rule.count is not None:
+        days = days[:rule.count]
+    return [day for day in days if rule.until is None or day <= rule.until]
+
+
+def random_rule_text(generator, start):
+    frequency = generator.choice(("DAILY", "WEEKLY", "MONTHLY"))
+    parts = ["FREQ=" + frequency, "INTERVAL=" + str(generator.randint(1, 4))]
+    if frequency == "WEEKLY" and generator.random() < 0.6:
+        parts.append("BYDAY=" + ",".join(generator.sample(WEEKDAY_CODES, generator.randint(1, 4))))
+    if generator.random() < 0.5:
+        parts.append("COUNT=" + str(generator.randint(1, 25)))
+    if generator.random() < 0.4:
+        parts.append("UNTIL=" + date.fromordinal(start + generator.randrange(-10, HORIZON // 2)).strftime("%Y%m%d"))
+    generator.shuffle(parts)
+    return ";".join(parts)
+
+
+class RecurrenceTest(unittest.TestCase):
+    def test_occurrences_match_a_brute_force_expansion(self):
+        for paradigm in PARADIGMS:
+            recurrence = paradigm_module(paradigm, "recurrence")
+            generator = random.Random(paradigm)
+            for _ in range(400):
+                start = date.fromisoformat(generator.choice(STARTS)).toordinal()
+                text = random_rule_text(generator, start)
+                rule = recurrence.parse_rule(text)
+                expected = expanded_days(rule, start)
+                with self.subTest(paradigm=paradigm, rule=text, start=date.fromordinal(start)):
+                    self.assertEqual(list(recurrence.occurrence_days(rule, start, None, start + HORIZON - 1)), expected)
+                    for _ in range(5):
+                        first = generator.choice((None, start + generator.randrange(-40, HORIZON)))
+                        last = generator.randrange(first or start, start + HORIZON)
+                        from_day = start if first is None else first
+                        self.assertEqual(
+                            list(recurrence.occurrence_days(rule, start, first, last)),
+                            [day for day in expected if from_day <= day <= last],
+                        )
+
+    def test_a_counted_series_ends_at_its_count(self):
+        for paradigm in PARADIGMS:
+            recurrence = paradigm_module(paradigm, "recurrence")
+            start = date(2024, 1, 31).toordinal()
+            for text in ("FREQ=DAILY;COUNT=5", "FREQ=WEEKLY;BYDAY=MO,FR;COUNT=7", "FREQ=MONTHLY;COUNT=6", "FREQ=MONTHLY;INTERVAL=5;COUNT=3"):
+                with self.subTest(paradigm=paradigm, rule=text):
+                    rule = recurrence.parse_rule(text)
+                    days = list(recurrence.occurrence_days(rule, start, None, recurrence.LAST_DAY))
+                    self.assertEqual(days, expanded_days(rule, start))
+                    self.assertEqual(len(days), rule.count)
+                    self.assertEqual(list(recurrence.occurrence_days(rule, start, days[-1] + 1, recurrence.LAST_DAY)), [])
+
+    def test_a_series_without_end_is_read_far_ahead(self):
+        for paradigm in PARADIGMS:
+            recurrence = paradigm_module(paradigm, "recurrence")
+            start = date(2024, 2, 29).toordinal()
+            first = date(9000, 1, 1).toordinal()
+            with self.subTest(paradigm=paradigm):
+                daily = recurrence.parse_rule("FREQ=DAILY;INTERVAL=3")
+                self.assertEqual(
+                    list(recurrence.occurrence_days(daily, start, first, first + 10)),
+                    [day for day in range(first, first + 11) if (day - start) % 3 == 0],
+                )
+                monthly = recurrence.parse_rule("FREQ=MONTHLY;INTERVAL=12")
+                self.assertEqual(
+                    [date.fromordinal(day) for day in recurrence.occurrence_days(monthly, start, first, recurrence.LAST_DAY)][:2],
+                    [date(9004, 2, 29), date(9008, 2, 29)],
+                )
+
+    def test_bad_rules_raise_value_error(self):
+        for paradigm in PARADIGMS:
+            recurrence = paradigm_module(paradigm, "recurrence")
+            for text in ("FREQ=YEARLY", "FREQ=DAILY;BYDAY=MO", "FREQ=WEEKLY;BYDAY=XX", "FREQ=DAILY;INTERVAL=0",
+                         "FREQ=DAILY;COUNT=0", "FREQ=DAILY;BYMONTH=1", "FREQ", "INTERVAL=2", "FREQ=DAILY;UNTIL=2024"):
+                with self.subTest(paradigm=paradigm, rule=text), self.assertRaises(ValueError):
+                    recurrence.parse_rule(text)
+
+
+if __name__ == "__main__":
+    unittest.main()